@@ -1,6 +1,24 @@
-# bring definitions to the top level
-from ds_engines.components.event_book_portfolio import EventBookPortfolio
-from ds_engines.components.controller import Controller
+# bring definitions to the top level. The components are imported on first use so importing the package, such as
+# for its handlers alone, does not import the component stacks
+import importlib
+
+_COMPONENTS = {'EventBookPortfolio': 'ds_engines.components.event_book_portfolio',
+               'Controller': 'ds_engines.components.controller'}
+
+__all__ = list(_COMPONENTS.keys())
+
+
+def __getattr__(name: str):
+    if name in _COMPONENTS:
+        component = getattr(importlib.import_module(_COMPONENTS[name]), name)
+        globals()[name] = component
+        return component
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + __all__)
+
 
 # release version number picked up in the setup.py
 __version__ = "2.03.028"
@@ -1,9 +1,22 @@
 from __future__ import annotations
 
+import functools
+import os
 import pandas as pd
 from aistac.components.abstract_component import AbstractComponent
+from ds_engines.engines.controller.contract_mirror import ContractMirror
+from ds_engines.engines.controller.level_coordinator import LevelCoordinator, LevelWorker
+from ds_engines.engines.controller.level_scheduler import LevelScheduler
+from ds_engines.engines.controller.level_transport import LevelTransport
+from ds_engines.engines.controller.resource_scheduler import ResourceScheduler
+from ds_engines.engines.controller.run_book_plan import RunBookPlan
+from ds_engines.engines.controller.run_journal import RunJournal
+from ds_engines.engines.controller.run_options import RunOptions
+from ds_engines.engines.controller.run_stats import RunStats
+from ds_engines.engines.controller.source_watermark import SourceWatermark
+from ds_engines.engines.controller.task_cache import TaskResultCache
 from ds_engines.managers.controller_property_manager import ControllerPropertyManager
-from ds_engines.intent.controller_intent import ControllerIntentModel
+from ds_engines.intent.controller_intent import ControllerIntentModel, run_intent_level
 
 __author__ = 'Darryl Oatridge'
 
@@ -42,6 +55,11 @@ class Controller(AbstractComponent):
                          template_source_handler=template_source_handler,
                          template_persist_handler=template_persist_handler, align_connectors=align_connectors)
         self._raw_attribute_list = []
+        self._result_cache = None
+        self._run_book_plans = dict()
+        self._run_stats = None
+        self._distributed_report = None
+        self._placement_report = None
 
     @classmethod
     def from_uri(cls, task_name: str, uri_pm_path: str, username: str, uri_pm_repo: str=None, pm_file_type: str=None,
@@ -108,6 +126,9 @@ class Controller(AbstractComponent):
         'HADRON_PM_TYPE': a file type for the property manager. If not found sets as 'json'
         'HADRON_PM_MODULE': a default module package, if not set uses component default
         'HADRON_PM_HANDLER': a default handler. if not set uses component default
+        'HADRON_PM_MIRROR': a local contract mirror directory the uri_pm_repo contracts are loaded from
+        'HADRON_PM_MIRROR_TARBALL': a tarball path or URL to populate the contract mirror from
+        'HADRON_PM_MIRROR_REFRESH': if the mirrored contracts are conditionally refreshed on load
 
         This method calls to the Factory Method 'from_uri(...)' returning the initialised class instance
 
@@ -125,6 +146,11 @@ class Controller(AbstractComponent):
          :param kwargs: to pass to the property ConnectorContract as its kwargs
          :return: the initialised class instance
          """
+        # load the contracts from the local mirror if there is one
+        mirror = ContractMirror.from_env()
+        repo = uri_pm_repo if isinstance(uri_pm_repo, str) else os.environ.get('HADRON_PM_REPO', None)
+        if isinstance(repo, str) and isinstance(mirror, ContractMirror):
+            uri_pm_repo = mirror.resolve(repo, task_name=task_name if isinstance(task_name, str) else 'master')
         # save the controllers uri_pm_repo path
         if isinstance(uri_pm_repo, str):
             cls.URI_PM_REPO = uri_pm_repo
@@ -219,6 +245,150 @@ class Controller(AbstractComponent):
             return self._report(df, index_header='name')
         return df
 
+    def reset_component_cache(self, task_name: str=None, uri_pm_repo: str=None):
+        """ removes task components from the component cache so they are rebuilt from their domain contracts on
+        their next run. Components are otherwise rebuilt only when their contract modified time or ETag changes
+
+        :param task_name: (optional) only remove the components of this task name
+        :param uri_pm_repo: (optional) only remove the components loaded from this repository URI
+        """
+        self.intent_model.COMPONENT_CACHE.invalidate(task_name=task_name, uri_pm_repo=uri_pm_repo)
+        return
+
+    def report_cache(self, cache_path: str=None, stylise: bool=True):
+        """ generates a report of the task result cache hits, misses, entries and bytes by task
+
+        :param cache_path: (optional) the cache directory. Defaults to the cache of the last run or the environment
+        :param stylise: returns a stylised dataframe with formatting
+        :return: pd.Dataframe
+        """
+        if isinstance(cache_path, str) or not isinstance(self._result_cache, TaskResultCache):
+            cache = TaskResultCache(cache_path=cache_path)
+        else:
+            cache = self._result_cache
+        df = pd.DataFrame.from_dict(data=cache.report(), orient='columns')
+        if stylise:
+            return self._report(df, index_header='task_name')
+        return df
+
+    def report_watermarks(self, watermark_path: str=None, stylise: bool=True):
+        """ generates a report of the source watermarks of the incremental tasks
+
+        :param watermark_path: (optional) the watermark directory. Default 'HADRON_CONTROLLER_WATERMARK_PATH'
+        :param stylise: returns a stylised dataframe with formatting
+        :return: pd.Dataframe
+        """
+        df = pd.DataFrame.from_dict(data=SourceWatermark(watermark_path=watermark_path).report(), orient='columns')
+        if stylise:
+            return self._report(df, index_header='task_name')
+        return df
+
+    def reset_watermarks(self, task_name: str=None, watermark_path: str=None):
+        """ removes the source watermarks of incremental tasks, so their next run reads their source in full and
+        replaces their outcome
+
+        :param task_name: (optional) only remove the watermarks of this task name
+        :param watermark_path: (optional) the watermark directory. Default 'HADRON_CONTROLLER_WATERMARK_PATH'
+        """
+        SourceWatermark(watermark_path=watermark_path).reset(task_name=task_name)
+        return
+
+    def report_journal(self, journal_path: str=None, stylise: bool=True):
+        """ generates a report of the tasks recorded as completed in the run journal
+
+        :param journal_path: (optional) the run journal directory. Default 'HADRON_CONTROLLER_JOURNAL_PATH'
+        :param stylise: returns a stylised dataframe with formatting
+        :return: pd.Dataframe
+        """
+        journal = RunJournal(task_name=self.pm.task_name, journal_path=journal_path)
+        df = pd.DataFrame.from_dict(data=journal.report(), orient='columns')
+        if stylise:
+            return self._report(df, index_header='level')
+        return df
+
+    def report_distributed(self, stylise: bool=True):
+        """ generates a report of the status, attempts, worker, wall time and error of each intent level of the
+        last distributed controller run
+
+        :param stylise: returns a stylised dataframe with formatting
+        :return: pd.Dataframe
+        """
+        data = self._distributed_report if isinstance(self._distributed_report, dict) else \
+            {key: [] for key in ['level', 'status', 'attempts', 'worker_id', 'wall_time', 'error']}
+        df = pd.DataFrame.from_dict(data=data, orient='columns')
+        if stylise:
+            return self._report(df, index_header='level')
+        return df
+
+    def report_placement(self, stylise: bool=True):
+        """ generates a report of the pool, resource class, memory estimate and the source of the estimate each
+        intent level was placed with in the last resource aware controller run
+
+        :param stylise: returns a stylised dataframe with formatting
+        :return: pd.Dataframe
+        """
+        placements = self._placement_report if isinstance(self._placement_report, dict) else {}
+        data = {'level': list(placements.keys())}
+        for key in ['pool', 'resource', 'memory', 'source']:
+            data[key] = [v.get(key) for v in placements.values()]
+        df = pd.DataFrame.from_dict(data=data, orient='columns')
+        if stylise:
+            return self._report(df, index_header='level')
+        return df
+
+    @staticmethod
+    def run_worker(transport: LevelTransport, worker_id: str=None, max_tasks: int=None,
+                   idle_timeout: float=None) -> int:
+        """ runs as a level worker of a distributed controller run, claiming and running the intent levels
+        submitted by a coordinator `run_controller(transport=...)` until the coordinator closes the run. The worker
+        needs no domain contract of its own as each level is sent with its intent.
+
+        :param transport: the level transport to the coordinator
+        :param worker_id: (optional) a reference for the worker. Default the host name and a unique suffix
+        :param max_tasks: (optional) the number of levels to run before returning. Default no limit
+        :param idle_timeout: (optional) the seconds without a level to run before returning. Default no limit
+        :return: the number of levels run
+        """
+        worker = LevelWorker(transport=transport, worker_id=worker_id)
+        return worker.run(run_level=run_intent_level, max_tasks=max_tasks, idle_timeout=idle_timeout)
+
+    def report_run_stats(self, run_history: str=None, run_id: [str, list]=None, stylise: bool=True):
+        """ generates a report of the wall time, CPU time, peak memory, rows and bytes of each intent level and task
+        of the last controller run, or of the runs in a run history
+
+        :param run_history: (optional) a run history to report from. Default the last run
+        :param run_id: (optional) with a run history, a run id or list of run ids to report
+        :param stylise: returns a stylised dataframe with formatting
+        :return: pd.Dataframe
+        """
+        if isinstance(run_history, str):
+            data = RunStats.load_history(run_history=run_history, run_id=run_id)
+        elif isinstance(self._run_stats, RunStats):
+            data = self._run_stats.report()
+        else:
+            data = {key: [] for key in RunStats.RECORD_KEYS}
+        df = pd.DataFrame.from_dict(data=data, orient='columns')
+        df = df.drop(columns='profile')
+        if stylise:
+            return self._report(df, index_header='level')
+        return df
+
+    def report_run_profile(self, level: [str, int]=None) -> str:
+        """ returns the cProfile summaries of the tasks of the last controller run, if it was run with profile
+
+        :param level: (optional) only return the profiles of this intent level
+        :return: the profile summaries, each headed by the level, method and task name
+        """
+        if not isinstance(self._run_stats, RunStats):
+            return ''
+        profiles = []
+        for record in self._run_stats.records:
+            if record.get('profile') is None or (level is not None and record.get('level') != str(level)):
+                continue
+            profiles.append(f"level '{record.get('level')}', {record.get('method')} '{record.get('task_name')}'\n"
+                            f"{record.get('profile')}")
+        return "\n".join(profiles)
+
     def report_intent(self, levels: [str, int, list] = None, stylise: bool = True):
         """ generates a report on all the intent
 
@@ -261,29 +431,248 @@ class Controller(AbstractComponent):
             return df_style
         return df
 
-    def run_controller(self, intent_levels: [str, int, list]=None, synthetic_sizes: dict=None):
+    def set_level_dependencies(self, intent_level: [str, int], depends_on: [str, int, list], save: bool=None):
+        """ sets the intent levels that must complete before an intent level can run when the controller is run in
+        parallel. These are in addition to any dependencies inferred from the task connectors
+
+        :param intent_level: the intent level
+        :param depends_on: a single or list of intent levels the intent level depends on
+        :param save: (optional) if True, save to file. Default is True
+        """
+        self.pm.set_dependencies(intent_level=intent_level, depends_on=depends_on)
+        self.pm_persist(save=save)
+
+    def remove_level_dependencies(self, intent_level: [str, int]=None, save: bool=None):
+        """removes the dependencies of an intent level or, if no intent level is given, all dependencies"""
+        self.pm.remove_dependencies(intent_level=intent_level)
+        self.pm_persist(save=save)
+
+    def get_level_dependencies(self, intent_levels: [str, int, list]=None, infer: bool=None) -> dict:
+        """ returns the dependency graph of the intent levels as a dictionary of intent level to the intent levels it
+        depends on. The graph is the explicit dependencies set in the contract and, if infer is True, dependencies
+        inferred by matching each level's source connectors to the persist connectors of the levels before it.
+
+        :param intent_levels: (optional) the intent levels, in run order. Defaults to the run order of all levels
+        :param infer: (optional) if dependencies should be inferred from the task connectors. Default True
+        :return: dictionary of intent level to a list of intent levels
+        """
+        infer = infer if isinstance(infer, bool) else True
+        intent_levels = self._get_intent_levels(intent_levels=intent_levels)
+        connectors = None
+        if infer:
+            connectors = {str(level): self.intent_model.level_connectors(intent_level=level,
+                                                                         controller_repo=self.URI_PM_REPO)
+                          for level in intent_levels}
+        return self._level_dependencies(intent_levels=intent_levels, connectors=connectors)
+
+    def compile_run_book(self, run_book: str=None, intent_levels: [str, int, list]=None,
+                         infer_dependencies: bool=None, bind_connectors: bool=None) -> RunBookPlan:
+        """ compiles a run book into an immutable execution plan of the intent levels in run order, each level's
+        intent, the level dependencies and the level connector bindings. The plan can be passed to
+        `run_controller()` repeatedly, without the contract being reread, or serialised with `to_json()` and
+        shipped to workers. Plans are cached and only recompiled once the controller contract, or the domain contract
+        of one of its tasks, changes.
+
+        :param run_book: (optional) the name of a run book giving the intent levels to run
+        :param intent_levels: (optional) the intent levels to run if no run book is given. Default all levels
+        :param infer_dependencies: (optional) if dependencies are inferred from the task connectors. Default True
+        :param bind_connectors: (optional) if the task connector URIs are resolved into the plan. Default True
+        :return: RunBookPlan
+        """
+        bind_connectors = bind_connectors if isinstance(bind_connectors, bool) else True
+        infer_dependencies = infer_dependencies if isinstance(infer_dependencies, bool) else True
+        if isinstance(run_book, str):
+            if not self.pm.has_run_book(run_book):
+                raise ValueError(f"The run book '{run_book}' can not be found in the controller contract")
+            intent_levels = self.pm.get_run_book(run_book)
+        intent_levels = self._get_intent_levels(intent_levels=intent_levels)
+        contract_version = self._contract_version(intent_levels=intent_levels)
+        key = (run_book, tuple(str(x) for x in intent_levels), infer_dependencies, bind_connectors)
+        plan = self._run_book_plans.get(key)
+        if isinstance(plan, RunBookPlan) and plan.is_valid(contract_version):
+            return plan
+        connectors = None
+        if bind_connectors or infer_dependencies:
+            connectors = {str(level): self.intent_model.level_connectors(intent_level=level,
+                                                                         controller_repo=self.URI_PM_REPO)
+                          for level in intent_levels}
+        dependencies = self._level_dependencies(intent_levels=intent_levels,
+                                                connectors=connectors if infer_dependencies else None)
+        level_intents = {str(level): self.pm.get(self.pm.join(self.pm.KEY.intent_key, level), {})
+                         for level in intent_levels}
+        plan = RunBookPlan(task_name=self.pm.task_name, intent_levels=intent_levels, level_intents=level_intents,
+                           dependencies=dependencies, contract_version=contract_version,
+                           connectors=connectors if bind_connectors else None, run_book=run_book,
+                           controller_repo=self.URI_PM_REPO, infer_dependencies=infer_dependencies)
+        self._run_book_plans[key] = plan
+        return plan
+
+    def _contract_version(self, intent_levels: list) -> str:
+        """returns the version of the controller contract and the domain contracts of the intent level tasks"""
+        contract_stamps = dict()
+        for level in intent_levels:
+            contract_stamps[str(level)] = self.intent_model.level_contract_stamps(intent_level=level,
+                                                                                  controller_repo=self.URI_PM_REPO)
+        return RunBookPlan.get_contract_version(self.pm, contract_stamps=contract_stamps)
+
+    def _level_dependencies(self, intent_levels: list, connectors: dict=None) -> dict:
+        """ returns the explicit dependencies of the intent levels and, if connectors are given, those inferred by
+        matching each level's source connectors to the persist connectors of the levels before it"""
+        dependencies = {str(level): set(self.pm.get_dependencies(level)) for level in intent_levels}
+        if isinstance(connectors, dict):
+            for i, level in enumerate(intent_levels):
+                for upstream in intent_levels[:i]:
+                    if connectors[str(level)]['inputs'].intersection(connectors[str(upstream)]['outputs']):
+                        dependencies[str(level)].add(str(upstream))
+        return {level: sorted(depends_on) for level, depends_on in dependencies.items()}
+
+    def run_controller(self, intent_levels: [str, int, list]=None, synthetic_sizes: dict=None,
+                       run_book_plan: RunBookPlan=None, run_options: RunOptions=None, **kwargs):
         """ Runs the transition pipeline from source to persist. The synthetic_intent_sizes allows the additional
         inclusion of the special case SyntheticBuilder dataset size to be specified and applied to the different intent
         levels. If two or more Synthetic Builds are within one intent the values will be applied to all. If no size
-        is given then the default saved size is used
+        is given then the default saved size is used.
+
+        How the run is placed and how each intent level is run are set by the run options, see RunOptions, given
+        as a RunOptions or as its parameters in the kwargs. The options are validated once and configure the intent
+        model of every level, whether run here or by a worker.
+
+        With max_workers greater than one, the intent levels are run as a dependency graph in a pool of worker
+        processes, each level starting once the levels it depends on have completed (see `get_level_dependencies()`).
+        With a transport, the controller is the coordinator of a distributed run, and the levels are run by level
+        workers on other processes or nodes (see `run_worker()`). With cpu_workers, io_workers or a memory_budget,
+        each level is placed by its resource class, CPU bound levels on a pool of worker processes and I/O bound
+        levels on a pool of threads, within the memory budget (see `report_placement()`). Levels that are not run
+        in order only hand off outcomes between the tasks of the same level.
 
         :param intent_levels: (optional) list of intent labels to run in the order given
         :param synthetic_sizes: (optional) a dictionary keyed by intent level with a synthetic size parameter
+        :param run_book_plan: (optional) a plan from `compile_run_book()` to run in place of the intent_levels. If
+                        the controller contract has changed since the plan was compiled, it is recompiled
+        :param run_options: (optional) the options of the run, see RunOptions
+        :param kwargs: (optional) RunOptions parameters, such as max_workers, handoff or report_policy, taking
+                        precedence over those of the run_options
         """
-        if not self.pm.has_intent():
+        run_options = RunOptions.from_dict(kwargs, default=run_options)
+        if isinstance(run_book_plan, RunBookPlan):
+            if not run_book_plan.is_valid(self._contract_version(intent_levels=run_book_plan.intent_levels)):
+                run_book_plan = self.compile_run_book(run_book=run_book_plan.run_book,
+                                                      intent_levels=run_book_plan.intent_levels,
+                                                      infer_dependencies=run_book_plan.infer_dependencies,
+                                                      bind_connectors=run_book_plan.is_bound)
+            intent_levels = run_book_plan.intent_levels
+        elif not self.pm.has_intent():
             return
-        if isinstance(intent_levels, (int, str, list)):
-            intent_levels = self.pm.list_formatter(intent_levels)
         else:
-            intent_levels = self.pm.list_formatter(self.pm.get_intent().keys())
-            if self.pm.DEFAULT_INTENT_LEVEL in intent_levels:
-                intent_levels.insert(0, intent_levels.pop(intent_levels.index(self.pm.DEFAULT_INTENT_LEVEL)))
-        for intent in intent_levels:
-            synthetic_size = synthetic_sizes.get(intent, None) if isinstance(synthetic_sizes, dict) else None
-            self.intent_model.run_intent_pipeline(intent_level=intent, controller_repo=self.URI_PM_REPO,
-                                                  synthetic_size=synthetic_size)
+            intent_levels = self._get_intent_levels(intent_levels=intent_levels)
+        self._run_stats = RunStats(profile=run_options.profile) if run_options.run_stats else None
+        journal = run_options.journal(task_name=self.pm.task_name)
+        if isinstance(journal, RunJournal) and not run_options.resume:
+            journal.clear()
+        self._result_cache = run_options.result_cache()
+        parallel = run_options.max_workers > 1 and len(intent_levels) > 1
+        if run_options.is_distributed or run_options.is_resource_aware or parallel:
+            if isinstance(run_book_plan, RunBookPlan):
+                dependencies = run_book_plan.get_dependencies()
+                level_intents = run_book_plan.get_level_intents()
+            else:
+                dependencies = self.get_level_dependencies(intent_levels=intent_levels,
+                                                           infer=run_options.infer_dependencies)
+                level_intents = {str(level): self.pm.get(self.pm.join(self.pm.KEY.intent_key, level), {})
+                                 for level in intent_levels}
+            level_params = {'task_name': self.pm.task_name, 'level_intents': level_intents,
+                            'synthetic_sizes': synthetic_sizes, 'controller_repo': self.URI_PM_REPO,
+                            'run_options': run_options.level_options()}
+            if isinstance(self._run_stats, RunStats):
+                level_params['run_id'] = self._run_stats.run_id
+            if run_options.handoff:
+                # each level runs in its own intent model, so only outcomes read within the level are handed off,
+                # and those also read by another level are always persisted for it
+                level_inputs = self._level_inputs(intent_levels=intent_levels, run_book_plan=run_book_plan)
+                level_params['level_intermediates'] = dict()
+                for level, inputs in level_inputs.items():
+                    others = set().union(*[v for k, v in level_inputs.items() if k != level])
+                    level_params['level_intermediates'][level] = sorted(inputs.difference(others))
+            if run_options.is_distributed:
+                coordinator = LevelCoordinator(transport=run_options.transport, dependencies=dependencies,
+                                               max_retries=run_options.max_retries,
+                                               lease_timeout=run_options.lease_timeout)
+                try:
+                    results = coordinator.run(intent_levels=intent_levels, params=level_params)
+                finally:
+                    self._distributed_report = coordinator.report()
+            elif run_options.is_resource_aware:
+                profiles = ResourceScheduler.level_profiles(level_intents=level_intents,
+                                                            declared=run_options.resource_classes,
+                                                            run_history=run_options.run_history)
+                scheduler = ResourceScheduler(dependencies=dependencies, cpu_workers=run_options.cpu_workers,
+                                              io_workers=run_options.io_workers,
+                                              memory_budget=run_options.memory_budget, profiles=profiles)
+                try:
+                    results = scheduler.run(intent_levels=intent_levels,
+                                            run_level=functools.partial(run_intent_level, **level_params))
+                finally:
+                    self._placement_report = scheduler.placements
+            else:
+                results = LevelScheduler(dependencies=dependencies, max_workers=run_options.max_workers).run(
+                    intent_levels=intent_levels, run_level=functools.partial(run_intent_level, **level_params))
+            if isinstance(self._run_stats, RunStats):
+                for level in intent_levels:
+                    self._run_stats.extend(results.get(str(level), []))
+                self._persist_run_stats(run_history=run_options.run_history)
+            return
+        intermediates = None
+        if run_options.handoff:
+            if isinstance(run_book_plan, RunBookPlan) and run_book_plan.is_bound:
+                intermediates = run_book_plan.get_intermediates()
+            else:
+                intermediates = set().union(*self._level_inputs(intent_levels=intent_levels).values())
+        run_options.configure(self.intent_model, task_name=self.pm.task_name, intermediates=intermediates,
+                              result_cache=self._result_cache, run_stats=self._run_stats)
+        try:
+            for intent in intent_levels:
+                synthetic_size = synthetic_sizes.get(intent, None) if isinstance(synthetic_sizes, dict) else None
+                level_intent = None
+                if isinstance(run_book_plan, RunBookPlan):
+                    level_intent = run_book_plan.get_level_intent(intent)
+                if isinstance(self._run_stats, RunStats):
+                    with self._run_stats.measure(level=intent, method='level', task_name=self.pm.task_name):
+                        self.intent_model.run_intent_pipeline(intent_level=intent, controller_repo=self.URI_PM_REPO,
+                                                              synthetic_size=synthetic_size,
+                                                              level_intent=level_intent)
+                else:
+                    self.intent_model.run_intent_pipeline(intent_level=intent, controller_repo=self.URI_PM_REPO,
+                                                          synthetic_size=synthetic_size, level_intent=level_intent)
+        finally:
+            try:
+                RunOptions.release(self.intent_model)
+            finally:
+                self._persist_run_stats(run_history=run_options.run_history)
         return
 
+    def _level_inputs(self, intent_levels: list, run_book_plan: RunBookPlan=None) -> dict:
+        """returns the connector URIs read by each intent level, from the run book plan if it is bound"""
+        if isinstance(run_book_plan, RunBookPlan) and run_book_plan.is_bound:
+            return {str(level): set(run_book_plan.get_connectors(level)['inputs']) for level in intent_levels}
+        return {str(level): set(self.intent_model.level_connectors(intent_level=level,
+                                                                   controller_repo=self.URI_PM_REPO)['inputs'])
+                for level in intent_levels}
+
+    def _persist_run_stats(self, run_history: [str, None]):
+        """appends the run stats of the last run to the run history, if there are run stats and a run history"""
+        if isinstance(self._run_stats, RunStats) and isinstance(run_history, str):
+            self._run_stats.persist(run_history=run_history)
+        return
+
+    def _get_intent_levels(self, intent_levels: [str, int, list]=None) -> list:
+        """returns the intent levels to run in order, defaulting to all levels with the default level first"""
+        if isinstance(intent_levels, (int, str, list)):
+            return self.pm.list_formatter(intent_levels)
+        intent_levels = self.pm.list_formatter(self.pm.get_intent().keys())
+        if self.pm.DEFAULT_INTENT_LEVEL in intent_levels:
+            intent_levels.insert(0, intent_levels.pop(intent_levels.index(self.pm.DEFAULT_INTENT_LEVEL)))
+        return intent_levels
+
     def _report(self, canonical: pd.DataFrame, index_header: str, bold: [str, list]=None, large_font: [str, list]=None):
         """ generates a stylised report
 
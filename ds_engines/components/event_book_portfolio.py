@@ -1,26 +1,44 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import logging
 import os
+import uuid
+from contextlib import ExitStack
+from concurrent.futures import wait
 from datetime import datetime
 from typing import Any
+from urllib.parse import urlparse
 import pandas as pd
 from aistac.components.abstract_component import AbstractComponent
-from aistac.handlers.abstract_handlers import ConnectorContract
+from aistac.handlers.abstract_handlers import ConnectorContract, HandlerFactory
+from ds_engines.engines.event_books.async_event_book import AsyncEventBook
+from ds_engines.engines.event_books.book_query import BookQuery
 from ds_engines.managers.event_book_property_manager import EventBookPropertyManager
 from ds_engines.intent.event_book_intent_model import EventBookIntentModel
 
 __author__ = 'Darryl Oatridge'
 
+logger = logging.getLogger(__name__)
+
 
 class EventBookPortfolio(AbstractComponent):
 
     __book_portfolio = dict()
+    __async_portfolio = dict()
     BOOK_TEMPLATE_CONNECTOR = 'book_template_connector'
 
     DEFAULT_MODULE = 'ds_discovery.handlers.pandas_handlers'
     DEFAULT_SOURCE_HANDLER = 'PandasSourceHandler'
     DEFAULT_PERSIST_HANDLER = 'PandasPersistHandler'
 
+    SNAPSHOT_MODULE = 'ds_engines.handlers.snapshot_handlers'
+    SNAPSHOT_PERSIST_HANDLER = 'SnapshotPersistHandler'
+
+    MANIFEST_MODULE = 'aistac.handlers.python_handlers'
+    MANIFEST_HANDLER = 'PythonPersistHandler'
+
     def __init__(self, property_manager: EventBookPropertyManager, intent_model: EventBookIntentModel,
                  default_save=None, reset_templates: bool = None, template_path: str = None,
                  template_module: str = None,
@@ -117,6 +135,15 @@ class EventBookPortfolio(AbstractComponent):
             return True
         return False
 
+    def get_async_book(self, book_name: str) -> AsyncEventBook:
+        """retrieves the asyncio wrapper of an active event book instance by name"""
+        event_book = self.get_active_book(book_name=book_name)
+        async_book = self.__async_portfolio.get(book_name)
+        if async_book is None or async_book.event_book is not event_book:
+            async_book = AsyncEventBook(event_book=event_book)
+            self.__async_portfolio.update({book_name: async_book})
+        return async_book
+
     def start_portfolio(self, exclude_books: [str, list]=None,):
         """runs the intent pipeline
 
@@ -160,27 +187,35 @@ class EventBookPortfolio(AbstractComponent):
         return
 
     def add_book_contract(self, book_name: str, with_log: bool=None, file_type: str=None, versioned: bool=None,
-                          stamped: bool=None, save: bool=None, **kwargs):
+                          stamped: bool=None, snapshot: bool=None, save: bool=None, **kwargs):
         """ adds an event book connector using the book connector template and appending a book pattern to the URI path
 
         :param book_name: the name of the event book
         :param with_log: (optional) if an events log connector should be created
-        :param file_type: (optional) a file type extension. defaults to 'pickle'
+        :param file_type: (optional) a file type extension. defaults to 'pickle', or 'parquet' if a snapshot
         :param versioned: (optional) if the connector uri should be versioned
         :param stamped: (optional) if the connector uri should be timestamped
+        :param snapshot: (optional) if the state should use the columnar snapshot handler rather than the template
+                        handler. Snapshot kwargs such as chunk_size, compression and max_workers can be passed as kwargs
         :param save: (optional) override of the default save action set at initialisation.
         :param kwargs: extra kwargs to pass to the connector
         """
         if not self.pm.has_connector(connector_name=self.BOOK_TEMPLATE_CONNECTOR):
             raise ConnectionError(f"The book template connector has not been set")
         template = self.pm.get_connector_contract(self.BOOK_TEMPLATE_CONNECTOR)
-        uri_file = self.pm.file_pattern(name=book_name, file_type=file_type, versioned=versioned,
+        snapshot = snapshot if isinstance(snapshot, bool) else False
+        state_file_type = file_type if isinstance(file_type, str) or not snapshot else 'parquet'
+        uri_file = self.pm.file_pattern(name=book_name, file_type=state_file_type, versioned=versioned,
                                         stamped=stamped)
         uri = os.path.join(template.path, uri_file)
         if not isinstance(kwargs, dict):
             kwargs = {}
         kwargs.update(template.raw_kwargs)
-        cc = ConnectorContract(uri=uri, module_name=template.module_name, handler=template.handler, **kwargs)
+        if snapshot:
+            cc = ConnectorContract(uri=uri, module_name=self.SNAPSHOT_MODULE, handler=self.SNAPSHOT_PERSIST_HANDLER,
+                                   **kwargs)
+        else:
+            cc = ConnectorContract(uri=uri, module_name=template.module_name, handler=template.handler, **kwargs)
         self.add_connector_contract(connector_name=book_name, connector_contract=cc, template_aligned=True, save=save)
         # add the log persist
         if isinstance(with_log, bool) and with_log:
@@ -201,36 +236,179 @@ class EventBookPortfolio(AbstractComponent):
         """loads the current persisted state"""
         return self.load_canonical(connector_name=book_name)
 
+    def snapshot_portfolio(self, book_names: [str, list]=None, manifest_uri: str=None, retain: int=None) -> dict:
+        """ checkpoints the active event books at a consistent point. Ingestion is paused only while a copy-on-write
+        snapshot of every book is taken, then the snapshots are persisted in parallel, each to a URI of its own
+        scoped by the snapshot id alongside its book connector, so a snapshot is never overwritten by the book
+        state being persisted. The manifest, recording the snapshot URI and version of each book, is written once
+        every book has persisted, so a manifest always describes a complete snapshot. Once the manifest is written,
+        the earlier snapshots beyond the retention count are removed.
+
+        :param book_names: (optional) the book names to snapshot. Default all active books
+        :param manifest_uri: (optional) the URI of the manifest. Default a 'portfolio_manifest' json file in the
+                        book template connector path
+        :param retain: (optional) the number of snapshots to keep, including this one. Default 1
+        :return: the manifest
+        """
+        if book_names is None:
+            book_names = list(self.__book_portfolio.keys())
+        book_names = self.pm.list_formatter(book_names)
+        inactive = [book for book in book_names if not self.is_active_book(book_name=book)]
+        if len(inactive) > 0:
+            raise ValueError(f"The event book instances {inactive} are not active.")
+        missing = [book for book in book_names if not self.pm.has_connector(book)]
+        if len(missing) > 0:
+            raise ValueError(f"The event books {missing} have no book connector to persist to")
+        manifest_uri = manifest_uri if isinstance(manifest_uri, str) else self._manifest_uri()
+        retain = retain if isinstance(retain, int) and retain > 0 else 1
+        # quiesce the books in a fixed order, holding every book while its snapshot is taken
+        snapshots = dict()
+        snapshot_id = uuid.uuid4().hex
+        created = datetime.now()
+        with ExitStack() as stack:
+            for book in sorted(book_names):
+                event_book = stack.enter_context(self.get_async_book(book_name=book).quiesce())
+                snapshots[book] = (event_book.version, event_book.snapshot_state())
+        books = dict()
+        for book in book_names:
+            version, state = snapshots[book]
+            connector_contract = self.pm.get_connector_contract(book)
+            books[book] = {'uri': self._snapshot_uri(connector_contract.uri, snapshot_id),
+                           'module_name': connector_contract.module_name, 'handler': connector_contract.handler,
+                           'version': version, 'shape': list(state.shape) if hasattr(state, 'shape') else None}
+
+        def persist(async_book: AsyncEventBook, state: Any, connector_name: str):
+            uri = books[connector_name]['uri']
+            if urlparse(uri).scheme in ['', 'file']:
+                os.makedirs(os.path.dirname(urlparse(uri).path), exist_ok=True)
+            handler = HandlerFactory.instantiate(self._snapshot_contract(connector_name, uri))
+            handler.persist_canonical(state)
+
+        _ = self._apply_books({book: functools.partial(persist, state=snapshots[book][1], connector_name=book)
+                               for book in book_names})
+        handler = HandlerFactory.instantiate(self._manifest_contract(manifest_uri))
+        previous = handler.load_canonical() if handler.exists() else {}
+        earlier = list(previous.get('retained', []))
+        if 'snapshot_id' in previous:
+            earlier.append({'snapshot_id': previous['snapshot_id'], 'books': previous.get('books', {})})
+        retained = earlier[len(earlier) - (retain - 1):] if retain > 1 else []
+        manifest = {'snapshot_id': snapshot_id, 'task_name': self.pm.task_name, 'created': created.isoformat(),
+                    'books': books, 'retained': retained}
+        handler.persist_canonical(manifest)
+        for snapshot in earlier[:len(earlier) - len(retained)]:
+            self._remove_snapshot(snapshot)
+        return manifest
+
+    def recover_portfolio(self, book_names: [str, list]=None, manifest_uri: str=None) -> list:
+        """ restores the active event books from the last portfolio snapshot in parallel, see `snapshot_portfolio()`.
+        Each book is loaded from the snapshot URI in the manifest and restored to the version it was taken at. The
+        books must be started before they are recovered
+
+        :param book_names: (optional) the book names to recover. Default all books in the manifest
+        :param manifest_uri: (optional) the URI of the manifest. Default as `snapshot_portfolio()`
+        :return: the list of book names recovered
+        """
+        manifest_uri = manifest_uri if isinstance(manifest_uri, str) else self._manifest_uri()
+        handler = HandlerFactory.instantiate(self._manifest_contract(manifest_uri))
+        if not handler.exists():
+            raise FileNotFoundError(f"No portfolio snapshot manifest could be found at '{manifest_uri}'")
+        manifest = handler.load_canonical()
+        books = manifest.get('books', {})
+        book_names = list(books.keys()) if book_names is None else self.pm.list_formatter(book_names)
+        unknown = [book for book in book_names if book not in books.keys()]
+        if len(unknown) > 0:
+            raise ValueError(f"The event books {unknown} are not in the portfolio snapshot manifest")
+
+        def recover(async_book: AsyncEventBook, connector_name: str):
+            handler = HandlerFactory.instantiate(self._snapshot_contract(connector_name, books[connector_name]['uri']))
+            state = handler.load_canonical()
+            async_book.call(async_book.event_book.restore_state, state=state,
+                            version=books[connector_name].get('version'))
+
+        _ = self._apply_books({book: functools.partial(recover, connector_name=book) for book in book_names})
+        return book_names
+
+    def _manifest_uri(self) -> str:
+        """returns the default portfolio manifest URI in the book template connector path"""
+        if not self.pm.has_connector(connector_name=self.BOOK_TEMPLATE_CONNECTOR):
+            raise ConnectionError(f"The book template connector has not been set")
+        template = self.pm.get_connector_contract(self.BOOK_TEMPLATE_CONNECTOR)
+        return os.path.join(template.path, self.pm.file_pattern(name='portfolio_manifest', file_type='json'))
+
+    @staticmethod
+    def _snapshot_uri(uri: str, snapshot_id: str) -> str:
+        """returns the URI of a book snapshot, in a 'snapshots/<snapshot_id>' directory alongside the book URI"""
+        path, query = (uri.split('?', 1) + [''])[:2]
+        head, sep, name = path.rpartition('/')
+        path = f"{head}{sep}snapshots/{snapshot_id}/{name}"
+        return f"{path}?{query}" if len(query) > 0 else path
+
+    def _snapshot_contract(self, connector_name: str, uri: str) -> ConnectorContract:
+        """returns a connector contract to the snapshot URI, with the handler and kwargs of the book connector"""
+        connector_contract = self.pm.get_connector_contract(connector_name)
+        return ConnectorContract(uri=uri, module_name=connector_contract.module_name,
+                                 handler=connector_contract.handler, **connector_contract.kwargs)
+
+    @staticmethod
+    def _remove_snapshot(snapshot: dict):
+        """ removes the book snapshots of a snapshot no longer in the manifest. The snapshot is already replaced so a
+        snapshot that can not be removed is logged rather than raised"""
+        for book, entry in snapshot.get('books', {}).items():
+            uri = entry.get('uri')
+            if not isinstance(entry.get('module_name'), str) or not isinstance(entry.get('handler'), str):
+                continue
+            try:
+                handler = HandlerFactory.instantiate(ConnectorContract(uri=uri, module_name=entry.get('module_name'),
+                                                                       handler=entry.get('handler')))
+                if handler.exists():
+                    handler.remove_canonical()
+                if urlparse(uri).scheme in ['', 'file']:
+                    # the snapshot directory is removed once the last of its books is removed
+                    path = os.path.dirname(urlparse(uri).path)
+                    if os.path.isdir(path) and len(os.listdir(path)) == 0:
+                        os.rmdir(path)
+            except Exception as e:
+                logger.warning(f"The snapshot '{snapshot.get('snapshot_id')}' of the event book '{book}' could not "
+                               f"be removed from '{uri}': {e}")
+        return
+
+    def _manifest_contract(self, manifest_uri: str) -> ConnectorContract:
+        """returns the connector contract of the portfolio manifest"""
+        return ConnectorContract(uri=manifest_uri, module_name=self.MANIFEST_MODULE, handler=self.MANIFEST_HANDLER)
+
     def stop_active_books(self, book_names: [str, list]):
         """stops the event books listed in the book names"""
         book_names = self.pm.list_formatter(book_names)
         for book in book_names:
             _ = self.__book_portfolio.pop(book, None)
+            _ = self.__async_portfolio.pop(book, None)
         return
 
     def reset_portfolio(self):
         """resets the event book report_portfolio removing all running event books and intent"""
         self.__book_portfolio.clear()
+        self.__async_portfolio.clear()
         self.pm.reset_intents()
         return
 
     def remove_event_books(self, book_names: [str, list], save: bool=None):
-        """removes the event book"""
+        """removes the event books, persisting the property manager once all are removed"""
         book_names = self.pm.list_formatter(book_names)
         for book in book_names:
             state_name = book
             events_log_name = "_".join([book, '_log'])
             # remove the connectors
             if self.pm.has_connector(state_name):
-                self.remove_connector_contract(state_name)
+                self.pm.remove_connector_contract(connector_name=state_name)
             if self.pm.has_connector(events_log_name):
-                self.remove_connector_contract(events_log_name)
+                self.pm.remove_connector_contract(connector_name=events_log_name)
             # remove the intent
             self.pm.remove_intent(intent_param=book)
             # remove the report_portfolio entry
             if book in self.__book_portfolio.keys():
                 self.__book_portfolio.pop(book)
-            self.pm_persist(save=save)
+            self.__async_portfolio.pop(book, None)
+        self.pm_persist(save=save)
         return
 
     def current_state(self, book_name: str, fillna: bool=None) -> (datetime, Any):
@@ -238,13 +416,145 @@ class EventBookPortfolio(AbstractComponent):
         return event_book.current_state(fillna=fillna)
 
     def add_event(self, book_name: str, event: Any):
-        return self.get_active_book(book_name=book_name).add_event(event=event)
+        async_book = self.get_async_book(book_name=book_name)
+        return async_book.call(async_book.event_book.add_event, event=event)
 
     def increment_event(self, book_name: str, event: Any):
-        return self.get_active_book(book_name=book_name).increment_event(event=event)
+        async_book = self.get_async_book(book_name=book_name)
+        return async_book.call(async_book.event_book.increment_event, event=event)
 
     def decrement_event(self, book_name: str, event: Any):
-        return self.get_active_book(book_name=book_name).decrement_event(event=event)
+        async_book = self.get_async_book(book_name=book_name)
+        return async_book.call(async_book.event_book.decrement_event, event=event)
+
+    def query(self, query: BookQuery) -> pd.DataFrame:
+        """ runs a query across the active event books, projecting, filtering, joining and grouping the book states
+        in place, so only the rows and columns the query selects are copied. Each book is read in turn with the
+        other calls on it, see BookQuery
+
+        :param query: the book query
+        :return: the query result
+        """
+        if not isinstance(query, BookQuery):
+            raise ValueError(f"The query must be a BookQuery, not {type(query).__name__}")
+        inactive = [book for book in query.book_names if not self.is_active_book(book_name=book)]
+        if len(inactive) > 0:
+            raise ValueError(f"The event book instances {inactive} are not active.")
+
+        def read_state(book_name: str, reader: Any) -> Any:
+            async_book = self.get_async_book(book_name=book_name)
+            return async_book.call(async_book.event_book.read_state, reader)
+
+        return query.execute(read_state=read_state)
+
+    def add_events(self, events: dict) -> dict:
+        """ adds an event to each of the event books, replacing anything in the event cells. The events are applied
+        concurrently across the books and in turn with any other calls on the same book
+
+        :param events: a dictionary of book name to the event to add to that book
+        :return: a dictionary of book name to the time the event was added
+        """
+        return self._apply_events(events=events, method='add_event')
+
+    def increment_events(self, events: dict) -> dict:
+        """ adds an event to each of the event books, incrementing the values in the event cells, applied
+        concurrently across the books
+
+        :param events: a dictionary of book name to the event to add to that book
+        :return: a dictionary of book name to the time the event was added
+        """
+        return self._apply_events(events=events, method='increment_event')
+
+    def decrement_events(self, events: dict) -> dict:
+        """ adds an event to each of the event books, decrementing the values in the event cells, applied
+        concurrently across the books
+
+        :param events: a dictionary of book name to the event to add to that book
+        :return: a dictionary of book name to the time the event was added
+        """
+        return self._apply_events(events=events, method='decrement_event')
+
+    def persist_states(self, book_names: [str, list]=None) -> list:
+        """ persists the current state of each of the event books, concurrently across the books. Each state is
+        taken in turn with the other calls on its book, and persisted without holding up further events
+
+        :param book_names: (optional) the book names to persist. Default all active books
+        :return: the list of book names persisted
+        """
+        if book_names is None:
+            book_names = list(self.__book_portfolio.keys())
+        book_names = [book for book in self.pm.list_formatter(book_names) if self.is_active_book(book_name=book)]
+
+        def persist(async_book: AsyncEventBook, book_name: str):
+            state = async_book.call(async_book.event_book.current_state)
+            self.persist_canonical(connector_name=book_name, canonical=state)
+
+        _ = self._apply_books({book: functools.partial(persist, book_name=book) for book in book_names})
+        return book_names
+
+    def _apply_events(self, events: dict, method: str) -> dict:
+        """applies each event to its book through the named event book method, concurrently across the books"""
+        if not isinstance(events, dict):
+            raise ValueError(f"The events must be a dictionary of book name to event, not {type(events).__name__}")
+
+        def apply(async_book: AsyncEventBook, event: Any):
+            event_book = async_book.event_book
+            return async_book.call(getattr(event_book, method), event=event)
+
+        return self._apply_books({book: functools.partial(apply, event=event) for book, event in events.items()})
+
+    def _apply_books(self, calls: dict) -> dict:
+        """ runs a callable for each of the active books on the shared event book executor and waits for them all.
+        Every book must be active before any call is made. If a call fails the first exception is raised once all
+        the calls have completed
+
+        :param calls: a dictionary of book name to a callable taking the asyncio wrapper of the book
+        :return: a dictionary of book name to the result of its callable
+        """
+        inactive = [book for book in calls.keys() if not self.is_active_book(book_name=book)]
+        if len(inactive) > 0:
+            raise ValueError(f"The event book instances {inactive} are not active.")
+        futures = dict()
+        for book, call in calls.items():
+            async_book = self.get_async_book(book_name=book)
+            futures[book] = async_book.executor.submit(call, async_book)
+        _ = wait(list(futures.values()))
+        for future in futures.values():
+            if future.exception() is not None:
+                raise future.exception()
+        return {book: future.result() for book, future in futures.items()}
+
+    async def async_persist_state(self, book_name: str):
+        """ asyncio counterpart of persist_state, the state copy and the connector I/O are offloaded to an executor"""
+        if self.is_active_book(book_name=book_name):
+            async_book = self.get_async_book(book_name=book_name)
+            state = await async_book.current_state()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(async_book.executor, functools.partial(self.persist_canonical,
+                                                                              connector_name=book_name,
+                                                                              canonical=state))
+        return
+
+    async def async_current_state(self, book_name: str, fillna: bool=None) -> (datetime, Any):
+        return await self.get_async_book(book_name=book_name).current_state(fillna=fillna)
+
+    async def async_add_event(self, book_name: str, event: Any):
+        return await self.get_async_book(book_name=book_name).add_event(event=event)
+
+    async def async_increment_event(self, book_name: str, event: Any):
+        return await self.get_async_book(book_name=book_name).increment_event(event=event)
+
+    async def async_decrement_event(self, book_name: str, event: Any):
+        return await self.get_async_book(book_name=book_name).decrement_event(event=event)
+
+    async def async_save_state(self, book_name: str, with_reset: bool=None, fillna: bool=None, **kwargs):
+        """saves the event book state through its own state connector, sharing any checkpoint already in flight"""
+        return await self.get_async_book(book_name=book_name).save_state(with_reset=with_reset, fillna=fillna,
+                                                                           **kwargs)
+
+    async def async_recover_state(self, book_name: str):
+        """recovers the event book state from its own state connector and events log"""
+        return await self.get_async_book(book_name=book_name).recover_state()
 
     def report_connectors(self, connector_filter: [str, list]=None, stylise: bool=True):
         """ generates a report on the source contract
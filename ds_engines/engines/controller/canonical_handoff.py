@@ -0,0 +1,106 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+from typing import Any, Callable
+
+__author__ = 'Darryl Oatridge'
+
+
+class CanonicalHandoff(object):
+    """ Holds the outcome canonicals of controller tasks in memory, keyed by the URI of the connector they persist
+    to, so a downstream task whose source connector has the same URI takes the canonical directly rather than
+    reloading what was just persisted. The persist itself can be run inline, in the background or, for
+    intermediate outcomes that are only read by downstream tasks, skipped.
+    """
+
+    PERSIST_MODES = ['sync', 'async', 'skip']
+
+    def __init__(self, persist_mode: str=None, intermediates: [set, list]=None, max_workers: int=None):
+        """ creates a handoff for a controller run
+
+        :param persist_mode: (optional) 'sync' persists inline, 'async' persists in the background and 'skip' does
+                        not persist intermediate outcomes. Default 'sync'
+        :param intermediates: (optional) the URIs read by downstream tasks. If given, only these are held in memory
+        :param max_workers: (optional) the number of background persist threads. Default 2
+        """
+        persist_mode = persist_mode if isinstance(persist_mode, str) else 'sync'
+        if persist_mode not in self.PERSIST_MODES:
+            raise ValueError(f"The persist mode '{persist_mode}' must be one of {self.PERSIST_MODES}")
+        self._persist_mode = persist_mode
+        self._intermediates = set(intermediates) if isinstance(intermediates, (set, list)) else None
+        self._max_workers = max_workers if isinstance(max_workers, int) and max_workers > 0 else 2
+        self._canonicals = dict()
+        self._pending = list()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def persist_mode(self) -> str:
+        """the persist mode of the handoff"""
+        return self._persist_mode
+
+    def is_intermediate(self, uri: str) -> bool:
+        """if the URI is read by a downstream task"""
+        return self._intermediates is not None and uri in self._intermediates
+
+    def has_canonical(self, uri: str) -> bool:
+        """if a canonical is held for the URI"""
+        return uri in self._canonicals
+
+    def get_canonical(self, uri: str) -> Any:
+        """returns the canonical held for the URI or None"""
+        return self._canonicals.get(uri)
+
+    def hold(self, uri: str, canonical: Any):
+        """holds a canonical that is already persisted, such as a cached outcome, for downstream tasks"""
+        if self._intermediates is None or uri in self._intermediates:
+            self._canonicals[uri] = canonical
+        return
+
+    def persist(self, uri: str, canonical: Any, persist: Callable[..., Any]) -> [Future, None]:
+        """ holds the canonical for downstream tasks and persists it according to the persist mode
+
+        :param uri: the URI of the connector the canonical persists to
+        :param canonical: the outcome canonical
+        :param persist: a callable that persists the canonical, taking the canonical as its only argument
+        :return: the future of a background persist or None
+        """
+        self.hold(uri=uri, canonical=canonical)
+        if self._persist_mode == 'skip' and self.is_intermediate(uri):
+            return None
+        if self._persist_mode == 'async':
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                        thread_name_prefix='controller_persist')
+                future = self._executor.submit(persist, canonical)
+                self._pending.append(future)
+            return future
+        persist(canonical)
+        return None
+
+    def wait(self):
+        """waits for all background persists to complete, raising the first exception"""
+        with self._lock:
+            pending, self._pending = self._pending, list()
+        for future in pending:
+            future.result()
+        return
+
+    def settle(self) -> bool:
+        """waits for all background persists to complete, returning if they all succeeded. Unlike wait, any
+        exception is kept to be raised by wait or close"""
+        with self._lock:
+            pending = list(self._pending)
+        futures_wait(pending)
+        return all(future.exception() is None for future in pending)
+
+    def close(self):
+        """waits for background persists and releases the held canonicals"""
+        try:
+            self.wait()
+        finally:
+            self._canonicals.clear()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        return
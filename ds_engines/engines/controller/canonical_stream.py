@@ -0,0 +1,316 @@
+import os
+import shutil
+from typing import Any, Callable, Iterator
+import pandas as pd
+
+__author__ = 'Darryl Oatridge'
+
+
+class CanonicalStream(object):
+    """ A canonical read as a stream of DataFrame chunks of at most chunk_size rows, so a row independent task can
+    run chunk by chunk with peak memory bounded by the chunk size rather than the size of the dataset. A stream
+    can be iterated more than once as each iteration rereads the source. Tasks that need a global view of the
+    canonical fall back to materializing the whole stream.
+
+    Parquet files are read by record batch and CSV files by the pandas chunk reader. A parquet canonical can also be
+    a dataset directory of part files, as written by append.
+    """
+
+    FILE_TYPES = ['parquet', 'pq', 'csv']
+    DEFAULT_CHUNK_SIZE = 1000000
+
+    def __init__(self, uri: str, chunk_size: int=None, **kwargs):
+        """ creates a stream over a persisted canonical
+
+        :param uri: the URI of the parquet or csv canonical
+        :param chunk_size: (optional) the maximum number of rows in a chunk. Default 1,000,000
+        :param kwargs: (optional) read kwargs passed to the parquet or csv reader
+        """
+        if self.file_type(uri) not in self.FILE_TYPES:
+            raise ValueError(f"The uri '{uri}' must be one of the stream file types {self.FILE_TYPES}")
+        self._uri = uri
+        self._chunk_size = chunk_size if isinstance(chunk_size, int) and chunk_size > 0 else self.DEFAULT_CHUNK_SIZE
+        self._kwargs = kwargs
+
+    @property
+    def uri(self) -> str:
+        """the URI of the streamed canonical"""
+        return self._uri
+
+    @property
+    def chunk_size(self) -> int:
+        """the maximum number of rows in a chunk"""
+        return self._chunk_size
+
+    @staticmethod
+    def file_type(uri: str) -> str:
+        """returns the file type of the uri from its extension"""
+        _, ext = os.path.splitext(str(uri).split('?')[0])
+        return ext.lstrip('.').lower()
+
+    @classmethod
+    def is_streamable(cls, uri: str) -> bool:
+        """if the uri is a file type that can be streamed"""
+        return cls.file_type(uri) in cls.FILE_TYPES
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        if self.file_type(self._uri) == 'csv':
+            with pd.read_csv(self._uri, chunksize=self._chunk_size, **self._kwargs) as reader:
+                for chunk in reader:
+                    yield chunk
+            return
+        import pyarrow.parquet as pq
+        for part in self.parts():
+            for batch in pq.ParquetFile(part).iter_batches(batch_size=self._chunk_size, **self._kwargs):
+                yield batch.to_pandas()
+        return
+
+    def parts(self) -> list:
+        """returns the parquet file, or the sorted part files of a parquet dataset directory"""
+        if not os.path.isdir(self._uri):
+            return [self._uri]
+        # staging files are hidden, as they are by the pyarrow dataset reader
+        return [os.path.join(self._uri, name) for name in sorted(os.listdir(self._uri))
+                if not name.startswith(('.', '_'))]
+
+    def materialize(self) -> pd.DataFrame:
+        """returns the whole stream as a single DataFrame"""
+        if self.file_type(self._uri) == 'csv':
+            try:
+                return pd.read_csv(self._uri, **self._kwargs)
+            except pd.errors.EmptyDataError:
+                return pd.DataFrame()
+        import pyarrow.parquet as pq
+        return pq.read_table(self._uri, **self._kwargs).to_pandas()
+
+    def empty(self) -> pd.DataFrame:
+        """returns a DataFrame with no rows and the columns of the stream"""
+        if self.file_type(self._uri) == 'csv':
+            try:
+                return pd.read_csv(self._uri, nrows=0)
+            except pd.errors.EmptyDataError:
+                return pd.DataFrame()
+        import pyarrow.parquet as pq
+        parts = self.parts()
+        if len(parts) == 0:
+            return pd.DataFrame()
+        return pq.read_schema(parts[0]).empty_table().to_pandas()
+
+    def transform(self, run_chunk: Callable[[pd.DataFrame], pd.DataFrame], uri: str, **kwargs) -> Any:
+        """ runs each chunk through a row independent callable and persists the outcome chunks to the uri as they
+        are produced, returning a stream over the persisted outcome
+
+        :param run_chunk: a callable taking a chunk and returning the outcome chunk
+        :param uri: the URI of the parquet or csv outcome
+        :param kwargs: (optional) write kwargs passed to the parquet writer or to_csv
+        :return: a CanonicalStream over the outcome
+        """
+        writer = ChunkWriter(uri=uri, **kwargs)
+        try:
+            for chunk in self:
+                writer.write(run_chunk(chunk))
+            if writer.chunks == 0:
+                # an empty source still replaces the outcome, with the columns the task gives an empty chunk
+                writer.write(run_chunk(self.empty()))
+        except Exception:
+            writer.abort()
+            raise
+        writer.close()
+        return CanonicalStream(uri=uri, chunk_size=self._chunk_size)
+
+    def append(self, canonical: pd.DataFrame, **kwargs) -> Any:
+        """ appends a canonical to the persisted canonical, creating it if it does not exist, without rereading it. A
+        csv file is appended to in place. A parquet canonical is a dataset directory the canonical is added to as a
+        new part file, a parquet file being first moved into the directory as its first part.
+
+        :param canonical: the canonical to append, with the columns of the persisted canonical
+        :param kwargs: (optional) write kwargs passed to the parquet writer or to_csv
+        :return: the stream over the appended canonical
+        """
+        canonical = canonical.rename(columns=str)
+        if self.file_type(self._uri) == 'csv':
+            if not os.path.exists(self._uri):
+                writer = ChunkWriter(uri=self._uri, **kwargs)
+                writer.write(canonical)
+                writer.close()
+                return self
+            columns = pd.read_csv(self._uri, nrows=0).columns.to_list()
+            self._check_columns(columns, canonical=canonical)
+            canonical[columns].to_csv(self._uri, mode='a', header=False, index=False, **kwargs)
+            return self
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if os.path.isfile(self._uri):
+            staging = f"{self._uri}.{os.getpid()}.tmp"
+            os.replace(self._uri, staging)
+            os.makedirs(self._uri)
+            os.replace(staging, os.path.join(self._uri, self._part_name(0)))
+        os.makedirs(self._uri, exist_ok=True)
+        parts = self.parts()
+        schema = None
+        if len(parts) > 0:
+            # only the footer of the first part is read, for the schema the new part must have
+            schema = pq.read_schema(parts[0])
+            self._check_columns(schema.names, canonical=canonical)
+            if canonical.shape[0] == 0:
+                return self
+            canonical = canonical[schema.names]
+        table = pa.Table.from_pandas(canonical, schema=schema, preserve_index=False)
+        name = self._part_name(len(parts))
+        staging = os.path.join(self._uri, f".{name}.{os.getpid()}.tmp")
+        try:
+            pq.write_table(table, staging, **kwargs)
+        except Exception:
+            if os.path.exists(staging):
+                os.remove(staging)
+            raise
+        os.replace(staging, os.path.join(self._uri, name))
+        return self
+
+    def position(self) -> dict:
+        """ returns the position the persisted canonical has been appended to, the byte size and inode of a csv
+        file or the number of parts of a parquet canonical, for truncate to restore"""
+        if not os.path.exists(self._uri):
+            return {}
+        if self.file_type(self._uri) == 'csv':
+            stat = os.stat(self._uri)
+            return {'size': stat.st_size, 'inode': stat.st_ino}
+        return {'parts': len(self.parts())}
+
+    def truncate(self, position: dict):
+        """ removes anything appended to the persisted canonical after a position returned by position, such as an
+        append whose run failed before it was committed. A csv file replaced since the position is left as it is
+
+        :param position: a position returned by position
+        """
+        if not isinstance(position, dict) or not os.path.exists(self._uri):
+            return
+        if isinstance(position.get('size'), int) and os.path.isfile(self._uri):
+            stat = os.stat(self._uri)
+            if stat.st_ino == position.get('inode') and stat.st_size > position.get('size'):
+                os.truncate(self._uri, position.get('size'))
+        elif isinstance(position.get('parts'), int) and os.path.isdir(self._uri):
+            for part in self.parts()[position.get('parts'):]:
+                os.remove(part)
+        return
+
+    def remove(self):
+        """removes the persisted canonical, a file or a dataset directory, if it exists"""
+        if os.path.isdir(self._uri):
+            shutil.rmtree(self._uri)
+        elif os.path.exists(self._uri):
+            os.remove(self._uri)
+        return
+
+    def _check_columns(self, columns: list, canonical: pd.DataFrame):
+        if set(columns) != set(canonical.columns):
+            raise ValueError(f"The appended columns {canonical.columns.to_list()} do not match the columns "
+                             f"{columns} of '{self._uri}'")
+        return
+
+    @staticmethod
+    def _part_name(n: int) -> str:
+        return f"part-{n:08d}.parquet"
+
+
+class IncrementalStream(CanonicalStream):
+    """ A stream over the whole persisted outcome of an incremental task, carrying the outcome of the new data the
+    task ran. A downstream incremental task takes the increment as its new data, any other task the whole outcome.
+    """
+
+    def __init__(self, uri: str, increment: pd.DataFrame, appended: bool, chunk_size: int=None, **kwargs):
+        """ creates a stream over the persisted outcome of an incremental task
+
+        :param uri: the URI of the parquet or csv outcome
+        :param increment: the outcome of the new data
+        :param appended: if the increment was appended to the outcome rather than replacing it
+        :param chunk_size: (optional) the maximum number of rows in a chunk. Default 1,000,000
+        :param kwargs: (optional) read kwargs passed to the parquet or csv reader
+        """
+        super().__init__(uri=uri, chunk_size=chunk_size, **kwargs)
+        self._increment = increment
+        self._appended = appended
+
+    @property
+    def increment(self) -> pd.DataFrame:
+        """the outcome of the new data"""
+        return self._increment
+
+    @property
+    def appended(self) -> bool:
+        """if the increment was appended to the outcome rather than replacing it"""
+        return self._appended
+
+
+class ChunkWriter(object):
+    """ Appends DataFrame chunks to a parquet or csv file. The file is written to a staging file and only moved
+    into place once closed, so a failed stream does not leave a partial outcome. Every parquet chunk must have
+    the schema of the first.
+    """
+
+    def __init__(self, uri: str, **kwargs):
+        """ creates a writer for the uri
+
+        :param uri: the URI of the parquet or csv file
+        :param kwargs: (optional) write kwargs passed to the parquet writer or to_csv
+        """
+        if not CanonicalStream.is_streamable(uri):
+            raise ValueError(f"The uri '{uri}' must be one of the stream file types {CanonicalStream.FILE_TYPES}")
+        self._uri = uri
+        self._staging = f"{uri}.{os.getpid()}.tmp"
+        self._kwargs = kwargs
+        self._writer = None
+        self._schema = None
+        self._rows = 0
+        self._chunks = 0
+
+    @property
+    def rows(self) -> int:
+        """the number of rows written"""
+        return self._rows
+
+    @property
+    def chunks(self) -> int:
+        """the number of chunks written"""
+        return self._chunks
+
+    def write(self, chunk: pd.DataFrame):
+        """appends a chunk"""
+        if CanonicalStream.file_type(self._uri) == 'csv':
+            chunk.to_csv(self._staging, mode='a' if self._chunks > 0 else 'w', header=self._chunks == 0,
+                         index=False, **self._kwargs)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk.rename(columns=str), schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self._staging, schema=self._schema, **self._kwargs)
+            self._writer.write_table(table)
+        self._rows += chunk.shape[0]
+        self._chunks += 1
+        return
+
+    def close(self):
+        """ closes the writer, moving the staging file into place if every chunk was written. If no chunks were
+        written an empty file replaces the target, so it never holds the outcome of an earlier run"""
+        if self._chunks == 0:
+            self.write(pd.DataFrame())
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self._staging):
+            if os.path.isdir(self._uri):
+                # a parquet dataset directory of appended parts is replaced by the file
+                shutil.rmtree(self._uri)
+            os.replace(self._staging, self._uri)
+        return
+
+    def abort(self):
+        """closes the writer and removes the staging file"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self._staging):
+            os.remove(self._staging)
+        return
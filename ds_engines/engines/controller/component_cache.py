@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+
+__author__ = 'Darryl Oatridge'
+
+
+class ComponentCache(object):
+    """ A cache of task components constructed from their domain contracts, keyed by the component class, task name
+    and repository URI, so a component that runs more than once is built once. Each entry records a stamp of its
+    contract, the modified time of a local contract or the ETag or Last-Modified of a remote contract, and is
+    rebuilt if the stamp changes. Contracts whose stamp can not be taken are reused until explicitly invalidated.
+
+    Components are mutable, so each is owned by the thread that built or last took it. A thread is only handed a
+    component no other live thread owns, building another if they are all in use, so components are reused across
+    intent levels and controller runs but never shared by concurrent tasks. A component can also be leased until a
+    future is done, such as a background report reading it, and is not handed to any thread, its owner included,
+    until then.
+    """
+
+    DEFAULT_VALIDATE_INTERVAL = 30
+
+    def __init__(self, validate: bool=None, validate_interval: float=None):
+        """ creates an empty component cache
+
+        :param validate: (optional) if the contract stamp is checked each time a component is reused. Default True
+        :param validate_interval: (optional) the seconds a remote contract stamp is trusted before it is checked
+                    again with a HEAD request. A local contract is always checked. Default 30
+        """
+        self._validate = validate if isinstance(validate, bool) else True
+        self._validate_interval = validate_interval if isinstance(validate_interval, (int, float)) and \
+            validate_interval >= 0 else self.DEFAULT_VALIDATE_INTERVAL
+        self._entries = dict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, component_cls: Any, task_name: str, uri_pm_repo: str=None) -> Any:
+        """ returns a cached component not in use by another thread, or builds it from its domain contract with
+        from_env
+
+        :param component_cls: the component class
+        :param task_name: the task_name reference for the component
+        :param uri_pm_repo: (optional) A repository URI to initially load the property manager but not save to.
+        :return: the component
+        """
+        key = (component_cls.__name__, task_name, uri_pm_repo)
+        thread = threading.current_thread()
+        with self._lock:
+            entry = self._take(key, thread=thread)
+        if entry is not None:
+            if self._is_valid(entry):
+                with self._lock:
+                    self._hits += 1
+                return entry['component']
+            with self._lock:
+                if entry in self._entries.get(key, []):
+                    self._entries[key].remove(entry)
+        params = {'uri_pm_repo': uri_pm_repo} if isinstance(uri_pm_repo, str) else {}
+        component = component_cls.from_env(task_name=task_name, default_save=False, has_contract=True, **params)
+        uri = self.contract_uri(component, uri_pm_repo=uri_pm_repo)
+        entry = {'component': component, 'uri': uri, 'stamp': self.contract_stamp(uri), 'checked': time.monotonic(),
+                 'owner': thread, 'leases': []}
+        with self._lock:
+            self._misses += 1
+            self._entries.setdefault(key, []).append(entry)
+        return component
+
+    def lease(self, component: Any, future: Future):
+        """ holds a cached component until the future is done, so it is not handed to a thread while the work of
+        the future still uses it
+
+        :param component: the cached component
+        :param future: the future of the work using the component
+        """
+        with self._lock:
+            for entries in self._entries.values():
+                for entry in entries:
+                    if entry['component'] is component:
+                        entry['leases'].append(future)
+        return
+
+    def _take(self, key: tuple, thread: threading.Thread) -> [dict, None]:
+        """ returns the entry the thread owns, else takes one whose owning thread has ended, of the entries with no
+        outstanding lease, under the lock"""
+        entries = [entry for entry in self._entries.get(key, []) if self._is_free(entry)]
+        for entry in entries:
+            if entry['owner'] is thread:
+                return entry
+        for entry in entries:
+            if not entry['owner'].is_alive():
+                entry['owner'] = thread
+                return entry
+        return None
+
+    @staticmethod
+    def _is_free(entry: dict) -> bool:
+        """if the entry has no outstanding lease, dropping the leases that are done"""
+        entry['leases'] = [future for future in entry['leases'] if not future.done()]
+        return len(entry['leases']) == 0
+
+    def _is_valid(self, entry: dict) -> bool:
+        """ if the entry contract is unchanged. A remote stamp is only checked again once the validate interval
+        has passed since it was last checked"""
+        if not self._validate:
+            return True
+        if not self.is_local(entry['uri']) and time.monotonic() - entry['checked'] < self._validate_interval:
+            return True
+        stamp = self.contract_stamp(entry['uri'])
+        entry['checked'] = time.monotonic()
+        return stamp is None or stamp == entry['stamp']
+
+    def invalidate(self, task_name: str=None, uri_pm_repo: str=None):
+        """ removes cached components, all if no filter is given
+
+        :param task_name: (optional) only remove components with this task name
+        :param uri_pm_repo: (optional) only remove components loaded from this repository URI
+        """
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if isinstance(task_name, str) and key[1] != task_name:
+                    continue
+                if isinstance(uri_pm_repo, str) and key[2] != uri_pm_repo:
+                    continue
+                self._entries.pop(key)
+        return
+
+    def report(self) -> dict:
+        """returns a dictionary of the cached components, hits and misses"""
+        with self._lock:
+            return {'entries': sum(len(x) for x in self._entries.values()), 'hits': self._hits,
+                    'misses': self._misses}
+
+    @staticmethod
+    def is_local(uri: [str, None]) -> bool:
+        """if the contract uri is a local file, whose stamp is taken without a request"""
+        return isinstance(uri, str) and urlparse(uri).scheme in ['', 'file']
+
+    @staticmethod
+    def contract_uri(component: Any, uri_pm_repo: str=None) -> [str, None]:
+        """ returns the URI the component domain contract was loaded from, the repository copy if a repository
+        URI was given"""
+        if not component.pm.has_connector(component.pm.CONNECTOR_PM_CONTRACT):
+            return None
+        uri = component.pm.get_connector_contract(component.pm.CONNECTOR_PM_CONTRACT).uri
+        if isinstance(uri_pm_repo, str):
+            return "/".join([uri_pm_repo.rstrip('/'), os.path.basename(urlparse(uri).path)])
+        return uri
+
+    @staticmethod
+    def contract_stamp(uri: [str, None], timeout: int=None) -> [str, None]:
+        """ returns a stamp that changes when the contract at the uri changes, or None if it can not be taken
+
+        :param uri: the contract URI
+        :param timeout: (optional) the remote request timeout in seconds. Default 5
+        """
+        if not isinstance(uri, str):
+            return None
+        parsed = urlparse(uri)
+        if parsed.scheme in ['', 'file']:
+            path = parsed.path if parsed.scheme == 'file' else uri
+            if not os.path.exists(path):
+                return None
+            stat = os.stat(path)
+            return f"{stat.st_mtime_ns}:{stat.st_size}"
+        if parsed.scheme in ['http', 'https']:
+            try:
+                with urlopen(Request(uri, method='HEAD'), timeout=timeout if isinstance(timeout, int) else 5) as r:
+                    return r.headers.get('ETag') or r.headers.get('Last-Modified')
+            except OSError:
+                return None
+        return None
@@ -0,0 +1,282 @@
+import fnmatch
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from urllib.error import HTTPError
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+
+__author__ = 'Darryl Oatridge'
+
+logger = logging.getLogger(__name__)
+
+
+class ContractMirror(object):
+    """ A local, content addressed mirror of the domain contracts in a read only contract repository, so contracts
+    are loaded from local disk rather than fetched from the remote repository by every component. A repository is
+    mirrored with one bulk fetch of a tarball, remote or local for air-gapped runs, or by fetching named contract
+    files. Contract content is stored once by its sha256 hash in the objects directory and each mirrored repository
+    is a local directory of hard links to its objects, that can be passed in place of the repository URI, so loads
+    read the stored objects and a contract shared by repositories is stored once. A refresh revalidates each
+    contract with a conditional request, only downloading contracts that have changed.
+
+    The following environment variables can be set:
+    'HADRON_PM_MIRROR': the local mirror directory. If not set the mirror is not used
+    'HADRON_PM_MIRROR_TARBALL': a tarball path or URL to populate a repository from if it is not mirrored
+    'HADRON_PM_MIRROR_REFRESH': if mirrored contracts are conditionally refreshed when resolved. Default False
+    """
+
+    MANIFEST = 'mirror.json'
+    DEFAULT_TIMEOUT = 10
+
+    def __init__(self, mirror_path: str, timeout: int=None):
+        """ opens or creates a contract mirror
+
+        :param mirror_path: the local mirror directory
+        :param timeout: (optional) the remote request timeout in seconds. Default 10
+        """
+        self._mirror_path = mirror_path
+        self._timeout = timeout if isinstance(timeout, int) else self.DEFAULT_TIMEOUT
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self._mirror_path, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(self._mirror_path, 'repos'), exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> [object, None]:
+        """returns the contract mirror at 'HADRON_PM_MIRROR' or None if it is not set"""
+        mirror_path = os.environ.get('HADRON_PM_MIRROR', None)
+        if not isinstance(mirror_path, str) or len(mirror_path) == 0:
+            return None
+        return cls(mirror_path=mirror_path)
+
+    @property
+    def mirror_path(self) -> str:
+        """the local mirror directory"""
+        return self._mirror_path
+
+    def has_repo(self, uri_pm_repo: str) -> bool:
+        """if the repository is mirrored"""
+        return self._key(uri_pm_repo) in self._load_manifest()
+
+    def has_contract(self, uri_pm_repo: str, task_name: str) -> bool:
+        """if the repository is mirrored with a domain contract for the task name"""
+        files = self.report(uri_pm_repo).get('files', {})
+        return any(fnmatch.fnmatch(name, f"hadron_pm_*_{task_name}.*") for name in files.keys())
+
+    def local_repo(self, uri_pm_repo: str) -> str:
+        """returns the local directory of a mirrored repository, with a trailing separator"""
+        return os.path.join(self._mirror_path, 'repos', self._key(uri_pm_repo), '')
+
+    def is_local(self, uri_pm_repo: str) -> bool:
+        """if the repository URI is already a local repository directory of this mirror"""
+        repos_path = os.path.join(os.path.abspath(self._mirror_path), 'repos', '')
+        return urlparse(uri_pm_repo).scheme == '' and os.path.abspath(uri_pm_repo).startswith(repos_path)
+
+    def report(self, uri_pm_repo: str=None) -> dict:
+        """returns the manifest of the mirrored repositories, or of the given repository"""
+        manifest = self._load_manifest()
+        if isinstance(uri_pm_repo, str):
+            return manifest.get(self._key(uri_pm_repo), {})
+        return manifest
+
+    def resolve(self, uri_pm_repo: str, refresh: bool=None, tarball: str=None, task_name: str=None) -> str:
+        """ returns the local directory of the repository to load contracts from, populating it from the tarball if
+        it is not mirrored. If the repository is not mirrored and can not be populated, or the mirror has no
+        contract for the given task name, the repository URI is returned unchanged.
+
+        :param uri_pm_repo: the repository URI
+        :param refresh: (optional) if the mirrored contracts should be conditionally refreshed.
+                        Default 'HADRON_PM_MIRROR_REFRESH' or False
+        :param tarball: (optional) a tarball to populate the repository from. Default 'HADRON_PM_MIRROR_TARBALL'
+        :param task_name: (optional) the task name of the domain contract to be loaded from the repository
+        :return: the local repository directory or the repository URI
+        """
+        if self.is_local(uri_pm_repo):
+            return uri_pm_repo
+        if not isinstance(refresh, bool):
+            refresh = str(os.environ.get('HADRON_PM_MIRROR_REFRESH', 'false')).lower() in ['true', '1']
+        tarball = tarball if isinstance(tarball, str) else os.environ.get('HADRON_PM_MIRROR_TARBALL', None)
+        if not self.has_repo(uri_pm_repo):
+            if not isinstance(tarball, str) or len(tarball) == 0:
+                return uri_pm_repo
+            self.sync_tarball(uri_pm_repo=uri_pm_repo, tarball=tarball)
+        elif refresh:
+            self.refresh(uri_pm_repo=uri_pm_repo)
+        if isinstance(task_name, str) and not self.has_contract(uri_pm_repo, task_name=task_name):
+            logger.info(f"The mirror of '{uri_pm_repo}' has no contract for the task '{task_name}', loading it from "
+                        f"the repository")
+            return uri_pm_repo
+        return self.local_repo(uri_pm_repo)
+
+    def sync_tarball(self, uri_pm_repo: str, tarball: str, pattern: str=None) -> list:
+        """ mirrors the repository from a tarball of its contracts in one fetch. The tarball can be a local path
+        or a remote URL, such as a repository archive, and the contracts can be in any directory of it.
+
+        :param uri_pm_repo: the repository URI the contracts are mirrored for
+        :param tarball: the local path or URL of the tarball
+        :param pattern: (optional) a file name pattern of the contracts in the tarball. Default 'hadron_pm_*'
+        :return: the list of contract names mirrored
+        """
+        pattern = pattern if isinstance(pattern, str) else 'hadron_pm_*'
+        if urlparse(tarball).scheme in ['http', 'https']:
+            with urlopen(Request(tarball), timeout=self._timeout) as response:
+                stream = io.BytesIO(response.read())
+            archive = tarfile.open(fileobj=stream, mode='r:*')
+        else:
+            archive = tarfile.open(tarball, mode='r:*')
+        contracts = dict()
+        with archive:
+            for member in archive.getmembers():
+                name = os.path.basename(member.name)
+                if member.isfile() and fnmatch.fnmatch(name, pattern):
+                    contracts[name] = {'content': archive.extractfile(member).read()}
+        self._store(uri_pm_repo=uri_pm_repo, contracts=contracts, source=tarball, replace=True)
+        return sorted(contracts.keys())
+
+    def sync_files(self, uri_pm_repo: str, names: [str, list]) -> list:
+        """ mirrors named contracts by fetching each from the repository
+
+        :param uri_pm_repo: the repository URI
+        :param names: a contract file name or list of contract file names
+        :return: the list of contract names mirrored
+        """
+        names = [names] if isinstance(names, str) else list(names)
+        contracts = dict()
+        for name in names:
+            content, headers = self._fetch(self._join(uri_pm_repo, name))
+            contracts[name] = {'content': content, 'etag': headers.get('ETag'),
+                               'last_modified': headers.get('Last-Modified')}
+        self._store(uri_pm_repo=uri_pm_repo, contracts=contracts, source=uri_pm_repo, replace=False)
+        return sorted(contracts.keys())
+
+    def refresh(self, uri_pm_repo: str) -> list:
+        """ revalidates each mirrored contract against the repository with a conditional request, downloading only
+        contracts that have changed. Contracts that can not be reached, such as in an air-gapped run, or whose
+        request fails, are logged and the mirrored copy is kept.
+
+        :param uri_pm_repo: the repository URI
+        :return: the list of contract names that changed
+        """
+        entry = self.report(uri_pm_repo)
+        changed = dict()
+        for name, info in entry.get('files', {}).items():
+            headers = {}
+            if isinstance(info.get('etag'), str):
+                headers['If-None-Match'] = info['etag']
+            if isinstance(info.get('last_modified'), str):
+                headers['If-Modified-Since'] = info['last_modified']
+            elif not headers:
+                headers['If-Modified-Since'] = format_datetime(datetime.fromisoformat(entry['synced']), usegmt=True)
+            try:
+                content, response = self._fetch(self._join(uri_pm_repo, name), headers=headers)
+            except HTTPError as e:
+                if e.code != 304:
+                    logger.warning(f"The contract '{name}' could not be refreshed from '{uri_pm_repo}', "
+                                   f"keeping the mirrored copy: {e}")
+                continue
+            except OSError as e:
+                logger.warning(f"The contract '{name}' could not be refreshed from '{uri_pm_repo}', "
+                               f"keeping the mirrored copy: {e}")
+                continue
+            if hashlib.sha256(content).hexdigest() != info.get('sha256'):
+                changed[name] = {'content': content, 'etag': response.get('ETag'),
+                                 'last_modified': response.get('Last-Modified')}
+        self._store(uri_pm_repo=uri_pm_repo, contracts=changed, source=uri_pm_repo, replace=False)
+        return sorted(changed.keys())
+
+    def remove_repo(self, uri_pm_repo: str):
+        """removes a mirrored repository. Contract content no longer used by any repository is removed"""
+        with self._lock:
+            manifest = self._load_manifest()
+            manifest.pop(self._key(uri_pm_repo), None)
+            shutil.rmtree(self.local_repo(uri_pm_repo), ignore_errors=True)
+            used = {f['sha256'] for e in manifest.values() for f in e.get('files', {}).values()}
+            for sha in os.listdir(os.path.join(self._mirror_path, 'objects')):
+                if sha not in used:
+                    os.remove(os.path.join(self._mirror_path, 'objects', sha))
+            self._save_manifest(manifest)
+        return
+
+    def _store(self, uri_pm_repo: str, contracts: dict, source: str, replace: bool):
+        """stores contract content by hash and hard links it into the local repository directory"""
+        with self._lock:
+            manifest = self._load_manifest()
+            key = self._key(uri_pm_repo)
+            entry = manifest.get(key, {'uri_pm_repo': uri_pm_repo, 'files': {}})
+            if replace:
+                entry['files'] = {}
+                shutil.rmtree(self.local_repo(uri_pm_repo), ignore_errors=True)
+            repo_path = self.local_repo(uri_pm_repo)
+            os.makedirs(repo_path, exist_ok=True)
+            for name, contract in contracts.items():
+                content = contract['content']
+                sha = hashlib.sha256(content).hexdigest()
+                object_path = os.path.join(self._mirror_path, 'objects', sha)
+                if not os.path.exists(object_path):
+                    self._write(object_path, content)
+                self._link(object_path, os.path.join(repo_path, name), content=content)
+                entry['files'][name] = {'sha256': sha, 'etag': contract.get('etag'),
+                                        'last_modified': contract.get('last_modified')}
+            entry['source'] = source
+            entry['synced'] = datetime.now(timezone.utc).isoformat()
+            manifest[key] = entry
+            self._save_manifest(manifest)
+        return
+
+    def _fetch(self, uri: str, headers: dict=None) -> tuple:
+        """returns the content and response headers of a local or remote contract"""
+        if urlparse(uri).scheme in ['http', 'https']:
+            with urlopen(Request(uri, headers=headers or {}), timeout=self._timeout) as response:
+                return response.read(), response.headers
+        path = urlparse(uri).path if urlparse(uri).scheme == 'file' else uri
+        with open(path, 'rb') as f:
+            return f.read(), {}
+
+    @staticmethod
+    def _write(path: str, content: bytes):
+        """writes the content to a staging file and moves it into place"""
+        handle, staging = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(handle, 'wb') as f:
+            f.write(content)
+        os.replace(staging, path)
+        return
+
+    @classmethod
+    def _link(cls, object_path: str, path: str, content: bytes):
+        """hard links the object into place, writing a copy of the content if the file system can not link"""
+        staging = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.link")
+        try:
+            if os.path.exists(staging):
+                os.remove(staging)
+            os.link(object_path, staging)
+            os.replace(staging, path)
+        except OSError:
+            cls._write(path, content)
+        return
+
+    @staticmethod
+    def _key(uri_pm_repo: str) -> str:
+        return hashlib.sha256(uri_pm_repo.rstrip('/').encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _join(uri_pm_repo: str, name: str) -> str:
+        return "/".join([uri_pm_repo.rstrip('/'), name])
+
+    def _load_manifest(self) -> dict:
+        path = os.path.join(self._mirror_path, self.MANIFEST)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: dict):
+        self._write(os.path.join(self._mirror_path, self.MANIFEST), json.dumps(manifest, indent=2).encode())
+        return
@@ -0,0 +1,222 @@
+import socket
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable
+from ds_engines.engines.controller.level_scheduler import LevelScheduler
+from ds_engines.engines.controller.level_transport import LevelTransport
+
+__author__ = 'Darryl Oatridge'
+
+
+class LevelCoordinator(object):
+    """ Coordinates the intent levels of a run book across level workers on other processes or nodes. Each level is
+    submitted to the transport as a task once every level it depends on has completed, so independent levels are
+    partitioned across the workers as they claim them. A level whose task fails, or whose worker stops
+    heartbeating, is resubmitted up to the maximum retries. The progress of each level is kept for reporting.
+
+    A lease is timed by the coordinator clock from when it last saw the heartbeat of a claim change, so worker
+    clocks need not agree with it. A worker whose lease has expired is not stopped, and the attempt it is running
+    is not fenced from the resubmitted attempt: its late result is ignored, but any persist it makes before it
+    finishes is not. Levels should persist to outcomes that a rerun replaces, as the resubmitted attempt does.
+    """
+
+    def __init__(self, transport: LevelTransport, dependencies: dict=None, max_retries: int=None,
+                 lease_timeout: int=None, poll_interval: float=None):
+        """ creates the coordinator
+
+        :param transport: the transport to the level workers
+        :param dependencies: (optional) a dictionary of intent level to the list of intent levels it depends on
+        :param max_retries: (optional) the number of times a failed level is resubmitted. Default 2
+        :param lease_timeout: (optional) the seconds without a heartbeat before a level is resubmitted. Default 60
+        :param poll_interval: (optional) the seconds between polls of the transport. Default 0.2
+        """
+        self._transport = transport
+        self._scheduler = LevelScheduler(dependencies=dependencies)
+        self._max_retries = max_retries if isinstance(max_retries, int) and max_retries >= 0 else 2
+        self._lease_timeout = lease_timeout if isinstance(lease_timeout, (int, float)) else 60
+        self._poll_interval = poll_interval if isinstance(poll_interval, (int, float)) else 0.2
+        self._progress = dict()
+
+    def report(self) -> dict:
+        """returns a dictionary of lists of the status, attempts, worker, wall time and error of each level"""
+        levels = list(self._progress.values())
+        return {key: [p.get(key) for p in levels]
+                for key in ['level', 'status', 'attempts', 'worker_id', 'wall_time', 'error']}
+
+    def run(self, intent_levels: list, params: dict=None, timeout: int=None) -> dict:
+        """ runs the intent levels on the level workers in dependency order. If a level fails after its retries,
+        no further levels are submitted and an error is raised once the running levels have finished.
+
+        :param intent_levels: the intent levels to run, in their default order
+        :param params: (optional) the JSON serialisable parameters passed to the worker with each level
+        :param timeout: (optional) the seconds to wait for the run to complete. Default no limit
+        :return: a dictionary of intent level to the level result
+        """
+        _ = self._scheduler.execution_waves(intent_levels)
+        pending = [str(x) for x in intent_levels]
+        scope = set(pending)
+        done = set()
+        results = dict()
+        running = dict()
+        # the heartbeat stamp of each claim and the coordinator time it was seen to change
+        observed = dict()
+        error = None
+        self._progress = {level: {'level': level, 'status': 'pending', 'attempts': 0, 'worker_id': None,
+                                  'wall_time': None, 'error': None} for level in pending}
+        started = time.time()
+        self._transport.open(run_id=uuid.uuid4().hex)
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                if error is None:
+                    for level in list(pending):
+                        if self._is_ready(level, done, scope):
+                            running[self._submit(level, params)] = level
+                            pending.remove(level)
+                if len(running) == 0:
+                    break
+                for result in self._transport.results():
+                    level = running.pop(result.get('task_id'), None)
+                    if level is None:
+                        # the late result of a resubmitted task
+                        continue
+                    progress = self._progress[level]
+                    progress.update({'worker_id': result.get('worker_id'), 'wall_time': result.get('wall_time')})
+                    if result.get('status') == 'complete':
+                        progress.update({'status': 'complete', 'error': None})
+                        results[level] = result.get('result')
+                        done.add(level)
+                    elif progress['attempts'] <= self._max_retries and error is None:
+                        progress['error'] = result.get('error')
+                        running[self._submit(level, params)] = level
+                    else:
+                        progress.update({'status': 'failed', 'error': result.get('error')})
+                        error = error if error is not None else progress['error']
+                now = time.time()
+                for task_id, claim in self._transport.claims().items():
+                    level = running.get(task_id)
+                    if level is None:
+                        continue
+                    self._progress[level].update({'status': 'running', 'worker_id': claim.get('worker_id')})
+                    if task_id not in observed or observed[task_id][0] != claim.get('heartbeat'):
+                        observed[task_id] = (claim.get('heartbeat'), time.monotonic())
+                    if time.monotonic() - observed[task_id][1] > self._lease_timeout:
+                        self._transport.revoke(task_id)
+                        running.pop(task_id)
+                        self._progress[level]['error'] = f"worker '{claim.get('worker_id')}' lease expired"
+                        if self._progress[level]['attempts'] <= self._max_retries and error is None:
+                            running[self._submit(level, params)] = level
+                        else:
+                            self._progress[level]['status'] = 'failed'
+                            error = error if error is not None else self._progress[level]['error']
+                if isinstance(timeout, (int, float)) and now - started > timeout:
+                    for task_id, level in running.items():
+                        self._transport.revoke(task_id)
+                        self._progress[level].update({'status': 'failed', 'error': 'timed out'})
+                    error = error if error is not None else f"the run timed out after {timeout} seconds"
+                    break
+                time.sleep(self._poll_interval)
+        finally:
+            self._transport.close()
+        if error is not None:
+            failed = [p['level'] for p in self._progress.values() if p['status'] == 'failed']
+            raise ValueError(f"The distributed run failed on the intent levels {failed}: {error}")
+        return results
+
+    def _submit(self, level: str, params: dict) -> str:
+        """submits a new attempt of a level, returning its task id"""
+        progress = self._progress[level]
+        progress['attempts'] += 1
+        progress['status'] = 'queued'
+        task_id = uuid.uuid4().hex
+        self._transport.submit({'task_id': task_id, 'intent_level': level, 'attempt': progress['attempts'],
+                                'params': params if isinstance(params, dict) else {}})
+        return task_id
+
+    def _is_ready(self, level: str, done: set, scope: set) -> bool:
+        """a level is ready when every dependency within the scope of the run is done"""
+        for dependency in self._scheduler.get_dependencies(level):
+            if dependency != level and dependency in scope and dependency not in done:
+                return False
+        return True
+
+
+class LevelWorker(object):
+    """ Runs the intent level tasks claimed from a level transport until the coordinator closes the run. The
+    worker heartbeats while a level runs so the coordinator can resubmit the level if the worker is lost.
+    """
+
+    def __init__(self, transport: LevelTransport, worker_id: str=None, heartbeat_interval: float=None,
+                 poll_interval: float=None):
+        """ creates the worker
+
+        :param transport: the transport to the coordinator
+        :param worker_id: (optional) a reference for the worker. Default the host name and a unique suffix
+        :param heartbeat_interval: (optional) the seconds between heartbeats. Default 10
+        :param poll_interval: (optional) the seconds between polls for a task. Default 0.5
+        """
+        self._transport = transport
+        self._worker_id = worker_id if isinstance(worker_id, str) else f"{socket.gethostname()}_{uuid.uuid4().hex[:8]}"
+        self._heartbeat_interval = heartbeat_interval if isinstance(heartbeat_interval, (int, float)) else 10
+        self._poll_interval = poll_interval if isinstance(poll_interval, (int, float)) else 0.5
+
+    @property
+    def worker_id(self) -> str:
+        """the reference of the worker"""
+        return self._worker_id
+
+    def run(self, run_level: Callable[..., Any], max_tasks: int=None, idle_timeout: float=None) -> int:
+        """ claims and runs level tasks until the run is stopped, calling run_level with the intent level and the
+        task parameters. A worker started before the coordinator waits for the run to open.
+
+        :param run_level: a callable taking the intent_level and task parameters as keyword arguments
+        :param max_tasks: (optional) the number of tasks to run before returning. Default no limit
+        :param idle_timeout: (optional) the seconds without a task before returning. Default no limit
+        :return: the number of tasks run
+        """
+        tasks = 0
+        opened = False
+        idle_since = time.time()
+        while not isinstance(max_tasks, int) or tasks < max_tasks:
+            state = self._transport.state()
+            if state == LevelTransport.STATE_RUNNING:
+                opened = True
+            elif opened:
+                break
+            task = self._transport.claim(self._worker_id) if state == LevelTransport.STATE_RUNNING else None
+            if task is None:
+                if isinstance(idle_timeout, (int, float)) and time.time() - idle_since > idle_timeout:
+                    break
+                time.sleep(self._poll_interval)
+                continue
+            self._run_task(task, run_level)
+            tasks += 1
+            idle_since = time.time()
+        return tasks
+
+    def _run_task(self, task: dict, run_level: Callable[..., Any]):
+        """runs a task, heartbeating until it completes, and returns its result to the coordinator"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self._heartbeat_interval):
+                self._transport.heartbeat(worker_id=self._worker_id, task_id=task['task_id'])
+
+        heartbeat = threading.Thread(target=beat, daemon=True, name='level_worker_heartbeat')
+        heartbeat.start()
+        result = {'task_id': task['task_id'], 'intent_level': task['intent_level'], 'attempt': task.get('attempt'),
+                  'worker_id': self._worker_id}
+        started = time.perf_counter()
+        try:
+            outcome = run_level(intent_level=task['intent_level'], **task.get('params', {}))
+            result.update({'status': 'complete', 'result': outcome})
+        except Exception as e:
+            result.update({'status': 'failed', 'error': f"{type(e).__name__}: {e}",
+                           'traceback': traceback.format_exc()})
+        finally:
+            stop.set()
+            heartbeat.join()
+        result['wall_time'] = round(time.perf_counter() - started, 6)
+        self._transport.complete(result)
+        return
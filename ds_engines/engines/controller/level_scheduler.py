@@ -0,0 +1,101 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable
+
+__author__ = 'Darryl Oatridge'
+
+
+class LevelScheduler(object):
+    """ Schedules intent levels as a dependency graph, running each level once every level it depends on has
+    completed. Independent levels run concurrently, bounded by the max workers.
+    """
+
+    def __init__(self, dependencies: dict=None, max_workers: int=None):
+        """ builds the scheduler from a dependency map
+
+        :param dependencies: (optional) a dictionary of intent level to the list of intent levels it depends on
+        :param max_workers: (optional) the maximum number of levels to run concurrently. Default 1
+        """
+        dependencies = dependencies if isinstance(dependencies, dict) else {}
+        self._dependencies = {str(k): set(str(x) for x in v) for k, v in dependencies.items()}
+        self._max_workers = max_workers if isinstance(max_workers, int) and max_workers > 0 else 1
+
+    @property
+    def max_workers(self) -> int:
+        """the maximum number of levels run concurrently"""
+        return self._max_workers
+
+    def get_dependencies(self, intent_level: [str, int]) -> set:
+        """returns the set of intent levels the given intent level depends on"""
+        return self._dependencies.get(str(intent_level), set()).copy()
+
+    def execution_waves(self, intent_levels: list) -> list:
+        """ returns the intent levels grouped into waves, where every level in a wave only depends on levels in
+        earlier waves. Dependencies on levels not in the intent_levels are taken as already met.
+
+        :param intent_levels: the intent levels to run
+        :return: a list of lists of intent levels
+        """
+        remaining = [str(x) for x in intent_levels]
+        scope = set(remaining)
+        done = set()
+        waves = []
+        while len(remaining) > 0:
+            wave = [level for level in remaining if self._ready(level, done, scope)]
+            if len(wave) == 0:
+                raise ValueError(f"The intent level dependencies are cyclic between the levels {remaining}")
+            waves.append(wave)
+            done.update(wave)
+            remaining = [level for level in remaining if level not in done]
+        return waves
+
+    def run(self, intent_levels: list, run_level: Callable[[str], Any], executor: Executor=None) -> dict:
+        """ runs the intent levels in dependency order, submitting each level to the executor once its
+        dependencies are complete. If a level fails, no further levels are submitted and the exception is raised
+        once the running levels have finished.
+
+        :param intent_levels: the intent levels to run, in their default order
+        :param run_level: a callable taking the intent level. With a process pool it must be picklable
+        :param executor: (optional) the executor to run on. Defaults to a process pool of max_workers
+        :return: a dictionary of intent level to the run_level result
+        """
+        _ = self.execution_waves(intent_levels)
+        pending = [str(x) for x in intent_levels]
+        scope = set(pending)
+        done = set()
+        results = dict()
+        running = dict()
+        error = None
+        own_executor = not isinstance(executor, Executor)
+        executor = ProcessPoolExecutor(max_workers=self._max_workers) if own_executor else executor
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                if error is None:
+                    for level in list(pending):
+                        if len(running) >= self._max_workers:
+                            break
+                        if self._ready(level, done, scope):
+                            running[executor.submit(run_level, level)] = level
+                            pending.remove(level)
+                if len(running) == 0:
+                    break
+                finished, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    level = running.pop(future)
+                    try:
+                        results[level] = future.result()
+                        done.add(level)
+                    except Exception as e:
+                        error = error if error is not None else e
+        finally:
+            if own_executor:
+                executor.shutdown(wait=True)
+        if error is not None:
+            raise error
+        return results
+
+    def _ready(self, level: str, done: set, scope: set) -> bool:
+        """a level is ready when every dependency within the scope of the run is done"""
+        for dependency in self._dependencies.get(level, set()):
+            if dependency != level and dependency in scope and dependency not in done:
+                return False
+        return True
@@ -0,0 +1,376 @@
+import hmac
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from urllib.parse import urlparse
+
+__author__ = 'Darryl Oatridge'
+
+
+class LevelTransport(ABC):
+    """ The transport between a level coordinator and its level workers. The coordinator opens a run, submits
+    level tasks, collects their results and revokes tasks whose worker has stopped heartbeating. Workers claim
+    tasks, heartbeat while running them and complete them with a result. Tasks and results are JSON serialisable
+    dictionaries, each task having a unique 'task_id'.
+
+    Transports are created from a URI with `from_uri()`:
+    'file:///path/to/queue': a filesystem queue on a directory shared between nodes
+    'tcp://host:port': a socket served by the coordinator that workers connect to
+    """
+
+    STATE_RUNNING = 'running'
+    STATE_STOPPED = 'stopped'
+
+    @staticmethod
+    def from_uri(uri: str, coordinator: bool=None):
+        """ returns the transport for a URI
+
+        :param uri: a 'file://' queue directory, or a 'tcp://host:port' address
+        :param coordinator: (optional) if the transport is for the coordinator, serving a socket. Default False
+        :return: a LevelTransport
+        """
+        parsed = urlparse(uri)
+        if parsed.scheme in ['', 'file']:
+            return FileQueueTransport(queue_path=parsed.path if parsed.scheme == 'file' else uri)
+        if parsed.scheme == 'tcp':
+            return SocketTransport(host=parsed.hostname, port=parsed.port, coordinator=coordinator)
+        raise ValueError(f"The transport uri '{uri}' must be a 'file://' queue directory or 'tcp://host:port'")
+
+    # coordinator
+
+    @abstractmethod
+    def open(self, run_id: str):
+        """opens a run, clearing any tasks and results of an earlier run"""
+
+    @abstractmethod
+    def submit(self, task: dict):
+        """queues a task to be claimed by a worker"""
+
+    @abstractmethod
+    def results(self) -> list:
+        """returns, and removes, the results completed since the last call"""
+
+    @abstractmethod
+    def claims(self) -> dict:
+        """ returns a dictionary of claimed task_id to the claiming 'worker_id' and its last 'heartbeat' stamp. The
+        stamp may be taken by the worker clock, so the coordinator only compares it with the stamp it last saw"""
+
+    @abstractmethod
+    def revoke(self, task_id: str):
+        """removes a queued or claimed task so it is no longer run"""
+
+    @abstractmethod
+    def close(self):
+        """closes the run, telling workers to stop"""
+
+    # worker
+
+    @abstractmethod
+    def state(self) -> [str, None]:
+        """returns the state of the run, 'running', 'stopped' or None if there is no run"""
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> [dict, None]:
+        """claims the next queued task, or returns None if there are none"""
+
+    @abstractmethod
+    def heartbeat(self, worker_id: str, task_id: str):
+        """records that the worker is still running the task"""
+
+    @abstractmethod
+    def complete(self, result: dict):
+        """returns the result of a claimed task to the coordinator"""
+
+
+class FileQueueTransport(LevelTransport):
+    """ A level transport over a directory, local or shared between nodes. Tasks are claimed by atomically
+    renaming them from the 'tasks' to the 'claimed' directory, so each task is claimed by exactly one worker, and
+    results are written to the 'results' directory. All files are written to a staging file and moved into place.
+    """
+
+    def __init__(self, queue_path: str):
+        """ opens or creates the queue
+
+        :param queue_path: the queue directory
+        """
+        self._queue_path = queue_path
+        self._sequence = 0
+        for name in ['tasks', 'claimed', 'results']:
+            os.makedirs(os.path.join(self._queue_path, name), exist_ok=True)
+
+    @property
+    def queue_path(self) -> str:
+        """the queue directory"""
+        return self._queue_path
+
+    def open(self, run_id: str):
+        for name in ['tasks', 'claimed', 'results']:
+            for file in os.listdir(os.path.join(self._queue_path, name)):
+                self._remove(os.path.join(self._queue_path, name, file))
+        self._write(os.path.join(self._queue_path, 'state.json'), {'run_id': run_id, 'state': self.STATE_RUNNING})
+        return
+
+    def submit(self, task: dict):
+        # the sequence prefix has tasks claimed in the order submitted
+        self._sequence += 1
+        name = f"{self._sequence:08d}_{task['task_id']}.json"
+        self._write(os.path.join(self._queue_path, 'tasks', name), task)
+        return
+
+    def results(self) -> list:
+        results = []
+        path = os.path.join(self._queue_path, 'results')
+        for file in sorted(os.listdir(path)):
+            if file.endswith('.json'):
+                results.append(self._read(os.path.join(path, file)))
+                self._remove(os.path.join(path, file))
+        return results
+
+    def claims(self) -> dict:
+        claims = dict()
+        path = os.path.join(self._queue_path, 'claimed')
+        for file in os.listdir(path):
+            if file.endswith('.hb'):
+                heartbeat = self._read(os.path.join(path, file))
+                if isinstance(heartbeat, dict):
+                    claims[heartbeat['task_id']] = heartbeat
+        return claims
+
+    def revoke(self, task_id: str):
+        for name in ['tasks', 'claimed']:
+            path = os.path.join(self._queue_path, name)
+            for file in os.listdir(path):
+                if self._task_id(file) == task_id:
+                    self._remove(os.path.join(path, file))
+        return
+
+    def close(self):
+        state = self._read(os.path.join(self._queue_path, 'state.json')) or {}
+        self._write(os.path.join(self._queue_path, 'state.json'), {**state, 'state': self.STATE_STOPPED})
+        return
+
+    def state(self) -> [str, None]:
+        state = self._read(os.path.join(self._queue_path, 'state.json'))
+        return state.get('state') if isinstance(state, dict) else None
+
+    def claim(self, worker_id: str) -> [dict, None]:
+        path = os.path.join(self._queue_path, 'tasks')
+        for file in sorted(os.listdir(path)):
+            if not file.endswith('.json'):
+                continue
+            claimed = os.path.join(self._queue_path, 'claimed', file)
+            try:
+                os.rename(os.path.join(path, file), claimed)
+            except OSError:
+                # claimed by another worker
+                continue
+            task = self._read(claimed)
+            if isinstance(task, dict):
+                self.heartbeat(worker_id=worker_id, task_id=task['task_id'])
+                return task
+        return None
+
+    def heartbeat(self, worker_id: str, task_id: str):
+        path = os.path.join(self._queue_path, 'claimed')
+        for file in os.listdir(path):
+            if file.endswith('.json') and self._task_id(file) == task_id:
+                self._write(os.path.join(path, f"{file[:-5]}.hb"),
+                            {'task_id': task_id, 'worker_id': worker_id, 'heartbeat': time.time()})
+        return
+
+    def complete(self, result: dict):
+        self._write(os.path.join(self._queue_path, 'results', f"{result['task_id']}.{uuid.uuid4().hex[:8]}.json"),
+                    result)
+        self.revoke(result['task_id'])
+        return
+
+    @staticmethod
+    def _task_id(file: str) -> str:
+        """returns the task id of a queue file name"""
+        return os.path.splitext(file)[0].split('_', 1)[-1]
+
+    @staticmethod
+    def _write(path: str, content: dict):
+        handle, staging = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(handle, 'w') as f:
+            json.dump(content, f, default=str)
+        os.replace(staging, path)
+        return
+
+    @staticmethod
+    def _read(path: str) -> [dict, None]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return
+
+
+class SocketTransport(LevelTransport):
+    """ A level transport over a TCP socket. The coordinator holds the queue in memory and serves it, workers
+    connect for each request. Each request and response is a single line of JSON. A worker that can not connect
+    to the coordinator takes the run as stopped.
+
+    Each request carries a run token shared by the coordinator and its workers, and the coordinator refuses any
+    request without it. A coordinator serving other than a loopback interface must be given a token. The socket
+    is neither encrypted nor rate limited, so it should only be bound to a private interface, such as a container
+    network, never to a public one.
+
+    The following environment variables can be set:
+    'HADRON_CONTROLLER_TRANSPORT_TOKEN': the shared run token
+    """
+
+    LOOPBACK_HOSTS = ['localhost', '127.0.0.1', '::1']
+
+    def __init__(self, host: str=None, port: int=None, coordinator: bool=None, timeout: int=None, token: str=None):
+        """ creates the transport
+
+        :param host: (optional) the coordinator host. Default 'localhost'
+        :param port: (optional) the coordinator port. Default 0, any free port, for a coordinator
+        :param coordinator: (optional) if this is the coordinator, serving the queue. Default False
+        :param timeout: (optional) the request timeout in seconds. Default 30
+        :param token: (optional) the run token shared by the coordinator and workers. Default
+                        'HADRON_CONTROLLER_TRANSPORT_TOKEN'
+        """
+        self._host = host if isinstance(host, str) else 'localhost'
+        self._port = port if isinstance(port, int) else 0
+        self._coordinator = coordinator if isinstance(coordinator, bool) else False
+        self._timeout = timeout if isinstance(timeout, int) else 30
+        token = token if isinstance(token, str) else os.environ.get('HADRON_CONTROLLER_TRANSPORT_TOKEN')
+        self._token = token if isinstance(token, str) and len(token) > 0 else None
+        if self._coordinator and self._token is None and self._host not in self.LOOPBACK_HOSTS:
+            raise ValueError(f"A coordinator serving '{self._host}' must be given a run token, or set "
+                             f"'HADRON_CONTROLLER_TRANSPORT_TOKEN'")
+        self._lock = threading.Lock()
+        self._server = None
+        self._run_id = None
+        self._state = None
+        self._tasks = list()
+        self._claimed = dict()
+        self._results = list()
+
+    @property
+    def address(self) -> tuple:
+        """the (host, port) of the coordinator, the bound port once a coordinator is opened"""
+        return self._host, self._port
+
+    def open(self, run_id: str):
+        with self._lock:
+            self._run_id = run_id
+            self._state = self.STATE_RUNNING
+            self._tasks, self._claimed, self._results = list(), dict(), list()
+        if self._coordinator and self._server is None:
+            transport = self
+
+            class Handler(socketserver.StreamRequestHandler):
+                def handle(self):
+                    request = json.loads(self.rfile.readline())
+                    response = transport._serve(request)
+                    self.wfile.write((json.dumps(response, default=str) + '\n').encode())
+
+            socketserver.ThreadingTCPServer.allow_reuse_address = True
+            self._server = socketserver.ThreadingTCPServer((self._host, self._port), Handler)
+            self._server.daemon_threads = True
+            self._port = self._server.server_address[1]
+            threading.Thread(target=self._server.serve_forever, daemon=True, name='level_transport').start()
+        return
+
+    def submit(self, task: dict):
+        with self._lock:
+            self._tasks.append(task)
+        return
+
+    def results(self) -> list:
+        with self._lock:
+            results, self._results = self._results, list()
+        return results
+
+    def claims(self) -> dict:
+        with self._lock:
+            return {k: dict(v) for k, v in self._claimed.items()}
+
+    def revoke(self, task_id: str):
+        with self._lock:
+            self._tasks = [t for t in self._tasks if t['task_id'] != task_id]
+            self._claimed.pop(task_id, None)
+        return
+
+    def close(self):
+        with self._lock:
+            self._state = self.STATE_STOPPED
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        return
+
+    def state(self) -> [str, None]:
+        response = self._request({'op': 'state'})
+        return response.get('state') if isinstance(response, dict) else self.STATE_STOPPED
+
+    def claim(self, worker_id: str) -> [dict, None]:
+        response = self._request({'op': 'claim', 'worker_id': worker_id})
+        return response.get('task') if isinstance(response, dict) else None
+
+    def heartbeat(self, worker_id: str, task_id: str):
+        self._request({'op': 'heartbeat', 'worker_id': worker_id, 'task_id': task_id})
+        return
+
+    def complete(self, result: dict):
+        self._request({'op': 'complete', 'result': result})
+        return
+
+    def _request(self, request: dict) -> [dict, None]:
+        """sends a request to the coordinator, returning None if it can not be reached"""
+        if self._coordinator:
+            return self._serve({**request, 'token': self._token})
+        try:
+            with socket.create_connection((self._host, self._port), timeout=self._timeout) as connection:
+                connection.sendall((json.dumps({**request, 'token': self._token}, default=str) + '\n').encode())
+                with connection.makefile('r') as reader:
+                    response = json.loads(reader.readline())
+        except (OSError, ValueError):
+            return None
+        if isinstance(response, dict) and response.get('error') == 'unauthorised':
+            raise PermissionError(f"The coordinator at '{self._host}:{self._port}' refused the run token")
+        return response
+
+    def _serve(self, request: dict) -> dict:
+        """serves a worker request against the in-memory queue"""
+        if self._token is not None and not hmac.compare_digest(str(request.get('token')), self._token):
+            return {'error': 'unauthorised'}
+        op = request.get('op')
+        with self._lock:
+            if op == 'state':
+                return {'state': self._state, 'run_id': self._run_id}
+            if op == 'claim':
+                if self._state != self.STATE_RUNNING or len(self._tasks) == 0:
+                    return {'task': None}
+                task = self._tasks.pop(0)
+                self._claimed[task['task_id']] = {'task_id': task['task_id'], 'worker_id': request.get('worker_id'),
+                                                  'heartbeat': time.time()}
+                return {'task': task}
+            if op == 'heartbeat':
+                if request.get('task_id') in self._claimed:
+                    self._claimed[request['task_id']]['heartbeat'] = time.time()
+                return {}
+            if op == 'complete':
+                result = request.get('result', {})
+                self._claimed.pop(result.get('task_id'), None)
+                self._results.append(result)
+                return {}
+        return {'error': f"unknown op '{op}'"}
@@ -0,0 +1,108 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+__author__ = 'Darryl Oatridge'
+
+
+class ReportWriter(object):
+    """ Computes and persists controller task reports according to a report policy. With background writing the
+    reports run on a worker thread so the task outcome is handed on as soon as it is persisted, and the reports
+    are completed before the controller run returns.
+
+    The report policies are:
+        none: no reports are generated
+        essential: only the essential reports, those that describe the outcome schema and quality, are generated
+        all: all reports are generated
+    """
+
+    REPORT_POLICIES = ['none', 'essential', 'all']
+
+    def __init__(self, report_policy: str=None, background: bool=None, max_workers: int=None):
+        """ creates a report writer for a controller run
+
+        :param report_policy: (optional) 'none', 'essential' or 'all'. Defaults to 'HADRON_CONTROLLER_REPORT_POLICY'
+                        or 'all'
+        :param background: (optional) if reports are written on a background thread. Defaults to
+                        'HADRON_CONTROLLER_REPORT_BACKGROUND' or True
+        :param max_workers: (optional) the number of background report threads. Default 1
+        """
+        report_policy = report_policy if isinstance(report_policy, str) else \
+            os.environ.get('HADRON_CONTROLLER_REPORT_POLICY', 'all')
+        report_policy = report_policy.lower()
+        if report_policy not in self.REPORT_POLICIES:
+            raise ValueError(f"The report policy '{report_policy}' must be one of {self.REPORT_POLICIES}")
+        if not isinstance(background, bool):
+            background = str(os.environ.get('HADRON_CONTROLLER_REPORT_BACKGROUND', 'true')).lower() in ['true', '1']
+        self._report_policy = report_policy
+        self._background = background
+        self._max_workers = max_workers if isinstance(max_workers, int) and max_workers > 0 else 1
+        self._pending = list()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def report_policy(self) -> str:
+        """the report policy of the writer"""
+        return self._report_policy
+
+    @property
+    def background(self) -> bool:
+        """if reports are written on a background thread"""
+        return self._background
+
+    def is_required(self, essential: bool=None) -> bool:
+        """ if a report is required by the report policy
+
+        :param essential: (optional) if the report is an essential report
+        """
+        if self._report_policy == 'all':
+            return True
+        return self._report_policy == 'essential' and isinstance(essential, bool) and essential
+
+    def write(self, component: Any, report_connector_name: str, report: Callable[[], Any],
+              essential: bool=None) -> [Future, None]:
+        """ computes and persists a component report if the report policy requires it and the component has the
+        report connector. As the report may be computed later, any canonical it uses must not be changed in place
+
+        :param component: the task component
+        :param report_connector_name: the name of the report connector
+        :param report: a callable taking no arguments that returns the report
+        :param essential: (optional) if the report is an essential report
+        :return: the future of a background report or None
+        """
+        if not self.is_required(essential=essential) or not component.pm.has_connector(report_connector_name):
+            return None
+
+        def save_report():
+            component.save_report_canonical(report_connector_name=report_connector_name, report=report())
+
+        if self._background:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                        thread_name_prefix='controller_report')
+                future = self._executor.submit(save_report)
+                self._pending.append(future)
+            return future
+        save_report()
+        return None
+
+    def wait(self):
+        """waits for all background reports to complete, raising the first exception"""
+        with self._lock:
+            pending, self._pending = self._pending, list()
+        for future in pending:
+            future.result()
+        return
+
+    def close(self):
+        """waits for background reports and releases the background thread"""
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        return
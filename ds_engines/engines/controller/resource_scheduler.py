@@ -0,0 +1,208 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable
+from ds_engines.engines.controller.level_scheduler import LevelScheduler
+from ds_engines.engines.controller.run_stats import RunStats
+
+__author__ = 'Darryl Oatridge'
+
+
+class ResourceScheduler(LevelScheduler):
+    """ Schedules intent levels as a dependency graph, placing each level by its resource class. CPU bound levels
+    run on a pool of worker processes and I/O bound levels on a pool of threads, so a mixed run keeps both the
+    CPU and the network busy. A level is only started if the memory estimates of the running levels and the
+    level fit the memory budget, unless nothing else is running.
+
+    The resource class and memory estimate of each level are taken, in order of precedence, from those declared,
+    from the run history of earlier runs and from the intent methods of the level, where a level of only
+    FeatureCatalog loads is I/O bound and any other level CPU bound.
+    """
+
+    RESOURCE_CLASSES = ['cpu', 'io']
+    IO_METHODS = ['feature_catalog']
+    # the ratio of CPU time to wall time above which a level in the run history is CPU bound
+    CPU_RATIO = 0.5
+
+    def __init__(self, dependencies: dict=None, cpu_workers: int=None, io_workers: int=None,
+                 memory_budget: int=None, profiles: dict=None):
+        """ builds the scheduler from a dependency map and the level resource profiles
+
+        :param dependencies: (optional) a dictionary of intent level to the list of intent levels it depends on
+        :param cpu_workers: (optional) the number of worker processes for CPU bound levels. Default 1
+        :param io_workers: (optional) the number of threads for I/O bound levels. Default 4
+        :param memory_budget: (optional) the bytes the memory estimates of the running levels must fit in.
+                        Default no budget
+        :param profiles: (optional) a dictionary of intent level to its 'resource' class and 'memory' estimate,
+                        see `level_profiles()`
+        """
+        self._cpu_workers = cpu_workers if isinstance(cpu_workers, int) and cpu_workers > 0 else 1
+        self._io_workers = io_workers if isinstance(io_workers, int) and io_workers > 0 else 4
+        super().__init__(dependencies=dependencies, max_workers=self._cpu_workers + self._io_workers)
+        self._memory_budget = memory_budget if isinstance(memory_budget, int) and memory_budget > 0 else None
+        self._profiles = {str(k): dict(v) for k, v in profiles.items()} if isinstance(profiles, dict) else {}
+        self._placements = dict()
+
+    @property
+    def placements(self) -> dict:
+        """a dictionary of intent level to the pool, resource class and memory estimate it was placed with"""
+        return {k: dict(v) for k, v in self._placements.items()}
+
+    def get_profile(self, intent_level: [str, int]) -> dict:
+        """returns the 'resource' class and 'memory' estimate of an intent level"""
+        profile = self._profiles.get(str(intent_level), {})
+        resource = profile.get('resource') if profile.get('resource') in self.RESOURCE_CLASSES else 'cpu'
+        memory = profile.get('memory') if isinstance(profile.get('memory'), int) else 0
+        return {'resource': resource, 'memory': memory}
+
+    @classmethod
+    def level_profiles(cls, level_intents: dict, declared: dict=None, run_history: str=None) -> dict:
+        """ returns the resource class and memory estimate of each intent level
+
+        :param level_intents: a dictionary of intent level to the level intent
+        :param declared: (optional) a dictionary of intent level or task name to a resource class 'cpu' or 'io', or
+                        to a dictionary with an optional 'resource' class and 'memory' estimate in bytes. A level
+                        with any CPU bound task is CPU bound, and its memory is the largest of its tasks
+        :param run_history: (optional) a run history of earlier runs, see RunStats
+        :return: a dictionary of intent level to its 'resource' class, 'memory' estimate and 'source'
+        """
+        declared = declared if isinstance(declared, dict) else {}
+        history = cls._history_profiles(run_history) if isinstance(run_history, str) else {}
+        profiles = dict()
+        for level, level_intent in level_intents.items():
+            level = str(level)
+            methods, task_names = set(), list()
+            for order in (level_intent or {}).values():
+                for method, params in order.items():
+                    methods.add(method)
+                    params = {**params, **params.get('kwargs', {})}
+                    if isinstance(params.get('task_name'), str):
+                        task_names.append(params.get('task_name'))
+            resource = 'io' if len(methods) > 0 and methods.issubset(cls.IO_METHODS) else 'cpu'
+            profile = {'resource': resource, 'memory': 0, 'source': 'method'}
+            if level in history:
+                profile.update({**history[level], 'source': 'history'})
+            claims = [cls._declared(declared.get(name)) for name in task_names if name in declared]
+            if level in declared:
+                claims.append(cls._declared(declared.get(level)))
+            claims = [c for c in claims if len(c) > 0]
+            if len(claims) > 0:
+                resources = [c['resource'] for c in claims if 'resource' in c]
+                if len(resources) > 0:
+                    profile['resource'] = 'cpu' if 'cpu' in resources else 'io'
+                memories = [c['memory'] for c in claims if 'memory' in c]
+                if len(memories) > 0:
+                    profile['memory'] = max(memories)
+                profile['source'] = 'declared'
+            profiles[level] = profile
+        return profiles
+
+    def run(self, intent_levels: list, run_level: Callable[[str], Any]) -> dict:
+        """ runs the intent levels in dependency order, placing each level on the process or thread pool of its
+        resource class once its dependencies are complete and its memory estimate fits the budget. If a level
+        fails, no further levels are submitted and the exception is raised once the running levels have finished.
+
+        :param intent_levels: the intent levels to run, in their default order
+        :param run_level: a callable taking the intent level. It must be picklable to run on the process pool
+        :return: a dictionary of intent level to the run_level result
+        """
+        _ = self.execution_waves(intent_levels)
+        pending = [str(x) for x in intent_levels]
+        scope = set(pending)
+        done = set()
+        results = dict()
+        running = dict()
+        error = None
+        self._placements = dict()
+        pools = {'cpu': ProcessPoolExecutor(max_workers=self._cpu_workers),
+                 'io': ThreadPoolExecutor(max_workers=self._io_workers, thread_name_prefix='controller_io')}
+        limits = {'cpu': self._cpu_workers, 'io': self._io_workers}
+        try:
+            while len(pending) > 0 or len(running) > 0:
+                if error is None:
+                    for level in list(pending):
+                        if not self._ready(level, done, scope):
+                            continue
+                        profile = self.get_profile(level)
+                        resource = profile['resource']
+                        if sum(1 for x in running.values() if x[1] == resource) >= limits[resource]:
+                            continue
+                        in_use = sum(x[2] for x in running.values())
+                        if isinstance(self._memory_budget, int) and len(running) > 0 and \
+                                in_use + profile['memory'] > self._memory_budget:
+                            continue
+                        future = pools[resource].submit(run_level, level)
+                        running[future] = (level, resource, profile['memory'])
+                        pending.remove(level)
+                        self._placements[level] = {'pool': 'process' if resource == 'cpu' else 'thread', **profile,
+                                                   'source': self._profiles.get(level, {}).get('source')}
+                if len(running) == 0:
+                    break
+                finished, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    level = running.pop(future)[0]
+                    try:
+                        results[level] = future.result()
+                        done.add(level)
+                    except Exception as e:
+                        error = error if error is not None else e
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+        if error is not None:
+            raise error
+        return results
+
+    @staticmethod
+    def _declared(value: Any) -> dict:
+        """returns a declared resource class or dictionary as a dictionary of 'resource' and 'memory'"""
+        if isinstance(value, str):
+            return {'resource': value.lower()} if value.lower() in ResourceScheduler.RESOURCE_CLASSES else {}
+        if isinstance(value, dict):
+            declared = dict()
+            if str(value.get('resource', '')).lower() in ResourceScheduler.RESOURCE_CLASSES:
+                declared['resource'] = str(value.get('resource')).lower()
+            if isinstance(value.get('memory'), int):
+                declared['memory'] = value.get('memory')
+            return declared
+        return {}
+
+    @classmethod
+    def _history_profiles(cls, run_history: str, runs: int=None) -> dict:
+        """ returns the resource class and memory estimate of each intent level in the run history, from its most
+        recent complete runs. The class is from the ratio of the CPU time of the level tasks, which includes the
+        task attempts run on other threads, to the wall time of the level, and the memory is the largest peak the
+        level raised the resident memory by. Runs with a task that did not complete, such as one skipped on
+        resume, do not reflect the level and are not used
+
+        :param run_history: the run history
+        :param runs: (optional) the number of most recent runs of each level to use. Default 5
+        """
+        runs = runs if isinstance(runs, int) and runs > 0 else 5
+        history = RunStats.load_history(run_history=run_history)
+        levels = dict()
+        for n in range(len(history.get('run_id', []))):
+            record = {key: values[n] for key, values in history.items()}
+            run = levels.setdefault(str(record['level']), {}).setdefault(record['run_id'], {
+                'complete': False, 'tasks_complete': True, 'wall_time': 0, 'cpu_time': 0, 'tasks_cpu_time': None,
+                'memory': None, 'tasks_memory': None})
+            if record['method'] == 'level':
+                run.update({'complete': record['status'] == 'complete', 'wall_time': record['wall_time'] or 0,
+                            'cpu_time': record['cpu_time'] or 0, 'memory': record['peak_rss']})
+                continue
+            if record['status'] != 'complete':
+                run['tasks_complete'] = False
+            run['tasks_cpu_time'] = (run['tasks_cpu_time'] or 0) + (record['cpu_time'] or 0)
+            if isinstance(record['peak_rss'], int):
+                run['tasks_memory'] = max(run['tasks_memory'] or 0, record['peak_rss'])
+        profiles = dict()
+        for level, level_runs in levels.items():
+            level_runs = [r for r in level_runs.values() if r['complete'] and r['tasks_complete']][-runs:]
+            if len(level_runs) == 0:
+                continue
+            wall_time = sum(r['wall_time'] for r in level_runs)
+            # a level without task records, such as from an earlier run history, is taken from the level record
+            cpu_time = sum(r['cpu_time'] if r['tasks_cpu_time'] is None else r['tasks_cpu_time'] for r in level_runs)
+            memories = [r['memory'] if isinstance(r['memory'], int) else r['tasks_memory'] for r in level_runs]
+            memory = max([m for m in memories if isinstance(m, int)] or [0])
+            resource = 'cpu' if wall_time == 0 or cpu_time / wall_time >= cls.CPU_RATIO else 'io'
+            profiles[level] = {'resource': resource, 'memory': memory}
+        return profiles
@@ -0,0 +1,176 @@
+import hashlib
+import json
+from copy import deepcopy
+from datetime import datetime
+from typing import Any
+
+__author__ = 'Darryl Oatridge'
+
+
+class RunBookPlan(object):
+    """ A compiled, immutable execution plan of a controller run book. The plan holds the intent levels in run
+    order, a copy of each level's intent, the level dependencies and, if bound, the source and persist connector
+    URIs of each level, so it can be run repeatedly without rereading the controller contract, or serialised and
+    shipped to workers. The plan records the version of the contract it was compiled from so it can be checked,
+    and recompiled, when the contract changes.
+    """
+
+    __slots__ = ['_task_name', '_run_book', '_controller_repo', '_intent_levels', '_level_intents', '_dependencies',
+                 '_connectors', '_infer_dependencies', '_contract_version', '_created']
+
+    def __init__(self, task_name: str, intent_levels: list, level_intents: dict, dependencies: dict,
+                 contract_version: str, connectors: dict=None, run_book: str=None, controller_repo: str=None,
+                 infer_dependencies: bool=None, created: str=None):
+        """ creates the plan. Use `Controller.compile_run_book()` to compile a plan from a controller contract
+
+        :param task_name: the task name of the controller
+        :param intent_levels: the intent levels in run order
+        :param level_intents: a dictionary of intent level to the level intent
+        :param dependencies: a dictionary of intent level to the list of intent levels it depends on
+        :param contract_version: the version of the contract the plan was compiled from
+        :param connectors: (optional) a dictionary of intent level to its 'inputs' and 'outputs' connector URIs
+        :param run_book: (optional) the name of the run book the plan was compiled from
+        :param controller_repo: (optional) the controller repo the tasks load their contracts from
+        :param infer_dependencies: (optional) if the dependencies were inferred from the connectors
+        :param created: (optional) the ISO timestamp the plan was compiled
+        """
+        self._task_name = task_name
+        self._run_book = run_book
+        self._controller_repo = controller_repo
+        self._intent_levels = tuple(str(x) for x in intent_levels)
+        self._level_intents = {str(k): deepcopy(v) for k, v in level_intents.items()}
+        self._dependencies = {str(k): tuple(str(x) for x in v) for k, v in dependencies.items()}
+        self._connectors = None
+        if isinstance(connectors, dict):
+            self._connectors = {str(k): {'inputs': tuple(sorted(v.get('inputs', []))),
+                                         'outputs': tuple(sorted(v.get('outputs', [])))}
+                                for k, v in connectors.items()}
+        self._infer_dependencies = infer_dependencies if isinstance(infer_dependencies, bool) else False
+        self._contract_version = contract_version
+        self._created = created if isinstance(created, str) else datetime.now().isoformat()
+
+    @staticmethod
+    def get_contract_version(pm: Any, contract_stamps: dict=None) -> str:
+        """ returns the version of a controller contract, a hash of its intent, dependencies and run books and of
+        the contract stamps of the tasks it runs, so the version changes when a task domain contract changes
+
+        :param pm: the controller property manager
+        :param contract_stamps: (optional) a dictionary of task to the stamp of its domain contract
+        :return: the contract version
+        """
+        contract = {'intent': pm.get_intent(), 'dependencies': pm.dependencies,
+                    'run_books': pm.get(pm.KEY.run_book_key, {}), 'contracts': contract_stamps or {}}
+        return hashlib.sha256(json.dumps(contract, sort_keys=True, default=str).encode()).hexdigest()
+
+    @property
+    def task_name(self) -> str:
+        """the task name of the controller"""
+        return self._task_name
+
+    @property
+    def run_book(self) -> [str, None]:
+        """the name of the run book the plan was compiled from"""
+        return self._run_book
+
+    @property
+    def controller_repo(self) -> [str, None]:
+        """the controller repo the tasks load their contracts from"""
+        return self._controller_repo
+
+    @property
+    def intent_levels(self) -> list:
+        """the intent levels in run order"""
+        return list(self._intent_levels)
+
+    @property
+    def infer_dependencies(self) -> bool:
+        """if the dependencies were inferred from the connectors"""
+        return self._infer_dependencies
+
+    @property
+    def is_bound(self) -> bool:
+        """if the level connectors are bound in the plan"""
+        return self._connectors is not None
+
+    @property
+    def contract_version(self) -> str:
+        """the version of the contract the plan was compiled from"""
+        return self._contract_version
+
+    @property
+    def created(self) -> str:
+        """the ISO timestamp the plan was compiled"""
+        return self._created
+
+    def is_valid(self, contract_version: str) -> bool:
+        """if the plan was compiled from the given contract version"""
+        return contract_version == self._contract_version
+
+    def get_level_intent(self, intent_level: [str, int]) -> dict:
+        """returns a copy of the intent of an intent level"""
+        return deepcopy(self._level_intents.get(str(intent_level), {}))
+
+    def get_level_intents(self) -> dict:
+        """returns a copy of the intent of every intent level"""
+        return deepcopy(self._level_intents)
+
+    def get_dependencies(self) -> dict:
+        """returns a dictionary of intent level to the list of intent levels it depends on"""
+        return {k: list(v) for k, v in self._dependencies.items()}
+
+    def get_connectors(self, intent_level: [str, int]) -> dict:
+        """returns the 'inputs' and 'outputs' connector URIs of an intent level, empty if the plan is not bound"""
+        connectors = (self._connectors or {}).get(str(intent_level), {})
+        return {'inputs': set(connectors.get('inputs', [])), 'outputs': set(connectors.get('outputs', []))}
+
+    def get_intermediates(self) -> set:
+        """returns the connector URIs read by any intent level of the plan"""
+        intermediates = set()
+        for level in self._intent_levels:
+            intermediates.update(self.get_connectors(level)['inputs'])
+        return intermediates
+
+    def to_dict(self) -> dict:
+        """returns the plan as a JSON serialisable dictionary"""
+        connectors = None
+        if self._connectors is not None:
+            connectors = {k: {'inputs': list(v['inputs']), 'outputs': list(v['outputs'])}
+                          for k, v in self._connectors.items()}
+        return {'task_name': self._task_name, 'run_book': self._run_book, 'controller_repo': self._controller_repo,
+                'intent_levels': list(self._intent_levels), 'level_intents': self.get_level_intents(),
+                'dependencies': self.get_dependencies(), 'connectors': connectors,
+                'infer_dependencies': self._infer_dependencies, 'contract_version': self._contract_version,
+                'created': self._created}
+
+    @classmethod
+    def from_dict(cls, plan: dict):
+        """returns the plan from a dictionary created by to_dict"""
+        return cls(**plan)
+
+    def to_json(self) -> str:
+        """returns the plan as a JSON string"""
+        return json.dumps(self.to_dict(), default=str)
+
+    @classmethod
+    def from_json(cls, plan: str):
+        """returns the plan from a JSON string created by to_json"""
+        return cls.from_dict(json.loads(plan))
+
+    def __getstate__(self) -> dict:
+        return self.to_dict()
+
+    def __setstate__(self, state: dict):
+        self.__init__(**state)
+
+    def __eq__(self, other) -> bool:
+        # plans compiled at different times from the same contract are equal
+        if not isinstance(other, RunBookPlan):
+            return False
+        plan, other_plan = self.to_dict(), other.to_dict()
+        plan.pop('created')
+        other_plan.pop('created')
+        return plan == other_plan
+
+    def __repr__(self) -> str:
+        return f"RunBookPlan(task_name={self._task_name!r}, run_book={self._run_book!r}, " \
+               f"intent_levels={list(self._intent_levels)!r}, contract_version={self._contract_version[:12]!r})"
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from urllib.parse import urlparse
+from ds_engines.engines.controller.component_cache import ComponentCache
+
+__author__ = 'Darryl Oatridge'
+
+
+class RunJournal(object):
+    """ A journal of the tasks completed by the runs of a controller, so a run that failed part way can be resumed
+    at the first task that did not complete. Each entry records a fingerprint of the task inputs, its intent
+    parameters, component contract and source connectors, and a stamp of each of its output connectors. A task
+    is complete if its inputs are unchanged and its outputs are as it left them.
+
+    Each entry is kept in its own file so tasks in parallel worker processes can record independently.
+    """
+
+    def __init__(self, task_name: str, journal_path: str=None):
+        """ opens or creates the journal of a controller
+
+        :param task_name: the task name of the controller
+        :param journal_path: (optional) the local journal directory. Defaults to 'HADRON_CONTROLLER_JOURNAL_PATH'
+                        or a 'hadron/controller_journal' directory in the system temp directory
+        """
+        if not isinstance(journal_path, str):
+            journal_path = os.environ.get('HADRON_CONTROLLER_JOURNAL_PATH')
+        if not isinstance(journal_path, str):
+            journal_path = os.path.join(tempfile.gettempdir(), 'hadron', 'controller_journal')
+        self._task_name = task_name
+        self._journal_path = journal_path
+        os.makedirs(self._entry_path, exist_ok=True)
+
+    @property
+    def task_name(self) -> str:
+        """the task name of the controller"""
+        return self._task_name
+
+    @property
+    def journal_path(self) -> str:
+        """the local journal directory"""
+        return self._journal_path
+
+    @property
+    def _entry_path(self) -> str:
+        return os.path.join(self._journal_path, hashlib.sha256(str(self._task_name).encode()).hexdigest()[:16])
+
+    @staticmethod
+    def stamp(uri: str) -> [str, None]:
+        """ returns a stamp that changes when the content at the uri changes, or None if it can not be taken. Local
+        and http URIs are stamped as contracts are, other schemes, such as s3, through fsspec if it is installed"""
+        if not isinstance(uri, str):
+            return None
+        if urlparse(uri).scheme in ['', 'file', 'http', 'https']:
+            return ComponentCache.contract_stamp(uri)
+        try:
+            import fsspec
+            info = fsspec.open(uri).fs.info(uri)
+        except (ImportError, OSError, ValueError):
+            return None
+        stamp = [info.get(k) for k in ['ETag', 'etag', 'LastModified', 'mtime', 'size'] if info.get(k) is not None]
+        return ":".join(str(x) for x in stamp) if len(stamp) > 0 else None
+
+    @classmethod
+    def fingerprint(cls, params: dict, contract_uri: str=None, inputs: [set, list]=None, canonical: str=None) -> str:
+        """ returns a fingerprint of the inputs of a task
+
+        :param params: the intent parameters of the task
+        :param contract_uri: (optional) the URI of the task component contract
+        :param inputs: (optional) the source connector URIs of the task
+        :param canonical: (optional) a fingerprint of a canonical passed to the task in memory
+        :return: the fingerprint
+        """
+        content = {'params': params, 'contract': cls.stamp(contract_uri),
+                   'inputs': {uri: cls.stamp(uri) for uri in sorted(inputs or [])}, 'canonical': canonical}
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def task_key(level: [str, int], order: [str, int], method: str, task_name: str) -> str:
+        """returns the journal key of a task"""
+        return f"{level}|{order}|{method}|{task_name}"
+
+    def get(self, key: str) -> [dict, None]:
+        """returns the journal entry of a task key, or None if the task has not completed"""
+        path = os.path.join(self._entry_path, self._file_name(key))
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def record(self, key: str, fingerprint: str, outputs: [set, list]=None, **info):
+        """ records a completed task, stamping its output connectors
+
+        :param key: the task key
+        :param fingerprint: the fingerprint of the task inputs
+        :param outputs: (optional) the output connector URIs of the task
+        :param info: (optional) additional information to report, such as the level and method
+        """
+        entry = {**info, 'key': key, 'fingerprint': fingerprint,
+                 'outputs': {uri: self.stamp(uri) for uri in sorted(outputs or [])},
+                 'completed': datetime.now().isoformat()}
+        handle, staging = tempfile.mkstemp(dir=self._entry_path)
+        with os.fdopen(handle, 'w') as f:
+            json.dump(entry, f, default=str)
+        os.replace(staging, os.path.join(self._entry_path, self._file_name(key)))
+        return
+
+    def is_complete(self, key: str, fingerprint: str) -> bool:
+        """if the task completed with the same inputs and its outputs are unchanged since"""
+        entry = self.get(key)
+        if not isinstance(entry, dict) or entry.get('fingerprint') != fingerprint:
+            return False
+        for uri, stamp in entry.get('outputs', {}).items():
+            if stamp is None or self.stamp(uri) != stamp:
+                return False
+        return True
+
+    def clear(self):
+        """removes every entry, so the next resumed run starts from the first task"""
+        shutil.rmtree(self._entry_path, ignore_errors=True)
+        os.makedirs(self._entry_path, exist_ok=True)
+        return
+
+    def report(self) -> dict:
+        """returns a dictionary of lists of the level, order, method, task name and completion of each entry"""
+        entries = []
+        for name in os.listdir(self._entry_path):
+            if name.endswith('.json'):
+                with open(os.path.join(self._entry_path, name), 'r') as f:
+                    entries.append(json.load(f))
+        entries.sort(key=lambda x: x.get('completed', ''))
+        return {key: [e.get(key) for e in entries] for key in ['level', 'order', 'method', 'task_name', 'completed']}
+
+    @staticmethod
+    def _file_name(key: str) -> str:
+        return f"{hashlib.sha256(key.encode()).hexdigest()[:24]}.json"
@@ -0,0 +1,355 @@
+import os
+from typing import Any
+from ds_engines.engines.controller.canonical_handoff import CanonicalHandoff
+from ds_engines.engines.controller.level_transport import LevelTransport
+from ds_engines.engines.controller.report_writer import ReportWriter
+from ds_engines.engines.controller.run_journal import RunJournal
+from ds_engines.engines.controller.run_stats import RunStats
+from ds_engines.engines.controller.task_cache import TaskResultCache
+from ds_engines.engines.controller.task_policy import TaskPolicy
+
+__author__ = 'Darryl Oatridge'
+
+
+class RunOptions(object):
+    """ The options of a controller run, validated once and passed through every run path. The level options
+    configure the intent model that runs each intent level, whether in the controller, a worker process or a level
+    worker on another node, and are passed to the level workers as a JSON serialisable dictionary. The placement
+    options choose how the levels are run, in order, in a pool of worker processes, placed by resource class or
+    distributed over a level transport.
+    """
+
+    LEVEL_PARAMETERS = ['handoff', 'handoff_persist', 'use_cache', 'cache_path', 'cache_size', 'report_policy',
+                        'report_background', 'chunk_size', 'stream_tasks', 'synthetic_shards', 'synthetic_seed',
+                        'synthetic_key_columns', 'profile', 'incremental_tasks', 'watermark_path', 'resume',
+                        'journal_path', 'task_policy', 'level_policies']
+    PLACEMENT_PARAMETERS = ['max_workers', 'infer_dependencies', 'run_stats', 'run_history', 'transport',
+                            'max_retries', 'lease_timeout', 'cpu_workers', 'io_workers', 'memory_budget',
+                            'resource_classes']
+
+    def __init__(self, handoff: bool=None, handoff_persist: str=None, use_cache: bool=None, cache_path: str=None,
+                 cache_size: int=None, report_policy: str=None, report_background: bool=None, chunk_size: int=None,
+                 stream_tasks: [str, list]=None, synthetic_shards: int=None, synthetic_seed: int=None,
+                 synthetic_key_columns: [str, list]=None, profile: bool=None, incremental_tasks: [str, list, dict]=None,
+                 watermark_path: str=None, resume: bool=None, journal_path: str=None, task_policy: dict=None,
+                 level_policies: dict=None, max_workers: int=None, infer_dependencies: bool=None,
+                 run_stats: bool=None, run_history: str=None, transport: LevelTransport=None, max_retries: int=None,
+                 lease_timeout: int=None, cpu_workers: int=None, io_workers: int=None, memory_budget: int=None,
+                 resource_classes: dict=None):
+        """ creates and validates the options of a controller run
+
+        :param handoff: (optional) pass each task outcome in memory to downstream tasks of the same intent level, or
+                        of any level if run in order, whose source connector matches the upstream persist connector
+                        rather than reloading it. Default False
+        :param handoff_persist: (optional) with handoff, how outcomes read by downstream tasks are persisted,
+                        'sync' inline, 'async' in the background or 'skip' not at all. Default 'sync'
+        :param use_cache: (optional) if task outcomes should be taken from the task result cache when the task
+                        intent, component contract and input canonical are unchanged. Default False
+        :param cache_path: (optional) the task result cache directory. Default 'HADRON_CONTROLLER_CACHE_PATH'
+        :param cache_size: (optional) the maximum task result cache size in bytes.
+                        Default 'HADRON_CONTROLLER_CACHE_SIZE'
+        :param report_policy: (optional) which task reports are generated, 'none', 'essential' for the schema and
+                        quality summary reports or 'all'. Default 'HADRON_CONTROLLER_REPORT_POLICY' or 'all'
+        :param report_background: (optional) compute and persist reports on a background thread so the data path
+                        completes first. Default 'HADRON_CONTROLLER_REPORT_BACKGROUND' or True
+        :param chunk_size: (optional) with stream_tasks, the maximum number of rows in each streamed chunk
+        :param stream_tasks: (optional) the task names of row independent transition or wrangle tasks to run chunk
+                        by chunk, bounding their peak memory by the chunk size. Their source and persist connectors
+                        must be parquet or csv files. Tasks that need a global view are not streamed
+        :param synthetic_shards: (optional) the number of shards to split each synthetic build into, built in
+                        parallel worker processes. Default a single build
+        :param synthetic_seed: (optional) the base seed each shard seed is derived from, making a sharded build
+                        reproducible. Default 0
+        :param synthetic_key_columns: (optional) with synthetic_shards, the numeric sequential columns, such as a
+                        generated id, offset by the rows of the shards before them so they stay unique across the
+                        build. Any other column that must be unique across the build must be shard safe
+        :param profile: (optional) if each task is profiled with cProfile. Default False
+        :param incremental_tasks: (optional) the task names of row independent transition or wrangle tasks to run
+                        incrementally, or a dictionary of task name to a monotonic source column to mark by. see
+                        `ControllerIntentModel.start_incremental()`
+        :param watermark_path: (optional) the local directory the incremental task watermarks are kept in. With a
+                        transport it must be given, on a volume shared by the level workers.
+                        Default 'HADRON_CONTROLLER_WATERMARK_PATH'
+        :param resume: (optional) if the tasks the run journal has as completed, with unchanged inputs and outputs,
+                        are skipped, so a run that failed part way resumes where it stopped. Default False
+        :param journal_path: (optional) the run journal directory. Setting a journal path, or resume, records each
+                        completed task in the journal. With a transport it must be given, on a volume shared by the
+                        level workers. Default 'HADRON_CONTROLLER_JOURNAL_PATH'
+        :param task_policy: (optional) how each task is run, a dictionary of 'timeout', 'retries', 'backoff',
+                        'max_backoff' and 'speculate_after', see TaskPolicy. Default each task runs once
+        :param level_policies: (optional) a dictionary of intent level to the task_policy parameters of that level
+        :param max_workers: (optional) the maximum number of intent levels to run in parallel. Default 1
+        :param infer_dependencies: (optional) if running in parallel, infer dependencies from the task connectors
+        :param run_stats: (optional) if the wall time, CPU time, peak memory, rows and bytes of each intent level
+                        and task are recorded. Default True if profile or run_history is set
+        :param run_history: (optional) a local JSON lines file the run stats are appended to.
+                        Default 'HADRON_CONTROLLER_RUN_HISTORY'
+        :param transport: (optional) a level transport to coordinate the intent levels across level workers
+        :param max_retries: (optional) with a transport, the times a failed or lost level is resubmitted. Default 2
+        :param lease_timeout: (optional) with a transport, the seconds without a worker heartbeat before a level
+                        is resubmitted. Default 60
+        :param cpu_workers: (optional) the number of worker processes CPU bound levels are placed on. Default 1
+        :param io_workers: (optional) the number of threads I/O bound levels are placed on. Default 4
+        :param memory_budget: (optional) the bytes the memory estimates of the concurrently running levels must fit
+                        in. Default no budget
+        :param resource_classes: (optional) a dictionary of intent level or task name to its resource class, 'cpu'
+                        or 'io', or to a dictionary of 'resource' and 'memory' estimate in bytes
+        """
+        self._handoff = handoff if isinstance(handoff, bool) else False
+        self._handoff_persist = handoff_persist if isinstance(handoff_persist, str) else 'sync'
+        if self._handoff_persist not in CanonicalHandoff.PERSIST_MODES:
+            raise ValueError(f"The handoff persist '{handoff_persist}' must be one of {CanonicalHandoff.PERSIST_MODES}")
+        self._use_cache = use_cache if isinstance(use_cache, bool) else False
+        self._cache_path = cache_path if isinstance(cache_path, str) else None
+        self._cache_size = cache_size if isinstance(cache_size, int) else None
+        report_policy = report_policy if isinstance(report_policy, str) else \
+            os.environ.get('HADRON_CONTROLLER_REPORT_POLICY', 'all')
+        self._report_policy = report_policy.lower()
+        if self._report_policy not in ReportWriter.REPORT_POLICIES:
+            raise ValueError(f"The report policy '{report_policy}' must be one of {ReportWriter.REPORT_POLICIES}")
+        if not isinstance(report_background, bool):
+            report_background = str(os.environ.get('HADRON_CONTROLLER_REPORT_BACKGROUND', 'true')).lower() in \
+                                ['true', '1']
+        self._report_background = report_background
+        self._chunk_size = chunk_size if isinstance(chunk_size, int) and chunk_size > 0 else None
+        self._stream_tasks = self._list_formatter(stream_tasks)
+        self._synthetic_shards = synthetic_shards if isinstance(synthetic_shards, int) and synthetic_shards > 1 \
+            else None
+        self._synthetic_seed = synthetic_seed if isinstance(synthetic_seed, int) else None
+        self._synthetic_key_columns = self._list_formatter(synthetic_key_columns)
+        self._profile = profile if isinstance(profile, bool) else False
+        if isinstance(incremental_tasks, dict):
+            self._incremental_tasks = incremental_tasks if len(incremental_tasks) > 0 else None
+        else:
+            self._incremental_tasks = self._list_formatter(incremental_tasks) or None
+        self._watermark_path = watermark_path if isinstance(watermark_path, str) else \
+            os.environ.get('HADRON_CONTROLLER_WATERMARK_PATH', None)
+        self._resume = resume if isinstance(resume, bool) else False
+        self._journal_path = journal_path if isinstance(journal_path, str) else \
+            os.environ.get('HADRON_CONTROLLER_JOURNAL_PATH', None)
+        # validate the task policies before any level is run
+        _ = TaskPolicy.from_dict(task_policy)
+        for policy in (level_policies if isinstance(level_policies, dict) else {}).values():
+            _ = TaskPolicy.from_dict(policy)
+        self._task_policy = task_policy if isinstance(task_policy, dict) else None
+        self._level_policies = {str(k): v for k, v in level_policies.items()} \
+            if isinstance(level_policies, dict) else None
+        self._max_workers = max_workers if isinstance(max_workers, int) and max_workers > 0 else 1
+        self._infer_dependencies = infer_dependencies if isinstance(infer_dependencies, bool) else None
+        run_history = run_history if isinstance(run_history, str) else \
+            os.environ.get('HADRON_CONTROLLER_RUN_HISTORY', None)
+        self._run_history = run_history if isinstance(run_history, str) and len(run_history) > 0 else None
+        self._run_stats = run_stats if isinstance(run_stats, bool) else \
+            self._profile or isinstance(self._run_history, str)
+        self._transport = transport if isinstance(transport, LevelTransport) else None
+        self._max_retries = max_retries
+        self._lease_timeout = lease_timeout
+        self._cpu_workers = cpu_workers if isinstance(cpu_workers, int) else None
+        self._io_workers = io_workers if isinstance(io_workers, int) else None
+        self._memory_budget = memory_budget if isinstance(memory_budget, int) else None
+        self._resource_classes = resource_classes if isinstance(resource_classes, dict) else None
+        if self.is_distributed:
+            # workers on other nodes keep the journal and watermarks where the coordinator tells them, so the
+            # directories must be given, on a volume shared by the nodes, rather than default to a local directory
+            if self._resume and not isinstance(self._journal_path, str):
+                raise ValueError("A distributed run with resume must be given a journal_path, or "
+                                 "'HADRON_CONTROLLER_JOURNAL_PATH', on a volume shared by the level workers")
+            if self._incremental_tasks is not None and not isinstance(self._watermark_path, str):
+                raise ValueError("A distributed run with incremental_tasks must be given a watermark_path, or "
+                                 "'HADRON_CONTROLLER_WATERMARK_PATH', on a volume shared by the level workers")
+
+    @classmethod
+    def from_dict(cls, options: [dict, None], default: 'RunOptions'=None) -> Any:
+        """ returns run options from a dictionary of their parameters, any not given taken from the default options
+
+        :param options: a dictionary of the run option parameters
+        :param default: (optional) the options of the parameters not in the dictionary
+        :return: the run options
+        """
+        options = options if isinstance(options, dict) else {}
+        parameters = cls.LEVEL_PARAMETERS + cls.PLACEMENT_PARAMETERS
+        unknown = set(options.keys()).difference(parameters)
+        if len(unknown) > 0:
+            raise ValueError(f"The run options {sorted(unknown)} are not in {parameters}")
+        if isinstance(default, RunOptions) and len(options) == 0:
+            return default
+        params = default.to_dict() if isinstance(default, RunOptions) else {}
+        params.update(options)
+        return cls(**params)
+
+    def to_dict(self) -> dict:
+        """returns the option parameters as a dictionary"""
+        params = self.level_options()
+        params.update({'max_workers': self._max_workers, 'infer_dependencies': self._infer_dependencies,
+                       'run_stats': self._run_stats, 'run_history': self._run_history, 'transport': self._transport,
+                       'max_retries': self._max_retries, 'lease_timeout': self._lease_timeout,
+                       'cpu_workers': self._cpu_workers, 'io_workers': self._io_workers,
+                       'memory_budget': self._memory_budget, 'resource_classes': self._resource_classes})
+        return params
+
+    def level_options(self) -> dict:
+        """returns the options that configure the intent model of a level as a JSON serialisable dictionary, as
+        passed to the level workers"""
+        return {'handoff': self._handoff, 'handoff_persist': self._handoff_persist, 'use_cache': self._use_cache,
+                'cache_path': self._cache_path, 'cache_size': self._cache_size, 'report_policy': self._report_policy,
+                'report_background': self._report_background, 'chunk_size': self._chunk_size,
+                'stream_tasks': list(self._stream_tasks), 'synthetic_shards': self._synthetic_shards,
+                'synthetic_seed': self._synthetic_seed, 'synthetic_key_columns': list(self._synthetic_key_columns),
+                'profile': self._profile, 'incremental_tasks': self._incremental_tasks,
+                'watermark_path': self._watermark_path, 'resume': self._resume, 'journal_path': self._journal_path,
+                'task_policy': self._task_policy, 'level_policies': self._level_policies}
+
+    @property
+    def handoff(self) -> bool:
+        """if task outcomes are handed to downstream tasks in memory"""
+        return self._handoff
+
+    @property
+    def has_journal(self) -> bool:
+        """if completed tasks are recorded in a run journal"""
+        return self._resume or isinstance(self._journal_path, str)
+
+    @property
+    def resume(self) -> bool:
+        """if the tasks the run journal has as complete are skipped"""
+        return self._resume
+
+    @property
+    def run_stats(self) -> bool:
+        """if the run stats of each level and task are recorded"""
+        return self._run_stats
+
+    @property
+    def profile(self) -> bool:
+        """if each task is profiled"""
+        return self._profile
+
+    @property
+    def run_history(self) -> [str, None]:
+        """the run history the run stats are appended to"""
+        return self._run_history
+
+    @property
+    def max_workers(self) -> int:
+        """the maximum number of intent levels run in parallel"""
+        return self._max_workers
+
+    @property
+    def infer_dependencies(self) -> [bool, None]:
+        """if level dependencies are inferred from the task connectors"""
+        return self._infer_dependencies
+
+    @property
+    def transport(self) -> [LevelTransport, None]:
+        """the level transport of a distributed run"""
+        return self._transport
+
+    @property
+    def max_retries(self) -> [int, None]:
+        """the times a failed or lost level is resubmitted"""
+        return self._max_retries
+
+    @property
+    def lease_timeout(self) -> [int, None]:
+        """the seconds without a worker heartbeat before a level is resubmitted"""
+        return self._lease_timeout
+
+    @property
+    def cpu_workers(self) -> [int, None]:
+        """the number of worker processes CPU bound levels are placed on"""
+        return self._cpu_workers
+
+    @property
+    def io_workers(self) -> [int, None]:
+        """the number of threads I/O bound levels are placed on"""
+        return self._io_workers
+
+    @property
+    def memory_budget(self) -> [int, None]:
+        """the bytes the memory estimates of the concurrently running levels must fit in"""
+        return self._memory_budget
+
+    @property
+    def resource_classes(self) -> [dict, None]:
+        """the declared resource class of each intent level or task name"""
+        return self._resource_classes
+
+    @property
+    def is_distributed(self) -> bool:
+        """if the levels are run by level workers over a transport"""
+        return isinstance(self._transport, LevelTransport)
+
+    @property
+    def is_resource_aware(self) -> bool:
+        """if the levels are placed by their resource class"""
+        return any(isinstance(x, int) for x in [self._cpu_workers, self._io_workers, self._memory_budget]) or \
+            isinstance(self._resource_classes, dict)
+
+    def result_cache(self) -> [TaskResultCache, None]:
+        """returns the task result cache of the run, or None if the cache is not used"""
+        if not self._use_cache:
+            return None
+        return TaskResultCache(cache_path=self._cache_path, max_size=self._cache_size)
+
+    def journal(self, task_name: str) -> [RunJournal, None]:
+        """returns the run journal of the controller task name, or None if completed tasks are not journaled"""
+        if not self.has_journal:
+            return None
+        return RunJournal(task_name=task_name, journal_path=self._journal_path)
+
+    def configure(self, intent_model: Any, task_name: str, intermediates: [set, list]=None,
+                  result_cache: TaskResultCache=None, run_stats: RunStats=None):
+        """ configures an intent model to run with the options, see `release()` once the run completes
+
+        :param intent_model: the ControllerIntentModel to configure
+        :param task_name: the task name of the controller, that the run journal is kept for
+        :param intermediates: (optional) with handoff, the URIs read by downstream tasks run by the intent model
+        :param result_cache: (optional) the task result cache. Default opened from the options
+        :param run_stats: (optional) the run stats collector that each task run is measured into
+        """
+        if self._handoff:
+            intent_model.start_handoff(persist_mode=self._handoff_persist, intermediates=intermediates)
+        result_cache = result_cache if isinstance(result_cache, TaskResultCache) else self.result_cache()
+        intent_model.set_result_cache(result_cache=result_cache)
+        intent_model.set_run_stats(run_stats=run_stats)
+        intent_model.start_report_writer(report_policy=self._report_policy, background=self._report_background)
+        intent_model.set_synthetic_shards(shards=self._synthetic_shards, seed=self._synthetic_seed,
+                                          key_columns=self._synthetic_key_columns)
+        intent_model.set_task_policies(task_policy=self._task_policy, level_policies=self._level_policies)
+        if isinstance(self._chunk_size, int) and len(self._stream_tasks) > 0:
+            intent_model.start_streaming(chunk_size=self._chunk_size, stream_tasks=self._stream_tasks)
+        if self._incremental_tasks is not None:
+            intent_model.start_incremental(incremental_tasks=self._incremental_tasks,
+                                           watermark_path=self._watermark_path)
+        journal = self.journal(task_name=task_name)
+        if isinstance(journal, RunJournal):
+            intent_model.start_journal(journal=journal, resume=self._resume)
+        return
+
+    @staticmethod
+    def release(intent_model: Any):
+        """ waits for the background persists and reports of an intent model configured by `configure()` and
+        returns it to running each task plainly
+
+        :param intent_model: the ControllerIntentModel to release
+        """
+        try:
+            intent_model.stop_handoff()
+        finally:
+            intent_model.stop_report_writer()
+            intent_model.stop_streaming()
+            intent_model.stop_incremental()
+            intent_model.stop_journal()
+            intent_model.set_synthetic_shards(None)
+            intent_model.set_task_policies(None)
+            intent_model.set_result_cache(None)
+            intent_model.set_run_stats(None)
+        return
+
+    @staticmethod
+    def _list_formatter(value: [str, list, None]) -> list:
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, (list, tuple, set)):
+            return list(value)
+        return []
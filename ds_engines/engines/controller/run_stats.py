@@ -0,0 +1,266 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+
+__author__ = 'Darryl Oatridge'
+
+
+class RunStats(object):
+    """ Collects the performance of a controller run for each intent level and task: the wall time, CPU time, peak
+    resident memory, the input and output row counts and the bytes read and written through local connectors.
+    Each task can optionally be profiled with cProfile. Records can be persisted to, and read from, a run history
+    of JSON lines so runs can be compared over time.
+
+    The CPU time is that of the thread running the task, and of any thread the task attaches its record to, so
+    tasks running in parallel threads are not charged for each other. The peak resident memory is the most the
+    resident memory of the process rose above where it was when the task started, sampled on a background thread
+    while the task runs. Memory is shared by the process, so tasks running in parallel threads overlap.
+    """
+
+    RECORD_KEYS = ['run_id', 'started', 'level', 'order', 'method', 'task_name', 'wall_time', 'cpu_time',
+                   'peak_rss', 'rows_in', 'rows_out', 'bytes_read', 'bytes_written', 'attempts', 'speculated',
+                   'status', 'profile']
+
+    DEFAULT_SAMPLE_INTERVAL = 0.05
+
+    def __init__(self, run_id: str=None, profile: bool=None, profile_top: int=None, sample_interval: float=None):
+        """ creates a run stats collector
+
+        :param run_id: (optional) a reference for the run. Defaults to a timestamp and unique suffix
+        :param profile: (optional) if each task is profiled with cProfile. Default False
+        :param profile_top: (optional) the number of functions by cumulative time kept in the profile. Default 20
+        :param sample_interval: (optional) the seconds between samples of the resident memory. Default 0.05
+        """
+        self._run_id = run_id if isinstance(run_id, str) else \
+            f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self._profile = profile if isinstance(profile, bool) else False
+        self._profile_top = profile_top if isinstance(profile_top, int) else 20
+        self._sample_interval = sample_interval if isinstance(sample_interval, (int, float)) and \
+            sample_interval > 0 else self.DEFAULT_SAMPLE_INTERVAL
+        self._records = list()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # the resident memory baseline and peak of each measured record, sampled while there are any
+        self._samples = dict()
+        self._sampler = None
+
+    @property
+    def run_id(self) -> str:
+        """the reference of the run"""
+        return self._run_id
+
+    @property
+    def records(self) -> list:
+        """the list of records collected"""
+        with self._lock:
+            return list(self._records)
+
+    @property
+    def current(self) -> [dict, None]:
+        """the record of the task running in this thread, or None"""
+        stack = getattr(self._local, 'stack', [])
+        return stack[-1] if len(stack) > 0 else None
+
+    @contextmanager
+    def measure(self, level: [str, int], method: str, task_name: str=None, order: int=None):
+        """ a context manager measuring a level or task. The record is the current record within the context so
+        row and byte counts can be added to it, and is yielded so its status can be set
+
+        :param level: the intent level
+        :param method: the intent method, or 'level' for the whole intent level
+        :param task_name: (optional) the task name
+        :param order: (optional) the order of the task in the level
+        """
+        record = {'run_id': self._run_id, 'started': datetime.now().isoformat(), 'level': str(level),
+                  'order': order, 'method': method, 'task_name': task_name, 'wall_time': None, 'cpu_time': None,
+                  'peak_rss': None, 'rows_in': None, 'rows_out': None, 'bytes_read': None, 'bytes_written': None,
+                  'attempts': None, 'speculated': None, 'status': 'running', 'profile': None}
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(record)
+        profiler = None
+        if self._profile and method != 'level' and sys.getprofile() is None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        sample = self._start_sample(record)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+            record['status'] = 'complete' if record['status'] == 'running' else record['status']
+        except BaseException as e:
+            record['status'] = f"failed: {type(e).__name__}"
+            raise
+        finally:
+            record['wall_time'] = round(time.perf_counter() - wall_start, 6)
+            # the CPU time of attempts run on other threads has been added to the record
+            record['cpu_time'] = round(time.thread_time() - cpu_start + (record['cpu_time'] or 0), 6)
+            record['peak_rss'] = self._stop_sample(record, sample=sample)
+            if profiler is not None:
+                profiler.disable()
+                record['profile'] = self._profile_summary(profiler)
+            stack.pop()
+            with self._lock:
+                self._records.append(record)
+
+    @contextmanager
+    def attach(self, record: dict):
+        """ a context manager making the given record the current record of this thread, so a task attempt run
+        on another thread can add its counts to a record of its own. If the thread is not already measuring a
+        record, the CPU time of the thread within the context is added to the record as its 'cpu_time'
+
+        :param record: the record, or a dictionary, counts are added to within the context
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        cpu_start = time.thread_time() if len(stack) == 0 else None
+        stack.append(record)
+        try:
+            yield record
+        finally:
+            stack.pop()
+            if cpu_start is not None:
+                record['cpu_time'] = round(time.thread_time() - cpu_start + (record.get('cpu_time') or 0), 6)
+
+    def add(self, **counts):
+        """ adds counts, such as rows_in or bytes_written, to the current record. None values are ignored"""
+        record = self.current
+        if record is None:
+            return
+        for key, value in counts.items():
+            if value is not None:
+                record[key] = value if record.get(key) is None else record[key] + value
+        return
+
+    def extend(self, records: list):
+        """adds records collected elsewhere, such as in a worker process"""
+        with self._lock:
+            self._records.extend(records)
+        return
+
+    def report(self) -> dict:
+        """returns the records as a dictionary of lists"""
+        records = self.records
+        return {key: [r.get(key) for r in records] for key in self.RECORD_KEYS}
+
+    def persist(self, run_history: str):
+        """ appends the records to a JSON lines run history
+
+        :param run_history: the local path of the run history
+        """
+        if os.path.dirname(run_history):
+            os.makedirs(os.path.dirname(run_history), exist_ok=True)
+        with self._lock, open(run_history, 'a') as f:
+            for record in self._records:
+                f.write(json.dumps(record, default=str) + '\n')
+        return
+
+    @staticmethod
+    def load_history(run_history: str, run_id: [str, list]=None) -> dict:
+        """ returns the records of a JSON lines run history as a dictionary of lists
+
+        :param run_history: the local path of the run history
+        :param run_id: (optional) a run id or list of run ids to filter on
+        """
+        run_ids = [run_id] if isinstance(run_id, str) else run_id
+        records = []
+        if os.path.exists(run_history):
+            with open(run_history, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        if run_ids is None or record.get('run_id') in run_ids:
+                            records.append(record)
+        return {key: [r.get(key) for r in records] for key in RunStats.RECORD_KEYS}
+
+    @staticmethod
+    def resident_memory() -> [int, None]:
+        """returns the current resident memory of the process in bytes, or None if it can not be measured"""
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError, AttributeError):
+            pass
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return int(psutil.Process().memory_info().rss)
+
+    def _start_sample(self, record: dict) -> [list, None]:
+        """starts sampling the resident memory for the record, returning its baseline and peak"""
+        rss = self.resident_memory()
+        if rss is None:
+            return None
+        sample = [rss, rss]
+        with self._lock:
+            self._samples[id(record)] = sample
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_memory, name='run_stats_sampler', daemon=True)
+                self._sampler.start()
+        return sample
+
+    def _stop_sample(self, record: dict, sample: [list, None]) -> [int, None]:
+        """stops sampling the resident memory for the record, returning its peak above the baseline"""
+        if sample is None:
+            return None
+        rss = self.resident_memory()
+        with self._lock:
+            self._samples.pop(id(record), None)
+            if rss is not None:
+                sample[1] = max(sample[1], rss)
+        return sample[1] - sample[0]
+
+    def _sample_memory(self):
+        """samples the resident memory into the peak of every measured record until none are measured"""
+        while True:
+            rss = self.resident_memory()
+            with self._lock:
+                if len(self._samples) == 0:
+                    self._sampler = None
+                    return
+                for sample in self._samples.values():
+                    sample[1] = max(sample[1], rss if rss is not None else 0)
+            time.sleep(self._sample_interval)
+
+    @staticmethod
+    def uri_size(uri: str) -> [int, None]:
+        """ returns the size in bytes of a file or directory uri, or None if it can not be taken. Other schemes than
+        local, such as s3, are sized through fsspec if it is installed"""
+        if not isinstance(uri, str):
+            return None
+        parsed = urlparse(uri)
+        if parsed.scheme not in ['', 'file']:
+            try:
+                import fsspec
+                fs = fsspec.open(uri).fs
+                info = fs.info(uri)
+                if info.get('type') == 'directory':
+                    return int(fs.du(uri, total=True))
+                return int(info['size']) if info.get('size') is not None else None
+            except (ImportError, OSError, ValueError):
+                return None
+        path = parsed.path if parsed.scheme == 'file' else uri
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        if os.path.isdir(path):
+            return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+        return None
+
+    def _profile_summary(self, profiler: cProfile.Profile) -> str:
+        """returns the top functions by cumulative time"""
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(self._profile_top)
+        return stream.getvalue()
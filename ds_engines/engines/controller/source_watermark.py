@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any
+from urllib.parse import urlparse
+import numpy as np
+import pandas as pd
+from ds_engines.engines.controller.canonical_stream import CanonicalStream
+
+__author__ = 'Darryl Oatridge'
+
+
+class SourceWatermark(object):
+    """ A persisted high-water mark for each task source connector, so an incremental task reads only the source
+    data that is new since its last run. The mark is taken one of three ways:
+
+    'column': with a monotonic column, such as an event time or sequence id, only rows above the highest value
+              seen are read. Parquet sources are filtered as they are read
+    'files': with a directory of partition files, only partition files not seen before are read
+    'mtime': with a single file, the file is read only if its modified time or size has changed
+
+    A source read from its marked position is appended to the task outcome. A source with no mark, or whose
+    already read partitions have changed, is read in full and the task outcome replaced. A mark is only committed
+    once the task outcome has been persisted, with the position the outcome was appended to, so a failed run
+    rereads the same data and its append is truncated. Each mark is kept in its own
+    file so tasks in parallel worker processes can commit their marks independently.
+
+    The source must be a local parquet or csv file, or a local directory of them.
+    """
+
+    def __init__(self, watermark_path: str=None):
+        """ opens or creates the watermarks
+
+        :param watermark_path: (optional) the local watermark directory. Defaults to
+                        'HADRON_CONTROLLER_WATERMARK_PATH' or a 'hadron/controller_watermarks' directory in the
+                        system temp directory
+        """
+        if not isinstance(watermark_path, str):
+            watermark_path = os.environ.get('HADRON_CONTROLLER_WATERMARK_PATH')
+        if not isinstance(watermark_path, str):
+            watermark_path = os.path.join(tempfile.gettempdir(), 'hadron', 'controller_watermarks')
+        self._watermark_path = watermark_path
+        os.makedirs(self._watermark_path, exist_ok=True)
+
+    @property
+    def watermark_path(self) -> str:
+        """the local watermark directory"""
+        return self._watermark_path
+
+    @staticmethod
+    def local_path(uri: str) -> [str, None]:
+        """returns the local path of a uri, or None if the uri is not local"""
+        if not isinstance(uri, str):
+            return None
+        parsed = urlparse(uri)
+        if parsed.scheme not in ['', 'file']:
+            return None
+        return parsed.path if parsed.scheme == 'file' else uri
+
+    @classmethod
+    def is_supported(cls, uri: str) -> bool:
+        """if the uri is a local parquet or csv file, or a local directory, that can be watermarked"""
+        path = cls.local_path(uri)
+        if not isinstance(path, str):
+            return False
+        return os.path.isdir(path) or CanonicalStream.is_streamable(path)
+
+    def get(self, task_name: str, uri: str) -> [dict, None]:
+        """returns the committed mark of the task source, or None if there is no mark"""
+        path = os.path.join(self._watermark_path, self._key(task_name, uri))
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def commit(self, task_name: str, uri: str, mark: dict):
+        """ commits the mark of the task source, once the outcome of the data read up to the mark is persisted
+
+        :param task_name: the task name
+        :param uri: the source connector URI
+        :param mark: the mark returned by read_new
+        """
+        mark = {**mark, 'task_name': task_name, 'uri': uri, 'updated': datetime.now().isoformat()}
+        handle, staging = tempfile.mkstemp(dir=self._watermark_path)
+        with os.fdopen(handle, 'w') as f:
+            json.dump(mark, f, indent=2, default=str)
+        os.replace(staging, os.path.join(self._watermark_path, self._key(task_name, uri)))
+        return
+
+    def reset(self, task_name: str=None, uri: str=None):
+        """ removes marks so the next run reads the source in full, all if no filter is given
+
+        :param task_name: (optional) only remove the marks of this task name
+        :param uri: (optional) only remove the marks of this source connector URI
+        """
+        for name, mark in self._marks():
+            if isinstance(task_name, str) and mark.get('task_name') != task_name:
+                continue
+            if isinstance(uri, str) and mark.get('uri') != uri:
+                continue
+            os.remove(os.path.join(self._watermark_path, name))
+        return
+
+    def report(self) -> dict:
+        """returns a dictionary of lists of the task name, source uri, mode, mark and last update of each mark"""
+        marks = [mark for _, mark in self._marks()]
+        return {'task_name': [m.get('task_name') for m in marks], 'uri': [m.get('uri') for m in marks],
+                'mode': [m.get('mode') for m in marks],
+                'mark': [m.get('value', m.get('stamp', len(m.get('files', {})))) for m in marks],
+                'updated': [m.get('updated') for m in marks]}
+
+    def read_new(self, task_name: str, uri: str, column: str=None, full: bool=None) -> tuple:
+        """ reads the source data that is new since the committed mark
+
+        :param task_name: the task name
+        :param uri: the source connector URI
+        :param column: (optional) a monotonic column to mark by. Default by partition files or modified time
+        :param full: (optional) if the source should be read in full regardless of the mark
+        :return: a tuple of the new canonical, or None if there is nothing new, the mark to commit once its outcome
+                 is persisted, and if the outcome should be appended to rather than replaced
+        """
+        path = self.local_path(uri)
+        if not self.is_supported(uri):
+            raise ValueError(f"The source uri '{uri}' must be a local parquet or csv file or directory")
+        previous = None if isinstance(full, bool) and full else self.get(task_name, uri)
+        files = self._data_files(path)
+        if isinstance(column, str):
+            last = None
+            if isinstance(previous, dict) and previous.get('mode') == 'column' and previous.get('column') == column:
+                last = self._decode(previous.get('value'))
+            frames = [self._read(file, column=column, above=last) for file in files]
+            frames = [f for f in frames if f.shape[0] > 0]
+            if len(frames) == 0:
+                return None, None, True
+            canonical = pd.concat(frames, ignore_index=True)
+            value = canonical[column].max()
+            return canonical, {'mode': 'column', 'column': column, 'value': self._encode(value)}, last is not None
+        stamps = {os.path.relpath(file, path) if os.path.isdir(path) else os.path.basename(file): self._stamp(file)
+                  for file in files}
+        if os.path.isdir(path):
+            seen = previous.get('files', {}) if isinstance(previous, dict) and previous.get('mode') == 'files' else None
+            mark = {'mode': 'files', 'files': stamps}
+            if isinstance(seen, dict) and all(stamps.get(name) == stamp for name, stamp in seen.items()):
+                new_files = [file for file in files if os.path.relpath(file, path) not in seen]
+                if len(new_files) == 0:
+                    return None, None, True
+                return self._concat(new_files), mark, True
+            return self._concat(files), mark, False
+        stamp = stamps.get(os.path.basename(path))
+        if isinstance(previous, dict) and previous.get('mode') == 'mtime' and previous.get('stamp') == stamp:
+            return None, None, True
+        return self._concat(files), {'mode': 'mtime', 'stamp': stamp}, False
+
+    @staticmethod
+    def _data_files(path: str) -> list:
+        """returns the sorted parquet and csv files of a directory, or the file itself"""
+        if not os.path.isdir(path):
+            return [path] if os.path.exists(path) else []
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith(('.', '_')))
+            for name in sorted(names):
+                if not name.startswith(('.', '_')) and CanonicalStream.is_streamable(name):
+                    files.append(os.path.join(root, name))
+        return files
+
+    @staticmethod
+    def _stamp(file: str) -> str:
+        stat = os.stat(file)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    @classmethod
+    def _concat(cls, files: list) -> [pd.DataFrame, None]:
+        frames = [cls._read(file) for file in files]
+        if len(frames) == 0:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _read(file: str, column: str=None, above: Any=None) -> pd.DataFrame:
+        """reads a parquet or csv file, only the rows whose column value is above the given value if one is given"""
+        if CanonicalStream.file_type(file) == 'csv':
+            if above is None:
+                return pd.read_csv(file)
+            chunks = [chunk[chunk[column] > above] for chunk in CanonicalStream(uri=file)]
+            return pd.concat(chunks, ignore_index=True) if len(chunks) > 0 else pd.DataFrame()
+        import pyarrow.parquet as pq
+        if above is None:
+            return pq.read_table(file).to_pandas()
+        if isinstance(above, pd.Timestamp):
+            above = above.to_pydatetime()
+        return pq.read_table(file, filters=[(column, '>', above)]).to_pandas()
+
+    @staticmethod
+    def _encode(value: Any) -> dict:
+        """returns a JSON serialisable form of a mark value"""
+        if isinstance(value, (pd.Timestamp, datetime, np.datetime64)):
+            return {'type': 'timestamp', 'value': pd.Timestamp(value).isoformat()}
+        if isinstance(value, np.generic):
+            value = value.item()
+        return {'type': type(value).__name__, 'value': value}
+
+    @staticmethod
+    def _decode(value: [dict, None]) -> Any:
+        """returns a mark value from its JSON serialisable form"""
+        if not isinstance(value, dict):
+            return None
+        if value.get('type') == 'timestamp':
+            return pd.Timestamp(value.get('value'))
+        return value.get('value')
+
+    @staticmethod
+    def _key(task_name: str, uri: str) -> str:
+        """returns the file name of the mark of a task source"""
+        return f"{hashlib.sha256(f'{task_name}|{uri}'.encode()).hexdigest()[:24]}.json"
+
+    def _marks(self) -> list:
+        """returns a list of the file name and mark of every mark"""
+        marks = []
+        for name in sorted(os.listdir(self._watermark_path)):
+            if name.endswith('.json'):
+                with open(os.path.join(self._watermark_path, name), 'r') as f:
+                    marks.append((name, json.load(f)))
+        return marks
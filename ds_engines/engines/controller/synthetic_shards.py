@@ -0,0 +1,92 @@
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Iterator
+import numpy as np
+import pandas as pd
+
+__author__ = 'Darryl Oatridge'
+
+
+class SyntheticShards(object):
+    """ Splits a synthetic build of a given size into shards that are built in parallel worker processes. Each
+    shard has its own seed derived from the base seed and the shard number, so a sharded build is reproducible
+    for the same size, shards and seed. The shard outcomes are yielded in shard order as they complete.
+
+    Each shard is built independently, so a unique or sequential column, such as a generated id, repeats its values
+    in every shard. Numeric key columns are offset by the number of rows in the shards before them, so a sequence
+    continues across the shards as it would in a single build. Any other column that must be unique across the
+    build, such as ids sampled at random, must be made shard safe in the builder, for example by building it from
+    a key column.
+    """
+
+    def __init__(self, size: int, shards: int, seed: int=None, max_workers: int=None, key_columns: [str, list]=None):
+        """ plans the shards of a synthetic build
+
+        :param size: the total size of the synthetic build
+        :param shards: the number of shards, limited to the size
+        :param seed: (optional) the base seed the shard seeds are derived from. Default 0
+        :param max_workers: (optional) the number of worker processes. Default the number of shards
+        :param key_columns: (optional) a numeric sequential column, or list of columns, offset by the shard row offset
+        """
+        if not isinstance(size, int) or size < 0:
+            raise ValueError(f"The synthetic size '{size}' must be a positive int")
+        if not isinstance(shards, int) or shards < 1:
+            raise ValueError(f"The number of shards '{shards}' must be a positive int")
+        self._size = size
+        self._shards = max(1, min(shards, size))
+        self._seed = seed if isinstance(seed, int) else 0
+        self._max_workers = max_workers if isinstance(max_workers, int) and max_workers > 0 else self._shards
+        self._key_columns = [key_columns] if isinstance(key_columns, str) else list(key_columns or [])
+
+    @property
+    def sizes(self) -> list:
+        """the size of each shard, differing by at most one"""
+        base, remainder = divmod(self._size, self._shards)
+        return [base + 1 if n < remainder else base for n in range(self._shards)]
+
+    @property
+    def offsets(self) -> list:
+        """the row offset of each shard, the number of rows in the shards before it"""
+        return [int(x) for x in np.cumsum([0] + self.sizes[:-1])]
+
+    @property
+    def seeds(self) -> list:
+        """the seed of each shard"""
+        return [int(np.random.SeedSequence([self._seed, n]).generate_state(1)[0]) for n in range(self._shards)]
+
+    def run(self, run_shard: Callable[[int, int], Any], executor: Executor=None) -> Iterator[Any]:
+        """ runs the shards in parallel, yielding each shard outcome in shard order with its key columns offset
+
+        :param run_shard: a picklable callable taking the shard size and shard seed and returning the outcome
+        :param executor: (optional) the executor to run on. Defaults to a process pool of max_workers
+        :return: an iterator of the shard outcomes
+        """
+        own_executor = not isinstance(executor, Executor)
+        executor = ProcessPoolExecutor(max_workers=self._max_workers) if own_executor else executor
+        futures = []
+        try:
+            futures = [executor.submit(run_shard, size, seed) for size, seed in zip(self.sizes, self.seeds)]
+            for future, offset in zip(futures, self.offsets):
+                yield self._offset_keys(future.result(), offset=offset)
+        finally:
+            for future in futures:
+                future.cancel()
+            if own_executor:
+                executor.shutdown(wait=True)
+        return
+
+    def _offset_keys(self, outcome: Any, offset: int) -> Any:
+        """offsets the numeric key columns of a shard outcome by the shard row offset"""
+        if offset == 0 or not isinstance(outcome, pd.DataFrame):
+            return outcome
+        for column in self._key_columns:
+            if column in outcome.columns and pd.api.types.is_numeric_dtype(outcome[column]):
+                outcome[column] = outcome[column] + offset
+        return outcome
+
+    @staticmethod
+    def set_seed(seed: int):
+        """seeds the global random generators of a shard worker"""
+        random.seed(seed)
+        np.random.seed(seed % 2 ** 32)
+        return
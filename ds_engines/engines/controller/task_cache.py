@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any
+import pandas as pd
+
+__author__ = 'Darryl Oatridge'
+
+
+class TaskResultCache(object):
+    """ A content addressed, local disk cache of controller task outcomes. An entry is keyed by a hash of the task
+    intent parameters, the task component contract and a fingerprint of the input canonical, so any change to
+    these misses the cache. Entries are evicted least recently used first once the cache is over its size.
+
+    Each entry is kept with its own metadata file, and the hits and misses of each process in their own file, so
+    the level worker processes sharing the cache directory record independently.
+    """
+
+    STATS_DIR = 'stats'
+    DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+
+    _stats_lock = threading.Lock()
+
+    def __init__(self, cache_path: str=None, max_size: int=None):
+        """ opens or creates a task result cache
+
+        :param cache_path: (optional) the local cache directory. Defaults to 'HADRON_CONTROLLER_CACHE_PATH' or a
+                        'hadron/controller_cache' directory in the system temp directory
+        :param max_size: (optional) the maximum size of the cache in bytes. Defaults to
+                        'HADRON_CONTROLLER_CACHE_SIZE' or 2GB
+        """
+        cache_path = cache_path if isinstance(cache_path, str) else os.environ.get('HADRON_CONTROLLER_CACHE_PATH')
+        if not isinstance(cache_path, str):
+            cache_path = os.path.join(tempfile.gettempdir(), 'hadron', 'controller_cache')
+        if not isinstance(max_size, int):
+            max_size = int(os.environ.get('HADRON_CONTROLLER_CACHE_SIZE', self.DEFAULT_MAX_SIZE))
+        self._cache_path = cache_path
+        self._max_size = max_size
+        os.makedirs(os.path.join(self._cache_path, self.STATS_DIR), exist_ok=True)
+
+    @property
+    def cache_path(self) -> str:
+        """the local cache directory"""
+        return self._cache_path
+
+    @property
+    def max_size(self) -> int:
+        """the maximum size of the cache in bytes"""
+        return self._max_size
+
+    @staticmethod
+    def fingerprint(canonical: Any) -> str:
+        """ returns a content fingerprint of a canonical. DataFrames are hashed by their values, index, columns and
+        dtypes, anything else by its pickled bytes"""
+        digest = hashlib.sha256()
+        if isinstance(canonical, pd.DataFrame):
+            digest.update(str(canonical.columns.to_list()).encode())
+            digest.update(str(canonical.dtypes.to_list()).encode())
+            try:
+                digest.update(pd.util.hash_pandas_object(canonical, index=True).values.tobytes())
+            except TypeError:
+                digest.update(pickle.dumps(canonical, protocol=pickle.HIGHEST_PROTOCOL))
+        elif canonical is not None:
+            digest.update(pickle.dumps(canonical, protocol=pickle.HIGHEST_PROTOCOL))
+        return digest.hexdigest()
+
+    @staticmethod
+    def contract_version(component: Any) -> str:
+        """returns a fingerprint of a component domain contract from its intent and connectors"""
+        contract = {'intent': component.pm.get_intent(), 'connectors': component.pm.report_connectors()}
+        return hashlib.sha256(json.dumps(contract, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def task_key(method: str, params: dict, contract_version: str, input_fingerprint: str) -> str:
+        """returns the cache key for a task"""
+        key = {'method': method, 'params': params, 'contract': contract_version, 'input': input_fingerprint}
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, key: str, task_name: str=None) -> Any:
+        """ returns the cached outcome for the key or None, recording a hit or miss against the task name"""
+        entry = self._load_json(self._meta_path(key))
+        canonical = None
+        if isinstance(entry, dict):
+            try:
+                with open(self._entry_path(key), 'rb') as f:
+                    canonical = pickle.load(f)
+            except FileNotFoundError:
+                # evicted by another process since the metadata was read
+                entry = None
+        self._count(task_name=task_name, hit=isinstance(entry, dict))
+        if not isinstance(entry, dict):
+            return None
+        self._write_json(self._meta_path(key), {**entry, 'accessed': datetime.now().isoformat()})
+        return canonical
+
+    def put(self, key: str, canonical: Any, task_name: str=None):
+        """ adds an outcome to the cache, evicting least recently used entries if the cache is over size"""
+        path = self._entry_path(key)
+        staging = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(staging, 'wb') as f:
+            pickle.dump(canonical, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(staging, path)
+        self._write_json(self._meta_path(key), {'task_name': str(task_name), 'size': os.path.getsize(path),
+                                                'accessed': datetime.now().isoformat()})
+        self._evict()
+        return
+
+    def clear(self):
+        """removes all entries and statistics from the cache"""
+        for key in self._entries().keys():
+            self._remove(key)
+        with self._stats_lock:
+            stats_path = os.path.join(self._cache_path, self.STATS_DIR)
+            for name in os.listdir(stats_path):
+                self._remove_file(os.path.join(stats_path, name))
+        return
+
+    def report(self) -> dict:
+        """returns a dictionary report of the hits, misses and cached bytes of each task"""
+        entries = list(self._entries().values())
+        stats = dict()
+        stats_path = os.path.join(self._cache_path, self.STATS_DIR)
+        for name in os.listdir(stats_path):
+            if not name.endswith('.json'):
+                continue
+            for task_name, counts in (self._load_json(os.path.join(stats_path, name)) or {}).items():
+                task_stats = stats.setdefault(task_name, {'hits': 0, 'misses': 0})
+                task_stats['hits'] += counts.get('hits', 0)
+                task_stats['misses'] += counts.get('misses', 0)
+        report = {'task_name': [], 'hits': [], 'misses': [], 'entries': [], 'bytes': []}
+        for task_name, task_stats in sorted(stats.items()):
+            task_entries = [e for e in entries if e.get('task_name') == task_name]
+            report['task_name'].append(task_name)
+            report['hits'].append(task_stats.get('hits', 0))
+            report['misses'].append(task_stats.get('misses', 0))
+            report['entries'].append(len(task_entries))
+            report['bytes'].append(sum(e.get('size', 0) for e in task_entries))
+        return report
+
+    def _entries(self) -> dict:
+        """returns the metadata of each entry by its key"""
+        entries = dict()
+        for name in os.listdir(self._cache_path):
+            if name.endswith('.json'):
+                entry = self._load_json(os.path.join(self._cache_path, name))
+                if isinstance(entry, dict):
+                    entries[name[:-len('.json')]] = entry
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(e.get('size', 0) for e in entries.values())
+        for key in sorted(entries.keys(), key=lambda k: entries[k].get('accessed', '')):
+            if total <= self._max_size:
+                break
+            total -= entries[key].get('size', 0)
+            self._remove(key)
+        return
+
+    def _remove(self, key: str):
+        """removes an entry, its metadata first so it is a miss once removal starts"""
+        self._remove_file(self._meta_path(key))
+        self._remove_file(self._entry_path(key))
+        return
+
+    def _count(self, task_name: str, hit: bool):
+        """counts a hit or miss in the statistics file of this process"""
+        path = os.path.join(self._cache_path, self.STATS_DIR, f"{os.getpid()}.json")
+        with self._stats_lock:
+            stats = self._load_json(path) or {}
+            task_stats = stats.setdefault(str(task_name), {'hits': 0, 'misses': 0})
+            task_stats['hits' if hit else 'misses'] += 1
+            self._write_json(path, stats)
+        return
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._cache_path, f"{key}.pickle")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self._cache_path, f"{key}.json")
+
+    @staticmethod
+    def _load_json(path: str) -> [dict, None]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path: str, content: dict):
+        staging = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(staging, 'w') as f:
+            json.dump(content, f)
+        os.replace(staging, path)
+        return
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
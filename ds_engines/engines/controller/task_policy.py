@@ -0,0 +1,155 @@
+import threading
+import time
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from typing import Any, Callable
+
+__author__ = 'Darryl Oatridge'
+
+
+class TaskPolicy(object):
+    """ How a controller task is run: a timeout on each attempt, the number of retries of a failed or timed out
+    attempt with an exponential backoff between them, and the seconds after which a straggling attempt is
+    speculatively run a second time, the first to succeed winning.
+
+    An attempt with a timeout or speculation runs on its own daemon thread. Python can not stop a thread, so an
+    attempt that times out, or loses to its speculative copy, is abandoned and its outcome discarded, though it
+    may still complete its writes. Retried and speculated tasks should therefore be idempotent.
+    """
+
+    PARAMETERS = ['timeout', 'retries', 'backoff', 'max_backoff', 'speculate_after']
+
+    def __init__(self, timeout: float=None, retries: int=None, backoff: float=None, max_backoff: float=None,
+                 speculate_after: float=None):
+        """ creates a task policy
+
+        :param timeout: (optional) the seconds an attempt can run before it is abandoned as timed out. Default none
+        :param retries: (optional) the times a failed or timed out task is retried. Default 0
+        :param backoff: (optional) the seconds before the first retry, doubling with each retry. Default 1
+        :param max_backoff: (optional) the most seconds between retries. Default 60
+        :param speculate_after: (optional) the seconds after which a running attempt is run a second time, the
+                        first to succeed winning. Default none
+        """
+        self._timeout = float(timeout) if isinstance(timeout, (int, float)) and timeout > 0 else None
+        self._retries = retries if isinstance(retries, int) and retries > 0 else 0
+        self._backoff = float(backoff) if isinstance(backoff, (int, float)) and backoff >= 0 else 1.0
+        self._max_backoff = float(max_backoff) if isinstance(max_backoff, (int, float)) and max_backoff >= 0 else 60.0
+        self._speculate_after = float(speculate_after) if isinstance(speculate_after, (int, float)) and \
+            speculate_after > 0 else None
+
+    @classmethod
+    def from_dict(cls, policy: [dict, None], default: 'TaskPolicy'=None) -> [Any, None]:
+        """ returns a task policy from a dictionary of its parameters, any not given taken from the default policy
+
+        :param policy: a dictionary of 'timeout', 'retries', 'backoff', 'max_backoff' and 'speculate_after'
+        :param default: (optional) the policy of the parameters not in the dictionary
+        :return: the task policy, or the default if the policy is not a dictionary
+        """
+        if not isinstance(policy, dict):
+            return default
+        unknown = set(policy.keys()).difference(cls.PARAMETERS)
+        if len(unknown) > 0:
+            raise ValueError(f"The task policy parameters {sorted(unknown)} are not in {cls.PARAMETERS}")
+        params = default.to_dict() if isinstance(default, TaskPolicy) else {}
+        params.update(policy)
+        return cls(**params)
+
+    def to_dict(self) -> dict:
+        """returns the policy parameters as a dictionary"""
+        return {'timeout': self._timeout, 'retries': self._retries, 'backoff': self._backoff,
+                'max_backoff': self._max_backoff, 'speculate_after': self._speculate_after}
+
+    @property
+    def timeout(self) -> [float, None]:
+        """the seconds an attempt can run before it is abandoned"""
+        return self._timeout
+
+    @property
+    def retries(self) -> int:
+        """the times a failed or timed out task is retried"""
+        return self._retries
+
+    @property
+    def speculate_after(self) -> [float, None]:
+        """the seconds after which a running attempt is run a second time"""
+        return self._speculate_after
+
+    @property
+    def is_active(self) -> bool:
+        """if the policy changes how a task is run"""
+        return self._timeout is not None or self._retries > 0 or self._speculate_after is not None
+
+    def retry_delay(self, retry: int) -> float:
+        """returns the seconds before the given retry, starting at 1"""
+        return min(self._backoff * (2 ** (max(retry, 1) - 1)), self._max_backoff)
+
+    def run(self, task: Callable[[], Any], info: dict=None) -> Any:
+        """ runs the task under the policy, retrying a failed or timed out attempt after the backoff. The exception
+        of the last attempt is raised once the retries are spent.
+
+        :param task: a callable taking no arguments, called once for each attempt
+        :param info: (optional) a dictionary the 'attempts' made, including speculative attempts, the 'speculated'
+                    attempts and the 'timeouts' are set in, whether the task succeeds or not
+        :return: the result of the first attempt to succeed
+        """
+        info = info if isinstance(info, dict) else {}
+        info.update({'attempts': 0, 'speculated': 0, 'timeouts': 0})
+        retry = 0
+        while True:
+            try:
+                if self._timeout is None and self._speculate_after is None:
+                    info['attempts'] += 1
+                    return task()
+                return self._attempt(task, info=info)
+            except Exception:
+                if retry >= self._retries:
+                    raise
+                retry += 1
+                time.sleep(self.retry_delay(retry))
+
+    def _attempt(self, task: Callable[[], Any], info: dict) -> Any:
+        """runs an attempt on a daemon thread, speculating it if it straggles and abandoning it if it times out"""
+        started = time.perf_counter()
+        running = [self._start(task, info)]
+        error = None
+        speculated = False
+        while len(running) > 0:
+            elapsed = time.perf_counter() - started
+            waits = []
+            if self._timeout is not None:
+                waits.append(self._timeout - elapsed)
+            can_speculate = self._speculate_after is not None and not speculated
+            if can_speculate:
+                waits.append(self._speculate_after - elapsed)
+            finished, _ = wait(running, timeout=max(min(waits), 0) if len(waits) > 0 else None,
+                               return_when=FIRST_COMPLETED)
+            for future in finished:
+                running.remove(future)
+                if future.exception() is None:
+                    return future.result()
+                error = error if error is not None else future.exception()
+            elapsed = time.perf_counter() - started
+            if len(running) > 0 and self._timeout is not None and elapsed >= self._timeout:
+                info['timeouts'] += 1
+                raise TimeoutError(f"The task did not complete within the timeout of {self._timeout} seconds")
+            if len(running) > 0 and can_speculate and elapsed >= self._speculate_after:
+                speculated = True
+                info['speculated'] += 1
+                running.append(self._start(task, info))
+        raise error
+
+    @staticmethod
+    def _start(task: Callable[[], Any], info: dict) -> Future:
+        """starts an attempt on a daemon thread, so an abandoned attempt does not hold the process open"""
+        future = Future()
+        info['attempts'] += 1
+
+        def run_attempt():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(task())
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run_attempt, name='controller_task', daemon=True).start()
+        return future
@@ -1,4 +1,6 @@
 from ds_engines import Controller
+from ds_engines.engines.controller.level_transport import LevelTransport
+from ds_engines.engines.controller.run_options import RunOptions
 import os
 import warnings
 
@@ -9,6 +11,16 @@ __author__ = 'Darryl Oatridge'
 
 
 def domain_controller():
+    # 'standalone' runs the run book, 'coordinator' distributes its levels to 'worker' containers
+    mode = os.environ.get('HADRON_CONTROLLER_MODE', 'standalone').lower()
+    transport = os.environ.get('HADRON_CONTROLLER_TRANSPORT', None)
+    if mode == 'worker':
+        if not isinstance(transport, str):
+            raise ValueError("A worker needs the 'HADRON_CONTROLLER_TRANSPORT' of its coordinator")
+        idle_timeout = os.environ.get('HADRON_CONTROLLER_IDLE_TIMEOUT', None)
+        Controller.run_worker(transport=LevelTransport.from_uri(transport),
+                              idle_timeout=float(idle_timeout) if isinstance(idle_timeout, str) else None)
+        return
     controller = Controller.from_env(default_save=False, has_contract=True)
     run_book = os.environ.get('HADRON_CONTROLLER_RUNBOOK', None)
     synthetic_size_map = dict([(k[23:].lower(), int(v))
@@ -18,7 +30,64 @@ def domain_controller():
     if isinstance(run_book, str) and controller.pm.has_run_book(run_book):
         intent_levels = controller.pm.get_run_book(run_book)
     synthetic_size_map = synthetic_size_map if isinstance(synthetic_size_map, dict) else None
-    controller.run_controller(intent_levels=intent_levels, synthetic_sizes=synthetic_size_map)
+    max_workers = int(os.environ.get('HADRON_CONTROLLER_MAX_WORKERS', 1))
+    report_policy = os.environ.get('HADRON_CONTROLLER_REPORT_POLICY', 'all')
+    chunk_size = int(os.environ.get('HADRON_CONTROLLER_CHUNK_SIZE', 0))
+    stream_tasks = [x.strip() for x in os.environ.get('HADRON_CONTROLLER_STREAM_TASKS', '').split(',') if x.strip()]
+    synthetic_shards = int(os.environ.get('HADRON_CONTROLLER_SYNTHETIC_SHARDS', 1))
+    synthetic_seed = os.environ.get('HADRON_CONTROLLER_SYNTHETIC_SEED', None)
+    synthetic_seed = int(synthetic_seed) if isinstance(synthetic_seed, str) else None
+    synthetic_key_columns = [x.strip() for x in os.environ.get('HADRON_CONTROLLER_SYNTHETIC_KEY_COLUMNS', '').split(',')
+                             if x.strip()]
+    run_history = os.environ.get('HADRON_CONTROLLER_RUN_HISTORY', None)
+    resume = str(os.environ.get('HADRON_CONTROLLER_RESUME', 'false')).lower() in ['true', '1']
+    # incremental tasks as 'task' or 'task:column' to mark the task source by a monotonic column
+    incremental_tasks = dict()
+    for task in os.environ.get('HADRON_CONTROLLER_INCREMENTAL_TASKS', '').split(','):
+        if task.strip():
+            name, _, column = task.strip().partition(':')
+            incremental_tasks[name.strip()] = column.strip() if column.strip() else None
+    # resource aware placement with the pool sizes, a memory budget in bytes and resource classes as
+    # 'level_or_task:cpu' or 'level_or_task:io:memory'
+    options = dict()
+    for key in ['cpu_workers', 'io_workers', 'memory_budget']:
+        value = os.environ.get(f'HADRON_CONTROLLER_{key.upper()}', None)
+        if isinstance(value, str) and value.strip():
+            options[key] = int(value)
+    resource_classes = dict()
+    for declared in os.environ.get('HADRON_CONTROLLER_RESOURCE_CLASSES', '').split(','):
+        if declared.strip():
+            name, _, resource = declared.strip().partition(':')
+            resource, _, memory = resource.partition(':')
+            resource_classes[name.strip()] = {'resource': resource.strip().lower()}
+            if memory.strip():
+                resource_classes[name.strip()]['memory'] = int(memory)
+    if len(resource_classes) > 0:
+        options['resource_classes'] = resource_classes
+    # the timeout, retries and speculation of every task
+    task_policy = dict()
+    for key, name in [('timeout', 'TASK_TIMEOUT'), ('retries', 'TASK_RETRIES'), ('backoff', 'RETRY_BACKOFF'),
+                      ('speculate_after', 'SPECULATE_AFTER')]:
+        value = os.environ.get(f'HADRON_CONTROLLER_{name}', None)
+        if isinstance(value, str) and value.strip():
+            task_policy[key] = int(value) if key == 'retries' else float(value)
+    if len(task_policy) > 0:
+        options['task_policy'] = task_policy
+    distributed = {}
+    if mode == 'coordinator':
+        if not isinstance(transport, str):
+            raise ValueError("A coordinator needs a 'HADRON_CONTROLLER_TRANSPORT' for its workers")
+        distributed = {'transport': LevelTransport.from_uri(transport, coordinator=True),
+                       'max_retries': int(os.environ.get('HADRON_CONTROLLER_MAX_RETRIES', 2)),
+                       'lease_timeout': int(os.environ.get('HADRON_CONTROLLER_LEASE_TIMEOUT', 60))}
+    run_options = RunOptions(max_workers=max_workers, report_policy=report_policy, chunk_size=chunk_size,
+                             stream_tasks=stream_tasks, synthetic_shards=synthetic_shards,
+                             synthetic_seed=synthetic_seed, synthetic_key_columns=synthetic_key_columns,
+                             run_history=run_history,
+                             incremental_tasks=incremental_tasks if len(incremental_tasks) > 0 else None,
+                             resume=resume, **options, **distributed)
+    controller.run_controller(intent_levels=intent_levels, synthetic_sizes=synthetic_size_map,
+                              run_options=run_options)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,9 @@
 import importlib.util
 from abc import ABC, abstractmethod
+from collections import deque
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable
+from ds_engines.engines.event_books.event_book_subscription import EventBookSubscription, EventChangeRecord
 
 __author__ = 'Darryl Oatridge'
 
@@ -65,11 +67,16 @@ class EventBookContract(object):
 
 class AbstractEventBook(ABC):
 
+    CHANGE_LOG_SIZE = 1000
+
     @abstractmethod
     def __init__(self, book_name: str):
         """instantiates a book event"""
         self._book_name = book_name
         self._modified_flag = False
+        self._version = 0
+        self._change_log = deque(maxlen=self.CHANGE_LOG_SIZE)
+        self._subscriptions = list()
 
     @property
     def book_name(self) -> str:
@@ -89,6 +96,95 @@ class AbstractEventBook(ABC):
         """ sets the modified flag"""
         self._modified_flag = flag if isinstance(flag, bool) else False
 
+    @property
+    def version(self) -> int:
+        """A monotonically increasing version that is raised with every change to the book state"""
+        return self._version
+
+    def changes_since(self, version: int) -> [tuple, None]:
+        """ returns a tuple of the index keys and the columns changed since the given version. If every row of a
+        column changed the index keys are None. If the changes can not be resolved from the change log, for example
+        the book was reset or the log has moved on, None is returned and the full state should be reloaded.
+
+        :param version: the version the caller last saw
+        :return: tuple of (index keys, columns) or None
+        """
+        if not isinstance(version, int) or version < 0:
+            return None
+        if version >= self._version:
+            return [], []
+        if len(self._change_log) == 0 or self._change_log[0][0] > version + 1:
+            return None
+        index = dict()
+        columns = dict()
+        all_rows = False
+        for _version, _action, _index, _columns in self._change_log:
+            if _version <= version:
+                continue
+            if _columns is None:
+                return None
+            columns.update(dict.fromkeys(_columns))
+            if _index is None:
+                all_rows = True
+            elif not all_rows:
+                index.update(dict.fromkeys(_index))
+        return None if all_rows else list(index.keys()), list(columns.keys())
+
+    @property
+    def has_subscribers(self) -> bool:
+        """if there are active subscriptions to the change records of the book"""
+        return len(self._subscriptions) > 0
+
+    def subscribe(self, callback: Callable[[EventChangeRecord], Any]=None, max_records: int=None,
+                  resync: Callable[[int], Any]=None) -> EventBookSubscription:
+        """ subscribes to the change records of the book. The records are held in a bounded queue and, with a
+        callback, pushed to the callback from a worker thread, otherwise pulled with the subscription `poll()`
+
+        :param callback: (optional) a callable passed each EventChangeRecord
+        :param max_records: (optional) the maximum number of records held waiting for the consumer
+        :param resync: (optional) with a callback, a callable passed the number of records dropped before the next
+                    record is pushed
+        :return: the subscription
+        """
+        subscription = EventBookSubscription(book_name=self._book_name, callback=callback, max_records=max_records,
+                                             resync=resync)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventBookSubscription):
+        """closes and removes a subscription to the change records of the book"""
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+        subscription.close()
+        return
+
+    def _restore_version(self, version: [int, None]):
+        """ sets the version so the next recorded change has the given version, unless the book has already
+        passed it, as the version can only increase"""
+        if isinstance(version, int) and version > self._version:
+            self._version = version - 1
+        return
+
+    def _record_change(self, action: str, index: Any=None, columns: Any=None, values: Any=None):
+        """ raises the version and modified flag, logging the index keys and columns touched by the change and
+        publishing a change record to any subscriptions.
+
+        :param action: the name of the action that made the change
+        :param index: (optional) the index keys changed. None if every row changed
+        :param columns: (optional) the columns changed. None if the whole state changed, e.g. a reset
+        :param values: (optional) the new values of the changed cells, only needed if there are subscribers
+        """
+        self._version += 1
+        index = None if index is None else list(index)
+        columns = None if columns is None else list(columns)
+        self._change_log.append((self._version, action, index, columns))
+        self._set_modified(True)
+        if self.has_subscribers:
+            record = EventChangeRecord(book_name=self._book_name, version=self._version, action=action, index=index,
+                                       columns=columns, values=values)
+            for subscription in list(self._subscriptions):
+                subscription.publish(record)
+
     @abstractmethod
     def current_state(self, fillna: bool=None) -> (datetime, Any):
         """returns a tuple of datetime and the current book state"""
@@ -109,6 +205,26 @@ class AbstractEventBook(ABC):
     def reset_state(self):
         """resets the event book to its starting state"""
 
+    def snapshot_state(self) -> Any:
+        """returns a snapshot of the current state that later events do not change. Defaults to the current state"""
+        return self.current_state()
+
+    def read_state(self, reader: Callable[[Any], Any]) -> Any:
+        """calls the reader with the current state, which it must only read and not keep, returning its result"""
+        return reader(self.current_state())
+
+    def restore_state(self, state: Any, version: int=None):
+        """ replaces the current state with a state taken by snapshot_state. Defaults to resetting the book and adding
+        the state as an event
+
+        :param state: the state to restore
+        :param version: (optional) the version the state was taken at, that the book version is restored to
+        """
+        self.reset_state()
+        self._restore_version(version)
+        self.add_event(event=state)
+        return
+
 
 class EventBookFactory(object):
 
@@ -0,0 +1,154 @@
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any
+from ds_engines.engines.event_books.abstract_event_book import AbstractEventBook
+
+__author__ = 'Darryl Oatridge'
+
+
+class AsyncEventBook(object):
+    """ An asyncio wrapper around an event book instance. Calls are offloaded to an executor so the event loop is
+    never blocked by the pandas work or the connector I/O of a persist. Calls on the same book are serialised with a
+    lock as the book state is not thread safe, and concurrent checkpoints with the same arguments share the one
+    in-flight save.
+    """
+
+    __default_executor: Executor = None
+    __executor_lock = threading.Lock()
+
+    def __init__(self, event_book: AbstractEventBook, executor: Executor=None):
+        """ wraps an event book for use within an asyncio event loop
+
+        :param event_book: the event book instance to wrap
+        :param executor: (optional) the executor to offload to. Defaults to a shared thread pool
+        """
+        if not isinstance(event_book, AbstractEventBook):
+            raise TypeError(f"The event book must be an instance of AbstractEventBook")
+        self._event_book = event_book
+        self._executor = executor if isinstance(executor, Executor) else self.default_executor()
+        self._book_lock = threading.RLock()
+        self._checkpoint_lock = threading.Lock()
+        self._checkpoint: [Future, None] = None
+        self._checkpoint_args: [tuple, None] = None
+
+    @classmethod
+    def default_executor(cls) -> Executor:
+        """the shared thread pool executor. Threads rather than processes as the book state lives in this process"""
+        with cls.__executor_lock:
+            if cls.__default_executor is None:
+                cls.__default_executor = ThreadPoolExecutor(thread_name_prefix='event_book')
+        return cls.__default_executor
+
+    @property
+    def event_book(self) -> AbstractEventBook:
+        """the wrapped event book instance"""
+        return self._event_book
+
+    @property
+    def executor(self) -> Executor:
+        """the executor calls are offloaded to"""
+        return self._executor
+
+    @property
+    def book_name(self) -> str:
+        """the book name of the wrapped event book"""
+        return self._event_book.book_name
+
+    async def add_event(self, event: Any, **kwargs) -> datetime:
+        """add an event to the event book, replacing anything in the event cells"""
+        return await self._run(self._event_book.add_event, event=event, **kwargs)
+
+    async def increment_event(self, event: Any) -> datetime:
+        """add an event to the event book, incrementing the values in the event cells"""
+        return await self._run(self._event_book.increment_event, event=event)
+
+    async def decrement_event(self, event: Any) -> datetime:
+        """add an event to the event book, decrementing the values in the event cells"""
+        return await self._run(self._event_book.decrement_event, event=event)
+
+    async def current_state(self, fillna: bool=None) -> Any:
+        """returns the current state of the event book"""
+        return await self._run(self._event_book.current_state, fillna=fillna)
+
+    async def reset_state(self):
+        """resets the event book to its starting state"""
+        return await self._run(self._event_book.reset_state)
+
+    async def save_state(self, with_reset: bool=None, fillna: bool=None, **kwargs):
+        """ saves the current state and optionally resets the event book. If a checkpoint with the same arguments is
+        already in flight the caller awaits that checkpoint rather than starting another, otherwise the save is
+        queued to run once the in-flight checkpoint completes.
+        """
+        args = (with_reset, fillna, kwargs)
+        with self._checkpoint_lock:
+            previous = self._checkpoint
+            if previous is None or previous.done() or not self._same_args(self._checkpoint_args, args):
+                checkpoint = Future()
+                # running, so one caller cancelling its await does not cancel the checkpoint shared with others
+                checkpoint.set_running_or_notify_cancel()
+                save = functools.partial(self._submit_save, checkpoint, with_reset=with_reset, fillna=fillna,
+                                         **kwargs)
+                self._checkpoint = checkpoint
+                self._checkpoint_args = args
+                if isinstance(previous, Future):
+                    # chained rather than waited on, so a queued save does not hold a worker of the executor
+                    previous.add_done_callback(lambda _: save())
+                else:
+                    save()
+            checkpoint = self._checkpoint
+        return await asyncio.wrap_future(checkpoint)
+
+    def _submit_save(self, checkpoint: Future, **kwargs):
+        """submits the save to the executor, setting its outcome on the checkpoint"""
+        try:
+            future = self._executor.submit(self._locked, self._event_book.save_state, **kwargs)
+        except Exception as e:
+            checkpoint.set_exception(e)
+            return
+        future.add_done_callback(functools.partial(self._set_outcome, checkpoint))
+        return
+
+    @staticmethod
+    def _set_outcome(checkpoint: Future, future: Future):
+        """sets the outcome of a finished save on the checkpoint"""
+        if future.cancelled():
+            checkpoint.set_exception(RuntimeError("The event book save was cancelled"))
+        elif future.exception() is not None:
+            checkpoint.set_exception(future.exception())
+        else:
+            checkpoint.set_result(future.result())
+        return
+
+    @staticmethod
+    def _same_args(args: [tuple, None], other: tuple) -> bool:
+        """if two sets of save arguments are the same"""
+        try:
+            return args is not None and bool(args == other)
+        except (TypeError, ValueError):
+            return False
+
+    async def recover_state(self, **kwargs):
+        """recovers the state from last persisted and applies any events from the event log"""
+        return await self._run(self._event_book.recover_state, **kwargs)
+
+    @contextmanager
+    def quiesce(self):
+        """a context manager holding the book lock, so no other call on the book runs within the context"""
+        with self._book_lock:
+            yield self._event_book
+
+    def call(self, func, *args, **kwargs) -> Any:
+        """runs a call on the event book in this thread, serialised with the other calls on the book"""
+        return self._locked(func, *args, **kwargs)
+
+    async def _run(self, func, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._locked, func, *args, **kwargs))
+
+    def _locked(self, func, *args, **kwargs) -> Any:
+        with self._book_lock:
+            return func(*args, **kwargs)
@@ -0,0 +1,188 @@
+import functools
+from typing import Any, Callable
+import pandas as pd
+
+__author__ = 'Darryl Oatridge'
+
+
+class BookQuery(object):
+    """ A query across event books, run as a vectorised pandas plan against the book state in place. Each book is
+    scanned once: its predicates are evaluated on the predicate columns alone and only the matching rows of the
+    projected columns are taken from the book, so a query copies what it returns rather than the whole book. The
+    scans are then joined, and optionally grouped and aggregated.
+
+    Predicates are a list of (column, operator, value) tuples that must all hold, where the operator is one of
+    '==', '!=', '>', '>=', '<', '<=', 'in', 'not in', 'isna' or 'notna'. For example:
+
+        query = BookQuery('orders', columns=['customer', 'amount'], where=[('amount', '>', 100)])
+        query.join('customers', on='customer', columns=['region']).group_by('region', aggregate={'amount': 'sum'})
+        portfolio.query(query)
+
+    A book joined without 'on' is joined on the book index, the key the book events align to. A join on columns
+    keeps the index of the left of the join, so index and column joins can be mixed in a query.
+    """
+
+    OPERATORS = ['==', '!=', '>', '>=', '<', '<=', 'in', 'not in', 'isna', 'notna']
+    # the reserved column the book index is kept in through a join on columns
+    INDEX_KEY = '__book_index__'
+
+    def __init__(self, book_name: str, columns: [str, list]=None, where: list=None):
+        """ starts a query from an event book
+
+        :param book_name: the name of the event book
+        :param columns: (optional) a column or list of columns to project the book to. Default all columns
+        :param where: (optional) a list of (column, operator, value) predicates the book rows must all meet
+        """
+        self._scans = [self._scan(book_name=book_name, columns=columns, where=where)]
+        self._joins = list()
+        self._group_by = None
+        self._aggregate = None
+
+    @property
+    def book_names(self) -> list:
+        """the names of the event books the query reads"""
+        return [scan['book_name'] for scan in self._scans]
+
+    def join(self, book_name: str, on: [str, list]=None, columns: [str, list]=None, where: list=None,
+             how: str=None):
+        """ joins another event book to the query
+
+        :param book_name: the name of the event book to join
+        :param on: (optional) a column or list of columns in both books to join on. Default the book index
+        :param columns: (optional) a column or list of columns to project the book to. Default all columns
+        :param where: (optional) a list of (column, operator, value) predicates the book rows must all meet
+        :param how: (optional) 'inner', 'left', 'right' or 'outer'. Default 'inner'
+        :return: the query
+        """
+        how = how if isinstance(how, str) else 'inner'
+        if how not in ['inner', 'left', 'right', 'outer']:
+            raise ValueError(f"The join '{how}' must be one of 'inner', 'left', 'right' or 'outer'")
+        on = [on] if isinstance(on, str) else on
+        self._scans.append(self._scan(book_name=book_name, columns=columns, where=where, keys=on))
+        self._joins.append({'on': on, 'how': how})
+        return self
+
+    def group_by(self, by: [str, list], aggregate: dict):
+        """ groups the joined rows and aggregates them
+
+        :param by: a column or list of columns to group by
+        :param aggregate: a dictionary of column to a pandas aggregation, or list of aggregations, such as 'sum'
+        :return: the query
+        """
+        if not isinstance(aggregate, dict) or len(aggregate) == 0:
+            raise ValueError(f"The group by aggregate must be a dictionary of column to aggregation")
+        self._group_by = [by] if isinstance(by, str) else list(by)
+        self._aggregate = aggregate
+        return self
+
+    def execute(self, read_state: Callable[[str, Callable[[pd.DataFrame], Any]], Any]) -> pd.DataFrame:
+        """ runs the query
+
+        :param read_state: a callable taking a book name and a scan, that returns the scan of the book state. The
+                    scan only reads the state, and the caller holds the book while it runs
+        :return: the query result
+        """
+        needed = self._needed_columns()
+        frames = list()
+        for n, scan in enumerate(self._scans):
+            reader = functools.partial(self._run_scan, scan=scan, columns=needed[n])
+            frames.append(read_state(scan['book_name'], reader))
+        result = frames[0]
+        for n, join in enumerate(self._joins):
+            right = frames[n + 1]
+            suffixes = ('', f"_{self._scans[n + 1]['book_name']}")
+            if isinstance(join['on'], list):
+                # a merge on columns drops the index, so the left index is kept as a column through the merge
+                index_name = result.index.name
+                result = result.rename_axis(self.INDEX_KEY).reset_index()
+                result = result.merge(right, how=join['how'], on=join['on'], suffixes=suffixes)
+                result = result.set_index(self.INDEX_KEY).rename_axis(index_name)
+            else:
+                result = result.merge(right, how=join['how'], left_index=True, right_index=True, suffixes=suffixes)
+        if isinstance(self._group_by, list):
+            result = result.groupby(self._group_by).agg(self._aggregate)
+        return result
+
+    @classmethod
+    def _scan(cls, book_name: str, columns: [str, list]=None, where: list=None, keys: list=None) -> dict:
+        """validates and returns a book scan"""
+        if not isinstance(book_name, str) or len(book_name) == 0:
+            raise ValueError(f"The book name must be a valid string")
+        where = where if isinstance(where, list) else []
+        for predicate in where:
+            if not isinstance(predicate, (tuple, list)) or len(predicate) not in [2, 3] or \
+                    predicate[1] not in cls.OPERATORS:
+                raise ValueError(f"The predicate {predicate} must be a (column, operator, value) tuple with an "
+                                 f"operator in {cls.OPERATORS}")
+        columns = [columns] if isinstance(columns, str) else columns
+        return {'book_name': book_name, 'columns': columns, 'where': where, 'keys': keys}
+
+    def _needed_columns(self) -> list:
+        """ returns the columns to take from each book, its projection with any join keys, or None for all columns.
+        A group by column not projected by any book is taken from the first book"""
+        needed = list()
+        for scan in self._scans:
+            if not isinstance(scan['columns'], list):
+                needed.append(None)
+                continue
+            columns = list(scan['columns'])
+            for key in scan['keys'] or []:
+                if key not in columns:
+                    columns.append(key)
+            needed.append(columns)
+        # a group by column is only taken from the book that projects it, so it is not suffixed in the join
+        for key in self._group_by or []:
+            projected = any(columns is None or key in columns for columns in needed)
+            if not projected:
+                needed[0].append(key)
+        # a join key must be taken from the left of the join as well
+        for n, join in enumerate(self._joins):
+            for key in join['on'] or []:
+                for columns in needed[:n + 1]:
+                    if isinstance(columns, list) and key not in columns:
+                        columns.append(key)
+        return needed
+
+    @classmethod
+    def _run_scan(cls, state: pd.DataFrame, scan: dict, columns: [list, None]) -> pd.DataFrame:
+        """ evaluates the predicates on the book state and takes the matching rows of the projected columns. Only
+        the selection is copied from the state"""
+        mask = None
+        for predicate in scan['where']:
+            column, operator = predicate[0], predicate[1]
+            value = predicate[2] if len(predicate) > 2 else None
+            if column not in state.columns:
+                raise ValueError(f"The predicate column '{column}' is not in the book '{scan['book_name']}'")
+            condition = cls._evaluate(state[column], operator=operator, value=value)
+            mask = condition if mask is None else mask & condition
+        if isinstance(columns, list):
+            columns = [c for c in columns if c in state.columns]
+        else:
+            columns = list(state.columns)
+        if mask is None:
+            # a projection can be a view on the state so is copied before the book is released
+            return state.loc[:, columns].copy()
+        return state.loc[mask.fillna(False).to_numpy(dtype=bool), columns]
+
+    @staticmethod
+    def _evaluate(values: pd.Series, operator: str, value: Any) -> pd.Series:
+        """returns the boolean mask of a predicate on a column"""
+        if operator == '==':
+            return values == value
+        if operator == '!=':
+            return values != value
+        if operator == '>':
+            return values > value
+        if operator == '>=':
+            return values >= value
+        if operator == '<':
+            return values < value
+        if operator == '<=':
+            return values <= value
+        if operator == 'in':
+            return values.isin(list(value))
+        if operator == 'not in':
+            return ~values.isin(list(value))
+        if operator == 'isna':
+            return values.isna()
+        return values.notna()
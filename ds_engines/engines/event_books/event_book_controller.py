@@ -1,7 +1,10 @@
 import pandas as pd
-from typing import Dict
+from typing import Any, Callable, Dict
 from aistac.properties.decorator_patterns import singleton
 from ds_engines.engines.event_books.pandas_event_book import PandasEventBook
+from ds_engines.engines.event_books.async_event_book import AsyncEventBook
+from ds_engines.engines.event_books.book_query import BookQuery
+from ds_engines.engines.event_books.event_book_subscription import EventBookSubscription, EventChangeRecord
 
 __author__ = 'Darryl Oatridge'
 
@@ -9,6 +12,7 @@ __author__ = 'Darryl Oatridge'
 class EventBookController(object):
 
     __book_catalog: Dict[str, PandasEventBook] = dict()
+    __async_catalog: Dict[str, AsyncEventBook] = dict()
 
     @singleton
     def __new__(cls):
@@ -39,6 +43,7 @@ class EventBookController(object):
     def remove_event_books(self, book_name: str) -> bool:
         """removes the event book"""
         book = self.__book_catalog.pop(book_name, None)
+        self.__async_catalog.pop(book_name, None)
         return True if book else False
 
     def current_state(self, book_name: str, fillna: bool=None) -> [pd.DataFrame, pd.Series]:
@@ -46,6 +51,37 @@ class EventBookController(object):
             return self.__book_catalog.get(book_name).current_state(fillna=fillna)
         raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
 
+    def delta_state(self, book_name: str, since_version: int, fillna: bool=None) -> pd.DataFrame:
+        """returns the rows and columns that changed since the given version, or the full state if unresolved"""
+        if self.is_event_book(book_name=book_name):
+            return self.__book_catalog.get(book_name).delta_state(since_version=since_version, fillna=fillna)
+        raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
+
+    def query(self, query: BookQuery) -> pd.DataFrame:
+        """ runs a query across the event books in the catalog, reading the book states in place so only the rows
+        and columns the query selects are copied, see BookQuery
+
+        :param query: the book query
+        :return: the query result
+        """
+        if not isinstance(query, BookQuery):
+            raise ValueError(f"The query must be a BookQuery, not {type(query).__name__}")
+        for book_name in query.book_names:
+            if not self.is_event_book(book_name=book_name):
+                raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
+
+        def read_state(book_name: str, reader: Callable[[pd.DataFrame], Any]) -> Any:
+            async_book = self.get_async_book(book_name=book_name)
+            return async_book.call(async_book.event_book.read_state, reader)
+
+        return query.execute(read_state=read_state)
+
+    def get_version(self, book_name: str) -> int:
+        """The monotonically increasing version of the book, raised with every change to the book state"""
+        if self.is_event_book(book_name=book_name):
+            return self.__book_catalog.get(book_name).version
+        raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
+
     def get_modified(self, book_name: str) -> bool:
         """A boolean flag that is raised when a modifier method is called"""
         if self.is_event_book(book_name=book_name):
@@ -59,18 +95,87 @@ class EventBookController(object):
             return self.__book_catalog.get(book_name).set_modified(modified=modified)
         raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
 
+    def subscribe(self, book_name: str, callback: Callable[[EventChangeRecord], Any]=None, max_records: int=None,
+                  resync: Callable[[int], Any]=None) -> EventBookSubscription:
+        """ subscribes to the change records of a book, see AbstractEventBook.subscribe()
+
+        :param book_name: the name of the event book
+        :param callback: (optional) a callable passed each EventChangeRecord from the subscription worker
+        :param max_records: (optional) the maximum number of records held waiting for the consumer
+        :param resync: (optional) with a callback, a callable passed the number of records dropped before the next
+                    record is pushed
+        :return: the subscription
+        """
+        if self.is_event_book(book_name=book_name):
+            return self.__book_catalog.get(book_name).subscribe(callback=callback, max_records=max_records,
+                                                                resync=resync)
+        raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
+
+    def unsubscribe(self, book_name: str, subscription: EventBookSubscription):
+        """closes and removes a subscription to the change records of a book"""
+        if self.is_event_book(book_name=book_name):
+            return self.__book_catalog.get(book_name).unsubscribe(subscription=subscription)
+        subscription.close()
+        return
+
     def add_event(self, book_name: str, event: [pd.DataFrame, pd.Series], fix_index: bool=False):
         if self.is_event_book(book_name=book_name):
             fix_index = fix_index if isinstance(fix_index, bool) else False
-            return self.__book_catalog.get(book_name).add_event(event=event, fix_index=fix_index)
+            async_book = self.get_async_book(book_name=book_name)
+            return async_book.call(async_book.event_book.add_event, event=event, fix_index=fix_index)
         raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
 
     def increment_event(self, book_name: str, event: [pd.DataFrame, pd.Series]):
         if self.is_event_book(book_name=book_name):
-            return self.__book_catalog.get(book_name).increment_event(event=event)
+            async_book = self.get_async_book(book_name=book_name)
+            return async_book.call(async_book.event_book.increment_event, event=event)
         raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
 
     def decrement_event(self, book_name: str, event: [pd.DataFrame, pd.Series]):
         if self.is_event_book(book_name=book_name):
-            return self.__book_catalog.get(book_name).decrement_event(event=event)
+            async_book = self.get_async_book(book_name=book_name)
+            return async_book.call(async_book.event_book.decrement_event, event=event)
+        raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
+
+    def save_state(self, book_name: str, with_reset: bool=None, fillna: bool=None, **kwargs):
+        """saves the current state of the book and optionally resets the event book"""
+        if self.is_event_book(book_name=book_name):
+            return self.__book_catalog.get(book_name).save_state(with_reset=with_reset, fillna=fillna, **kwargs)
         raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
+
+    def recover_state(self, book_name: str):
+        """recovers the book state from last persisted and applies any events from the event log"""
+        if self.is_event_book(book_name=book_name):
+            return self.__book_catalog.get(book_name).recover_state()
+        raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
+
+    def get_async_book(self, book_name: str) -> AsyncEventBook:
+        """Returns the asyncio wrapper for the given book name"""
+        if not self.is_event_book(book_name=book_name):
+            raise ValueError(f"The book name '{book_name}' can not be found in the catalog")
+        book = self.__book_catalog.get(book_name)
+        async_book = self.__async_catalog.get(book_name)
+        if async_book is None or async_book.event_book is not book:
+            async_book = AsyncEventBook(event_book=book)
+            self.__async_catalog.update({book_name: async_book})
+        return async_book
+
+    async def async_current_state(self, book_name: str, fillna: bool=None) -> [pd.DataFrame, pd.Series]:
+        return await self.get_async_book(book_name=book_name).current_state(fillna=fillna)
+
+    async def async_add_event(self, book_name: str, event: [pd.DataFrame, pd.Series], fix_index: bool=False):
+        fix_index = fix_index if isinstance(fix_index, bool) else False
+        return await self.get_async_book(book_name=book_name).add_event(event=event, fix_index=fix_index)
+
+    async def async_increment_event(self, book_name: str, event: [pd.DataFrame, pd.Series]):
+        return await self.get_async_book(book_name=book_name).increment_event(event=event)
+
+    async def async_decrement_event(self, book_name: str, event: [pd.DataFrame, pd.Series]):
+        return await self.get_async_book(book_name=book_name).decrement_event(event=event)
+
+    async def async_save_state(self, book_name: str, with_reset: bool=None, fillna: bool=None, **kwargs):
+        return await self.get_async_book(book_name=book_name).save_state(with_reset=with_reset, fillna=fillna,
+                                                                           **kwargs)
+
+    async def async_recover_state(self, book_name: str):
+        return await self.get_async_book(book_name=book_name).recover_state()
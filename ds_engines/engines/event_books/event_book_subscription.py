@@ -0,0 +1,189 @@
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable
+
+__author__ = 'Darryl Oatridge'
+
+
+class EventChangeRecord(object):
+    """A container class for a single change applied to an event book"""
+
+    __slots__ = ['book_name', 'version', 'action', 'index', 'columns', 'values', 'changed']
+
+    def __init__(self, book_name: str, version: int, action: str, index: list=None, columns: list=None,
+                 values: Any=None):
+        """ A change record. If index is None every row of the columns changed. If columns is None the whole book
+        changed, for example a reset or recover, and the consumer should resync from the current state.
+
+        :param book_name: the name of the event book the change was applied to
+        :param version: the book version after the change
+        :param action: the action that made the change, e.g. 'add', 'increment', 'decrement', 'reset', 'recover'
+        :param index: (optional) the index keys changed
+        :param columns: (optional) the columns changed
+        :param values: (optional) the new values of the changed cells
+        """
+        self.book_name = book_name
+        self.version = version
+        self.action = action
+        self.index = index
+        self.columns = columns
+        self.values = values
+        self.changed = datetime.now()
+
+    def to_dict(self) -> dict:
+        """Returns a dictionary representation of the change record"""
+        return {'book_name': self.book_name, 'version': self.version, 'action': self.action, 'index': self.index,
+                'columns': self.columns, 'values': self.values, 'changed': self.changed}
+
+    def __str__(self):
+        return str(self.to_dict())
+
+    def __repr__(self):
+        return "<{} book_name={}, version={}, action={}>".format(self.__class__.__name__, self.book_name,
+                                                                 self.version, self.action)
+
+
+class EventChangeBatch(list):
+    """ A batch of change records pulled from a subscription, in the order they were applied. The `dropped` count is
+    the number of records dropped before this batch because the consumer fell behind, at which point the consumer
+    should resync from the current state."""
+
+    def __init__(self, records: list=None, dropped: int=None):
+        super().__init__(records if isinstance(records, list) else [])
+        self.dropped = dropped if isinstance(dropped, int) else 0
+
+
+class EventBookSubscription(object):
+    """ A subscription to the change records of an event book. The records are held in a bounded queue, so the
+    writer of the event book never waits on a consumer. With a callback the records are pushed to the callback from
+    a worker thread of the subscription, otherwise they are pulled with `poll()`. If a consumer falls behind, the
+    oldest records are dropped and counted, at which point the consumer should resync from the current state. The
+    count is reported with the next polled batch or, to a callback consumer, passed to the resync callable before
+    the next record is pushed.
+    """
+
+    DEFAULT_MAX_RECORDS = 10000
+
+    def __init__(self, book_name: str, callback: Callable[[EventChangeRecord], Any]=None, max_records: int=None,
+                 resync: Callable[[int], Any]=None):
+        """ subscribes to an event book change stream
+
+        :param book_name: the name of the event book subscribed to
+        :param callback: (optional) a callable passed each change record, in order, from a worker thread
+        :param max_records: (optional) the maximum number of records held waiting for the consumer
+        :param resync: (optional) with a callback, a callable passed the number of records dropped, from the worker
+                    thread before the next record is pushed, at which point the consumer should resync
+        """
+        self._book_name = book_name
+        self._callback = callback if callable(callback) else None
+        self._resync = resync if callable(resync) else None
+        self._max_records = max_records if isinstance(max_records, int) and max_records > 0 \
+            else self.DEFAULT_MAX_RECORDS
+        self._queue = deque()
+        self._dropped = 0
+        self._last_error = None
+        self._active = True
+        self._in_callback = False
+        self._lock = threading.Condition()
+        self._worker = None
+        if self._callback is not None:
+            self._worker = threading.Thread(target=self._push_worker, name=f"subscription_{book_name}", daemon=True)
+            self._worker.start()
+
+    @property
+    def book_name(self) -> str:
+        """the name of the event book subscribed to"""
+        return self._book_name
+
+    @property
+    def active(self) -> bool:
+        """if the subscription is still receiving records"""
+        return self._active
+
+    @property
+    def dropped(self) -> int:
+        """ the number of records dropped because the consumer fell behind, not yet reported with a polled batch
+        or to the resync callable"""
+        return self._dropped
+
+    @property
+    def last_error(self) -> [Exception, None]:
+        """the last exception raised by the push callback, if any"""
+        return self._last_error
+
+    def pending(self) -> int:
+        """the number of records waiting for the consumer"""
+        return len(self._queue)
+
+    def publish(self, record: EventChangeRecord):
+        """ adds a record to the bounded queue, dropping the oldest record if the consumer has fallen behind. The
+        record is pushed to any callback from the subscription worker, so a slow callback does not hold the writer"""
+        if not self._active:
+            return
+        with self._lock:
+            self._queue.append(record)
+            while len(self._queue) > self._max_records:
+                self._queue.popleft()
+                self._dropped += 1
+            self._lock.notify_all()
+        return
+
+    def poll(self, max_records: int=None) -> EventChangeBatch:
+        """ pulls the waiting change records in the order they were applied, with the number of records dropped
+        before them. Records are only polled from a subscription without a callback
+
+        :param max_records: (optional) the maximum number of records to return
+        :return: an EventChangeBatch list of EventChangeRecord with its dropped count
+        """
+        if self._callback is not None:
+            return EventChangeBatch()
+        with self._lock:
+            count = len(self._queue)
+            if isinstance(max_records, int) and 0 <= max_records < count:
+                count = max_records
+            batch = EventChangeBatch([self._queue.popleft() for _ in range(count)], dropped=self._dropped)
+            self._dropped = 0
+        return batch
+
+    def flush(self, timeout: float=None) -> bool:
+        """ waits for the records waiting for a callback to be pushed
+
+        :param timeout: (optional) the most seconds to wait
+        :return: True if every waiting record was pushed
+        """
+        if self._callback is None:
+            return True
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._active or (len(self._queue) == 0 and not self._in_callback),
+                                       timeout=timeout)
+
+    def close(self):
+        """stops the subscription receiving records and clears any waiting records"""
+        with self._lock:
+            self._active = False
+            self._queue.clear()
+            self._lock.notify_all()
+        return
+
+    def _push_worker(self):
+        """ pushes the waiting records to the callback in order, first passing any dropped count to the resync
+        callable, recording a failing callback in `last_error`"""
+        while True:
+            with self._lock:
+                self._in_callback = False
+                self._lock.notify_all()
+                self._lock.wait_for(lambda: not self._active or len(self._queue) > 0)
+                if not self._active:
+                    return
+                record = self._queue.popleft()
+                dropped = 0
+                if self._resync is not None and self._dropped > 0:
+                    dropped, self._dropped = self._dropped, 0
+                self._in_callback = True
+            try:
+                if dropped > 0:
+                    self._resync(dropped)
+                self._callback(record)
+            except Exception as e:
+                self._last_error = e
@@ -1,8 +1,10 @@
 from copy import deepcopy
 from datetime import datetime
+from typing import Any, Callable
 import pandas as pd
 from ds_engines.engines.event_books.abstract_event_book import AbstractEventBook
 from aistac.handlers.abstract_handlers import ConnectorContract, HandlerFactory
+from ds_engines.handlers.snapshot_handlers import SnapshotSourceHandler
 
 __author__ = 'Darryl Oatridge'
 
@@ -10,10 +12,12 @@ __author__ = 'Darryl Oatridge'
 class PandasEventBook(AbstractEventBook):
 
     __book_state: pd.DataFrame
+    __index_keys: set
     __events_log: dict
     __event_count: int
     __book_count: int
     __last_book_time: datetime
+    __shared: bool
 
     def __init__(self, book_name: str, time_distance: int=None, count_distance: int=None, events_log_distance: int=None,
                  state_connector: ConnectorContract=None, events_log_connector: ConnectorContract=None):
@@ -76,6 +80,65 @@ class PandasEventBook(AbstractEventBook):
             df = self._fillna(df)
         return df
 
+    def snapshot_state(self) -> pd.DataFrame:
+        """ returns the current state as a copy-on-write snapshot. The state is returned without copying it and
+        the book copies it before its next change in place, so the snapshot is unchanged by later events. The
+        snapshot must be treated as read only"""
+        self.__shared = True
+        return self.__book_state
+
+    def read_state(self, reader: Callable[[pd.DataFrame], Any]) -> Any:
+        """ calls the reader with the current state without copying it, returning its result. The reader must only
+        read the state and not keep it, taking a copy of anything it returns, see BookQuery"""
+        return reader(self.__book_state)
+
+    def restore_state(self, state: pd.DataFrame, version: int=None):
+        """ replaces the current state with a state taken by snapshot_state, clearing the events log
+
+        :param state: the state to restore
+        :param version: (optional) the version the state was taken at. The book version is restored to it, unless
+                        the book has already passed it
+        """
+        if not isinstance(state, pd.DataFrame):
+            raise ValueError(f"The state to restore must be a pandas DataFrame, not {type(state).__name__}")
+        self.__book_state = state
+        self.__shared = True
+        self.__index_keys = set(state.index)
+        self.__events_log = dict()
+        self._restore_version(version)
+        self._record_change('recover')
+        return
+
+    def delta_state(self, since_version: int, fillna: bool=None) -> pd.DataFrame:
+        """ returns the rows and columns of the event book that changed since the given version. If the changes can
+        not be resolved from the change log the full current state is returned
+
+        :param since_version: the version the caller last saw
+        :param fillna: (optional) if the NaN values should be filled
+        :return: pd.DataFrame
+        """
+        changes = self.changes_since(version=since_version)
+        if changes is None:
+            return self.current_state(fillna=fillna)
+        index, columns = changes
+        columns = self.__book_state.columns[self.__book_state.columns.isin(columns)]
+        if index is None:
+            df = self.__book_state.loc[:, columns].copy(deep=True)
+        else:
+            rows = [key for key in index if key in self.__index_keys]
+            df = self.__book_state.loc[rows, columns].copy(deep=True)
+        if isinstance(fillna, bool) and fillna:
+            df = self._fillna(df)
+        return df
+
+    def _change_values(self, index: pd.Index, columns: pd.Index) -> [pd.DataFrame, None]:
+        """returns a copy of the changed cells for the change record, only if there is a subscriber"""
+        if not self.has_subscribers:
+            return None
+        if index is None:
+            return self.__book_state.loc[:, columns].copy(deep=True)
+        return self.__book_state.loc[index, columns].copy(deep=True)
+
     def _current_events_log(self) -> dict:
         return deepcopy(self.__events_log)
 
@@ -100,14 +163,35 @@ class PandasEventBook(AbstractEventBook):
         if self.events_log_distance > 0:
             self.__events_log.update({_time.strftime('%Y%m%d%H%M%S%f'): ['add', event]})
         fix_index = fix_index if isinstance(fix_index, bool) else True
+        # an empty book has no index to fix to so the event sets the index
+        fix_index = fix_index and len(self.__index_keys) > 0
         if fix_index:
-            event = event.loc[event.index.isin(self.__book_state.index), :]
+            event = event.loc[[key in self.__index_keys for key in event.index], :]
+        if self.__shared:
+            # a snapshot holds the state so it is copied before it is changed in place
+            self.__book_state = self.__book_state.copy(deep=True)
+            self.__shared = False
         intersect = set(self.__book_state.columns).intersection(set(event.columns))
         if len(intersect) > 0:
             self.__book_state.drop(columns=list(intersect), inplace=True)
-        self.__book_state = pd.concat([self.__book_state, event], axis=1, sort=False, copy=False)
+        if fix_index:
+            if event.index.equals(self.__book_state.index):
+                for column in event.columns:
+                    self.__book_state[column] = event[column]
+            else:
+                # the event is aligned to the book by key, taking the last event row of a repeated key, so every
+                # book row of a key, including a repeated book key, is set
+                _event = event.loc[~event.index.duplicated(keep='last')]
+                for column in _event.columns:
+                    self.__book_state[column] = _event[column].reindex(self.__book_state.index)
+        else:
+            self.__book_state = pd.concat([self.__book_state, event], axis=1, sort=False, copy=False)
+            self.__index_keys.update(event.index)
+        # replaced columns change every row, not just the event rows
+        _index = None if len(intersect) > 0 else event.index
+        self._record_change('add', index=_index, columns=event.columns,
+                            values=self._change_values(index=_index, columns=event.columns))
         self._update_counters()
-        super()._set_modified(True)
         return _time
 
     def increment_event(self, event: pd.DataFrame()) -> datetime:
@@ -116,8 +200,10 @@ class PandasEventBook(AbstractEventBook):
             self.__events_log.update({_time.strftime('%Y%m%d%H%M%S%f'): ['increment', event]})
         _event = event.combine(self.__book_state, lambda s1, s2: s2 + s1 if len(s2.mode()) else s1)
         self.__book_state = _event.combine_first(self.__book_state)
+        self.__index_keys.update(event.index)
+        self._record_change('increment', index=event.index, columns=event.columns,
+                            values=self._change_values(index=event.index, columns=event.columns))
         self._update_counters()
-        super()._set_modified(True)
         return _time
 
     def decrement_event(self, event: pd.DataFrame()) -> datetime:
@@ -126,16 +212,21 @@ class PandasEventBook(AbstractEventBook):
             self.__events_log.update({_time.strftime('%Y%m%d%H%M%S%f'): ['decrement', event]})
         _event = event.combine(self.__book_state, lambda s1, s2: s2 - s1 if len(s2.mode()) else s1)
         self.__book_state = _event.combine_first(self.__book_state)
+        self.__index_keys.update(event.index)
+        self._record_change('decrement', index=event.index, columns=event.columns,
+                            values=self._change_values(index=event.index, columns=event.columns))
         self._update_counters()
-        super()._set_modified(True)
         return _time
 
     def reset_state(self):
         self.__book_state = pd.DataFrame()
+        self.__shared = False
+        self.__index_keys = set()
         self.__events_log = dict()
         self.__event_count = 0
         self.__book_count = 0
         self.__last_book_time = datetime.now()
+        self._record_change('reset')
         self.reset_modified()
 
     def save_state(self, with_reset: bool=None, fillna: bool=None, **kwargs):
@@ -189,20 +280,36 @@ class PandasEventBook(AbstractEventBook):
             handler.persist_canonical(self.__events_log)
         return
 
-    def recover_state(self):
-        """recovers the state from last persisted and applies any events from the event log"""
+    def recover_state(self, columns: [str, list]=None):
+        """ recovers the state from last persisted and applies any events from the event log
+
+        :param columns: (optional) a column or list of columns to project the recovered state to. The snapshot
+                        handler only reads these columns, other handlers load the full state before it is projected
+        """
+        columns = [columns] if isinstance(columns, str) else columns
         if isinstance(self._state_connector, ConnectorContract):
             handler = HandlerFactory.instantiate(self._state_connector)
-            self.__book_state = handler.load_canonical()
+            if isinstance(columns, list):
+                if isinstance(handler, SnapshotSourceHandler):
+                    self.__book_state = handler.load_canonical(columns=columns)
+                else:
+                    self.__book_state = handler.load_canonical()
+                self.__book_state = self.__book_state.loc[:, self.__book_state.columns.isin(columns)]
+            else:
+                self.__book_state = handler.load_canonical()
         else:
             self.__book_state = pd.DataFrame()
-        super()._set_modified(True)
+        self.__shared = False
+        self.__index_keys = set(self.__book_state.index)
+        self._record_change('recover')
         if isinstance(self._events_connector, ConnectorContract):
             handler = HandlerFactory.instantiate(self._events_connector)
             self.__events_log = handler.load_canonical()
             _event_times = pd.Series(list(self.__events_log.keys())).sort_values().reset_index(drop=True)
             for _items in _event_times:
                 _action, _event = self.__events_log.get(_items, ['add', pd.DataFrame()])
+                if isinstance(columns, list):
+                    _event = _event.loc[:, _event.columns.isin(columns)]
                 if str(_action).lower() == 'add':
                     self.add_event(event=_event)
                 elif str(_action).lower() == 'increment':
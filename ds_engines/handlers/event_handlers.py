@@ -25,15 +25,47 @@ class EventSourceHandler(AbstractSourceHandler):
     def exists(self) -> bool:
         return self._controller.is_event_book(book_name=self._book_name)
 
-    def has_changed(self) -> bool:
+    def has_changed(self, if_newer_than: int=None) -> bool:
+        """ if the event book has changed. If a version is given the test is against that version rather than the
+        shared modified flag, so each reader can track its own changes independently
+
+        :param if_newer_than: (optional) the book version the caller last saw
+        """
+        if isinstance(if_newer_than, int):
+            return self._controller.get_version(book_name=self._book_name) > if_newer_than
         return self._controller.get_modified(book_name=self._book_name)
 
+    def get_version(self) -> int:
+        """the current version of the event book"""
+        return self._controller.get_version(book_name=self._book_name)
+
     def reset_changed(self, changed: bool=False):
         self._controller.reset_modified(book_name=self._book_name, modified=changed)
         return
 
-    def load_canonical(self, **kwargs) -> pd.DataFrame:
-        return self._controller.current_state(book_name=self._book_name)
+    def load_canonical(self, if_newer_than: int=None, delta: bool=None, **kwargs) -> [pd.DataFrame, None]:
+        """ loads the event book state. The version of the returned state is set in the canonical attrs as 'version'
+        so the caller can pass it back as 'if_newer_than' on the next load
+
+        :param if_newer_than: (optional) the book version the caller last saw, returns None if unchanged since
+        :param delta: (optional) with if_newer_than, only return the rows and columns changed since that version
+        :return: pd.DataFrame or None if unchanged
+        """
+        version = self._controller.get_version(book_name=self._book_name)
+        if isinstance(if_newer_than, int):
+            if version <= if_newer_than:
+                return None
+            if isinstance(delta, bool) and delta:
+                canonical = self._controller.delta_state(book_name=self._book_name, since_version=if_newer_than)
+                canonical.attrs['version'] = version
+                return canonical
+        canonical = self._controller.current_state(book_name=self._book_name)
+        canonical.attrs['version'] = version
+        return canonical
+
+    async def async_load_canonical(self, **kwargs) -> pd.DataFrame:
+        """asyncio counterpart of load_canonical, offloading the state copy to an executor"""
+        return await self._controller.async_current_state(book_name=self._book_name)
 
 
 class EventPersistHandler(EventSourceHandler, AbstractPersistHandler):
@@ -51,6 +83,20 @@ class EventPersistHandler(EventSourceHandler, AbstractPersistHandler):
         self._controller.add_event(book_name=self._book_name, event=canonical, fix_index=False)
         return True
 
+    async def async_persist_canonical(self, canonical: pd.DataFrame, reset_state: bool=None, **kwargs) -> bool:
+        """ asyncio counterpart of persist_canonical, offloading the event book work to an executor
+
+        :param canonical: the canonical to persist to the event book
+        :param reset_state: True - resets the event book (Default)
+                            False - merges the canonical to the current state based on their index
+        """
+        reset_state = reset_state if isinstance(reset_state, bool) else True
+        async_book = self._controller.get_async_book(book_name=self._book_name)
+        if reset_state:
+            await async_book.reset_state()
+        await async_book.add_event(event=canonical, fix_index=False)
+        return True
+
     def remove_canonical(self, **kwargs) -> bool:
         return self._controller.remove_event_books(book_name=self._book_name)
 
@@ -0,0 +1,196 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from aistac.handlers.abstract_handlers import AbstractSourceHandler, AbstractPersistHandler
+from aistac.handlers.abstract_handlers import ConnectorContract
+
+__author__ = 'Darryl Oatridge'
+
+
+class SnapshotSourceHandler(AbstractSourceHandler):
+    """ A columnar snapshot handler for event book state. A snapshot is a directory holding a manifest and a
+    versioned directory of Parquet part files, each a chunk of rows, with compression and column statistics. A new
+    version is written alongside the current one and the manifest, which names the parts of its version, is replaced
+    in one step, so a failed write leaves the previous snapshot in place. Loads can be projected to a subset of
+    columns so only those columns are read.
+
+    Extra ConnectorContract kwargs are:
+        chunk_size: the number of rows in each part file. Default 1,000,000
+        row_group_size: the number of rows in each Parquet row group. Default the chunk size
+        compression: the Parquet compression codec. Default 'zstd'
+        max_workers: the number of threads writing or reading parts in parallel. Default the pyarrow cpu count
+    """
+
+    MANIFEST = '_snapshot.json'
+    DEFAULT_CHUNK_SIZE = 1000000
+    DEFAULT_COMPRESSION = 'zstd'
+
+    def __init__(self, connector_contract: ConnectorContract):
+        """ initialise the Handler passing the connector_contract dictionary"""
+        super().__init__(connector_contract)
+        self._file_state = 0
+        self._changed_flag = True
+
+    def supported_types(self) -> list:
+        return ['pd.DataFrame']
+
+    def exists(self) -> bool:
+        fs, path = self._get_filesystem()
+        return self._file_info(fs, self._join(path, self.MANIFEST)) is not None
+
+    def has_changed(self) -> bool:
+        fs, path = self._get_filesystem()
+        info = self._file_info(fs, self._join(path, self.MANIFEST))
+        if info is None:
+            return False
+        state = info.mtime_ns
+        if state != self._file_state:
+            self._changed_flag = True
+            self._file_state = state
+        return self._changed_flag
+
+    def reset_changed(self, changed: bool=False):
+        self._changed_flag = changed if isinstance(changed, bool) else False
+        return
+
+    def load_canonical(self, columns: [str, list]=None, **kwargs) -> pd.DataFrame:
+        """ loads the snapshot, reading the part files in parallel
+
+        :param columns: (optional) a column or list of columns to project the load to
+        :return: pd.DataFrame
+        """
+        import pyarrow.parquet as pq
+        fs, path = self._get_filesystem()
+        manifest = self.load_manifest()
+        if manifest is None:
+            raise FileNotFoundError(f"No snapshot manifest could be found at '{self.connector_contract.uri}'")
+        parts = [self._join(path, part) for part in manifest.get('parts', [])]
+        if len(parts) == 0:
+            return pd.DataFrame(columns=manifest.get('columns', [])).rename(columns=manifest.get('column_names', {}))
+        if isinstance(columns, str):
+            columns = [columns]
+        if isinstance(columns, list):
+            # the index is stored as columns and must be read to be restored
+            columns = [str(c) for c in columns if str(c) in manifest.get('columns', [])]
+            columns += manifest.get('index_columns', [])
+        table = pq.read_table(parts, filesystem=fs, columns=columns, use_threads=True)
+        # column names that are not strings are stored as strings so are restored
+        return table.to_pandas().rename(columns=manifest.get('column_names', {}))
+
+    def load_manifest(self) -> [dict, None]:
+        """returns the snapshot manifest or None if there is no snapshot"""
+        fs, path = self._get_filesystem()
+        manifest_path = self._join(path, self.MANIFEST)
+        if self._file_info(fs, manifest_path) is None:
+            return None
+        with fs.open_input_stream(manifest_path) as stream:
+            return json.loads(stream.read().decode('utf-8'))
+
+    def _get_filesystem(self, uri: str=None):
+        """returns the pyarrow filesystem and path for the uri"""
+        import pyarrow.fs as pa_fs
+        uri = uri if isinstance(uri, str) else self.connector_contract.uri
+        if '://' not in uri:
+            uri = os.path.abspath(uri)
+        return pa_fs.FileSystem.from_uri(uri)
+
+    @staticmethod
+    def _file_info(fs, path: str):
+        import pyarrow.fs as pa_fs
+        info = fs.get_file_info(path)
+        return None if info.type == pa_fs.FileType.NotFound else info
+
+    @staticmethod
+    def _join(path: str, name: str) -> str:
+        return "/".join([path.rstrip('/'), name])
+
+
+class SnapshotPersistHandler(SnapshotSourceHandler, AbstractPersistHandler):
+
+    def persist_canonical(self, canonical: pd.DataFrame, **kwargs) -> bool:
+        """ persists the canonical as a snapshot replacing any existing snapshot"""
+        return self._write_snapshot(canonical=canonical, uri=self.connector_contract.uri, **kwargs)
+
+    def remove_canonical(self, **kwargs) -> bool:
+        fs, path = self._get_filesystem()
+        if self._file_info(fs, path) is None:
+            return False
+        fs.delete_dir(path)
+        return True
+
+    def backup_canonical(self, canonical: pd.DataFrame, uri: str, **kwargs) -> bool:
+        """ persists the canonical as a snapshot to an alternative uri
+
+        :param canonical: the canonical to persist
+        :param uri: the uri of the backup snapshot
+        """
+        return self._write_snapshot(canonical=canonical, uri=uri, **kwargs)
+
+    def _write_snapshot(self, canonical: pd.DataFrame, uri: str, **kwargs) -> bool:
+        """ writes the canonical in chunks, in parallel, to a new version directory then replaces the manifest to
+        point to it. The previous version is only removed once the new manifest is in place"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not isinstance(canonical, pd.DataFrame):
+            raise TypeError(f"The snapshot handler only supports a pd.DataFrame canonical")
+        _kwargs = {**self.connector_contract.kwargs, **kwargs}
+        chunk_size = int(_kwargs.get('chunk_size', self.DEFAULT_CHUNK_SIZE))
+        row_group_size = int(_kwargs.get('row_group_size', chunk_size))
+        compression = _kwargs.get('compression', self.DEFAULT_COMPRESSION)
+        max_workers = _kwargs.get('max_workers', pa.cpu_count())
+        fs, path = self._get_filesystem(uri=uri)
+        stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        version = f"v-{stamp}"
+        fs.create_dir(self._join(path, version))
+        # parquet needs string column names, so the names that are not strings are kept to be restored
+        column_names = dict()
+        for column in canonical.columns:
+            name = column.item() if isinstance(column, np.generic) else column
+            if not isinstance(name, str) and isinstance(name, (int, float, bool)):
+                column_names[str(name)] = name
+        canonical = canonical.rename(columns=str)
+        chunks = [(n, canonical.iloc[i:i + chunk_size]) for n, i in enumerate(range(0, max(len(canonical), 1),
+                                                                                     chunk_size))]
+
+        def write_part(item: tuple) -> tuple:
+            n, chunk = item
+            table = pa.Table.from_pandas(chunk, preserve_index=True, nthreads=1)
+            name = f"{version}/part-{n:05d}.parquet"
+            pq.write_table(table, self._join(path, name), filesystem=fs, compression=compression,
+                           row_group_size=row_group_size, write_statistics=True)
+            return name, table.schema
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(write_part, chunks))
+            schema = results[0][1]
+            index_columns = [c for c in (schema.pandas_metadata or {}).get('index_columns', []) if isinstance(c, str)]
+            manifest = {'parts': [name for name, _ in results], 'rows': len(canonical),
+                        'columns': canonical.columns.to_list(), 'column_names': column_names,
+                        'index_columns': index_columns, 'compression': compression, 'chunk_size': chunk_size,
+                        'version': version, 'created': datetime.now().isoformat()}
+            staging = self._join(path, f"{self.MANIFEST}.{stamp}.tmp")
+            with fs.open_output_stream(staging) as stream:
+                stream.write(json.dumps(manifest).encode('utf-8'))
+            # the move replaces the manifest in one step, so a load sees either the old or the new version
+            fs.move(staging, self._join(path, self.MANIFEST))
+        except Exception:
+            fs.delete_dir(self._join(path, version))
+            raise
+        self._remove_versions(fs, path=path, keep=version)
+        return True
+
+    def _remove_versions(self, fs, path: str, keep: str):
+        """removes the part files and version directories of the snapshots replaced by the kept version"""
+        import pyarrow.fs as pa_fs
+        for info in fs.get_file_info(pa_fs.FileSelector(path)):
+            if info.base_name == keep:
+                continue
+            if info.type == pa_fs.FileType.Directory and info.base_name.startswith('v-'):
+                fs.delete_dir(info.path)
+            elif info.type == pa_fs.FileType.File and info.base_name.startswith('part-'):
+                fs.delete_file(info.path)
+        return
@@ -1,16 +1,45 @@
+import importlib
 import inspect
-from typing import Any
+import os
+import functools
+import threading
+from contextlib import nullcontext
+from typing import Any, TYPE_CHECKING
 import numpy as np
 import pandas as pd
 from aistac.intent.abstract_intent import AbstractIntentModel
-from ds_discovery import FeatureCatalog, Transition, DataDrift, Wrangle, SyntheticBuilder
+from ds_engines.engines.controller.canonical_handoff import CanonicalHandoff
+from ds_engines.engines.controller.canonical_stream import CanonicalStream, ChunkWriter, IncrementalStream
+from ds_engines.engines.controller.component_cache import ComponentCache
+from ds_engines.engines.controller.contract_mirror import ContractMirror
+from ds_engines.engines.controller.report_writer import ReportWriter
+from ds_engines.engines.controller.run_journal import RunJournal
+from ds_engines.engines.controller.run_options import RunOptions
+from ds_engines.engines.controller.run_stats import RunStats
+from ds_engines.engines.controller.source_watermark import SourceWatermark
+from ds_engines.engines.controller.synthetic_shards import SyntheticShards
+from ds_engines.engines.controller.task_cache import TaskResultCache
+from ds_engines.engines.controller.task_policy import TaskPolicy
+from ds_engines.intent.dispatch_plan import DispatchPlan, DispatchStep
 from ds_engines.managers.controller_property_manager import ControllerPropertyManager
 
+if TYPE_CHECKING:
+    from ds_discovery import FeatureCatalog, Transition, DataDrift, Wrangle, SyntheticBuilder
+
 __author__ = 'Darryl Oatridge'
 
 
 class ControllerIntentModel(AbstractIntentModel):
 
+    COMPONENTS = {'synthetic_builder': 'SyntheticBuilder', 'transition': 'Transition', 'wrangle': 'Wrangle',
+                  'feature_catalog': 'FeatureCatalog', 'data_drift': 'DataDrift'}
+    # the component classes are imported from the module on first use, keeping it out of the import of the model
+    COMPONENT_MODULE = 'ds_discovery'
+
+    # components built from their domain contracts, reused across intent levels and controller runs by one thread
+    # at a time, so concurrent tasks and task attempts each have their own
+    COMPONENT_CACHE = ComponentCache()
+
     def __init__(self, property_manager: ControllerPropertyManager, default_save_intent: bool=None,
                  default_intent_level: [str, int, float]=None, order_next_available: bool=None,
                  default_replace_intent: bool=None):
@@ -33,9 +62,176 @@ class ControllerIntentModel(AbstractIntentModel):
                          intent_param_exclude=intent_param_exclude, default_intent_level=default_intent_level,
                          default_intent_order=default_intent_order, default_replace_intent=default_replace_intent,
                          intent_type_additions=intent_type_additions)
+        self._dispatch_plans = dict()
+        self._run_stats: [RunStats, None] = None
+        self._journal: [RunJournal, None] = None
+        self._resume = False
+        self._handoff: [CanonicalHandoff, None] = None
+        self._result_cache: [TaskResultCache, None] = None
+        self._report_writer: [ReportWriter, None] = None
+        self._stream_chunk_size: [int, None] = None
+        self._stream_tasks = set()
+        self._watermark: [SourceWatermark, None] = None
+        self._incremental_tasks = dict()
+        self._synthetic_shards: [int, None] = None
+        self._synthetic_seed: [int, None] = None
+        self._synthetic_key_columns = list()
+        self._task_policy: [TaskPolicy, None] = None
+        self._level_policies = dict()
+        # the persists and reports of a task attempt, held until the attempt wins, by the thread running the attempt
+        self._staging = threading.local()
+
+    def set_result_cache(self, result_cache: TaskResultCache=None):
+        """ sets the task result cache, so tasks whose intent, component contract and input canonical are unchanged
+        reuse their cached outcome rather than rerunning. Passing None stops using the cache
+
+        :param result_cache: (optional) the task result cache
+        """
+        self._result_cache = result_cache if isinstance(result_cache, TaskResultCache) else None
+        return
+
+    def start_streaming(self, chunk_size: int, stream_tasks: [str, list]):
+        """ starts running the given row independent tasks chunk by chunk, so peak memory is bounded by the chunk
+        size. A streamed task reads its source and writes its persist connector directly, so both must be parquet
+        or csv files, and returns a CanonicalStream that a downstream streamed task consumes and any other task
+        materializes. see CanonicalStream
+
+        :param chunk_size: the maximum number of rows in a chunk
+        :param stream_tasks: the task names of the row independent transition or wrangle tasks to stream
+        """
+        self._stream_chunk_size = chunk_size if isinstance(chunk_size, int) and chunk_size > 0 else None
+        self._stream_tasks = set(self._pm.list_formatter(stream_tasks))
+        return
+
+    def stop_streaming(self):
+        """stops running tasks chunk by chunk"""
+        self._stream_chunk_size = None
+        self._stream_tasks = set()
+        return
+
+    def start_journal(self, journal: RunJournal, resume: bool=None):
+        """ starts recording each completed task in the run journal and, if resuming, skips the tasks the journal
+        has as complete with unchanged inputs and outputs. A skipped task passes its persisted outcome on, as the
+        task would have passed its outcome. see RunJournal
+
+        :param journal: the run journal
+        :param resume: (optional) if completed tasks are skipped. Default False
+        """
+        self._journal = journal if isinstance(journal, RunJournal) else None
+        self._resume = resume if isinstance(resume, bool) else False
+        return
+
+    def stop_journal(self):
+        """stops recording completed tasks"""
+        self._journal = None
+        self._resume = False
+        return
+
+    def start_incremental(self, incremental_tasks: [str, list, dict], watermark_path: str=None):
+        """ starts running the given row independent tasks incrementally, reading only the source data that is new
+        since the task last ran and appending its outcome to the persisted outcome. An incremental task reads its
+        source and writes its persist connector directly, so its source must be a parquet or csv file, or a
+        directory of them, and its persist a parquet or csv file. An incremental task passes on an IncrementalStream
+        over its whole persisted outcome, that a downstream incremental task takes the increment of and any other
+        task the whole outcome. see SourceWatermark
+
+        :param incremental_tasks: the task names of the row independent transition or wrangle tasks to run
+                        incrementally, or a dictionary of task name to a monotonic source column to mark by
+        :param watermark_path: (optional) the local directory the source watermarks are kept in
+        """
+        if isinstance(incremental_tasks, dict):
+            self._incremental_tasks = {str(k): v if isinstance(v, str) else None for k, v in incremental_tasks.items()}
+        else:
+            self._incremental_tasks = {k: None for k in self._pm.list_formatter(incremental_tasks)}
+        self._watermark = SourceWatermark(watermark_path=watermark_path) if len(self._incremental_tasks) > 0 else None
+        return
+
+    def stop_incremental(self):
+        """stops running tasks incrementally"""
+        self._watermark = None
+        self._incremental_tasks = dict()
+        return
+
+    def set_run_stats(self, run_stats: RunStats=None):
+        """ sets the run stats collector that each task run is measured into. Passing None stops measuring
+
+        :param run_stats: (optional) the run stats collector
+        """
+        self._run_stats = run_stats if isinstance(run_stats, RunStats) else None
+        return
+
+    def set_task_policies(self, task_policy: dict=None, level_policies: dict=None):
+        """ sets the timeout, retries with backoff and speculative execution of each task run, see TaskPolicy.
+        The persists and reports of each attempt are staged, and only those of the attempt that succeeds are
+        committed. Incremental, streamed and sharded synthetic tasks write their outcome in place, so are only
+        retried. Passing None runs each task once with no timeout
+
+        :param task_policy: (optional) the policy parameters of every intent level, such as {'timeout': 600,
+                    'retries': 2, 'backoff': 5, 'speculate_after': 300}
+        :param level_policies: (optional) a dictionary of intent level to the policy parameters of that level,
+                    any not given taken from the task_policy
+        """
+        self._task_policy = TaskPolicy.from_dict(task_policy)
+        self._level_policies = dict()
+        if isinstance(level_policies, dict):
+            for level, policy in level_policies.items():
+                self._level_policies[str(level)] = TaskPolicy.from_dict(policy, default=self._task_policy)
+        return
+
+    def set_synthetic_shards(self, shards: int=None, seed: int=None, key_columns: [str, list]=None):
+        """ sets synthetic builds to be split into shards built in parallel worker processes, each with a seed
+        derived from the base seed so the build is reproducible. If the synthetic persist connector is a parquet
+        or csv file, shards are written to it as they complete rather than concatenated in memory. Passing no
+        shards builds in a single process. Columns that must be unique across the build must be shard safe, see
+        SyntheticShards
+
+        :param shards: (optional) the number of shards to split a synthetic build into
+        :param seed: (optional) the base seed of the shard seeds. Default 0
+        :param key_columns: (optional) the numeric sequential columns offset by each shard row offset
+        """
+        self._synthetic_shards = shards if isinstance(shards, int) and shards > 1 else None
+        self._synthetic_seed = seed if isinstance(seed, int) else None
+        self._synthetic_key_columns = self._pm.list_formatter(key_columns)
+        return
+
+    def start_report_writer(self, report_policy: str=None, background: bool=None):
+        """ starts writing task reports according to the report policy, optionally on a background thread so the
+        task outcomes are handed on before the reports are complete. see ReportWriter
+
+        :param report_policy: (optional) 'none', 'essential' or 'all'. Default 'HADRON_CONTROLLER_REPORT_POLICY'
+        :param background: (optional) if reports are written in the background. Default True
+        """
+        self.stop_report_writer()
+        self._report_writer = ReportWriter(report_policy=report_policy, background=background)
+        return
+
+    def stop_report_writer(self):
+        """waits for any background reports to complete"""
+        if isinstance(self._report_writer, ReportWriter):
+            writer, self._report_writer = self._report_writer, None
+            writer.close()
+        return
+
+    def start_handoff(self, persist_mode: str=None, intermediates: [set, list]=None):
+        """ starts holding task outcomes in memory so downstream tasks whose source connector matches an upstream
+        persist connector take the canonical directly. see CanonicalHandoff
+
+        :param persist_mode: (optional) 'sync', 'async' or 'skip' for intermediate outcomes. Default 'sync'
+        :param intermediates: (optional) the URIs read by downstream tasks
+        """
+        self.stop_handoff()
+        self._handoff = CanonicalHandoff(persist_mode=persist_mode, intermediates=intermediates)
+        return
+
+    def stop_handoff(self):
+        """waits for any background persists and releases the canonicals held in memory"""
+        if isinstance(self._handoff, CanonicalHandoff):
+            handoff, self._handoff = self._handoff, None
+            handoff.close()
+        return
 
     def run_intent_pipeline(self, intent_level: [int, str]=None, synthetic_size: int=None,
-                            controller_repo: str=None, **kwargs):
+                            controller_repo: str=None, level_intent: dict=None, **kwargs):
         """ Collectively runs all parameterised intent taken from the property manager against the code base as
         defined by the intent_contract.
 
@@ -46,37 +242,489 @@ class ControllerIntentModel(AbstractIntentModel):
         :param kwargs: additional kwargs to add to the parameterised intent, these will replace any that already exist
         :param synthetic_size: a size to pass to any synthetic intent
         :param controller_repo: the controller repo to use if no uri_pm_repo is within the intent parameters
+        :param level_intent: (optional) the intent of the level, such as from a compiled run book, rather than the
+                        intent in the property manager
         :return Canonical with parameterised intent applied
         """
         canonical = pd.DataFrame()
         # test if there is any intent to run
-        if self._pm.has_intent():
+        if isinstance(level_intent, dict) or self._pm.has_intent():
             # get the list of levels to run
             intent_level = intent_level if isinstance(intent_level, (int, str)) else self._pm.DEFAULT_INTENT_LEVEL
-            level_key = self._pm.join(self._pm.KEY.intent_key, intent_level)
-            for order in sorted(self._pm.get(level_key, {})):
-                for method, params in self._pm.get(self._pm.join(level_key, order), {}).items():
-                    if method in self.__dir__():
-                        # fail safe in case kwargs was sored as the reference
-                        params.update(params.pop('kwargs', {}))
-                        # add method kwargs to the params
-                        if isinstance(kwargs, dict):
-                            params.update(kwargs)
-                        # remove the creator param
-                        _ = params.pop('intent_creator', 'Unknown')
-                        # add excluded params and set to False
-                        params.update({'run_task': True, 'save_intent': False})
-                        # add the controller_repo if given
-                        if isinstance(controller_repo, str) and 'uri_pm_repo' not in params.keys():
-                            params.update({'uri_pm_repo': controller_repo})
-                        if method == 'synthetic_builder':
-                            if isinstance(synthetic_size, int):
-                                params['size'] = synthetic_size
-                            canonical = eval(f"self.{method}(**{params})", globals(), locals())
-                        else:
-                            canonical = eval(f"self.{method}(canonical, **{params})", globals(), locals())
+            if not isinstance(level_intent, dict):
+                level_intent = self._pm.get(self._pm.join(self._pm.KEY.intent_key, intent_level), {})
+            plan = DispatchPlan.get_plan(self, plans=self._dispatch_plans, intent_level=intent_level,
+                                         level_intent=level_intent, flatten_kwargs=True)
+            completed = list()
+            try:
+                for step in plan.steps:
+                    # add method kwargs and set the excluded params
+                    params = dict(kwargs) if isinstance(kwargs, dict) else {}
+                    params.update({'run_task': True, 'save_intent': False})
+                    # add the controller_repo if given
+                    if isinstance(controller_repo, str) and 'uri_pm_repo' not in step.params.keys():
+                        params.update({'uri_pm_repo': controller_repo})
+                    if step.method == 'synthetic_builder' and isinstance(synthetic_size, int):
+                        params['size'] = synthetic_size
+                    entry = self._journal_entry(intent_level, step=step, params=params, canonical=canonical)
+                    with self._measure(intent_level, step) as record:
+                        if entry is not None and self._resume and self._journal.is_complete(entry['key'],
+                                                                                             entry['fingerprint']):
+                            if isinstance(record, dict):
+                                record['status'] = 'resumed'
+                            # the next task takes the persisted outcome, as it would have been passed the outcome
+                            canonical = self._load_resumed_outcome(step=step, params=params)
+                            continue
+                        canonical = self._run_step(intent_level, step=step, canonical=canonical, params=params,
+                                                   record=record)
+                    if entry is not None:
+                        completed.append(entry)
+            finally:
+                self._record_journal(completed)
+        return canonical
+
+    def level_connectors(self, intent_level: [int, str], controller_repo: str=None) -> dict:
+        """ infers the connector inputs and outputs of an intent level from the domain contracts of its tasks. The
+        inputs are the source connector URIs of every task that takes a canonical and the outputs are the persist
+        connector URIs, so the inputs are a superset of what is actually read.
+
+        :param intent_level: the intent level to infer
+        :param controller_repo: (optional) the controller repo to use if no uri_pm_repo is within the intent parameters
+        :return: a dictionary with 'inputs' and 'outputs' sets of URIs
+        """
+        inputs, outputs = set(), set()
+        level_key = self._pm.join(self._pm.KEY.intent_key, intent_level)
+        for order in sorted(self._pm.get(level_key, {})):
+            for method, params in self._pm.get(self._pm.join(level_key, order), {}).items():
+                if method not in self.COMPONENTS.keys():
+                    continue
+                params = dict(params)
+                params.update(params.pop('kwargs', {}))
+                uri_pm_repo = params.get('uri_pm_repo', controller_repo)
+                component = self._get_component(method=method, task_name=params.get('task_name'),
+                                                uri_pm_repo=uri_pm_repo)
+                connectors = self._task_connectors(component, method=method, params=params)
+                inputs.update(connectors['inputs'])
+                outputs.update(connectors['outputs'])
+        return {'inputs': inputs, 'outputs': outputs}
+
+    def level_contract_stamps(self, intent_level: [int, str], controller_repo: str=None) -> dict:
+        """ returns the contract stamp of each task of an intent level, that changes when the domain contract of the
+        task changes, keyed by the intent method and task name
+
+        :param intent_level: the intent level
+        :param controller_repo: (optional) the controller repo to use if no uri_pm_repo is within the intent parameters
+        :return: a dictionary of '<method>:<task_name>' to the contract stamp, or None if it can not be taken
+        """
+        stamps = dict()
+        level_key = self._pm.join(self._pm.KEY.intent_key, intent_level)
+        for order in sorted(self._pm.get(level_key, {})):
+            for method, params in self._pm.get(self._pm.join(level_key, order), {}).items():
+                if method not in self.COMPONENTS.keys():
+                    continue
+                params = dict(params)
+                params.update(params.pop('kwargs', {}))
+                uri_pm_repo = self._resolve_repo(params.get('uri_pm_repo', controller_repo),
+                                                 task_name=params.get('task_name'))
+                component = self.COMPONENT_CACHE.get(self.component_class(method), task_name=params.get('task_name'),
+                                                     uri_pm_repo=uri_pm_repo)
+                uri = ComponentCache.contract_uri(component, uri_pm_repo=uri_pm_repo)
+                stamps[f"{method}:{params.get('task_name')}"] = ComponentCache.contract_stamp(uri)
+        return stamps
+
+    @staticmethod
+    def _task_connectors(component: Any, method: str, params: dict) -> dict:
+        """returns the source connector URI of a task as its 'inputs' and its persist connector URIs as 'outputs'"""
+        inputs, outputs = set(), set()
+        if method != 'synthetic_builder' and component.pm.has_connector(component.CONNECTOR_SOURCE):
+            inputs.add(component.pm.get_connector_contract(component.CONNECTOR_SOURCE).uri)
+        for connector_name in [component.CONNECTOR_PERSIST, params.get('feature_name'), params.get('measure')]:
+            if isinstance(connector_name, str) and component.pm.has_connector(connector_name):
+                outputs.add(component.pm.get_connector_contract(connector_name).uri)
+        return {'inputs': inputs, 'outputs': outputs}
+
+    def _journal_entry(self, intent_level: [int, str], step: DispatchStep, params: dict,
+                       canonical: Any) -> [dict, None]:
+        """ returns the journal key, input fingerprint and outputs of a task, or None if there is no journal. A
+        canonical passed in memory is fingerprinted only if the task has no source connector to stamp"""
+        if not isinstance(self._journal, RunJournal) or step.method not in self.COMPONENTS.keys():
+            return None
+        params = {**step.params, **params}
+        uri_pm_repo = params.get('uri_pm_repo')
+        component = self._get_component(method=step.method, task_name=params.get('task_name'),
+                                        uri_pm_repo=uri_pm_repo)
+        connectors = self._task_connectors(component, method=step.method, params=params)
+        canonical_fingerprint = None
+        if len(connectors['inputs']) == 0 and isinstance(canonical, pd.DataFrame) and canonical.shape != (0, 0):
+            canonical_fingerprint = TaskResultCache.fingerprint(canonical)
+        fingerprint = RunJournal.fingerprint(params=params, inputs=connectors['inputs'],
+                                             contract_uri=ComponentCache.contract_uri(component, uri_pm_repo),
+                                             canonical=canonical_fingerprint)
+        key = RunJournal.task_key(level=intent_level, order=step.order, method=step.method,
+                                  task_name=params.get('task_name'))
+        return {'key': key, 'fingerprint': fingerprint, 'outputs': connectors['outputs'], 'level': str(intent_level),
+                'order': step.order, 'method': step.method, 'task_name': params.get('task_name')}
+
+    def _load_resumed_outcome(self, step: DispatchStep, params: dict) -> pd.DataFrame:
+        """ returns the persisted outcome of a task skipped on resume, or an empty DataFrame if it has none
+
+        :param step: the dispatch step of the task
+        :param params: the run parameters of the task
+        :return: the outcome loaded from the task persist connector, or feature or measure connector
+        """
+        params = {**step.params, **params}
+        component = self._get_component(method=step.method, task_name=params.get('task_name'),
+                                        uri_pm_repo=params.get('uri_pm_repo'))
+        connector_name = component.CONNECTOR_PERSIST
+        if step.method == 'feature_catalog':
+            connector_name = params.get('feature_name')
+        elif step.method == 'data_drift':
+            connector_name = params.get('measure')
+        if not isinstance(connector_name, str) or not component.pm.has_connector(connector_name):
+            return pd.DataFrame()
+        uri = component.pm.get_connector_contract(connector_name).uri
+        canonical = component.load_canonical(connector_name=connector_name)
+        self._add_stats(bytes_read=RunStats.uri_size(uri) if isinstance(self._run_stats, RunStats) else None)
+        return canonical
+
+    def _record_journal(self, completed: list):
+        """ records the completed tasks in the journal once their outcomes are persisted. If a background persist
+        failed, nothing is recorded so the tasks are rerun on resume"""
+        if not isinstance(self._journal, RunJournal) or len(completed) == 0:
+            return
+        if isinstance(self._handoff, CanonicalHandoff) and not self._handoff.settle():
+            return
+        for entry in completed:
+            self._journal.record(**entry)
+        return
+
+    def _run_step(self, intent_level: [int, str], step: DispatchStep, canonical: Any, params: dict,
+                  record: [dict, None]) -> Any:
+        """ runs a task under the task policy of its intent level. Each attempt adds its counts to a record of its
+        own, and only those of the attempt that succeeds are added to the task record, with the attempts made.
+        Each attempt stages its persists, handoff holds, result cache entries and reports, and only those of the
+        attempt that succeeds are committed, so an abandoned attempt writes nothing. Attempts after the first are
+        given a copy of the canonical taken before the first attempt started, as the first attempt may change it.
+
+        :param intent_level: the intent level of the task
+        :param step: the dispatch step of the task
+        :param canonical: the canonical passed from the upstream task
+        :param params: the run parameters of the task
+        :param record: the run stats record of the task, or None if there are no run stats
+        :return: the task outcome
+        """
+        policy = self._level_policies.get(str(intent_level), self._task_policy)
+        if not isinstance(policy, TaskPolicy) or not policy.is_active:
+            if step.method == 'synthetic_builder':
+                return step.run(**params)
+            return step.run(canonical, **params)
+        task_name = step.params.get('task_name')
+        sharded = step.method == 'synthetic_builder' and isinstance(self._synthetic_shards, int)
+        staging = not (task_name in self._incremental_tasks or task_name in self._stream_tasks or sharded)
+        if not staging:
+            # tasks that write their outcome as they run can not be staged, so only run one attempt at a time
+            policy = TaskPolicy.from_dict({'timeout': None, 'speculate_after': None}, default=policy)
+        source = canonical
+        if isinstance(canonical, pd.DataFrame) and (policy.retries > 0 or policy.speculate_after is not None):
+            source = canonical.copy()
+        attempts = []
+
+        def attempt():
+            args = [] if step.method == 'synthetic_builder' else [canonical]
+            if len(attempts) > 0 and isinstance(source, pd.DataFrame):
+                args = [source.copy()]
+            counts = dict()
+            attempts.append(counts)
+            staged = list()
+            self._staging.writes = staged if staging else None
+            try:
+                if not isinstance(self._run_stats, RunStats):
+                    return step.run(*args, **params), counts, staged
+                with self._run_stats.attach(counts):
+                    return step.run(*args, **params), counts, staged
+            finally:
+                self._staging.writes = None
+
+        info = dict()
+        try:
+            outcome, counts, staged = policy.run(attempt, info=info)
+        finally:
+            if isinstance(record, dict):
+                record['attempts'] = info.get('attempts')
+                record['speculated'] = info.get('speculated')
+        self._add_stats(**counts)
+        for write in staged:
+            write()
+        return outcome
+
+    def _staged(self, write: Any) -> bool:
+        """stages the write if the thread is running a task attempt, returning if it was staged"""
+        staged = getattr(self._staging, 'writes', None)
+        if not isinstance(staged, list):
+            return False
+        staged.append(write)
+        return True
+
+    def _measure(self, intent_level: [int, str], step: DispatchStep):
+        """returns a context measuring the task into the run stats, or a null context if there are no run stats"""
+        if not isinstance(self._run_stats, RunStats):
+            return nullcontext()
+        return self._run_stats.measure(level=intent_level, method=step.method, order=step.order,
+                                       task_name=step.params.get('task_name'))
+
+    def _add_stats(self, **counts):
+        """adds row and byte counts to the run stats of the running task"""
+        if isinstance(self._run_stats, RunStats):
+            self._run_stats.add(**counts)
+        return
+
+    def _load_source_canonical(self, component: Any, canonical: Any) -> Any:
+        """ returns the canonical if it is not empty, else the outcome of an upstream task held in the handoff whose
+        persist connector matches the component source connector, else the canonical loaded from the source"""
+        if isinstance(canonical, CanonicalStream):
+            canonical = canonical.materialize()
+        elif canonical is None or canonical.shape == (0, 0):
+            uri = None
+            if component.pm.has_connector(component.CONNECTOR_SOURCE):
+                uri = component.pm.get_connector_contract(component.CONNECTOR_SOURCE).uri
+            if isinstance(self._handoff, CanonicalHandoff) and self._handoff.has_canonical(uri):
+                canonical = self._handoff.get_canonical(uri)
+            else:
+                canonical = component.load_source_canonical()
+                self._add_stats(bytes_read=RunStats.uri_size(uri) if isinstance(self._run_stats, RunStats) else None)
+        self._add_stats(rows_in=self._row_count(canonical))
+        return canonical
+
+    @staticmethod
+    def _row_count(canonical: Any) -> [int, None]:
+        """returns the number of rows of a canonical, or None if it has no shape"""
+        shape = getattr(canonical, 'shape', None)
+        return int(shape[0]) if isinstance(shape, tuple) and len(shape) > 0 else None
+
+    def _is_streaming(self, component: Any, task_name: str, canonical: Any=None) -> bool:
+        """ if the task is streamed, needing both a streamable source and persist connector. A task passed a
+        non-empty in-memory canonical by its upstream task runs it whole, as it would if it were not streamed"""
+        if not isinstance(self._stream_chunk_size, int) or task_name not in self._stream_tasks:
+            return False
+        if isinstance(canonical, pd.DataFrame) and canonical.shape != (0, 0):
+            return False
+        for connector_name in [component.CONNECTOR_SOURCE, component.CONNECTOR_PERSIST]:
+            if not component.pm.has_connector(connector_name):
+                return False
+            if not CanonicalStream.is_streamable(component.pm.get_connector_contract(connector_name).uri):
+                return False
+        return True
+
+    def _stream_canonical(self, component: Any, canonical: Any, run_chunk: Any) -> CanonicalStream:
+        """ runs the source of a streamed task chunk by chunk, persisting each outcome chunk as it is produced
+
+        :param component: the task component
+        :param canonical: an upstream CanonicalStream, otherwise the source connector is streamed
+        :param run_chunk: a callable taking a chunk and returning the outcome chunk
+        :return: a CanonicalStream over the persisted outcome
+        """
+        if not isinstance(canonical, CanonicalStream):
+            uri = component.pm.get_connector_contract(component.CONNECTOR_SOURCE).uri
+            canonical = CanonicalStream(uri=uri, chunk_size=self._stream_chunk_size)
+        uri = component.pm.get_connector_contract(component.CONNECTOR_PERSIST).uri
+        outcome = canonical.transform(run_chunk, uri=uri)
+        if isinstance(self._run_stats, RunStats):
+            self._add_stats(bytes_read=RunStats.uri_size(canonical.uri), bytes_written=RunStats.uri_size(uri))
+        return outcome
+
+    def _is_incremental(self, component: Any, task_name: str) -> bool:
+        """if the task is run incrementally, needing a watermarked source and an appendable persist connector"""
+        if not isinstance(self._watermark, SourceWatermark) or task_name not in self._incremental_tasks:
+            return False
+        if not component.pm.has_connector(component.CONNECTOR_SOURCE):
+            return False
+        if not component.pm.has_connector(component.CONNECTOR_PERSIST):
+            return False
+        if not SourceWatermark.is_supported(component.pm.get_connector_contract(component.CONNECTOR_SOURCE).uri):
+            return False
+        uri = component.pm.get_connector_contract(component.CONNECTOR_PERSIST).uri
+        return isinstance(SourceWatermark.local_path(uri), str) and CanonicalStream.is_streamable(uri)
+
+    def _run_incremental(self, component: Any, task_name: str, canonical: Any, run_task: Any) -> Any:
+        """ runs the source data that is new since the task watermark and appends the outcome to the persisted
+        outcome. The increment of an upstream incremental task is taken as the new data, and any other non-empty
+        canonical passed from an upstream task as the whole source, replacing the outcome.
+
+        The outcome position is committed with the mark, an upstream canonical committing an 'upstream' mark, and
+        anything appended after the committed position is truncated before the next read, so a run that fails
+        between its append and its commit is not appended twice.
+
+        :param component: the task component
+        :param task_name: the task name
+        :param canonical: the canonical passed from the upstream task
+        :param run_task: a callable taking the new data and returning its outcome
+        :return: an IncrementalStream over the whole persisted outcome, carrying the outcome of the new data, or an
+                 empty DataFrame if there is no outcome
+        """
+        source_uri = component.pm.get_connector_contract(component.CONNECTOR_SOURCE).uri
+        path = SourceWatermark.local_path(component.pm.get_connector_contract(component.CONNECTOR_PERSIST).uri)
+        stream = CanonicalStream(uri=path)
+        committed = self._watermark.get(task_name=task_name, uri=source_uri)
+        if isinstance(committed, dict):
+            stream.truncate(committed.get('outcome'))
+        if isinstance(canonical, IncrementalStream):
+            new, mark, append = canonical.increment, {'mode': 'upstream'}, canonical.appended
+            new = new if new.shape[0] > 0 or not append else None
+        elif isinstance(canonical, pd.DataFrame) and canonical.shape != (0, 0):
+            new, mark, append = canonical, {'mode': 'upstream'}, False
+        else:
+            new, mark, append = self._watermark.read_new(task_name=task_name, uri=source_uri,
+                                                         column=self._incremental_tasks.get(task_name),
+                                                         full=not os.path.exists(path))
+            if isinstance(self._run_stats, RunStats) and new is not None:
+                self._add_stats(bytes_read=RunStats.uri_size(source_uri))
+        if new is None:
+            self._add_stats(rows_in=0, rows_out=0)
+            if not os.path.exists(path):
+                return pd.DataFrame()
+            return IncrementalStream(uri=path, increment=stream.empty(), appended=True)
+        self._add_stats(rows_in=self._row_count(new))
+        outcome = run_task(new)
+        if append:
+            stream.append(outcome)
+        else:
+            # written directly, as appended parts are, so the outcome is in place before the mark is committed
+            writer = ChunkWriter(uri=path)
+            writer.write(outcome)
+            writer.close()
+        self._add_stats(rows_out=self._row_count(outcome))
+        if isinstance(self._run_stats, RunStats):
+            self._add_stats(bytes_written=RunStats.uri_size(path))
+        self._watermark.commit(task_name=task_name, uri=source_uri, mark={**mark, 'outcome': stream.position()})
+        return IncrementalStream(uri=path, increment=outcome, appended=append)
+
+    @staticmethod
+    def _materialize(canonical: Any) -> Any:
+        """returns the canonical, materializing it if it is a CanonicalStream"""
+        if isinstance(canonical, CanonicalStream):
+            return canonical.materialize()
         return canonical
 
+    def _persist_canonical(self, component: Any, connector_name: str, canonical: Any, persist: Any):
+        """ persists the outcome canonical through the persist callable, or through the handoff if started
+
+        :param component: the task component
+        :param connector_name: the name of the connector the canonical persists to
+        :param canonical: the outcome canonical
+        :param persist: the component persist method taking the canonical as a keyword argument
+        """
+        if self._staged(functools.partial(self._persist_canonical, component, connector_name, canonical=canonical,
+                                          persist=persist)):
+            return
+        uri = component.pm.get_connector_contract(connector_name).uri
+        self._add_stats(rows_out=self._row_count(canonical))
+        if isinstance(self._handoff, CanonicalHandoff):
+            mode = self._handoff.persist_mode
+            written = mode == 'sync' or (mode == 'skip' and not self._handoff.is_intermediate(uri))
+            self._handoff.persist(uri=uri, canonical=canonical, persist=lambda x: persist(canonical=x))
+        else:
+            written = True
+            persist(canonical=canonical)
+        if written and isinstance(self._run_stats, RunStats):
+            self._add_stats(bytes_written=RunStats.uri_size(uri))
+        return
+
+    def _write_report(self, component: Any, report_connector_name: str, report: Any, essential: bool=None):
+        """ writes a component report through the report writer, or inline if there is no report writer running
+
+        :param component: the task component
+        :param report_connector_name: the name of the report connector
+        :param report: a callable taking no arguments that returns the report
+        :param essential: (optional) if the report is an essential report
+        """
+        if self._staged(functools.partial(self._write_report, component, report_connector_name, report=report,
+                                          essential=essential)):
+            return
+        writer = self._report_writer
+        if not isinstance(writer, ReportWriter):
+            writer = ReportWriter(background=False)
+        future = writer.write(component, report_connector_name=report_connector_name, report=report,
+                              essential=essential)
+        if future is not None:
+            # the component is not handed to another task until the background report has read it
+            self.COMPONENT_CACHE.lease(component, future)
+        return
+
+    def _get_cached_outcome(self, component: Any, method: str, params: dict, canonical: Any,
+                            connector_name: str=None, persist: Any=None) -> tuple:
+        """ looks up the task outcome in the result cache. On a hit the outcome is persisted again to the connector,
+        as it may have been written by another run since, so downstream tasks reading the connector see the outcome
+
+        :param component: the task component
+        :param method: the intent method name
+        :param params: the intent parameters that change the outcome
+        :param canonical: the input canonical
+        :param connector_name: (optional) the name of the connector the outcome persists to
+        :param persist: (optional) the component persist method taking the canonical as a keyword argument
+        :return: a tuple of the cache key and the cached outcome or None
+        """
+        if not isinstance(self._result_cache, TaskResultCache):
+            return None, None
+        key = self._result_cache.task_key(method=method, params=params,
+                                          contract_version=self._result_cache.contract_version(component),
+                                          input_fingerprint=self._result_cache.fingerprint(canonical))
+        outcome = self._result_cache.get(key, task_name=params.get('task_name'))
+        if outcome is not None and isinstance(connector_name, str) and component.pm.has_connector(connector_name):
+            if callable(persist):
+                self._persist_canonical(component, connector_name, canonical=outcome, persist=persist)
+            else:
+                self._hold_canonical(component.pm.get_connector_contract(connector_name).uri, canonical=outcome)
+        return key, outcome
+
+    def _hold_canonical(self, uri: str, canonical: Any):
+        """holds the outcome canonical in the handoff if started, staged as a persist is"""
+        if self._staged(functools.partial(self._hold_canonical, uri, canonical=canonical)):
+            return
+        if isinstance(self._handoff, CanonicalHandoff):
+            self._handoff.hold(uri=uri, canonical=canonical)
+        return
+
+    def _put_cached_outcome(self, key: [str, None], canonical: Any, task_name: str):
+        """adds the task outcome to the result cache if there is one, staged as a persist is"""
+        if not isinstance(self._result_cache, TaskResultCache) or not isinstance(key, str):
+            return
+        if self._staged(functools.partial(self._put_cached_outcome, key, canonical=canonical, task_name=task_name)):
+            return
+        self._result_cache.put(key, canonical=canonical, task_name=task_name)
+        return
+
+    @classmethod
+    def component_class(cls, method: str) -> Any:
+        """ returns the component class of an intent method, importing the component module on first use
+
+        :param method: the intent method name
+        :return: the component class
+        """
+        if method not in cls.COMPONENTS.keys():
+            raise ValueError(f"The intent method '{method}' does not have a component")
+        return getattr(importlib.import_module(cls.COMPONENT_MODULE), cls.COMPONENTS.get(method))
+
+    def _get_component(self, method: str, task_name: str, uri_pm_repo: str=None):
+        """ returns the component for an intent method from the component cache, instantiating it from its domain
+        contract if it is not cached or its contract has changed
+
+        :param method: the intent method name
+        :param task_name: the task_name reference for the component
+        :param uri_pm_repo: (optional) A repository URI to initially load the property manager but not save to.
+        """
+        component_cls = self.component_class(method)
+        uri_pm_repo = self._resolve_repo(uri_pm_repo, task_name=task_name)
+        return self.COMPONENT_CACHE.get(component_cls, task_name=task_name, uri_pm_repo=uri_pm_repo)
+
+    @staticmethod
+    def _resolve_repo(uri_pm_repo: [str, None], task_name: str=None) -> [str, None]:
+        """ returns the local mirror of the repository if there is a contract mirror with the contract of the task,
+        else the repository URI"""
+        mirror = ContractMirror.from_env()
+        if isinstance(uri_pm_repo, str) and isinstance(mirror, ContractMirror):
+            return mirror.resolve(uri_pm_repo, refresh=False, task_name=task_name)
+        return uri_pm_repo
+
     def synthetic_builder(self, task_name: str, size: int, columns: [str, list]=None, uri_pm_repo: str=None,
                           run_task: bool=None, persist: bool=None, save_intent: bool=None, intent_order: int=None,
                           intent_level: [int, str]=None, replace_intent: bool=None, remove_duplicates: bool=None):
@@ -105,23 +753,65 @@ class ControllerIntentModel(AbstractIntentModel):
                                    remove_duplicates=remove_duplicates, save_intent=save_intent)
         # create the event book
         if isinstance(run_task, bool) and run_task:
-            params = {'uri_pm_repo': uri_pm_repo} if isinstance(uri_pm_repo, str) else {}
-            builder: SyntheticBuilder = eval(f"SyntheticBuilder.from_env(task_name=task_name, default_save=False, "
-                                             f"has_contract=True, **{params})", globals(), locals())
-            canonical = builder.intent_model.run_intent_pipeline(size, columns)
+            builder: SyntheticBuilder = self._get_component(method='synthetic_builder', task_name=task_name,
+                                                            uri_pm_repo=uri_pm_repo)
+            task_params = {'task_name': task_name, 'size': size, 'columns': columns}
+            if isinstance(self._synthetic_shards, int):
+                task_params.update({'shards': self._synthetic_shards, 'seed': self._synthetic_seed,
+                                    'key_columns': self._synthetic_key_columns})
+            cache_key, cached = self._get_cached_outcome(builder, method='synthetic_builder', params=task_params,
+                                                         canonical=None, connector_name=builder.CONNECTOR_PERSIST,
+                                                         persist=builder.save_synthetic_canonical)
+            hit = cached is not None
+            if hit:
+                # the cached outcome has been persisted again, so only the reports are written
+                canonical, cache_key = cached, None
+            elif isinstance(self._synthetic_shards, int) and size > 1:
+                canonical = self._run_synthetic_shards(builder, task_name=task_name, size=size, columns=columns,
+                                                       uri_pm_repo=uri_pm_repo)
+            else:
+                canonical = builder.intent_model.run_intent_pipeline(size, columns)
             # persist the canonical
-            if builder.pm.has_connector(builder.CONNECTOR_PERSIST):
-                builder.save_synthetic_canonical(canonical=canonical)
+            if not hit and builder.pm.has_connector(builder.CONNECTOR_PERSIST) and \
+                    not isinstance(canonical, CanonicalStream):
+                self._persist_canonical(builder, builder.CONNECTOR_PERSIST, canonical=canonical,
+                                        persist=builder.save_synthetic_canonical)
             # create reports
-            if builder.pm.has_connector(builder.REPORT_SCHEMA):
-                builder.save_report_canonical(report_connector_name=builder.REPORT_SCHEMA,
-                                              report=builder.report_canonical_schema(stylise=False))
-            if builder.pm.has_connector(builder.REPORT_CATALOG):
-                builder.save_report_canonical(report_connector_name=builder.REPORT_CATALOG,
-                                              report=builder.report_column_catalog(stylise=False))
+            self._write_report(builder, builder.REPORT_SCHEMA, essential=True,
+                               report=functools.partial(builder.report_canonical_schema, stylise=False))
+            self._write_report(builder, builder.REPORT_CATALOG,
+                               report=functools.partial(builder.report_column_catalog, stylise=False))
+            if not isinstance(canonical, CanonicalStream):
+                self._put_cached_outcome(cache_key, canonical=canonical, task_name=task_name)
             return canonical
         return
 
+    def _run_synthetic_shards(self, builder: 'SyntheticBuilder', task_name: str, size: int, columns: [str, list]=None,
+                              uri_pm_repo: str=None) -> Any:
+        """ builds the synthetic canonical in parallel shards, streaming them to the persist connector if it is a
+        parquet or csv file, else concatenating them
+
+        :return: a CanonicalStream over the persisted shards or the concatenated canonical
+        """
+        sharder = SyntheticShards(size=size, shards=self._synthetic_shards, seed=self._synthetic_seed,
+                                  key_columns=self._synthetic_key_columns)
+        run_shard = functools.partial(run_synthetic_shard, task_name=task_name, columns=columns,
+                                      uri_pm_repo=uri_pm_repo)
+        uri = None
+        if builder.pm.has_connector(builder.CONNECTOR_PERSIST):
+            uri = builder.pm.get_connector_contract(builder.CONNECTOR_PERSIST).uri
+        if isinstance(uri, str) and CanonicalStream.is_streamable(uri):
+            writer = ChunkWriter(uri=uri)
+            try:
+                for shard in sharder.run(run_shard):
+                    writer.write(shard)
+            except Exception:
+                writer.abort()
+                raise
+            writer.close()
+            return CanonicalStream(uri=uri, chunk_size=max(sharder.sizes))
+        return pd.concat(list(sharder.run(run_shard)), axis=0, ignore_index=True)
+
     def transition(self, canonical: Any, task_name: str, uri_pm_repo: str=None, run_task: bool=None,
                    transition_intent: [int, str, list]=None, save_intent: bool=None, intent_order: int=None,
                    intent_level: [int, str]=None, replace_intent: bool=None, remove_duplicates: bool=None):
@@ -149,35 +839,53 @@ class ControllerIntentModel(AbstractIntentModel):
                                    remove_duplicates=remove_duplicates, save_intent=save_intent)
         # create the event book
         if isinstance(run_task, bool) and run_task:
-            params = {'uri_pm_repo': uri_pm_repo} if isinstance(uri_pm_repo, str) else {}
-            tr: Transition = eval(f"Transition.from_env(task_name=task_name, default_save=False, has_contract=True, "
-                                  f"**{params})", globals(), locals())
-            if canonical.shape == (0, 0):
-                canonical = tr.load_source_canonical()
-            canonical = tr.intent_model.run_intent_pipeline(canonical=canonical, intent_levels=intent_level,
-                                                            inplace=False)
-            # persist the canonical
-            if tr.pm.has_connector(tr.CONNECTOR_PERSIST):
-                tr.save_clean_canonical(canonical=canonical)
+            tr: Transition = self._get_component(method='transition', task_name=task_name, uri_pm_repo=uri_pm_repo)
+            incremental = self._is_incremental(tr, task_name=task_name)
+            if incremental:
+                cache_key = None
+                canonical = self._run_incremental(tr, task_name=task_name, canonical=canonical, run_task=lambda x: (
+                    tr.intent_model.run_intent_pipeline(canonical=x, intent_levels=intent_level, inplace=False)))
+            elif self._is_streaming(tr, task_name=task_name, canonical=canonical):
+                cache_key = None
+                canonical = self._stream_canonical(tr, canonical=canonical, run_chunk=lambda x: (
+                    tr.intent_model.run_intent_pipeline(canonical=x, intent_levels=intent_level, inplace=False)))
+            else:
+                canonical = self._load_source_canonical(tr, canonical=canonical)
+                task_params = {'task_name': task_name, 'intent_level': intent_level,
+                               'transition_intent': transition_intent}
+                cache_key, cached = self._get_cached_outcome(tr, method='transition', params=task_params,
+                                                             canonical=canonical, connector_name=tr.CONNECTOR_PERSIST,
+                                                             persist=tr.save_clean_canonical)
+                if cached is not None:
+                    # the cached outcome has been persisted again, so only the reports are written
+                    canonical, cache_key = cached, None
+                else:
+                    canonical = tr.intent_model.run_intent_pipeline(canonical=canonical, intent_levels=intent_level,
+                                                                    inplace=False)
+                    # persist the canonical
+                    if tr.pm.has_connector(tr.CONNECTOR_PERSIST):
+                        self._persist_canonical(tr, tr.CONNECTOR_PERSIST, canonical=canonical,
+                                                persist=tr.save_clean_canonical)
+            # reports of an incremental task are of the increment, so the persisted outcome is not reread, and there
+            # are none without one
+            outcome = canonical.increment if isinstance(canonical, IncrementalStream) else canonical
+            outcome_reports = not incremental or outcome.shape[0] > 0
             # create reports
-            if tr.pm.has_connector(tr.REPORT_SCHEMA):
-                tr.save_report_canonical(report_connector_name=tr.REPORT_SCHEMA,
-                                         report=tr.report_canonical_schema(stylise=False))
-            if tr.pm.has_connector(tr.REPORT_SUMMARY):
-                tr.save_report_canonical(report_connector_name=tr.REPORT_SUMMARY,
-                                         report=tr.report_quality_summary(stylise=False))
-            if tr.pm.has_connector(tr.REPORT_PROVENANCE):
-                tr.save_report_canonical(report_connector_name=tr.REPORT_PROVENANCE,
-                                         report=tr.report_provenance(stylise=False))
-            if tr.pm.has_connector(tr.REPORT_FIELDS):
-                tr.save_report_canonical(report_connector_name=tr.REPORT_FIELDS,
-                                         report=tr.report_attributes(canonical=canonical, stylise=False))
-            if tr.pm.has_connector(tr.REPORT_DICTIONARY):
-                tr.save_report_canonical(report_connector_name=tr.REPORT_DICTIONARY,
-                                         report=tr.canonical_report(canonical=canonical, stylise=False))
-            if tr.pm.has_connector(tr.REPORT_QUALITY):
-                tr.save_report_canonical(report_connector_name=tr.REPORT_QUALITY,
-                                         report=tr.report_quality(canonical=canonical))
+            self._write_report(tr, tr.REPORT_SCHEMA, essential=True,
+                               report=functools.partial(tr.report_canonical_schema, stylise=False))
+            self._write_report(tr, tr.REPORT_SUMMARY, essential=True,
+                               report=functools.partial(tr.report_quality_summary, stylise=False))
+            self._write_report(tr, tr.REPORT_PROVENANCE,
+                               report=functools.partial(tr.report_provenance, stylise=False))
+            # reports over the outcome need a global view so a streamed outcome is materialized
+            if outcome_reports:
+                self._write_report(tr, tr.REPORT_FIELDS, report=lambda: (
+                    tr.report_attributes(canonical=self._materialize(outcome), stylise=False)))
+                self._write_report(tr, tr.REPORT_DICTIONARY, report=lambda: (
+                    tr.canonical_report(canonical=self._materialize(outcome), stylise=False)))
+                self._write_report(tr, tr.REPORT_QUALITY, report=lambda: (
+                    tr.report_quality(canonical=self._materialize(outcome))))
+            self._put_cached_outcome(cache_key, canonical=canonical, task_name=task_name)
             return canonical
         return
 
@@ -208,16 +916,30 @@ class ControllerIntentModel(AbstractIntentModel):
                                    remove_duplicates=remove_duplicates, save_intent=save_intent)
         # create the event book
         if isinstance(run_task, bool) and run_task:
-            params = {'uri_pm_repo': uri_pm_repo} if isinstance(uri_pm_repo, str) else {}
-            wr: Wrangle = eval(f"Transition.from_env(task_name=task_name, default_save=False, has_contract=True, "
-                                  f"**{params})", globals(), locals())
-            if canonical.shape == (0, 0):
-                canonical = wr.load_source_canonical()
-            canonical = wr.intent_model.run_intent_pipeline(canonical=canonical, intent_levels=intent_level,
-                                                            inplace=False)
-            # persist the canonical
-            if wr.pm.has_connector(wr.CONNECTOR_PERSIST):
-                wr.save_wrangled_canonical(canonical=canonical)
+            wr: Wrangle = self._get_component(method='wrangle', task_name=task_name, uri_pm_repo=uri_pm_repo)
+            if self._is_incremental(wr, task_name=task_name):
+                cache_key = None
+                canonical = self._run_incremental(wr, task_name=task_name, canonical=canonical, run_task=lambda x: (
+                    wr.intent_model.run_intent_pipeline(canonical=x, intent_levels=intent_level, inplace=False)))
+            elif self._is_streaming(wr, task_name=task_name, canonical=canonical):
+                cache_key = None
+                canonical = self._stream_canonical(wr, canonical=canonical, run_chunk=lambda x: (
+                    wr.intent_model.run_intent_pipeline(canonical=x, intent_levels=intent_level, inplace=False)))
+            else:
+                canonical = self._load_source_canonical(wr, canonical=canonical)
+                task_params = {'task_name': task_name, 'intent_level': intent_level, 'wrangled_intent': wrangled_intent}
+                cache_key, cached = self._get_cached_outcome(wr, method='wrangle', params=task_params,
+                                                             canonical=canonical, connector_name=wr.CONNECTOR_PERSIST,
+                                                             persist=wr.save_wrangled_canonical)
+                if cached is not None:
+                    return cached
+                canonical = wr.intent_model.run_intent_pipeline(canonical=canonical, intent_levels=intent_level,
+                                                                inplace=False)
+                # persist the canonical
+                if wr.pm.has_connector(wr.CONNECTOR_PERSIST):
+                    self._persist_canonical(wr, wr.CONNECTOR_PERSIST, canonical=canonical,
+                                            persist=wr.save_wrangled_canonical)
+            self._put_cached_outcome(cache_key, canonical=canonical, task_name=task_name)
             return canonical
         return
 
@@ -254,15 +976,24 @@ class ControllerIntentModel(AbstractIntentModel):
                                    remove_duplicates=remove_duplicates, save_intent=save_intent)
         # create the event book
         if isinstance(run_task, bool) and run_task:
-            params = {'uri_pm_repo': uri_pm_repo} if isinstance(uri_pm_repo, str) else {}
-            fc: FeatureCatalog = eval(f"FeatureCatalog.from_env(task_name=task_name, default_save=False, "
-                                      f"has_contract=True, **{params})", globals(), locals())
-            if canonical.shape == (0, 0):
-                canonical = fc.load_source_canonical()
+            fc: FeatureCatalog = self._get_component(method='feature_catalog', task_name=task_name,
+                                                     uri_pm_repo=uri_pm_repo)
+            canonical = self._load_source_canonical(fc, canonical=canonical)
+            cache_key, cached = self._get_cached_outcome(fc, method='feature_catalog',
+                                                         params={'task_name': task_name, 'feature_name': feature_name,
+                                                                 'train_size': train_size, 'seed': seed,
+                                                                 'shuffle': shuffle},
+                                                         canonical=canonical, connector_name=feature_name,
+                                                         persist=functools.partial(fc.save_catalog_feature,
+                                                                                   feature_name=feature_name))
+            if cached is not None:
+                return cached
             canonical = fc.intent_model.run_intent_pipeline(canonical=canonical, feature_name=feature_name,
                                                             train_size=train_size, seed=seed, shuffle=shuffle)
             if fc.pm.has_connector(feature_name):
-                fc.save_catalog_feature(feature_name=feature_name, canonical=canonical)
+                self._persist_canonical(fc, feature_name, canonical=canonical,
+                                        persist=functools.partial(fc.save_catalog_feature, feature_name=feature_name))
+            self._put_cached_outcome(cache_key, canonical=canonical, task_name=task_name)
             return canonical
         return
 
@@ -294,14 +1025,20 @@ class ControllerIntentModel(AbstractIntentModel):
                                    remove_duplicates=remove_duplicates, save_intent=save_intent)
         # create the event book
         if isinstance(run_task, bool) and run_task:
-            params = {'uri_pm_repo': uri_pm_repo} if isinstance(uri_pm_repo, str) else {}
-            ct: DataDrift = eval(f"DataTolerance.from_env(task_name=task_name, default_save=False, "
-                                 f"has_contract=True, **{params})", globals(), locals())
-            if canonical.shape == (0, 0):
-                canonical = ct.load_source_canonical()
+            ct: DataDrift = self._get_component(method='data_drift', task_name=task_name, uri_pm_repo=uri_pm_repo)
+            canonical = self._load_source_canonical(ct, canonical=canonical)
+            cache_key, cached = self._get_cached_outcome(ct, method='data_drift',
+                                                         params={'task_name': task_name, 'measure': measure},
+                                                         canonical=canonical, connector_name=measure,
+                                                         persist=functools.partial(ct.save_catalog_feature,
+                                                                                   feature_name=measure))
+            if cached is not None:
+                return cached
             canonical = ct.intent_model.run_intent_pipeline(canonical=canonical, measure=measure)
             if ct.pm.has_connector(measure):
-                ct.save_catalog_feature(feature_name=measure, canonical=canonical)
+                self._persist_canonical(ct, measure, canonical=canonical,
+                                        persist=functools.partial(ct.save_catalog_feature, feature_name=measure))
+            self._put_cached_outcome(cache_key, canonical=canonical, task_name=task_name)
             return canonical
         return
 
@@ -335,3 +1072,62 @@ class ControllerIntentModel(AbstractIntentModel):
                                       replace_intent=replace_intent, remove_duplicates=remove_duplicates,
                                       save_intent=save_intent)
         return
+
+
+def run_synthetic_shard(size: int, seed: int, task_name: str, columns: [str, list]=None,
+                        uri_pm_repo: str=None) -> pd.DataFrame:
+    """ builds one shard of a synthetic canonical in a worker process, seeding the global random generators with
+    the shard seed
+
+    :param size: the size of the shard
+    :param seed: the seed of the shard
+    :param task_name: the task name of the synthetic builder
+    :param columns: (optional) the builder columns to run
+    :param uri_pm_repo: (optional) a repository URI to load the builder property manager from
+    :return: the shard canonical
+    """
+    SyntheticShards.set_seed(seed)
+    uri_pm_repo = ControllerIntentModel._resolve_repo(uri_pm_repo, task_name=task_name)
+    params = {'uri_pm_repo': uri_pm_repo} if isinstance(uri_pm_repo, str) else {}
+    builder_cls = ControllerIntentModel.component_class('synthetic_builder')
+    builder = builder_cls.from_env(task_name=task_name, default_save=False, has_contract=True, **params)
+    return builder.intent_model.run_intent_pipeline(size, columns)
+
+
+def run_intent_level(intent_level: str, task_name: str, level_intents: dict, synthetic_sizes: dict=None,
+                     controller_repo: str=None, run_options: dict=None, run_id: str=None,
+                     level_intermediates: dict=None) -> list:
+    """ runs a single intent level in a fresh intent model. Used by the level scheduler to run a level in a worker
+    process, so all parameters must be picklable and the level must persist its own outcome.
+
+    :param intent_level: the intent level to run
+    :param task_name: the task name of the controller
+    :param level_intents: a dictionary of intent level to the level intent contract
+    :param synthetic_sizes: (optional) a dictionary keyed by intent level with a synthetic size parameter
+    :param controller_repo: (optional) the controller repo to use if no uri_pm_repo is within the intent parameters
+    :param run_options: (optional) the level options of the controller run, see `RunOptions.level_options()`
+    :param run_id: (optional) the run id of the controller run, if the run stats of each task should be recorded
+    :param level_intermediates: (optional) with handoff, a dictionary of intent level to the URIs read by the
+                    downstream tasks of the level
+    :return: the run stats records of the intent level, empty if no run_id was given
+    """
+    pm = ControllerPropertyManager(task_name=task_name, username='controller_worker')
+    synthetic_size = synthetic_sizes.get(intent_level, None) if isinstance(synthetic_sizes, dict) else None
+    intent_model = ControllerIntentModel(property_manager=pm, default_save_intent=False)
+    options = RunOptions.from_dict(run_options)
+    run_stats = RunStats(run_id=run_id, profile=options.profile) if isinstance(run_id, str) else None
+    intermediates = level_intermediates.get(intent_level, []) if isinstance(level_intermediates, dict) else None
+    options.configure(intent_model, task_name=task_name, intermediates=intermediates, run_stats=run_stats)
+    try:
+        if isinstance(run_stats, RunStats):
+            with run_stats.measure(level=intent_level, method='level', task_name=task_name):
+                intent_model.run_intent_pipeline(intent_level=intent_level, synthetic_size=synthetic_size,
+                                                 controller_repo=controller_repo,
+                                                 level_intent=level_intents.get(intent_level, {}))
+        else:
+            intent_model.run_intent_pipeline(intent_level=intent_level, synthetic_size=synthetic_size,
+                                             controller_repo=controller_repo,
+                                             level_intent=level_intents.get(intent_level, {}))
+    finally:
+        RunOptions.release(intent_model)
+    return run_stats.records if isinstance(run_stats, RunStats) else []
@@ -0,0 +1,78 @@
+from copy import deepcopy
+from typing import Any, Callable
+
+__author__ = 'Darryl Oatridge'
+
+
+class DispatchStep(object):
+    """ A single intent method call of a dispatch plan, the bound intent method and its contracted parameters"""
+
+    __slots__ = ['method', 'call', 'params', 'order']
+
+    def __init__(self, method: str, call: Callable[..., Any], params: dict, order: [int, str]=None):
+        self.method = method
+        self.call = call
+        self.params = params
+        self.order = order
+
+    def run(self, *args, **params) -> Any:
+        """ calls the intent method with the contracted parameters, updated by the given parameters"""
+        return self.call(*args, **{**self.params, **params})
+
+
+class DispatchPlan(object):
+    """ A pre-compiled intent level. The level intent is resolved once into an ordered tuple of steps, each
+    holding the bound intent method and its parameters as native objects, so an intent level is run by calling
+    the steps directly. The plan holds a copy of the level intent it was compiled from and is recompiled only
+    when the level intent in the contract no longer matches.
+    """
+
+    def __init__(self, intent_model: Any, level_intent: dict, flatten_kwargs: bool=None):
+        """ compiles the plan of an intent level
+
+        :param intent_model: the intent model whose methods the steps are bound to
+        :param level_intent: the intent level contract of order to intent methods and their parameters
+        :param flatten_kwargs: (optional) if a contracted 'kwargs' parameter is flattened into the parameters
+        """
+        self._level_intent = deepcopy(level_intent) if isinstance(level_intent, dict) else {}
+        methods = set(intent_model.__dir__())
+        steps = []
+        for order in sorted(self._level_intent):
+            for method, params in self._level_intent.get(order, {}).items():
+                if method not in methods:
+                    continue
+                params = deepcopy(params)
+                if isinstance(flatten_kwargs, bool) and flatten_kwargs:
+                    params.update(params.pop('kwargs', {}))
+                _ = params.pop('intent_creator', 'Unknown')
+                steps.append(DispatchStep(method=method, call=getattr(intent_model, method), params=params,
+                                          order=order))
+        self._steps = tuple(steps)
+
+    @classmethod
+    def get_plan(cls, intent_model: Any, plans: dict, intent_level: [int, str], level_intent: dict,
+                 flatten_kwargs: bool=None):
+        """ returns the compiled plan of the intent level from the plans, compiling it if it is not in the plans
+        or the level intent has changed
+
+        :param intent_model: the intent model whose methods the steps are bound to
+        :param plans: the dictionary of compiled plans, keyed by intent level
+        :param intent_level: the intent level
+        :param level_intent: the current intent level contract
+        :param flatten_kwargs: (optional) if a contracted 'kwargs' parameter is flattened into the parameters
+        :return: DispatchPlan
+        """
+        plan = plans.get(str(intent_level))
+        if not isinstance(plan, cls) or not plan.is_valid(level_intent):
+            plan = cls(intent_model=intent_model, level_intent=level_intent, flatten_kwargs=flatten_kwargs)
+            plans[str(intent_level)] = plan
+        return plan
+
+    @property
+    def steps(self) -> tuple:
+        """the ordered steps of the plan"""
+        return self._steps
+
+    def is_valid(self, level_intent: dict) -> bool:
+        """if the plan was compiled from the given level intent"""
+        return isinstance(level_intent, dict) and level_intent == self._level_intent
@@ -3,6 +3,7 @@ import inspect
 from aistac.intent.abstract_intent import AbstractIntentModel
 from ds_engines.engines.event_books.abstract_event_book import EventBookContract, EventBookFactory
 from ds_engines.engines.event_books.pandas_event_book import PandasEventBook
+from ds_engines.intent.dispatch_plan import DispatchPlan
 from ds_engines.managers.event_book_property_manager import EventBookPropertyManager
 
 __author__ = 'Darryl Oatridge'
@@ -28,6 +29,7 @@ class EventBookIntentModel(AbstractIntentModel):
                          intent_param_exclude=intent_param_exclude, default_intent_level=default_intent_level,
                          default_intent_order=default_intent_order, default_replace_intent=default_replace_intent,
                          intent_type_additions=intent_type_additions)
+        self._dispatch_plans = dict()
 
     def run_intent_pipeline(self, book_names: [int, str, list]=None, **kwargs):
         """ Collectively runs all parameterised intent taken from the property manager against the code base as
@@ -44,20 +46,15 @@ class EventBookIntentModel(AbstractIntentModel):
             else:
                 intent_levels = sorted(self._pm.get_intent().keys())
             for level in intent_levels:
-                level_key = self._pm.join(self._pm.KEY.intent_key, level)
-                for order in sorted(self._pm.get(level_key, {})):
-                    for method, params in self._pm.get(self._pm.join(level_key, order), {}).items():
-                        if method in self.__dir__():
-                            # add method kwargs to the params
-                            if isinstance(kwargs, dict):
-                                params.update(kwargs)
-                            # remove the creator param
-                            _ = params.pop('intent_creator', 'Unknown')
-                            # add excluded params and set to False
-                            params.update({'start_book': True, 'save_intent': False})
-                            book_name = level
-                            eb = eval(f"self.{method}(book_name='{level}', **{params})", globals(), locals())
-                            book_portfolio.update({book_name: eb})
+                level_intent = self._pm.get(self._pm.join(self._pm.KEY.intent_key, level), {})
+                plan = DispatchPlan.get_plan(self, plans=self._dispatch_plans, intent_level=level,
+                                             level_intent=level_intent)
+                for step in plan.steps:
+                    # add method kwargs and set the excluded params
+                    params = dict(kwargs) if isinstance(kwargs, dict) else {}
+                    params.update({'start_book': True, 'save_intent': False})
+                    eb = step.run(book_name=str(level), **params)
+                    book_portfolio.update({level: eb})
         return book_portfolio
 
     def add_event_book(self, book_name: str, module_name: str=None, event_book_cls: str=None, start_book: bool=None,
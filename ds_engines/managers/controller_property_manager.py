@@ -10,7 +10,7 @@ class ControllerPropertyManager(AbstractPropertyManager):
     def __init__(self, task_name: str, username: str):
         """Abstract Class for the Master Properties"""
         root_keys = [{'use_case': ['title', 'domain', 'project', 'overview', 'scope', 'situation', 'opportunity',
-                                   'actions', 'author']}]
+                                   'actions', 'author']}, 'dependencies']
         knowledge_keys = []
         super().__init__(task_name=task_name, root_keys=root_keys, knowledge_keys=knowledge_keys, username=username)
 
@@ -57,3 +57,30 @@ class ControllerPropertyManager(AbstractPropertyManager):
         self._base_pm.remove(self.KEY.use_case_key)
         self.set(self.KEY.use_case_key, {})
         return
+
+    @property
+    def dependencies(self) -> dict:
+        """Return the intent level dependencies"""
+        return self.get(self.KEY.dependencies_key, {})
+
+    def get_dependencies(self, intent_level: [str, int]) -> list:
+        """returns the list of intent levels the given intent level depends on"""
+        return self.list_formatter(self.get(self.join(self.KEY.dependencies_key, intent_level), []))
+
+    def set_dependencies(self, intent_level: [str, int], depends_on: [str, int, list]):
+        """ sets the intent levels an intent level depends on, replacing any already set
+
+        :param intent_level: the intent level
+        :param depends_on: a single or list of intent levels that must complete before the intent level runs
+        """
+        self.set(self.join(self.KEY.dependencies_key, intent_level), [str(x) for x in self.list_formatter(depends_on)])
+        return
+
+    def remove_dependencies(self, intent_level: [str, int]=None):
+        """removes the dependencies of an intent level or, if no intent level is given, all dependencies"""
+        if intent_level is None:
+            self._base_pm.remove(self.KEY.dependencies_key)
+            self.set(self.KEY.dependencies_key, {})
+        else:
+            self._base_pm.remove(self.join(self.KEY.dependencies_key, intent_level))
+        return
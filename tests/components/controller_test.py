@@ -9,6 +9,8 @@ from ds_behavioral.intent.synthetic_intent_model import SyntheticIntentModel
 from aistac.properties.property_manager import PropertyManager
 
 from ds_engines import Controller
+from ds_engines.engines.controller.run_journal import RunJournal
+from ds_engines.engines.controller.run_stats import RunStats
 
 
 class ControllerTest(unittest.TestCase):
@@ -58,6 +60,25 @@ class ControllerTest(unittest.TestCase):
                                                              controller_repo=uri_pm_repo)
         self.assertEqual((100, 25), result.shape)
 
+    def test_run_controller_resume(self):
+        uri_pm_repo = "https://raw.githubusercontent.com/project-hadron/hadron-asset-bank/master/contracts/healthcare/factory/members/"
+        controller = Controller.from_env(uri_pm_repo=uri_pm_repo)
+        journal = RunJournal(task_name=controller.pm.task_name, journal_path=os.path.join('work', 'journal'))
+        controller.intent_model.start_journal(journal=journal, resume=False)
+        result = controller.intent_model.run_intent_pipeline(intent_level='generator', synthetic_size=100,
+                                                             controller_repo=uri_pm_repo)
+        self.assertEqual((100, 25), result.shape)
+        # a resumed run skips the completed tasks, passing on their persisted outcome
+        controller.intent_model.start_journal(journal=journal, resume=True)
+        run_stats = RunStats()
+        controller.intent_model.set_run_stats(run_stats)
+        resumed = controller.intent_model.run_intent_pipeline(intent_level='generator', synthetic_size=100,
+                                                              controller_repo=uri_pm_repo)
+        controller.intent_model.stop_journal()
+        self.assertEqual({'resumed'}, set(run_stats.report()['status']))
+        self.assertEqual(result.shape, resumed.shape)
+        self.assertEqual(result.columns.to_list(), resumed.columns.to_list())
+
     def test_report_tasks(self):
         uri_pm_repo = "https://raw.githubusercontent.com/project-hadron/hadron-asset-bank/master/contracts/healthcare/factory/members/"
         controller = Controller.from_env(uri_pm_repo=uri_pm_repo)
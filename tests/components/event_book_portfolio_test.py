@@ -7,6 +7,7 @@ import pandas as pd
 from aistac.handlers.abstract_handlers import ConnectorContract
 
 from ds_engines.components.event_book_portfolio import EventBookPortfolio
+from ds_engines.engines.event_books.book_query import BookQuery
 from ds_engines.managers.event_book_property_manager import EventBookPropertyManager
 
 
@@ -27,6 +28,77 @@ class EventBookPortfolioTest(unittest.TestCase):
         engine = EventBookPortfolio.from_env('task', has_contract=False)
         self.assertTrue(isinstance(engine, EventBookPortfolio))
 
+    def test_bulk_events(self):
+        engine = EventBookPortfolio.from_env('task', default_save=False, has_contract=False)
+        engine.reset_portfolio()
+        book_names = [f"book_{n}" for n in range(10)]
+        for book_name in book_names:
+            engine.intent_model.add_event_book(book_name=book_name)
+        engine.start_portfolio()
+        result = engine.add_events({book: pd.DataFrame({'A': [1, 2], 'B': [n, n]})
+                                    for n, book in enumerate(book_names)})
+        self.assertEqual(book_names, list(result.keys()))
+        _ = engine.increment_events({book: pd.DataFrame({'A': [1, 1]}) for book in book_names})
+        self.assertEqual([2, 3], engine.current_state('book_3')['A'].to_list())
+        self.assertEqual([3, 3], engine.current_state('book_3')['B'].to_list())
+        with self.assertRaises(ValueError):
+            engine.add_events({'book_0': pd.DataFrame({'A': [1]}), 'unknown': pd.DataFrame({'A': [1]})})
+        # nothing is applied if a book is not active
+        self.assertEqual([2, 3], engine.current_state('book_0')['A'].to_list())
+        engine.remove_event_books(book_names[5:])
+        self.assertFalse(engine.is_active_book('book_5'))
+        self.assertTrue(engine.is_active_book('book_4'))
+        engine.reset_portfolio()
+
+    def test_query(self):
+        engine = EventBookPortfolio.from_env('task', default_save=False, has_contract=False)
+        engine.reset_portfolio()
+        for book_name in ['orders', 'customers']:
+            engine.intent_model.add_event_book(book_name=book_name)
+        engine.start_portfolio()
+        _ = engine.add_events({'orders': pd.DataFrame({'customer': [1, 2, 1], 'amount': [50, 150, 300]}),
+                               'customers': pd.DataFrame({'customer': [1, 2], 'region': ['N', 'S']})})
+        query = BookQuery('orders', columns='amount', where=[('amount', '>', 100)])
+        query.join('customers', on='customer', columns='region').group_by('region', aggregate={'amount': 'sum'})
+        self.assertEqual({'N': 300, 'S': 150}, engine.query(query)['amount'].to_dict())
+        with self.assertRaises(ValueError):
+            engine.query(BookQuery('unknown'))
+        engine.reset_portfolio()
+
+    def test_snapshot_portfolio(self):
+        engine = EventBookPortfolio.from_env('task', default_save=False, has_contract=False)
+        engine.reset_portfolio()
+        engine.set_book_contract_template(uri_path=os.path.join(os.environ['HADRON_PM_PATH'], 'books'),
+                                          module_name='aistac.handlers.python_handlers',
+                                          handler='PythonPersistHandler')
+        book_names = [f"book_{n}" for n in range(5)]
+        for book_name in book_names:
+            engine.intent_model.add_event_book(book_name=book_name)
+            engine.add_book_contract(book_name=book_name)
+        engine.start_portfolio()
+        _ = engine.add_events({book: pd.DataFrame({'A': [n, n]}) for n, book in enumerate(book_names)})
+        manifest = engine.snapshot_portfolio()
+        self.assertEqual(book_names, list(manifest['books'].keys()))
+        self.assertEqual([2, 1], manifest['books']['book_2']['shape'])
+        # each book snapshot is written to its own URI scoped by the snapshot id
+        self.assertIn(f"/snapshots/{manifest['snapshot_id']}/", manifest['books']['book_2']['uri'])
+        self.assertTrue(os.path.exists(manifest['books']['book_2']['uri']))
+        # the earlier snapshots beyond the retention count are removed once the manifest is written
+        second = engine.snapshot_portfolio(retain=2)
+        self.assertEqual([manifest['snapshot_id']], [s['snapshot_id'] for s in second['retained']])
+        self.assertTrue(os.path.exists(manifest['books']['book_2']['uri']))
+        manifest = engine.snapshot_portfolio()
+        self.assertEqual([], manifest['retained'])
+        self.assertFalse(os.path.exists(second['books']['book_2']['uri']))
+        # changes after the snapshot are rolled back on recovery
+        _ = engine.increment_events({book: pd.DataFrame({'A': [10, 10]}) for book in book_names})
+        self.assertEqual([12, 12], engine.current_state('book_2')['A'].to_list())
+        self.assertEqual(book_names, engine.recover_portfolio())
+        self.assertEqual([2, 2], engine.current_state('book_2')['A'].to_list())
+        with self.assertRaises(ValueError):
+            engine.recover_portfolio(book_names='unknown')
+        engine.reset_portfolio()
+
 
 if __name__ == '__main__':
     unittest.main()
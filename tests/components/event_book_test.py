@@ -1,9 +1,11 @@
+import threading
 import shutil
 import unittest
 import os
 import pandas as pd
 import numpy as np
 from aistac.handlers.abstract_handlers import ConnectorContract
+from ds_engines.engines.event_books.abstract_event_book import AbstractEventBook
 from ds_engines.engines.event_books.pandas_event_book import PandasEventBook
 
 
@@ -100,6 +102,111 @@ class EventBookTest(unittest.TestCase):
         engine.increment_event(event=pd.DataFrame(data={'A': [1,1,1]}))
         self.assertEqual(1, len(engine._current_events_log.keys()), "loop Four")
 
+    def test_recover_columns(self):
+        state_uri = os.path.join(os.environ['HADRON_PM_PATH'], 'state.pickle')
+        state_connector = ConnectorContract(uri=state_uri, module_name=self.MODULE, handler=self.HANDLER)
+        event_book = PandasEventBook('test', state_connector=state_connector)
+        event_book.add_event(event=pd.DataFrame({'A': [1, 2], 'B': [3, 4]}))
+        event_book.save_state(with_reset=True)
+        # a handler without projection loads the full state before it is projected
+        event_book.recover_state(columns=['B'])
+        self.assertEqual(['B'], event_book.current_state().columns.to_list())
+        self.assertEqual([3, 4], event_book.current_state()['B'].to_list())
+
+    def test_fix_index(self):
+        event_book = PandasEventBook('test')
+        # an empty book takes the index of the first event
+        event_book.add_event(event=pd.DataFrame({'A': [1, 2, 3]}), fix_index=True)
+        self.assertEqual([0, 1, 2], event_book.current_state().index.to_list())
+        # events outside the book index are dropped
+        event_book.add_event(event=pd.DataFrame({'B': [5, 6]}, index=[2, 9]), fix_index=True)
+        result = event_book.current_state()
+        self.assertEqual([0, 1, 2], result.index.to_list())
+        self.assertEqual(5, result.loc[2, 'B'])
+        # the index keys are maintained through increments
+        event_book.increment_event(event=pd.DataFrame({'A': [1]}, index=[7]))
+        event_book.add_event(event=pd.DataFrame({'C': [4]}, index=[7]), fix_index=True)
+        self.assertEqual(4, event_book.current_state().loc[7, 'C'])
+        # an event of the same length as the book is set by key rather than position, including repeated keys
+        event_book = PandasEventBook('test')
+        event_book.add_event(event=pd.DataFrame({'A': [1, 2, 3]}, index=[0, 0, 1]), fix_index=True)
+        event_book.add_event(event=pd.DataFrame({'B': [7, 8, 9]}, index=[1, 0, 2]), fix_index=True)
+        self.assertEqual([8, 8, 7], event_book.current_state()['B'].to_list())
+
+    def test_subscribe(self):
+        event_book = PandasEventBook('test')
+        pushed = []
+        pusher = event_book.subscribe(callback=pushed.append)
+        cursor = event_book.subscribe(max_records=2)
+        event_book.add_event(event=pd.DataFrame({'A': [1, 1, 1]}), fix_index=False)
+        event_book.increment_event(event=pd.DataFrame({'A': [2]}, index=[1]))
+        self.assertTrue(pusher.flush(timeout=5))
+        self.assertEqual(['add', 'increment'], [r.action for r in pushed])
+        self.assertEqual([1], pushed[1].index)
+        self.assertEqual([3], pushed[1].values['A'].to_list())
+        event_book.decrement_event(event=pd.DataFrame({'A': [1]}, index=[2]))
+        records = cursor.poll()
+        self.assertEqual(['increment', 'decrement'], [r.action for r in records])
+        self.assertEqual(1, records.dropped)
+        self.assertEqual(0, cursor.poll().dropped)
+        self.assertEqual(0, cursor.pending())
+        event_book.unsubscribe(cursor)
+        event_book.reset_state()
+        self.assertEqual(0, cursor.pending())
+        self.assertTrue(pusher.flush(timeout=5))
+        self.assertEqual(None, pushed[-1].columns)
+        # a slow callback does not hold the writer, and records beyond the bound are dropped
+        release = threading.Event()
+        slow = event_book.subscribe(callback=lambda x: release.wait(5), max_records=1)
+        for n in range(3):
+            event_book.add_event(event=pd.DataFrame({'A': [n]}))
+        release.set()
+        self.assertTrue(slow.flush(timeout=5))
+        self.assertGreaterEqual(slow.dropped, 1)
+        event_book.unsubscribe(slow)
+        # the dropped count is passed to the resync callable before the next pushed record and reset
+        release, resyncs, pushed = threading.Event(), [], []
+        slow = event_book.subscribe(callback=lambda x: release.wait(5) and pushed.append(x), max_records=1,
+                                    resync=resyncs.append)
+        for n in range(3):
+            event_book.add_event(event=pd.DataFrame({'A': [n]}))
+        release.set()
+        self.assertTrue(slow.flush(timeout=5))
+        self.assertEqual(1, len(resyncs))
+        self.assertEqual(3, resyncs[0] + len(pushed))
+        self.assertEqual(0, slow.dropped)
+        event_book.unsubscribe(slow)
+
+    def test_snapshot_state(self):
+        event_book = PandasEventBook('test')
+        event_book.add_event(event=pd.DataFrame({'A': [1, 2], 'B': [3, 4]}))
+        snapshot = event_book.snapshot_state()
+        event_book.add_event(event=pd.DataFrame({'A': [9, 9]}))
+        event_book.increment_event(event=pd.DataFrame({'B': [1, 1]}))
+        # the snapshot is unchanged by later events
+        self.assertEqual([1, 2], snapshot['A'].to_list())
+        self.assertEqual([3, 4], snapshot['B'].to_list())
+        self.assertEqual([9, 9], event_book.current_state()['A'].to_list())
+        # a restored snapshot is unchanged by events on the restored book
+        restored = PandasEventBook('restored')
+        restored.restore_state(state=snapshot)
+        restored.add_event(event=pd.DataFrame({'A': [5, 5]}))
+        self.assertEqual([1, 2], snapshot['A'].to_list())
+        self.assertEqual([5, 5], restored.current_state()['A'].to_list())
+        with self.assertRaises(ValueError):
+            restored.restore_state(state={'A': [1]})
+        # the version is restored to the snapshot version, but never goes back
+        restored = PandasEventBook('restored')
+        restored.restore_state(state=snapshot, version=5)
+        self.assertEqual(5, restored.version)
+        restored.restore_state(state=snapshot, version=2)
+        self.assertEqual(6, restored.version)
+        # the default restore resets the book and adds the state as an event
+        restored = PandasEventBook('restored')
+        AbstractEventBook.restore_state(restored, state=snapshot, version=5)
+        self.assertEqual(5, restored.version)
+        self.assertEqual([1, 2], restored.current_state()['A'].to_list())
+
     def test_fillna(self):
         eb = PandasEventBook('test')
         event = pd.DataFrame({'A': [1, 1, 1], 'E': [1.1, 1.5, 2.6]})
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from ds_engines.engines.event_books.async_event_book import AsyncEventBook
+from ds_engines.engines.event_books.pandas_event_book import PandasEventBook
+
+
+class SavingEventBook(PandasEventBook):
+
+    def __init__(self, book_name: str):
+        super().__init__(book_name=book_name)
+        self.saves = []
+        self.release = threading.Event()
+
+    def save_state(self, with_reset: bool=None, fillna: bool=None, **kwargs):
+        self.release.wait(5)
+        self.saves.append(with_reset)
+        if with_reset:
+            self.reset_state()
+
+
+class AsyncEventBookTest(unittest.TestCase):
+
+    def test_save_state(self):
+        book = SavingEventBook('book')
+        book.add_event(pd.DataFrame({'a': [1, 2]}))
+        async_book = AsyncEventBook(book)
+
+        async def checkpoint():
+            saves = [asyncio.ensure_future(async_book.save_state()), asyncio.ensure_future(async_book.save_state()),
+                     asyncio.ensure_future(async_book.save_state(with_reset=True))]
+            await asyncio.sleep(0.05)
+            book.release.set()
+            await asyncio.gather(*saves)
+
+        asyncio.run(checkpoint())
+        # the same arguments share the in-flight save and a reset is queued after it rather than dropped
+        self.assertEqual([None, True], book.saves)
+        self.assertEqual((0, 0), book.current_state().shape)
+
+    def test_queued_save(self):
+        book = SavingEventBook('book')
+        executor = ThreadPoolExecutor(max_workers=2)
+        async_book = AsyncEventBook(book, executor=executor)
+
+        async def checkpoint():
+            saves = [asyncio.ensure_future(async_book.save_state()),
+                     asyncio.ensure_future(async_book.save_state(with_reset=True))]
+            await asyncio.sleep(0.05)
+            # the queued save does not hold the second worker while the first save runs
+            self.assertEqual('free', executor.submit(lambda: 'free').result(timeout=1))
+            book.release.set()
+            await asyncio.gather(*saves)
+
+        asyncio.run(checkpoint())
+        self.assertEqual([None, True], book.saves)
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
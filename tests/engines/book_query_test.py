@@ -0,0 +1,86 @@
+import unittest
+import pandas as pd
+from ds_engines.engines.event_books.book_query import BookQuery
+from ds_engines.engines.event_books.event_book_controller import EventBookController
+from ds_engines.engines.event_books.pandas_event_book import PandasEventBook
+
+
+class BookQueryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.books = {'orders': PandasEventBook('orders'), 'customers': PandasEventBook('customers')}
+        self.books['orders'].add_event(pd.DataFrame({'customer': [1, 2, 1, 3], 'amount': [50, 150, 300, 200],
+                                                     'note': ['a', 'b', 'c', 'd']}))
+        self.books['customers'].add_event(pd.DataFrame({'customer': [1, 2, 3], 'region': ['N', 'S', 'N']}))
+        self.read = []
+
+    def read_state(self, book_name: str, reader):
+        self.read.append(book_name)
+        return self.books[book_name].read_state(reader)
+
+    def test_projection(self):
+        result = BookQuery('orders', columns=['amount'], where=[('amount', '>=', 150),
+                                                                ('customer', '!=', 3)]).execute(self.read_state)
+        self.assertEqual(['amount'], result.columns.to_list())
+        self.assertEqual([150, 300], result['amount'].to_list())
+        # the result is independent of the book state
+        result.loc[:, 'amount'] = 0
+        projection = BookQuery('orders', columns='amount').execute(self.read_state)
+        projection.loc[:, 'amount'] = 0
+        self.assertEqual([50, 150, 300, 200], self.books['orders'].current_state()['amount'].to_list())
+        result = BookQuery('orders', where=[('customer', 'in', [2, 3]), ('note', 'notna')]).execute(self.read_state)
+        self.assertEqual([1, 3], result.index.to_list())
+
+    def test_join_group_by(self):
+        query = BookQuery('orders', columns=['amount'], where=[('amount', '>', 100)])
+        query.join('customers', on='customer', columns=['region']).group_by('region', aggregate={'amount': 'sum'})
+        result = query.execute(self.read_state)
+        self.assertEqual({'N': 500, 'S': 150}, result['amount'].to_dict())
+        self.assertEqual(['orders', 'customers'], self.read)
+        # joined on the book index
+        result = BookQuery('orders', columns='amount').join('customers', columns='region').execute(self.read_state)
+        self.assertEqual(['N', 'S', 'N'], result['region'].to_list())
+        # a column in both books takes the joined book name as a suffix
+        result = BookQuery('orders', columns='customer').join('customers', how='left').execute(self.read_state)
+        self.assertEqual(['customer', 'customer_customers', 'region'], result.columns.to_list())
+        # a join on columns keeps the book index for a later join on the book index
+        self.books['shipments'] = PandasEventBook('shipments')
+        self.books['shipments'].add_event(pd.DataFrame({'shipment': ['s0', 's1', 's2', 's3']}))
+        query = BookQuery('orders', columns='amount', where=[('amount', '>', 100)])
+        result = query.join('customers', on='customer').join('shipments').execute(self.read_state)
+        self.assertEqual([1, 2, 3], result.index.to_list())
+        self.assertEqual(['s1', 's2', 's3'], result['shipment'].to_list())
+        self.assertEqual(['S', 'N', 'N'], result['region'].to_list())
+        # a group by column in both books is taken from the book that projects it
+        self.books['orders'].add_event(pd.DataFrame({'region': ['X', 'X', 'X', 'X']}))
+        query = BookQuery('orders', columns='amount').join('customers', on='customer', columns='region')
+        result = query.group_by('region', aggregate={'amount': 'sum'}).execute(self.read_state)
+        self.assertEqual({'N': 550, 'S': 150}, result['amount'].to_dict())
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            BookQuery('orders', where=[('amount', 'like', 1)])
+        with self.assertRaises(ValueError):
+            BookQuery('orders').join('customers', how='cross')
+        with self.assertRaises(ValueError):
+            BookQuery('orders', where=[('unknown', '==', 1)]).execute(self.read_state)
+        with self.assertRaises(ValueError):
+            BookQuery('orders').group_by('customer', aggregate={})
+
+    def test_controller(self):
+        controller = EventBookController()
+        for book_name, book in self.books.items():
+            if controller.is_event_book(book_name):
+                controller.remove_event_books(book_name)
+            controller.add_event_book(book_name)
+            controller.add_event(book_name, event=book.current_state())
+        query = BookQuery('orders', where=[('customer', '==', 1)]).join('customers', on='customer')
+        self.assertEqual([50, 300], controller.query(query)['amount'].to_list())
+        with self.assertRaises(ValueError):
+            controller.query(BookQuery('unknown'))
+        for book_name in self.books.keys():
+            controller.remove_event_books(book_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import time
+import unittest
+import pandas as pd
+from ds_engines.engines.controller.canonical_handoff import CanonicalHandoff
+
+
+class CanonicalHandoffTest(unittest.TestCase):
+
+    def test_sync(self):
+        persisted = []
+        handoff = CanonicalHandoff()
+        df = pd.DataFrame({'A': [1, 2, 3]})
+        handoff.persist(uri='work/a.csv', canonical=df, persist=persisted.append)
+        self.assertEqual(1, len(persisted))
+        self.assertTrue(handoff.has_canonical('work/a.csv'))
+        self.assertIs(df, handoff.get_canonical('work/a.csv'))
+        handoff.close()
+        self.assertFalse(handoff.has_canonical('work/a.csv'))
+
+    def test_async(self):
+        persisted = []
+
+        def persist(canonical):
+            time.sleep(0.05)
+            persisted.append(canonical)
+
+        handoff = CanonicalHandoff(persist_mode='async')
+        handoff.persist(uri='work/a.csv', canonical=pd.DataFrame({'A': [1]}), persist=persist)
+        self.assertEqual(0, len(persisted))
+        handoff.wait()
+        self.assertEqual(1, len(persisted))
+        handoff.close()
+
+    def test_skip_intermediates(self):
+        persisted = []
+        handoff = CanonicalHandoff(persist_mode='skip', intermediates=['work/a.csv'])
+        handoff.persist(uri='work/a.csv', canonical=pd.DataFrame({'A': [1]}), persist=persisted.append)
+        handoff.persist(uri='work/b.csv', canonical=pd.DataFrame({'B': [1]}), persist=persisted.append)
+        self.assertEqual(1, len(persisted))
+        self.assertTrue(handoff.has_canonical('work/a.csv'))
+        self.assertFalse(handoff.has_canonical('work/b.csv'))
+        handoff.close()
+
+    def test_raise(self):
+        with self.assertRaises(ValueError):
+            CanonicalHandoff(persist_mode='never')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from ds_engines.engines.controller.canonical_stream import CanonicalStream, ChunkWriter
+
+
+class CanonicalStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_parquet(self):
+        uri = os.path.join(self.path, 'source.parquet')
+        pd.DataFrame({'A': range(1000), 'B': [1.5] * 1000}).to_parquet(uri, index=False)
+        stream = CanonicalStream(uri=uri, chunk_size=300)
+        self.assertEqual([300, 300, 300, 100], [chunk.shape[0] for chunk in stream])
+        outcome = stream.transform(lambda x: x.assign(C=x['A'] * 2), uri=os.path.join(self.path, 'persist.parquet'))
+        self.assertIsInstance(outcome, CanonicalStream)
+        result = outcome.materialize()
+        self.assertEqual((1000, 3), result.shape)
+        self.assertEqual(list(range(0, 2000, 2)), result['C'].to_list())
+
+    def test_csv(self):
+        uri = os.path.join(self.path, 'source.csv')
+        pd.DataFrame({'A': range(10)}).to_csv(uri, index=False)
+        stream = CanonicalStream(uri=uri, chunk_size=4)
+        self.assertEqual([4, 4, 2], [chunk.shape[0] for chunk in stream])
+        outcome = stream.transform(lambda x: x[x['A'] % 2 == 0], uri=os.path.join(self.path, 'persist.csv'))
+        self.assertEqual([0, 2, 4, 6, 8], outcome.materialize()['A'].to_list())
+
+    def test_failed_transform(self):
+        uri = os.path.join(self.path, 'source.csv')
+        pd.DataFrame({'A': range(10)}).to_csv(uri, index=False)
+        persist = os.path.join(self.path, 'persist.csv')
+
+        def run_chunk(chunk):
+            if chunk['A'].max() > 5:
+                raise ValueError("failed")
+            return chunk
+
+        with self.assertRaises(ValueError):
+            CanonicalStream(uri=uri, chunk_size=4).transform(run_chunk, uri=persist)
+        self.assertEqual(['source.csv'], os.listdir(self.path))
+
+    @staticmethod
+    def _write(df: pd.DataFrame, uri: str):
+        if uri.endswith('.csv'):
+            df.to_csv(uri, index=False)
+        else:
+            df.to_parquet(uri, index=False)
+
+    def test_empty_source(self):
+        for ext in ['parquet', 'csv']:
+            uri = os.path.join(self.path, f"source.{ext}")
+            persist = os.path.join(self.path, f"persist.{ext}")
+            source = pd.DataFrame({'A': [1, 2, 3]})
+            self._write(source, uri)
+            CanonicalStream(uri=uri, chunk_size=2).transform(lambda x: x.assign(B=x['A']), uri=persist)
+            self.assertEqual([1, 2, 3], CanonicalStream(uri=persist).materialize()['B'].to_list())
+            # a rerun over an empty source replaces the previous outcome
+            self._write(source.iloc[:0], uri)
+            outcome = CanonicalStream(uri=uri, chunk_size=2).transform(lambda x: x.assign(B=x['A']), uri=persist)
+            result = outcome.materialize()
+            self.assertEqual(0, result.shape[0])
+            self.assertEqual(['A', 'B'], result.columns.to_list())
+        # a writer closed with no chunks still replaces its target
+        persist = os.path.join(self.path, 'persist.csv')
+        ChunkWriter(uri=persist).close()
+        self.assertEqual((0, 0), CanonicalStream(uri=persist).materialize().shape)
+
+    def test_append_parts(self):
+        uri = os.path.join(self.path, 'outcome.parquet')
+        pd.DataFrame({'id': [1, 2], 'value': [0.5, 1.5]}).to_parquet(uri, index=False)
+        stream = CanonicalStream(uri=uri, chunk_size=10)
+        stream.append(pd.DataFrame({'value': [2.5], 'id': [3]}))
+        # the file becomes the first part and is not rewritten, the increment is a new part
+        first = os.path.join(uri, 'part-00000000.parquet')
+        modified = os.path.getmtime(first)
+        stream.append(pd.DataFrame({'id': [4], 'value': [3.5]}))
+        stream.append(pd.DataFrame({'id': pd.Series([], dtype=int), 'value': pd.Series([], dtype=float)}))
+        self.assertEqual(modified, os.path.getmtime(first))
+        self.assertEqual(3, len(stream.parts()))
+        self.assertEqual([1, 2, 3, 4], stream.materialize()['id'].to_list())
+        self.assertEqual([[1, 2], [3], [4]], [chunk['id'].to_list() for chunk in stream])
+        self.assertEqual(['id', 'value'], stream.empty().columns.to_list())
+        self.assertEqual([1, 2, 3, 4], pd.read_parquet(uri)['id'].to_list())
+        with self.assertRaises(ValueError):
+            stream.append(pd.DataFrame({'other': [1]}))
+        # a full rewrite replaces the dataset directory
+        stream.transform(lambda x: x, uri=os.path.join(self.path, 'copy.parquet')).transform(lambda x: x, uri=uri)
+        self.assertTrue(os.path.isfile(uri))
+        self.assertEqual([1, 2, 3, 4], CanonicalStream(uri=uri).materialize()['id'].to_list())
+
+    def test_truncate(self):
+        for file_type in ['parquet', 'csv']:
+            uri = os.path.join(self.path, f"outcome.{file_type}")
+            stream = CanonicalStream(uri=uri)
+            self.assertEqual({}, stream.position())
+            stream.append(pd.DataFrame({'id': [1, 2]}))
+            stream.append(pd.DataFrame({'id': [3]}))
+            position = stream.position()
+            # an append after the position, as of a run that failed before its commit, is removed
+            stream.append(pd.DataFrame({'id': [4]}))
+            stream.truncate(position)
+            self.assertEqual([1, 2, 3], stream.materialize()['id'].to_list())
+            stream.truncate(position)
+            self.assertEqual([1, 2, 3], stream.materialize()['id'].to_list())
+        # a csv file replaced since the position is left as it is
+        uri = os.path.join(self.path, 'outcome.csv')
+        position = CanonicalStream(uri=uri).position()
+        writer = ChunkWriter(uri=uri)
+        writer.write(pd.DataFrame({'id': [7, 8, 9, 10]}))
+        writer.close()
+        CanonicalStream(uri=uri).truncate(position)
+        self.assertEqual([7, 8, 9, 10], CanonicalStream(uri=uri).materialize()['id'].to_list())
+
+    def test_file_types(self):
+        self.assertTrue(CanonicalStream.is_streamable('data/file.parquet'))
+        self.assertFalse(CanonicalStream.is_streamable('data/file.json'))
+        with self.assertRaises(ValueError):
+            ChunkWriter(uri='data/file.pickle')
+
+
+if __name__ == '__main__':
+    unittest.main()
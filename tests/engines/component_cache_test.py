@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from ds_engines.engines.controller.component_cache import ComponentCache
+
+
+class ContractComponent(object):
+
+    builds = 0
+    contract_path = None
+
+    class PM(object):
+
+        CONNECTOR_PM_CONTRACT = 'pm_contract'
+
+        class Contract(object):
+
+            def __init__(self, uri: str):
+                self.uri = uri
+
+        def __init__(self, uri: str):
+            self._uri = uri
+
+        def has_connector(self, connector_name: str) -> bool:
+            return connector_name == self.CONNECTOR_PM_CONTRACT
+
+        def get_connector_contract(self, connector_name: str):
+            return self.Contract(self._uri)
+
+    def __init__(self, task_name: str):
+        self.task_name = task_name
+        self.pm = self.PM(os.path.join(self.contract_path, f"hadron_pm_contract_{task_name}.json"))
+
+    @classmethod
+    def from_env(cls, task_name: str, **kwargs):
+        cls.builds += 1
+        return cls(task_name)
+
+
+class ComponentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        ContractComponent.builds = 0
+        ContractComponent.contract_path = self.path
+        with open(os.path.join(self.path, 'hadron_pm_contract_task.json'), 'w') as f:
+            f.write('{}')
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_reuse(self):
+        cache = ComponentCache()
+        component = cache.get(ContractComponent, task_name='task')
+        self.assertIs(component, cache.get(ContractComponent, task_name='task'))
+        self.assertEqual(1, ContractComponent.builds)
+        self.assertIsNot(component, cache.get(ContractComponent, task_name='other'))
+        self.assertEqual({'entries': 2, 'hits': 1, 'misses': 2}, cache.report())
+
+    def test_contract_changed(self):
+        cache = ComponentCache()
+        component = cache.get(ContractComponent, task_name='task')
+        with open(os.path.join(self.path, 'hadron_pm_contract_task.json'), 'w') as f:
+            f.write('{"changed": true}')
+        self.assertIsNot(component, cache.get(ContractComponent, task_name='task'))
+        self.assertEqual(2, ContractComponent.builds)
+
+    def test_invalidate(self):
+        cache = ComponentCache()
+        component = cache.get(ContractComponent, task_name='task')
+        cache.invalidate(task_name='other')
+        self.assertIs(component, cache.get(ContractComponent, task_name='task'))
+        cache.invalidate(task_name='task')
+        self.assertIsNot(component, cache.get(ContractComponent, task_name='task'))
+
+    def test_threads(self):
+        cache = ComponentCache()
+        component = cache.get(ContractComponent, task_name='task')
+        taken = []
+        barrier = threading.Barrier(2)
+
+        def run_task():
+            taken.append(cache.get(ContractComponent, task_name='task'))
+            barrier.wait(5)
+
+        threads = [threading.Thread(target=run_task) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # concurrent threads are each given their own component
+        self.assertEqual(3, len({id(x) for x in [component] + taken}))
+        # a component of a thread that has ended is taken by the next thread
+        thread = threading.Thread(target=lambda: taken.append(cache.get(ContractComponent, task_name='task')))
+        thread.start()
+        thread.join()
+        self.assertIn(taken[-1], taken[:2])
+        self.assertEqual(3, ContractComponent.builds)
+
+    def test_lease(self):
+        cache = ComponentCache()
+        component = cache.get(ContractComponent, task_name='task')
+        future = Future()
+        cache.lease(component, future)
+        # a leased component is not handed out, even to its owner, until the future is done
+        other = cache.get(ContractComponent, task_name='task')
+        self.assertIsNot(component, other)
+        future.set_result(None)
+        self.assertIs(component, cache.get(ContractComponent, task_name='task'))
+        self.assertEqual(2, ContractComponent.builds)
+
+    def test_validate_interval(self):
+        stamps = []
+
+        class RemoteCache(ComponentCache):
+
+            @staticmethod
+            def contract_stamp(uri, timeout=None):
+                stamps.append(uri)
+                return 'etag'
+
+        repo = 'https://raw.github.com/project/contracts/'
+        cache = RemoteCache(validate_interval=60)
+        component = cache.get(ContractComponent, task_name='task', uri_pm_repo=repo)
+        for _ in range(5):
+            self.assertIs(component, cache.get(ContractComponent, task_name='task', uri_pm_repo=repo))
+        # the remote stamp is taken on the build and not again within the interval
+        self.assertEqual(1, len(stamps))
+        cache = RemoteCache(validate_interval=0)
+        component = cache.get(ContractComponent, task_name='task', uri_pm_repo=repo)
+        self.assertIs(component, cache.get(ContractComponent, task_name='task', uri_pm_repo=repo))
+        self.assertEqual(3, len(stamps))
+
+    def test_repo_uri(self):
+        repo = 'https://raw.github.com/project/contracts/'
+        component = ContractComponent('task')
+        self.assertEqual(f"{repo}hadron_pm_contract_task.json", ComponentCache.contract_uri(component, repo))
+
+
+if __name__ == '__main__':
+    unittest.main()
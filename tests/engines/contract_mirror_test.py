@@ -0,0 +1,87 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+from urllib.error import HTTPError
+from ds_engines.engines.controller.contract_mirror import ContractMirror
+
+
+class ContractMirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.mirror_path = os.path.join(self.path, 'mirror')
+        self.repo = os.path.join(self.path, 'repo')
+        os.makedirs(self.repo)
+        for name in ['hadron_pm_transition_task.json', 'hadron_pm_wrangle_task.json']:
+            with open(os.path.join(self.repo, name), 'w') as f:
+                f.write('{"task": "%s"}' % name)
+        self.tarball = os.path.join(self.path, 'contracts.tar.gz')
+        with tarfile.open(self.tarball, 'w:gz') as archive:
+            archive.add(self.repo, arcname='project/contracts')
+            readme = b'not a contract'
+            info = tarfile.TarInfo('project/README.md')
+            info.size = len(readme)
+            archive.addfile(info, io.BytesIO(readme))
+
+    def tearDown(self):
+        os.environ.pop('HADRON_PM_MIRROR', None)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_tarball(self):
+        mirror = ContractMirror(mirror_path=self.mirror_path)
+        uri_pm_repo = 'https://raw.github.com/project/contracts/'
+        self.assertEqual(uri_pm_repo, mirror.resolve(uri_pm_repo))
+        local = mirror.resolve(uri_pm_repo, tarball=self.tarball)
+        self.assertTrue(mirror.has_repo(uri_pm_repo))
+        self.assertEqual(['hadron_pm_transition_task.json', 'hadron_pm_wrangle_task.json'], sorted(os.listdir(local)))
+        self.assertEqual(local, mirror.resolve(uri_pm_repo))
+        self.assertEqual(local, mirror.resolve(local, tarball=self.tarball))
+        # a task whose contract is not mirrored loads it from the repository
+        self.assertEqual(local, mirror.resolve(uri_pm_repo, task_name='task'))
+        self.assertEqual(uri_pm_repo, mirror.resolve(uri_pm_repo, task_name='other_task'))
+        self.assertFalse(mirror.has_contract(uri_pm_repo, task_name='other_task'))
+        self.assertEqual(2, len(os.listdir(os.path.join(self.mirror_path, 'objects'))))
+        # the repository contracts are the stored objects
+        sha = mirror.report(uri_pm_repo)['files']['hadron_pm_wrangle_task.json']['sha256']
+        self.assertTrue(os.path.samefile(os.path.join(self.mirror_path, 'objects', sha),
+                                         os.path.join(local, 'hadron_pm_wrangle_task.json')))
+
+    def test_refresh(self):
+        mirror = ContractMirror(mirror_path=self.mirror_path)
+        self.assertEqual(['hadron_pm_transition_task.json'], mirror.sync_files(self.repo,
+                                                                               'hadron_pm_transition_task.json'))
+        self.assertEqual([], mirror.refresh(self.repo))
+        with open(os.path.join(self.repo, 'hadron_pm_transition_task.json'), 'w') as f:
+            f.write('{"changed": true}')
+        self.assertEqual(['hadron_pm_transition_task.json'], mirror.refresh(self.repo))
+        with open(os.path.join(mirror.local_repo(self.repo), 'hadron_pm_transition_task.json')) as f:
+            self.assertEqual('{"changed": true}', f.read())
+        mirror.remove_repo(self.repo)
+        self.assertFalse(mirror.has_repo(self.repo))
+        self.assertEqual([], os.listdir(os.path.join(self.mirror_path, 'objects')))
+
+    def test_refresh_error(self):
+
+        class UnavailableMirror(ContractMirror):
+
+            def _fetch(self, uri: str, headers: dict=None) -> tuple:
+                raise HTTPError(uri, 503, 'Service Unavailable', {}, None)
+
+        mirror = UnavailableMirror(mirror_path=self.mirror_path)
+        uri_pm_repo = 'https://raw.github.com/project/contracts/'
+        local = mirror.resolve(uri_pm_repo, tarball=self.tarball)
+        with self.assertLogs('ds_engines.engines.controller.contract_mirror', level='WARNING'):
+            self.assertEqual(local, mirror.resolve(uri_pm_repo, refresh=True))
+        self.assertEqual(2, len(os.listdir(local)))
+
+    def test_from_env(self):
+        self.assertIsNone(ContractMirror.from_env())
+        os.environ['HADRON_PM_MIRROR'] = self.mirror_path
+        self.assertEqual(self.mirror_path, ContractMirror.from_env().mirror_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 import os
 import shutil
@@ -56,6 +57,20 @@ class EventBookControllerTest(unittest.TestCase):
         self.assertDictEqual(result1.to_dict(), event.to_dict())
         self.assertDictEqual(result1.to_dict(), result2.to_dict())
 
+    def test_async_events(self):
+        ebc = EventBookController()
+        ebc.add_event_book('async_book', reset=ebc.is_event_book('async_book'))
+
+        async def ingest():
+            await ebc.async_add_event(book_name='async_book', event=pd.DataFrame(data={'a': [0, 0, 0]}))
+            await asyncio.gather(*[ebc.async_increment_event(book_name='async_book',
+                                                             event=pd.DataFrame(data={'a': [1, 2, 3]}))
+                                   for _ in range(10)])
+            return await ebc.async_current_state(book_name='async_book')
+
+        result = asyncio.run(ingest())
+        self.assertEqual([10, 20, 30], result['a'].to_list())
+
     def test_raise(self):
         with self.assertRaises(KeyError) as context:
             env = os.environ['NoEnvValueTest']
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+
+class ImportTimeTest(unittest.TestCase):
+    """ Guards the start-up cost of the package. The component stacks must not be imported until a component is
+    used. Each import is timed in a fresh interpreter and the bare package import, which only defines the lazy
+    attributes, is checked against a budget. The budget is generous as the time depends on the machine, and can
+    be set in seconds with 'HADRON_IMPORT_TIME_BUDGET'
+    """
+
+    BUDGET = float(os.environ.get('HADRON_IMPORT_TIME_BUDGET') or 1.0)
+
+    @staticmethod
+    def run_import(statement: str) -> dict:
+        code = "import json, sys, time\n" \
+               "started = time.perf_counter()\n" \
+               f"{statement}\n" \
+               "elapsed = time.perf_counter() - started\n" \
+               "print(json.dumps({'time': elapsed, 'modules': sorted(sys.modules.keys())}))"
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(x for x in sys.path if x)}
+        result = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                env=env, check=True)
+        return json.loads(result.stdout.decode().strip().splitlines()[-1])
+
+    def test_package(self):
+        result = self.run_import('import ds_engines')
+        self.assertLess(result['time'], self.BUDGET)
+        for module in ['ds_discovery', 'ds_engines.components.controller',
+                       'ds_engines.components.event_book_portfolio']:
+            self.assertNotIn(module, result['modules'])
+
+    def test_handlers(self):
+        result = self.run_import('import ds_engines.handlers.event_handlers')
+        self.assertNotIn('ds_discovery', result['modules'])
+        self.assertNotIn('ds_engines.components.controller', result['modules'])
+
+    def test_controller(self):
+        result = self.run_import('from ds_engines import Controller')
+        self.assertIn('ds_engines.components.controller', result['modules'])
+        self.assertNotIn('ds_discovery', result['modules'])
+        result = self.run_import('from ds_engines.intent.controller_intent import ControllerIntentModel')
+        self.assertNotIn('ds_discovery', result['modules'])
+
+    def test_lazy_attributes(self):
+        import ds_engines
+        self.assertIn('Controller', dir(ds_engines))
+        self.assertIn('EventBookPortfolio', ds_engines.__all__)
+        with self.assertRaises(AttributeError):
+            _ = ds_engines.Unknown
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from ds_engines.engines.controller.level_coordinator import LevelCoordinator, LevelWorker
+from ds_engines.engines.controller.level_transport import LevelTransport, FileQueueTransport, SocketTransport
+
+
+class LevelCoordinatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.lock = threading.Lock()
+        self.calls = list()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def run_level(self, intent_level: str, delay: float=None, fail: list=None, **kwargs):
+        with self.lock:
+            self.calls.append(intent_level)
+            attempts = self.calls.count(intent_level)
+        time.sleep(delay if isinstance(delay, (int, float)) else 0.05)
+        if isinstance(fail, list) and intent_level in fail and attempts == 1:
+            raise ValueError(f"level {intent_level} failed")
+        return {'level': intent_level, 'attempts': attempts, **kwargs}
+
+    def start_workers(self, transports: list, **kwargs) -> list:
+        workers = []
+        for n, transport in enumerate(transports):
+            worker = LevelWorker(transport=transport, worker_id=f"worker_{n}", heartbeat_interval=0.05,
+                                 poll_interval=0.02)
+            thread = threading.Thread(target=worker.run, kwargs={'run_level': self.run_level, **kwargs}, daemon=True)
+            thread.start()
+            workers.append(thread)
+        return workers
+
+    def test_file_queue(self):
+        queue_path = os.path.join(self.path, 'queue')
+        coordinator = LevelCoordinator(transport=FileQueueTransport(queue_path), dependencies={'C': ['A', 'B']},
+                                       poll_interval=0.02)
+        workers = self.start_workers([FileQueueTransport(queue_path), FileQueueTransport(queue_path)])
+        results = coordinator.run(intent_levels=['A', 'B', 'C'], params={'value': 1})
+        self.assertEqual({'A', 'B', 'C'}, set(results.keys()))
+        self.assertEqual({'level': 'C', 'attempts': 1, 'value': 1}, results['C'])
+        self.assertEqual('C', self.calls[-1])
+        report = coordinator.report()
+        self.assertEqual(['complete'] * 3, report['status'])
+        for worker in workers:
+            worker.join(timeout=5)
+            self.assertFalse(worker.is_alive())
+
+    def test_socket(self):
+        transport = SocketTransport(host='localhost', port=0, coordinator=True)
+        coordinator = LevelCoordinator(transport=transport, dependencies={'B': ['A']}, poll_interval=0.02)
+        results = {}
+
+        def run():
+            results.update(coordinator.run(intent_levels=['A', 'B']))
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        while transport.state() != LevelTransport.STATE_RUNNING:
+            time.sleep(0.01)
+        host, port = transport.address
+        workers = self.start_workers([LevelTransport.from_uri(f"tcp://{host}:{port}")])
+        thread.join(timeout=10)
+        self.assertEqual(['A', 'B'], self.calls)
+        self.assertEqual({'A', 'B'}, set(results.keys()))
+        workers[0].join(timeout=5)
+        self.assertFalse(workers[0].is_alive())
+
+    def test_socket_token(self):
+        transport = SocketTransport(host='localhost', port=0, coordinator=True, token='secret')
+        transport.open(run_id='run')
+        host, port = transport.address
+        try:
+            self.assertEqual(LevelTransport.STATE_RUNNING, SocketTransport(host, port, token='secret').state())
+            with self.assertRaises(PermissionError):
+                SocketTransport(host, port, token='other').state()
+            with self.assertRaises(PermissionError):
+                SocketTransport(host, port).claim('worker')
+        finally:
+            transport.close()
+        # a coordinator serving other than a loopback interface must have a token
+        with self.assertRaises(ValueError):
+            SocketTransport(host='0.0.0.0', port=0, coordinator=True)
+
+    def test_retry(self):
+        queue_path = os.path.join(self.path, 'queue')
+        coordinator = LevelCoordinator(transport=FileQueueTransport(queue_path), max_retries=1, poll_interval=0.02)
+        self.start_workers([FileQueueTransport(queue_path)])
+        results = coordinator.run(intent_levels=['A', 'B'], params={'fail': ['A']})
+        self.assertEqual(2, results['A']['attempts'])
+        report = coordinator.report()
+        self.assertEqual([2, 1], report['attempts'])
+        # retries exhausted
+        coordinator = LevelCoordinator(transport=FileQueueTransport(queue_path), max_retries=0, poll_interval=0.02)
+        self.calls.clear()
+        self.start_workers([FileQueueTransport(queue_path)])
+        with self.assertRaises(ValueError) as context:
+            coordinator.run(intent_levels=['A', 'B'], params={'fail': ['A']})
+        self.assertIn('level A failed', str(context.exception))
+        self.assertIn('failed', coordinator.report()['status'])
+
+    def test_lease(self):
+        queue_path = os.path.join(self.path, 'queue')
+        coordinator = LevelCoordinator(transport=FileQueueTransport(queue_path), lease_timeout=0.2,
+                                       poll_interval=0.02)
+        # the first worker heartbeats too slowly, so its level is resubmitted to the second
+        slow = LevelWorker(transport=FileQueueTransport(queue_path), worker_id='slow', heartbeat_interval=10,
+                           poll_interval=0.02)
+        threading.Thread(target=slow.run, kwargs={'run_level': self.run_level, 'max_tasks': 1}, daemon=True).start()
+        results = {}
+        thread = threading.Thread(target=lambda: results.update(
+            coordinator.run(intent_levels=['A'], params={'delay': 0.6})))
+        thread.start()
+        while len(self.calls) == 0:
+            time.sleep(0.01)
+        self.start_workers([FileQueueTransport(queue_path)])
+        thread.join(timeout=10)
+        self.assertIn('A', results)
+        self.assertEqual(2, coordinator.report()['attempts'][0])
+        self.assertEqual('worker_0', coordinator.report()['worker_id'][0])
+
+    def test_lease_clock(self):
+        queue_path = os.path.join(self.path, 'queue')
+        coordinator = LevelCoordinator(transport=FileQueueTransport(queue_path), lease_timeout=0.3,
+                                       poll_interval=0.02)
+
+        class SkewedTransport(FileQueueTransport):
+            # a worker whose clock is an hour behind the coordinator
+            def heartbeat(self, worker_id: str, task_id: str):
+                path = os.path.join(self.queue_path, 'claimed')
+                for file in os.listdir(path):
+                    if file.endswith('.json') and self._task_id(file) == task_id:
+                        self._write(os.path.join(path, f"{file[:-5]}.hb"), {
+                            'task_id': task_id, 'worker_id': worker_id, 'heartbeat': time.time() - 3600})
+
+        self.start_workers([SkewedTransport(queue_path)])
+        results = coordinator.run(intent_levels=['A'], params={'delay': 0.6})
+        # the heartbeats are timed by the coordinator as they change, so the lease does not expire
+        self.assertEqual(1, results['A']['attempts'])
+        self.assertEqual(1, coordinator.report()['attempts'][0])
+
+    def test_from_uri(self):
+        self.assertIsInstance(LevelTransport.from_uri(f"file://{self.path}/queue"), FileQueueTransport)
+        self.assertIsInstance(LevelTransport.from_uri('tcp://localhost:8765'), SocketTransport)
+        with self.assertRaises(ValueError):
+            LevelTransport.from_uri('s3://bucket/queue')
+        # a transport must implement every method
+        with self.assertRaises(TypeError):
+            LevelTransport()
+        # a worker with no coordinator does not run
+        worker = LevelWorker(transport=LevelTransport.from_uri('tcp://localhost:1'), poll_interval=0.01)
+        self.assertEqual(0, worker.run(run_level=self.run_level, idle_timeout=0.05))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from ds_engines.engines.controller.level_scheduler import LevelScheduler
+
+
+class LevelSchedulerTest(unittest.TestCase):
+
+    def test_waves(self):
+        scheduler = LevelScheduler(dependencies={'c': ['a'], 'd': ['b', 'c']}, max_workers=4)
+        self.assertEqual([['a', 'b'], ['c'], ['d']], scheduler.execution_waves(['a', 'b', 'c', 'd']))
+        # dependencies outside the run are taken as met
+        self.assertEqual([['c', 'd']], LevelScheduler(dependencies={'c': ['a']}).execution_waves(['c', 'd']))
+
+    def test_cyclic(self):
+        scheduler = LevelScheduler(dependencies={'a': ['b'], 'b': ['a']})
+        with self.assertRaises(ValueError):
+            scheduler.execution_waves(['a', 'b'])
+
+    def test_run(self):
+        started = []
+        lock = threading.Lock()
+
+        def run_level(level: str):
+            with lock:
+                started.append(level)
+            time.sleep(0.05)
+            return level.upper()
+
+        scheduler = LevelScheduler(dependencies={'c': ['a', 'b']}, max_workers=2)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            result = scheduler.run(['a', 'b', 'c'], run_level=run_level, executor=executor)
+        self.assertEqual({'a': 'A', 'b': 'B', 'c': 'C'}, result)
+        self.assertEqual('c', started[-1])
+
+    def test_run_error(self):
+        def run_level(level: str):
+            if level == 'a':
+                raise RuntimeError('failed')
+            return level
+
+        scheduler = LevelScheduler(dependencies={'b': ['a']}, max_workers=2)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            with self.assertRaises(RuntimeError):
+                scheduler.run(['a', 'b'], run_level=run_level, executor=executor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import time
+import unittest
+from ds_engines.engines.controller.report_writer import ReportWriter
+
+
+class ReportComponent(object):
+
+    class PM(object):
+
+        def __init__(self, connectors: list):
+            self.connectors = connectors
+
+        def has_connector(self, connector_name: str) -> bool:
+            return connector_name in self.connectors
+
+    def __init__(self, connectors: list):
+        self.pm = self.PM(connectors)
+        self.reports = dict()
+
+    def save_report_canonical(self, report_connector_name: str, report):
+        self.reports[report_connector_name] = report
+
+
+class ReportWriterTest(unittest.TestCase):
+
+    def tearDown(self):
+        os.environ.pop('HADRON_CONTROLLER_REPORT_POLICY', None)
+
+    def test_policy(self):
+        component = ReportComponent(['schema', 'dictionary'])
+        writer = ReportWriter(report_policy='essential', background=False)
+        writer.write(component, 'schema', report=lambda: 'schema', essential=True)
+        writer.write(component, 'dictionary', report=lambda: 'dictionary')
+        writer.write(component, 'missing', report=lambda: 'missing', essential=True)
+        self.assertEqual({'schema': 'schema'}, component.reports)
+        component = ReportComponent(['schema'])
+        ReportWriter(report_policy='none', background=False).write(component, 'schema', report=lambda: 'schema',
+                                                                    essential=True)
+        self.assertEqual({}, component.reports)
+        with self.assertRaises(ValueError):
+            ReportWriter(report_policy='some')
+
+    def test_environ(self):
+        os.environ['HADRON_CONTROLLER_REPORT_POLICY'] = 'none'
+        self.assertEqual('none', ReportWriter().report_policy)
+        self.assertEqual('all', ReportWriter(report_policy='all').report_policy)
+
+    def test_background(self):
+        component = ReportComponent(['dictionary'])
+
+        def report():
+            time.sleep(0.05)
+            return 'dictionary'
+
+        writer = ReportWriter(report_policy='all', background=True)
+        writer.write(component, 'dictionary', report=report)
+        self.assertEqual({}, component.reports)
+        writer.close()
+        self.assertEqual({'dictionary': 'dictionary'}, component.reports)
+
+
+if __name__ == '__main__':
+    unittest.main()
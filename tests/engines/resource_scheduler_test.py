@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from ds_engines.engines.controller.resource_scheduler import ResourceScheduler
+from ds_engines.engines.controller.run_stats import RunStats
+
+_lock = threading.Lock()
+_running = []
+
+
+def run_level(level: str) -> tuple:
+    """a picklable level run returning the level, process id and the most levels seen running at once"""
+    with _lock:
+        _running.append(level)
+        concurrent = len(_running)
+    time.sleep(0.05)
+    with _lock:
+        _running.remove(level)
+    return level, os.getpid(), concurrent
+
+
+class ResourceSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_level_profiles(self):
+        level_intents = {'load': {0: {'feature_catalog': {'task_name': 'catalog'}}},
+                         'build': {0: {'synthetic_builder': {'task_name': 'members'}}},
+                         'mixed': {0: {'feature_catalog': {'task_name': 'catalog_b'}},
+                                   1: {'transition': {'kwargs': {'task_name': 'clean'}}}}}
+        profiles = ResourceScheduler.level_profiles(level_intents)
+        self.assertEqual('io', profiles['load']['resource'])
+        self.assertEqual('cpu', profiles['build']['resource'])
+        self.assertEqual('cpu', profiles['mixed']['resource'])
+        self.assertEqual('method', profiles['load']['source'])
+        # declared by task name or level
+        profiles = ResourceScheduler.level_profiles(level_intents, declared={'clean': {'resource': 'io',
+                                                                                       'memory': 100},
+                                                                             'build': 'io', 'catalog': 'cpu'})
+        self.assertEqual({'resource': 'io', 'memory': 100, 'source': 'declared'}, profiles['mixed'])
+        self.assertEqual('io', profiles['build']['resource'])
+        self.assertEqual('cpu', profiles['load']['resource'])
+
+    def test_history_profiles(self):
+        run_history = os.path.join(self.path, 'history.jsonl')
+        stats = RunStats(run_id='run_1')
+        stats.extend([{'level': 'load', 'method': 'level', 'status': 'complete', 'wall_time': 2.0,
+                       'cpu_time': 0.2, 'peak_rss': 1000},
+                      {'level': 'build', 'method': 'synthetic_builder', 'status': 'complete', 'wall_time': 1.0,
+                       'cpu_time': 0.9, 'peak_rss': 4000},
+                      {'level': 'build', 'method': 'wrangle', 'status': 'complete', 'wall_time': 1.0,
+                       'cpu_time': 1.0, 'peak_rss': 3000},
+                      {'level': 'build', 'method': 'level', 'status': 'complete', 'wall_time': 2.0,
+                       'cpu_time': 0.1, 'peak_rss': 5000}])
+        # a resumed run of a level, whose tasks were skipped, is not used
+        stats.extend([{'run_id': 'run_2', 'level': 'build', 'method': 'synthetic_builder', 'status': 'resumed',
+                       'wall_time': 0.1, 'cpu_time': 0.0, 'peak_rss': 0},
+                      {'run_id': 'run_2', 'level': 'build', 'method': 'level', 'status': 'complete',
+                       'wall_time': 0.1, 'cpu_time': 0.0, 'peak_rss': 0}])
+        stats.persist(run_history=run_history)
+        level_intents = {'load': {0: {'transition': {'task_name': 'a'}}},
+                         'build': {0: {'feature_catalog': {'task_name': 'b'}}}}
+        profiles = ResourceScheduler.level_profiles(level_intents, run_history=run_history)
+        self.assertEqual({'resource': 'io', 'memory': 1000, 'source': 'history'}, profiles['load'])
+        # the task CPU time, including attempts on other threads, is used over that of the level thread
+        self.assertEqual({'resource': 'cpu', 'memory': 5000, 'source': 'history'}, profiles['build'])
+
+    def test_placement(self):
+        profiles = {'a': {'resource': 'io'}, 'b': {'resource': 'io'}, 'c': {'resource': 'cpu'}}
+        scheduler = ResourceScheduler(dependencies={'c': ['a']}, cpu_workers=1, io_workers=2, profiles=profiles)
+        results = scheduler.run(['a', 'b', 'c'], run_level=run_level)
+        self.assertEqual(os.getpid(), results['a'][1])
+        self.assertEqual(os.getpid(), results['b'][1])
+        self.assertNotEqual(os.getpid(), results['c'][1])
+        self.assertEqual(2, max(results['a'][2], results['b'][2]))
+        self.assertEqual('thread', scheduler.placements['a']['pool'])
+        self.assertEqual('process', scheduler.placements['c']['pool'])
+
+    def test_memory_budget(self):
+        profiles = {level: {'resource': 'io', 'memory': 60} for level in ['a', 'b', 'c']}
+        scheduler = ResourceScheduler(io_workers=3, memory_budget=100, profiles=profiles)
+        results = scheduler.run(['a', 'b', 'c'], run_level=run_level)
+        self.assertEqual(1, max(r[2] for r in results.values()))
+        # a level larger than the budget still runs on its own
+        profiles = {'a': {'resource': 'io', 'memory': 500}, 'b': {'resource': 'io', 'memory': 10}}
+        scheduler = ResourceScheduler(io_workers=2, memory_budget=100, profiles=profiles)
+        self.assertEqual(['a', 'b'], sorted(scheduler.run(['a', 'b'], run_level=run_level).keys()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import pickle
+import unittest
+from ds_engines.engines.controller.run_book_plan import RunBookPlan
+
+
+class ContractPM(object):
+
+    class KEY(object):
+        run_book_key = 'run_book'
+
+    def __init__(self):
+        self.intent = {'A': {'0': {'transition': {'task_name': 'clean'}}}}
+        self.dependencies = {}
+        self.run_books = {'daily': ['A']}
+
+    def get_intent(self):
+        return self.intent
+
+    def get(self, key, default=None):
+        return self.run_books if key == self.KEY.run_book_key else default
+
+
+class RunBookPlanTest(unittest.TestCase):
+
+    @staticmethod
+    def get_plan(contract_version: str='v1'):
+        level_intents = {'A': {'0': {'transition': {'task_name': 'clean'}}},
+                         'B': {'0': {'wrangle': {'task_name': 'wrangle'}}}}
+        connectors = {'A': {'inputs': {'raw.csv'}, 'outputs': {'clean.csv'}},
+                      'B': {'inputs': {'clean.csv'}, 'outputs': {'wrangled.csv'}}}
+        return RunBookPlan(task_name='master', intent_levels=['A', 'B'], level_intents=level_intents,
+                           dependencies={'A': [], 'B': ['A']}, contract_version=contract_version,
+                           connectors=connectors, run_book='daily', infer_dependencies=True)
+
+    def test_immutable(self):
+        plan = self.get_plan()
+        plan.intent_levels.append('C')
+        plan.get_level_intent('A')['0']['transition']['task_name'] = 'changed'
+        plan.get_dependencies()['B'].append('C')
+        self.assertEqual(['A', 'B'], plan.intent_levels)
+        self.assertEqual({'0': {'transition': {'task_name': 'clean'}}}, plan.get_level_intent('A'))
+        self.assertEqual({'A': [], 'B': ['A']}, plan.get_dependencies())
+        self.assertEqual({'raw.csv', 'clean.csv'}, plan.get_intermediates())
+
+    def test_serialise(self):
+        plan = self.get_plan()
+        self.assertEqual(plan, RunBookPlan.from_json(plan.to_json()))
+        self.assertEqual(plan, pickle.loads(pickle.dumps(plan)))
+        self.assertEqual({'inputs': {'clean.csv'}, 'outputs': {'wrangled.csv'}},
+                         pickle.loads(pickle.dumps(plan)).get_connectors('B'))
+
+    def test_contract_version(self):
+        pm = ContractPM()
+        version = RunBookPlan.get_contract_version(pm)
+        plan = self.get_plan(contract_version=version)
+        self.assertTrue(plan.is_valid(RunBookPlan.get_contract_version(pm)))
+        pm.intent['A']['0']['transition']['task_name'] = 'changed'
+        self.assertFalse(plan.is_valid(RunBookPlan.get_contract_version(pm)))
+        # a run book or task contract change is a new version
+        version = RunBookPlan.get_contract_version(pm, contract_stamps={'A': {'transition:clean': '1:10'}})
+        self.assertNotEqual(version, RunBookPlan.get_contract_version(pm, contract_stamps={
+            'A': {'transition:clean': '2:10'}}))
+        pm.run_books['daily'].append('B')
+        self.assertNotEqual(version, RunBookPlan.get_contract_version(pm, contract_stamps={
+            'A': {'transition:clean': '1:10'}}))
+
+    def test_equal(self):
+        plan = self.get_plan()
+        self.assertEqual(plan, RunBookPlan.from_dict({**plan.to_dict(), 'created': '2020-01-01T00:00:00'}))
+        self.assertNotEqual(plan, self.get_plan(contract_version='v2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from ds_engines.engines.controller.canonical_handoff import CanonicalHandoff
+from ds_engines.engines.controller.run_journal import RunJournal
+
+
+class RunJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.journal = RunJournal(task_name='controller', journal_path=os.path.join(self.path, 'journal'))
+        self.source = self._write('source.csv', 'a,b\n1,2\n')
+        self.outcome = self._write('outcome.csv', 'a,b\n1,2\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.environ.pop('HADRON_CONTROLLER_JOURNAL_PATH', None)
+
+    def test_complete(self):
+        key = RunJournal.task_key(level='A', order=0, method='transition', task_name='task')
+        fingerprint = RunJournal.fingerprint(params={'task_name': 'task'}, inputs=[self.source])
+        self.assertFalse(self.journal.is_complete(key, fingerprint))
+        self.journal.record(key, fingerprint=fingerprint, outputs=[self.outcome], level='A', order=0,
+                            method='transition', task_name='task')
+        self.assertTrue(self.journal.is_complete(key, fingerprint))
+        # the same task in another level is not complete
+        other = RunJournal.task_key(level='B', order=0, method='transition', task_name='task')
+        self.assertFalse(self.journal.is_complete(other, fingerprint))
+        # reopening the journal keeps the entries
+        journal = RunJournal(task_name='controller', journal_path=os.path.join(self.path, 'journal'))
+        self.assertTrue(journal.is_complete(key, fingerprint))
+        # another controller has its own journal
+        journal = RunJournal(task_name='other', journal_path=os.path.join(self.path, 'journal'))
+        self.assertFalse(journal.is_complete(key, fingerprint))
+
+    def test_changed(self):
+        key = RunJournal.task_key(level='A', order=0, method='transition', task_name='task')
+        fingerprint = RunJournal.fingerprint(params={'task_name': 'task'}, inputs=[self.source])
+        self.journal.record(key, fingerprint=fingerprint, outputs=[self.outcome])
+        # changed parameters
+        self.assertNotEqual(fingerprint, RunJournal.fingerprint(params={'task_name': 'task', 'x': 1},
+                                                                inputs=[self.source]))
+        # a changed output is rerun
+        time.sleep(0.01)
+        self._write('outcome.csv', 'a,b\n1,2\n3,4\n')
+        self.assertFalse(self.journal.is_complete(key, fingerprint))
+        self.journal.record(key, fingerprint=fingerprint, outputs=[self.outcome])
+        self.assertTrue(self.journal.is_complete(key, fingerprint))
+        # a removed output is rerun
+        os.remove(self.outcome)
+        self.assertFalse(self.journal.is_complete(key, fingerprint))
+        # a changed input changes the fingerprint
+        self._write('source.csv', 'a,b\n9,9\n9,9\n')
+        self.assertNotEqual(fingerprint, RunJournal.fingerprint(params={'task_name': 'task'}, inputs=[self.source]))
+        # a canonical passed in memory
+        self.assertNotEqual(RunJournal.fingerprint(params={}, canonical='abc'),
+                            RunJournal.fingerprint(params={}, canonical='abd'))
+
+    def test_unstamped(self):
+        key = RunJournal.task_key(level='A', order=0, method='wrangle', task_name='task')
+        fingerprint = RunJournal.fingerprint(params={})
+        self.journal.record(key, fingerprint=fingerprint, outputs=[os.path.join(self.path, 'missing.csv')])
+        self.assertFalse(self.journal.is_complete(key, fingerprint))
+        self.journal.record(key, fingerprint=fingerprint)
+        self.assertTrue(self.journal.is_complete(key, fingerprint))
+        self.assertIsNone(RunJournal.stamp(None))
+        self.assertIsNone(RunJournal.stamp('unknown://bucket/outcome.csv'))
+
+    def test_report_clear(self):
+        for order, task_name in enumerate(['task_a', 'task_b']):
+            key = RunJournal.task_key(level='A', order=order, method='transition', task_name=task_name)
+            self.journal.record(key, fingerprint='x', level='A', order=order, method='transition',
+                                task_name=task_name)
+        report = self.journal.report()
+        self.assertEqual(['task_a', 'task_b'], sorted(report['task_name']))
+        self.journal.clear()
+        self.assertEqual([], self.journal.report()['task_name'])
+        os.environ['HADRON_CONTROLLER_JOURNAL_PATH'] = os.path.join(self.path, 'env')
+        self.assertEqual(os.path.join(self.path, 'env'), RunJournal(task_name='controller').journal_path)
+
+    def test_handoff_settle(self):
+        handoff = CanonicalHandoff(persist_mode='async')
+        handoff.persist(uri='a', canonical=1, persist=lambda x: time.sleep(0.05))
+        self.assertTrue(handoff.settle())
+
+        def fail(canonical):
+            raise ValueError('persist failed')
+
+        handoff.persist(uri='b', canonical=2, persist=fail)
+        self.assertFalse(handoff.settle())
+        with self.assertRaises(ValueError):
+            handoff.close()
+
+    def _write(self, name: str, content: str) -> str:
+        path = os.path.join(self.path, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+
+if __name__ == '__main__':
+    unittest.main()
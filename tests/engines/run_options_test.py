@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from ds_engines.engines.controller.level_transport import FileQueueTransport
+from ds_engines.engines.controller.run_journal import RunJournal
+from ds_engines.engines.controller.run_options import RunOptions
+from ds_engines.engines.controller.task_cache import TaskResultCache
+
+
+class IntentModel(object):
+    """records how it is configured, as a ControllerIntentModel would be"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def __getattr__(self, name: str):
+        if name.startswith(('start_', 'stop_', 'set_')):
+            return lambda *args, **kwargs: self.calls.setdefault(name, []).append(args or kwargs)
+        raise AttributeError(name)
+
+
+class RunOptionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        for key in ['HADRON_CONTROLLER_JOURNAL_PATH', 'HADRON_CONTROLLER_WATERMARK_PATH',
+                    'HADRON_CONTROLLER_REPORT_POLICY', 'HADRON_CONTROLLER_RUN_HISTORY']:
+            os.environ.pop(key, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_validate(self):
+        with self.assertRaises(ValueError):
+            RunOptions(handoff_persist='later')
+        with self.assertRaises(ValueError):
+            RunOptions(report_policy='some')
+        with self.assertRaises(ValueError):
+            RunOptions(task_policy={'timeout': 1, 'retry': 2})
+        with self.assertRaises(ValueError):
+            RunOptions(level_policies={'level': {'attempts': 2}})
+        with self.assertRaises(ValueError):
+            RunOptions.from_dict({'max_worker': 2})
+        # a distributed run keeps its journal and watermarks on a shared volume
+        transport = FileQueueTransport(queue_path=os.path.join(self.path, 'queue'))
+        with self.assertRaises(ValueError):
+            RunOptions(transport=transport, resume=True)
+        with self.assertRaises(ValueError):
+            RunOptions(transport=transport, incremental_tasks='task')
+        options = RunOptions(transport=transport, resume=True, journal_path=os.path.join(self.path, 'journal'))
+        self.assertTrue(options.is_distributed)
+        self.assertFalse(options.is_resource_aware)
+        self.assertTrue(RunOptions(memory_budget=1024).is_resource_aware)
+
+    def test_defaults(self):
+        options = RunOptions()
+        self.assertFalse(options.handoff)
+        self.assertFalse(options.has_journal)
+        self.assertFalse(options.run_stats)
+        self.assertEqual(1, options.max_workers)
+        self.assertIsNone(options.result_cache())
+        self.assertIsNone(options.journal(task_name='task'))
+        self.assertTrue(RunOptions(profile=True).run_stats)
+        os.environ['HADRON_CONTROLLER_RUN_HISTORY'] = os.path.join(self.path, 'history.jsonl')
+        self.assertTrue(RunOptions().run_stats)
+        self.assertFalse(RunOptions(run_stats=False).run_stats)
+
+    def test_from_dict(self):
+        options = RunOptions(max_workers=4, handoff=True, report_policy='essential')
+        self.assertIs(options, RunOptions.from_dict({}, default=options))
+        # the parameters given take precedence over the default options
+        merged = RunOptions.from_dict({'report_policy': 'none'}, default=options)
+        self.assertEqual(4, merged.max_workers)
+        self.assertTrue(merged.handoff)
+        self.assertEqual('none', merged.level_options()['report_policy'])
+        self.assertEqual(options.to_dict()['max_workers'], RunOptions.from_dict(options.to_dict()).max_workers)
+
+    def test_level_options(self):
+        options = RunOptions(handoff=True, handoff_persist='async', report_background=False, chunk_size=100,
+                             stream_tasks='clean', incremental_tasks={'load': 'id'}, task_policy={'retries': 2},
+                             level_policies={1: {'timeout': 60}}, max_workers=4,
+                             transport=FileQueueTransport(queue_path=os.path.join(self.path, 'queue')),
+                             watermark_path=os.path.join(self.path, 'watermarks'))
+        level_options = options.level_options()
+        self.assertEqual(set(RunOptions.LEVEL_PARAMETERS), set(level_options.keys()))
+        # the level options are passed to level workers, so are serialisable and give the same options
+        level_options = json.loads(json.dumps(level_options))
+        self.assertEqual(options.level_options(), RunOptions.from_dict(level_options).level_options())
+        self.assertEqual({'1': {'timeout': 60}}, level_options['level_policies'])
+        self.assertEqual(['clean'], level_options['stream_tasks'])
+
+    def test_configure(self):
+        journal_path = os.path.join(self.path, 'journal')
+        options = RunOptions(handoff=True, handoff_persist='skip', report_policy='essential',
+                             report_background=False, use_cache=True, cache_path=os.path.join(self.path, 'cache'),
+                             journal_path=journal_path, task_policy={'retries': 1}, synthetic_shards=2)
+        model = IntentModel()
+        options.configure(model, task_name='task', intermediates=['a.parquet'])
+        self.assertEqual([{'persist_mode': 'skip', 'intermediates': ['a.parquet']}], model.calls['start_handoff'])
+        self.assertEqual([{'report_policy': 'essential', 'background': False}], model.calls['start_report_writer'])
+        self.assertIsInstance(model.calls['set_result_cache'][0]['result_cache'], TaskResultCache)
+        self.assertEqual({'task_policy': {'retries': 1}, 'level_policies': None},
+                         model.calls['set_task_policies'][0])
+        self.assertEqual(2, model.calls['set_synthetic_shards'][0]['shards'])
+        journal = model.calls['start_journal'][0]['journal']
+        self.assertIsInstance(journal, RunJournal)
+        self.assertEqual(journal_path, journal.journal_path)
+        self.assertNotIn('start_streaming', model.calls)
+        self.assertNotIn('start_incremental', model.calls)
+        # released, the background work is waited for and the model runs each task plainly
+        RunOptions.release(model)
+        for name in ['stop_handoff', 'stop_report_writer', 'stop_streaming', 'stop_incremental', 'stop_journal']:
+            self.assertIn(name, model.calls)
+        self.assertEqual((None,), model.calls['set_result_cache'][-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from ds_engines.engines.controller.run_stats import RunStats
+
+
+class RunStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_measure(self):
+        stats = RunStats(run_id='run_1')
+        with stats.measure(level='A', method='level', task_name='controller'):
+            with stats.measure(level='A', method='transition', task_name='task', order=0):
+                stats.add(rows_in=10, bytes_read=100)
+                stats.add(rows_out=4)
+                stats.add(rows_out=6, bytes_written=None)
+            self.assertEqual('level', stats.current['method'])
+        self.assertIsNone(stats.current)
+        task, level = stats.records
+        self.assertEqual('transition', task['method'])
+        self.assertEqual(10, task['rows_in'])
+        self.assertEqual(10, task['rows_out'])
+        self.assertEqual(100, task['bytes_read'])
+        self.assertIsNone(task['bytes_written'])
+        self.assertEqual('complete', task['status'])
+        self.assertEqual('run_1', task['run_id'])
+        self.assertGreaterEqual(task['wall_time'], 0)
+        self.assertGreaterEqual(task['cpu_time'], 0)
+        self.assertEqual('level', level['method'])
+        self.assertIsNone(level['rows_in'])
+        stats.add(rows_in=1)
+        self.assertEqual(10, stats.records[0]['rows_in'])
+
+    def test_failed(self):
+        stats = RunStats()
+        with self.assertRaises(ValueError):
+            with stats.measure(level=0, method='wrangle'):
+                raise ValueError('broken')
+        self.assertEqual('failed: ValueError', stats.records[0]['status'])
+        self.assertEqual('0', stats.records[0]['level'])
+
+    def test_profile(self):
+        stats = RunStats(profile=True, profile_top=5)
+        with stats.measure(level='A', method='level'):
+            with stats.measure(level='A', method='transition'):
+                _ = sorted(range(1000), key=lambda x: -x)
+        task, level = stats.records
+        self.assertIn('cumulative', task['profile'])
+        self.assertIsNone(level['profile'])
+
+    def test_report_history(self):
+        history = os.path.join(self.path, 'history', 'runs.jsonl')
+        for run_id in ['run_1', 'run_2']:
+            stats = RunStats(run_id=run_id)
+            with stats.measure(level='A', method='transition'):
+                stats.add(rows_in=5)
+            stats.persist(run_history=history)
+        report = stats.report()
+        self.assertEqual(RunStats.RECORD_KEYS, list(report.keys()))
+        self.assertEqual(['run_2'], report['run_id'])
+        result = RunStats.load_history(run_history=history)
+        self.assertEqual(['run_1', 'run_2'], result['run_id'])
+        self.assertEqual([5, 5], result['rows_in'])
+        result = RunStats.load_history(run_history=history, run_id='run_1')
+        self.assertEqual(['run_1'], result['run_id'])
+        result = RunStats.load_history(run_history=os.path.join(self.path, 'missing.jsonl'))
+        self.assertEqual([], result['run_id'])
+
+    def test_extend(self):
+        stats = RunStats(run_id='run_1')
+        worker = RunStats(run_id=stats.run_id)
+        with worker.measure(level='B', method='wrangle'):
+            pass
+        stats.extend(worker.records)
+        self.assertEqual(['B'], stats.report()['level'])
+
+    def test_task_resources(self):
+        stats = RunStats(sample_interval=0.01)
+        # a task before a large allocation is not charged for it
+        with stats.measure(level='A', method='transition'):
+            pass
+        with stats.measure(level='A', method='wrangle'):
+            block = bytearray(64 * 1024 * 1024)
+            block[::4096] = b'x' * len(block[::4096])
+            time.sleep(0.05)
+            del block
+        small, large = stats.records
+        self.assertLess(small['peak_rss'], 32 * 1024 * 1024)
+        self.assertGreaterEqual(large['peak_rss'], 32 * 1024 * 1024)
+        # the CPU of another thread is not charged to the task, unless the thread attaches to its record
+
+        def spin(seconds: float):
+            started = time.perf_counter()
+            while time.perf_counter() - started < seconds:
+                pass
+
+        busy = threading.Thread(target=spin, args=(0.3,))
+        with stats.measure(level='B', method='wrangle'):
+            busy.start()
+            busy.join()
+        self.assertLess(stats.records[-1]['cpu_time'], 0.1)
+        counts = dict()
+
+        def attempt():
+            with stats.attach(counts):
+                spin(0.3)
+
+        with stats.measure(level='B', method='wrangle'):
+            thread = threading.Thread(target=attempt)
+            thread.start()
+            thread.join()
+            stats.add(**counts)
+        self.assertGreater(stats.records[-1]['cpu_time'], 0.2)
+
+    def test_uri_size(self):
+        file = os.path.join(self.path, 'data.csv')
+        with open(file, 'w') as f:
+            f.write('a,b\n1,2\n')
+        self.assertEqual(8, RunStats.uri_size(file))
+        self.assertEqual(8, RunStats.uri_size(f"file://{file}"))
+        self.assertEqual(8, RunStats.uri_size(self.path))
+        self.assertIsNone(RunStats.uri_size('unknown://bucket/data.csv'))
+        self.assertIsNone(RunStats.uri_size(os.path.join(self.path, 'missing.csv')))
+        self.assertIsNone(RunStats.uri_size(None))
+        self.assertGreater(RunStats.resident_memory(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import pandas as pd
+from ds_engines.engines.controller.canonical_stream import CanonicalStream
+from ds_engines.engines.controller.source_watermark import SourceWatermark
+
+
+class SourceWatermarkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.watermark = SourceWatermark(watermark_path=os.path.join(self.path, 'watermarks'))
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.environ.pop('HADRON_CONTROLLER_WATERMARK_PATH', None)
+
+    def test_column(self):
+        for file_type in ['parquet', 'csv']:
+            uri = os.path.join(self.path, f"source.{file_type}")
+            self._write(uri, pd.DataFrame({'id': [1, 2, 3], 'value': ['a', 'b', 'c']}))
+            new, mark, append = self.watermark.read_new(task_name='task', uri=uri, column='id')
+            self.assertEqual([1, 2, 3], new['id'].to_list())
+            self.assertFalse(append)
+            self.watermark.commit(task_name='task', uri=uri, mark=mark)
+            self._write(uri, pd.DataFrame({'id': [1, 2, 3, 4, 5], 'value': ['a', 'b', 'c', 'd', 'e']}))
+            new, mark, append = self.watermark.read_new(task_name='task', uri=uri, column='id')
+            self.assertEqual([4, 5], new['id'].to_list())
+            self.assertTrue(append)
+            self.watermark.commit(task_name='task', uri=uri, mark=mark)
+            new, mark, append = self.watermark.read_new(task_name='task', uri=uri, column='id')
+            self.assertIsNone(new)
+            new, _, append = self.watermark.read_new(task_name='task', uri=uri, column='id', full=True)
+            self.assertEqual(5, new.shape[0])
+            self.assertFalse(append)
+
+    def test_column_timestamp(self):
+        uri = os.path.join(self.path, 'source.parquet')
+        dates = pd.date_range('2024-01-01', periods=4, freq='D')
+        self._write(uri, pd.DataFrame({'ts': dates[:2], 'value': [1, 2]}))
+        _, mark, _ = self.watermark.read_new(task_name='task', uri=uri, column='ts')
+        self.watermark.commit(task_name='task', uri=uri, mark=mark)
+        self._write(uri, pd.DataFrame({'ts': dates, 'value': [1, 2, 3, 4]}))
+        new, _, append = self.watermark.read_new(task_name='task', uri=uri, column='ts')
+        self.assertEqual([3, 4], new['value'].to_list())
+        self.assertTrue(append)
+
+    def test_files(self):
+        uri = os.path.join(self.path, 'partitioned')
+        os.makedirs(uri)
+        self._write(os.path.join(uri, 'part-0.parquet'), pd.DataFrame({'id': [1, 2]}))
+        new, mark, append = self.watermark.read_new(task_name='task', uri=uri)
+        self.assertEqual([1, 2], new['id'].to_list())
+        self.assertFalse(append)
+        self.watermark.commit(task_name='task', uri=uri, mark=mark)
+        self.assertIsNone(self.watermark.read_new(task_name='task', uri=uri)[0])
+        self._write(os.path.join(uri, 'part-1.parquet'), pd.DataFrame({'id': [3]}))
+        new, mark, append = self.watermark.read_new(task_name='task', uri=uri)
+        self.assertEqual([3], new['id'].to_list())
+        self.assertTrue(append)
+        self.watermark.commit(task_name='task', uri=uri, mark=mark)
+        # a changed partition rereads the whole source
+        time.sleep(0.01)
+        self._write(os.path.join(uri, 'part-0.parquet'), pd.DataFrame({'id': [1, 2, 9]}))
+        new, _, append = self.watermark.read_new(task_name='task', uri=uri)
+        self.assertEqual([1, 2, 9, 3], new['id'].to_list())
+        self.assertFalse(append)
+
+    def test_mtime(self):
+        uri = os.path.join(self.path, 'source.csv')
+        self._write(uri, pd.DataFrame({'id': [1, 2]}))
+        new, mark, append = self.watermark.read_new(task_name='task', uri=uri)
+        self.assertEqual(2, new.shape[0])
+        self.assertFalse(append)
+        self.watermark.commit(task_name='task', uri=uri, mark=mark)
+        self.assertIsNone(self.watermark.read_new(task_name='task', uri=uri)[0])
+        # marks are kept by task
+        self.assertIsNotNone(self.watermark.read_new(task_name='other', uri=uri)[0])
+        self._write(uri, pd.DataFrame({'id': [1, 2, 3]}))
+        new, _, append = self.watermark.read_new(task_name='task', uri=uri)
+        self.assertEqual(3, new.shape[0])
+        self.assertFalse(append)
+
+    def test_report_reset(self):
+        uri = os.path.join(self.path, 'source.csv')
+        self._write(uri, pd.DataFrame({'id': [1, 2]}))
+        for task_name in ['task_a', 'task_b']:
+            _, mark, _ = self.watermark.read_new(task_name=task_name, uri=uri, column='id')
+            self.watermark.commit(task_name=task_name, uri=uri, mark=mark)
+        report = self.watermark.report()
+        self.assertEqual(['task_a', 'task_b'], sorted(report['task_name']))
+        self.assertEqual(['column', 'column'], report['mode'])
+        self.watermark.reset(task_name='task_a')
+        self.assertIsNone(self.watermark.get(task_name='task_a', uri=uri))
+        self.assertIsNotNone(self.watermark.get(task_name='task_b', uri=uri))
+        self.watermark.reset()
+        self.assertEqual([], self.watermark.report()['task_name'])
+
+    def test_supported(self):
+        self.assertTrue(SourceWatermark.is_supported(os.path.join(self.path, 'source.parquet')))
+        self.assertTrue(SourceWatermark.is_supported(self.path))
+        self.assertFalse(SourceWatermark.is_supported('s3://bucket/source.parquet'))
+        self.assertFalse(SourceWatermark.is_supported(os.path.join(self.path, 'source.json')))
+        with self.assertRaises(ValueError):
+            self.watermark.read_new(task_name='task', uri='s3://bucket/source.parquet')
+        os.environ['HADRON_CONTROLLER_WATERMARK_PATH'] = os.path.join(self.path, 'env')
+        self.assertEqual(os.path.join(self.path, 'env'), SourceWatermark().watermark_path)
+
+    def test_append(self):
+        for file_type in ['parquet', 'csv']:
+            uri = os.path.join(self.path, f"outcome.{file_type}")
+            stream = CanonicalStream(uri=uri, chunk_size=2)
+            stream.append(pd.DataFrame({'id': [1, 2, 3], 'value': ['a', 'b', 'c']}))
+            stream.append(pd.DataFrame({'value': ['d'], 'id': [4]}))
+            result = stream.materialize()
+            self.assertEqual([1, 2, 3, 4], result['id'].to_list())
+            self.assertEqual(['a', 'b', 'c', 'd'], result['value'].to_list())
+        with self.assertRaises(ValueError):
+            CanonicalStream(uri=os.path.join(self.path, 'outcome.csv')).append(pd.DataFrame({'other': [1]}))
+
+    @staticmethod
+    def _write(uri: str, df: pd.DataFrame):
+        if uri.endswith('.csv'):
+            df.to_csv(uri, index=False)
+        else:
+            df.to_parquet(uri, index=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
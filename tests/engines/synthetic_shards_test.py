@@ -0,0 +1,47 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from ds_engines.engines.controller.synthetic_shards import SyntheticShards
+
+
+def build_shard(size: int, seed: int) -> pd.DataFrame:
+    generator = np.random.default_rng(seed)
+    return pd.DataFrame({'id': range(100, 100 + size), 'value': generator.integers(0, 1000, size)})
+
+
+class SyntheticShardsTest(unittest.TestCase):
+
+    def test_sizes(self):
+        self.assertEqual([4, 3, 3], SyntheticShards(size=10, shards=3).sizes)
+        self.assertEqual([1, 1], SyntheticShards(size=2, shards=8).sizes)
+        self.assertEqual(100000, sum(SyntheticShards(size=100000, shards=7).sizes))
+        with self.assertRaises(ValueError):
+            SyntheticShards(size=10, shards=0)
+
+    def test_seeds(self):
+        seeds = SyntheticShards(size=100, shards=4, seed=42).seeds
+        self.assertEqual(4, len(set(seeds)))
+        self.assertEqual(seeds, SyntheticShards(size=100, shards=4, seed=42).seeds)
+        self.assertNotEqual(seeds, SyntheticShards(size=100, shards=4, seed=7).seeds)
+
+    def test_run(self):
+        sharder = SyntheticShards(size=1000, shards=4, seed=1)
+        first = pd.concat(list(sharder.run(build_shard)), ignore_index=True)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            second = pd.concat(list(sharder.run(build_shard, executor=executor)), ignore_index=True)
+        self.assertEqual(1000, first.shape[0])
+        self.assertTrue(first.equals(second))
+        # without key columns the sequence repeats in each shard
+        self.assertEqual(250, first['id'].nunique())
+
+    def test_key_columns(self):
+        sharder = SyntheticShards(size=10, shards=3, seed=1, key_columns='id')
+        self.assertEqual([0, 4, 7], sharder.offsets)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            result = pd.concat(list(sharder.run(build_shard, executor=executor)), ignore_index=True)
+        self.assertEqual(list(range(100, 110)), result['id'].to_list())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from ds_engines.engines.controller.task_cache import TaskResultCache
+
+
+def put_entries(cache_path: str, worker: int):
+    cache = TaskResultCache(cache_path=cache_path)
+    for n in range(10):
+        cache.put(f"{worker}_{n}", canonical=pd.DataFrame({'A': range(100)}), task_name='task')
+        _ = cache.get(f"{worker}_{n}", task_name='task')
+
+
+class TaskResultCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path, ignore_errors=True)
+
+    def test_fingerprint(self):
+        df = pd.DataFrame({'A': [1, 2, 3], 'B': list('abc')})
+        self.assertEqual(TaskResultCache.fingerprint(df), TaskResultCache.fingerprint(df.copy()))
+        changed = df.copy()
+        changed.loc[0, 'A'] = 9
+        self.assertNotEqual(TaskResultCache.fingerprint(df), TaskResultCache.fingerprint(changed))
+        self.assertNotEqual(TaskResultCache.fingerprint(df), TaskResultCache.fingerprint(df.astype({'A': float})))
+
+    def test_key(self):
+        key = TaskResultCache.task_key('wrangle', {'intent_level': 'A'}, 'contract', 'input')
+        self.assertEqual(key, TaskResultCache.task_key('wrangle', {'intent_level': 'A'}, 'contract', 'input'))
+        self.assertNotEqual(key, TaskResultCache.task_key('wrangle', {'intent_level': 'B'}, 'contract', 'input'))
+        self.assertNotEqual(key, TaskResultCache.task_key('wrangle', {'intent_level': 'A'}, 'changed', 'input'))
+
+    def test_get_put(self):
+        cache = TaskResultCache(cache_path=self.cache_path)
+        df = pd.DataFrame({'A': [1, 2, 3]})
+        self.assertIsNone(cache.get('key', task_name='task'))
+        cache.put('key', canonical=df, task_name='task')
+        self.assertTrue(df.equals(cache.get('key', task_name='task')))
+        report = cache.report()
+        self.assertEqual(['task'], report['task_name'])
+        self.assertEqual([1], report['hits'])
+        self.assertEqual([1], report['misses'])
+        self.assertEqual([1], report['entries'])
+        cache.clear()
+        self.assertIsNone(cache.get('key', task_name='task'))
+
+    def test_evict(self):
+        cache = TaskResultCache(cache_path=self.cache_path, max_size=1)
+        cache.put('first', canonical=pd.DataFrame({'A': range(100)}), task_name='task')
+        cache.put('second', canonical=pd.DataFrame({'A': range(100)}), task_name='task')
+        self.assertIsNone(cache.get('first'))
+        self.assertIsNone(cache.get('second'))
+        cache = TaskResultCache(cache_path=self.cache_path)
+        cache.put('first', canonical=pd.DataFrame({'A': range(100)}), task_name='task')
+        cache.put('second', canonical=pd.DataFrame({'A': range(100)}), task_name='task')
+        _ = cache.get('first', task_name='task')
+        report = cache.report()
+        size = report['bytes'][report['task_name'].index('task')]
+        cache = TaskResultCache(cache_path=self.cache_path, max_size=size)
+        cache.put('third', canonical=pd.DataFrame({'A': range(100)}), task_name='task')
+        self.assertIsNone(cache.get('second'))
+        self.assertIsNotNone(cache.get('first'))
+
+    def test_processes(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            _ = list(executor.map(put_entries, [self.cache_path] * 4, range(4)))
+        # every process records its entries and counts, so none are lost to another process
+        report = TaskResultCache(cache_path=self.cache_path).report()
+        self.assertEqual([40], report['entries'])
+        self.assertEqual([40], report['hits'])
+        size = report['bytes'][0] // 40
+        cache = TaskResultCache(cache_path=self.cache_path, max_size=size * 10)
+        cache.put('last', canonical=pd.DataFrame({'A': range(100)}), task_name='task')
+        self.assertEqual([10], cache.report()['entries'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+from ds_engines.engines.controller.run_stats import RunStats
+from ds_engines.engines.controller.task_policy import TaskPolicy
+
+
+class TaskPolicyTest(unittest.TestCase):
+
+    def test_inactive(self):
+        policy = TaskPolicy()
+        self.assertFalse(policy.is_active)
+        info = {}
+        self.assertEqual(1, policy.run(lambda: 1, info=info))
+        self.assertEqual({'attempts': 1, 'speculated': 0, 'timeouts': 0}, info)
+
+    def test_retries(self):
+        calls = []
+
+        def task():
+            calls.append(time.perf_counter())
+            if len(calls) < 3:
+                raise ConnectionError('flaky')
+            return 'done'
+
+        policy = TaskPolicy(retries=2, backoff=0.02)
+        info = {}
+        self.assertEqual('done', policy.run(task, info=info))
+        self.assertEqual(3, info['attempts'])
+        self.assertGreaterEqual(calls[2] - calls[1], 0.04)
+        # the retries are spent
+        calls.clear()
+        info = {}
+        with self.assertRaises(ConnectionError):
+            TaskPolicy(retries=1, backoff=0).run(task, info=info)
+        self.assertEqual(2, info['attempts'])
+        self.assertEqual([1.0, 2.0, 4.0, 5.0], [TaskPolicy(backoff=1, max_backoff=5).retry_delay(x)
+                                                for x in [1, 2, 3, 4]])
+
+    def test_timeout(self):
+        release = threading.Event()
+        calls = []
+
+        def task():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)
+            return len(calls)
+
+        info = {}
+        started = time.perf_counter()
+        self.assertEqual(2, TaskPolicy(timeout=0.1, retries=1, backoff=0).run(task, info=info))
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertEqual(1, info['timeouts'])
+        release.set()
+        with self.assertRaises(TimeoutError):
+            TaskPolicy(timeout=0.05).run(lambda: time.sleep(1))
+
+    def test_speculate(self):
+        calls = []
+
+        def task():
+            calls.append(1)
+            if len(calls) == 1:
+                time.sleep(1)
+                return 'straggler'
+            return 'speculative'
+
+        info = {}
+        started = time.perf_counter()
+        self.assertEqual('speculative', TaskPolicy(speculate_after=0.05).run(task, info=info))
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual({'attempts': 2, 'speculated': 1, 'timeouts': 0}, info)
+
+    def test_from_dict(self):
+        default = TaskPolicy.from_dict({'timeout': 10, 'retries': 2})
+        policy = TaskPolicy.from_dict({'retries': 0}, default=default)
+        self.assertEqual(10, policy.timeout)
+        self.assertEqual(0, policy.retries)
+        self.assertIs(default, TaskPolicy.from_dict(None, default=default))
+        with self.assertRaises(ValueError):
+            TaskPolicy.from_dict({'time_out': 10})
+
+    def test_attach(self):
+        stats = RunStats()
+        with stats.measure(level='A', method='transition', task_name='task') as record:
+            counts = {}
+
+            def attempt():
+                with stats.attach(counts):
+                    stats.add(rows_in=5)
+
+            thread = threading.Thread(target=attempt)
+            thread.start()
+            thread.join()
+            stats.add(**counts)
+            record['attempts'] = 1
+        self.assertEqual(5, stats.records[0]['rows_in'])
+        self.assertEqual(1, stats.report()['attempts'][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
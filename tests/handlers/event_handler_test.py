@@ -80,6 +80,22 @@ class EventHandlerTest(unittest.TestCase):
         print(result)
         # self.assertCountEqual(list('ABC'), result.columns.to_list())
 
+    def test_conditional_load(self):
+        cc = ConnectorContract(uri='eb://test_versions', module_name='', handler='')
+        handler = EventPersistHandler(connector_contract=cc)
+        handler.persist_canonical(pd.DataFrame({'A': [1, 2, 3, 4], 'B': [7, 2, 1, 4]}))
+        result = handler.load_canonical()
+        version = result.attrs['version']
+        self.assertEqual(version, handler.get_version())
+        self.assertIsNone(handler.load_canonical(if_newer_than=version))
+        self.assertFalse(handler.has_changed(if_newer_than=version))
+        handler.persist_canonical(pd.DataFrame({'C': [9, 8]}, index=[1, 3]), reset_state=False)
+        self.assertTrue(handler.has_changed(if_newer_than=version))
+        result = handler.load_canonical(if_newer_than=version, delta=True)
+        self.assertEqual(['C'], result.columns.to_list())
+        self.assertEqual([1, 3], result.index.to_list())
+        self.assertGreater(result.attrs['version'], version)
+
     def test_from_component(self):
         # EventBook
         os.environ['HADRON_DEFAULT_PATH'] = 'eb://grey_storage/'
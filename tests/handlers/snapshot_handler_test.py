@@ -0,0 +1,78 @@
+import unittest
+import os
+import shutil
+import pandas as pd
+import numpy as np
+from aistac.handlers.abstract_handlers import ConnectorContract
+from ds_engines.engines.event_books.pandas_event_book import PandasEventBook
+from ds_engines.handlers.snapshot_handlers import SnapshotPersistHandler
+
+
+class SnapshotHandlerTest(unittest.TestCase):
+
+    MODULE = "ds_engines.handlers.snapshot_handlers"
+    HANDLER = "SnapshotPersistHandler"
+
+    def setUp(self):
+        os.environ['HADRON_PM_PATH'] = os.path.join('work', 'config')
+        try:
+            os.makedirs(os.environ['HADRON_PM_PATH'])
+        except:
+            pass
+
+    def tearDown(self):
+        try:
+            shutil.rmtree('work')
+        except:
+            pass
+
+    def test_persist_load(self):
+        uri = os.path.join(os.environ['HADRON_PM_PATH'], 'book.parquet')
+        handler = SnapshotPersistHandler(ConnectorContract(uri=uri, module_name=self.MODULE, handler=self.HANDLER,
+                                                           chunk_size=3))
+        self.assertFalse(handler.exists())
+        df = pd.DataFrame({'A': np.arange(10), 'B': list('abcdefghij'), 'C': np.random.random(10)},
+                          index=[f"k{i}" for i in range(10)])
+        handler.persist_canonical(df)
+        self.assertTrue(handler.exists())
+        self.assertEqual(4, len(handler.load_manifest().get('parts')))
+        result = handler.load_canonical()
+        self.assertEqual(df.to_dict(), result.to_dict())
+        result = handler.load_canonical(columns=['B'])
+        self.assertEqual(['B'], result.columns.to_list())
+        self.assertEqual(df.index.to_list(), result.index.to_list())
+        # replace the snapshot
+        handler.persist_canonical(df.iloc[:2])
+        self.assertEqual((2, 3), handler.load_canonical().shape)
+        self.assertEqual(1, len([n for n in os.listdir(uri) if n.startswith('v-')]))
+
+    def test_failed_write(self):
+        uri = os.path.join(os.environ['HADRON_PM_PATH'], 'book.parquet')
+        handler = SnapshotPersistHandler(ConnectorContract(uri=uri, module_name=self.MODULE, handler=self.HANDLER))
+        df = pd.DataFrame({0: [1, 2, 3], 1: ['a', 'b', 'c'], 'C': [0.5, 1.5, 2.5]})
+        handler.persist_canonical(df)
+        # the column names that are not strings are restored
+        result = handler.load_canonical()
+        self.assertEqual([0, 1, 'C'], result.columns.to_list())
+        self.assertEqual(['a', 'b', 'c'], handler.load_canonical(columns=[1])[1].to_list())
+        # a write that fails leaves the previous snapshot in place
+        with self.assertRaises(ValueError):
+            handler.persist_canonical(pd.DataFrame({'A': [object(), object()]}))
+        self.assertEqual(df.to_dict(), handler.load_canonical().to_dict())
+        self.assertEqual(1, len([n for n in os.listdir(uri) if n.startswith('v-')]))
+
+    def test_event_book(self):
+        uri = os.path.join(os.environ['HADRON_PM_PATH'], 'state.parquet')
+        state_connector = ConnectorContract(uri=uri, module_name=self.MODULE, handler=self.HANDLER)
+        event_book = PandasEventBook('test', state_connector=state_connector)
+        event_book.add_event(pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6]}))
+        event_book.save_state()
+        event_book.reset_state()
+        event_book.recover_state(columns=['B'])
+        result = event_book.current_state()
+        self.assertEqual(['B'], result.columns.to_list())
+        self.assertEqual([4, 5, 6], result['B'].to_list())
+
+
+if __name__ == '__main__':
+    unittest.main()
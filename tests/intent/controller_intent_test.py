@@ -1,13 +1,20 @@
 import unittest
 import os
 import shutil
+import threading
+import time
 from pprint import pprint
+from types import SimpleNamespace
+import pandas as pd
 
 from ds_behavioral import SyntheticBuilder
 from ds_behavioral.intent.synthetic_intent_model import SyntheticIntentModel
 from aistac.properties.property_manager import PropertyManager
 
+from ds_engines.engines.controller.canonical_stream import CanonicalStream
+from ds_engines.engines.controller.task_cache import TaskResultCache
 from ds_engines.intent.controller_intent import ControllerIntentModel
+from ds_engines.intent.dispatch_plan import DispatchStep
 from ds_engines.managers.controller_property_manager import ControllerPropertyManager
 
 
@@ -74,6 +81,76 @@ class ControllerIntentTest(unittest.TestCase):
         self.assertEqual(control, result.columns.to_list())
         self.assertEqual((1000, 8), result.shape)
 
+    def test_staged_attempts(self):
+        dc = self.instance
+        dc.set_task_policies(task_policy={'speculate_after': 0.05})
+        dc.set_result_cache(TaskResultCache(cache_path=os.path.join('work', 'cache')))
+        persisted = []
+
+        class Component(object):
+            class pm(object):
+                @staticmethod
+                def get_connector_contract(connector_name):
+                    return SimpleNamespace(uri=f"memory://{connector_name}")
+
+        def wrangle(canonical, task_name, **kwargs):
+            calls.append(task_name)
+            if len(calls) == 1:
+                # the first attempt changes its canonical and straggles
+                canonical['A'] = -1
+                time.sleep(0.5)
+            dc._persist_canonical(Component, 'persist', canonical=canonical, persist=lambda canonical: (
+                persisted.append((canonical['A'].to_list(), threading.current_thread().name))))
+            dc._put_cached_outcome(f"attempt_{canonical['A'].iloc[0]}", canonical=canonical, task_name=task_name)
+            return canonical
+
+        calls = []
+        step = DispatchStep(method='wrangle', call=wrangle, params={'task_name': 'task'}, order=0)
+        canonical = pd.DataFrame({'A': [1, 2]})
+        result = dc._run_step('level', step=step, canonical=canonical, params={}, record=None)
+        # the speculative attempt had the canonical as it was passed and only its persist was committed
+        self.assertEqual([1, 2], result['A'].to_list())
+        time.sleep(0.6)
+        self.assertEqual([([1, 2], threading.current_thread().name)], persisted)
+        # only the result cache entry of the winning attempt was added
+        self.assertEqual(['attempt_1'], list(dc._result_cache._entries().keys()))
+
+    def test_incremental(self):
+        dc = self.instance
+        dc.start_incremental(['upstream', 'downstream'], watermark_path=os.path.join('work', 'marks'))
+        source = os.path.join('work', 'source')
+        os.makedirs(source)
+        pd.DataFrame({'id': [1, 2]}).to_parquet(os.path.join(source, 'a.parquet'), index=False)
+
+        def component(source_uri, persist_uri):
+            uris = {'source': source_uri, 'persist': persist_uri}
+            return SimpleNamespace(CONNECTOR_SOURCE='source', CONNECTOR_PERSIST='persist', pm=SimpleNamespace(
+                get_connector_contract=lambda connector_name: SimpleNamespace(uri=uris.get(connector_name))))
+
+        upstream = component(source, os.path.join('work', 'upstream.parquet'))
+        downstream = component(source, os.path.join('work', 'downstream.parquet'))
+
+        def run():
+            up = dc._run_incremental(upstream, 'upstream', canonical=pd.DataFrame(), run_task=lambda x: x)
+            return up, dc._run_incremental(downstream, 'downstream', canonical=up, run_task=lambda x: x)
+
+        up, down = run()
+        self.assertFalse(down.appended)
+        self.assertEqual([1, 2], down.increment['id'].to_list())
+        pd.DataFrame({'id': [3]}).to_parquet(os.path.join(source, 'b.parquet'), index=False)
+        up, down = run()
+        # the downstream incremental task is passed the increment, any other task the whole outcome
+        self.assertTrue(down.appended)
+        self.assertEqual([3], down.increment['id'].to_list())
+        self.assertEqual([1, 2, 3], up.materialize()['id'].to_list())
+        self.assertEqual([1, 2, 3], down.materialize()['id'].to_list())
+        # an append whose run failed before its mark was committed is truncated on the next run
+        CanonicalStream(uri=up.uri).append(pd.DataFrame({'id': [3]}))
+        up, down = run()
+        self.assertEqual(0, up.increment.shape[0])
+        self.assertEqual([1, 2, 3], up.materialize()['id'].to_list())
+        self.assertEqual([1, 2, 3], down.materialize()['id'].to_list())
+
     def test_raise(self):
         with self.assertRaises(KeyError) as context:
             env = os.environ['NoEnvValueTest']
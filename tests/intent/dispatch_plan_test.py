@@ -0,0 +1,51 @@
+import unittest
+import pandas as pd
+from ds_engines.intent.dispatch_plan import DispatchPlan
+
+
+class IntentModel(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def task(self, canonical, value, **kwargs):
+        self.calls.append((canonical, value, kwargs))
+        return canonical + value
+
+
+class DispatchPlanTest(unittest.TestCase):
+
+    def test_steps(self):
+        model = IntentModel()
+        level_intent = {'1': {'task': {'value': 2, 'intent_creator': 'user'}},
+                        '0': {'task': {'value': 1, 'kwargs': {'key': 'x'}}, 'unknown': {}}}
+        plan = DispatchPlan(model, level_intent=level_intent, flatten_kwargs=True)
+        self.assertEqual(['task', 'task'], [step.method for step in plan.steps])
+        self.assertEqual({'value': 1, 'key': 'x'}, plan.steps[0].params)
+        self.assertEqual({'value': 2}, plan.steps[1].params)
+        canonical = 0
+        for step in plan.steps:
+            canonical = step.run(canonical, run_task=True)
+        self.assertEqual(3, canonical)
+        self.assertEqual({'key': 'x', 'run_task': True}, model.calls[0][2])
+
+    def test_native_params(self):
+        model = IntentModel()
+        value = pd.Timestamp('2020-01-01')
+        plan = DispatchPlan(model, level_intent={'0': {'task': {'value': pd.Timedelta(days=1)}}})
+        self.assertEqual(pd.Timestamp('2020-01-02'), plan.steps[0].run(value))
+
+    def test_get_plan(self):
+        model = IntentModel()
+        plans = dict()
+        level_intent = {'0': {'task': {'value': 1}}}
+        plan = DispatchPlan.get_plan(model, plans=plans, intent_level='A', level_intent=level_intent)
+        self.assertIs(plan, DispatchPlan.get_plan(model, plans=plans, intent_level='A', level_intent=level_intent))
+        level_intent['0']['task']['value'] = 5
+        changed = DispatchPlan.get_plan(model, plans=plans, intent_level='A', level_intent=level_intent)
+        self.assertIsNot(plan, changed)
+        self.assertEqual({'value': 5}, changed.steps[0].params)
+
+
+if __name__ == '__main__':
+    unittest.main()